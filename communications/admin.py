@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import EmailLog, EmailMonitorConfig
+from .models import EmailLog, EmailMonitorConfig, SenderIndexEntry
 
 @admin.register(EmailLog)
 class EmailLogAdmin(admin.ModelAdmin):
@@ -14,4 +14,11 @@ class EmailMonitorConfigAdmin(admin.ModelAdmin):
     list_display = ('project', 'folder_name', 'last_check_time', 'is_active')
     list_filter = ('is_active',)
     search_fields = ('project__name', 'folder_name')
-    readonly_fields = ('last_check_time',)
\ No newline at end of file
+    readonly_fields = ('last_check_time',)
+
+@admin.register(SenderIndexEntry)
+class SenderIndexEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'key_type', 'subcontractor')
+    list_filter = ('key_type',)
+    search_fields = ('key', 'subcontractor__company')
+    raw_id_fields = ('subcontractor',)
\ No newline at end of file
@@ -4,4 +4,8 @@ from django.conf import settings
 
 class CommunicationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'communications'
\ No newline at end of file
+    name = 'communications'
+
+    def ready(self):
+        # Import signals to ensure they are registered
+        import communications.signals
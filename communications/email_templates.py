@@ -0,0 +1,119 @@
+# communications/email_templates.py
+import re
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Wraps slot names in the pre-rendered text, never produced by template content
+SLOT_MARKER = '\x00'
+
+
+class PrecompiledFragment:
+    """
+    An email template rendered once with placeholder slots.
+    Per-recipient values are joined into the pre-rendered text without re-rendering the template.
+    """
+
+    def __init__(self, template_name, slots=(), context=None):
+        context = dict(context or {})
+        for slot in slots:
+            context[slot] = mark_safe(f"{SLOT_MARKER}{slot}{SLOT_MARKER}")
+
+        rendered = render_to_string(template_name, context)
+
+        if slots:
+            pattern = re.compile(f"{SLOT_MARKER}({'|'.join(map(re.escape, slots))}){SLOT_MARKER}")
+            # Even indexes are literal text, odd indexes are slot names
+            self.parts = pattern.split(rendered)
+        else:
+            self.parts = [rendered]
+
+    def fill(self, **values):
+        """Substitute slot values as-is - callers pass trusted HTML or URL-safe tokens"""
+        return ''.join(
+            part if index % 2 == 0 else str(values.get(part, ''))
+            for index, part in enumerate(self.parts)
+        )
+
+
+def _base_url():
+    return getattr(settings, 'BASE_URL', 'https://taknox.pythonanywhere.com')
+
+
+@lru_cache(maxsize=None)
+def signature():
+    """Standardized company email signature"""
+    return render_to_string('communications/email/signature.html')
+
+
+@lru_cache(maxsize=None)
+def email_layout():
+    return PrecompiledFragment(
+        'communications/email/layout.html',
+        slots=('body', 'sharepoint_section', 'action_buttons')
+    )
+
+
+@lru_cache(maxsize=None)
+def tracking_buttons():
+    return PrecompiledFragment(
+        'communications/email/tracking_buttons.html',
+        slots=('token',),
+        context={'base_url': _base_url()}
+    )
+
+
+@lru_cache(maxsize=None)
+def action_buttons():
+    return PrecompiledFragment('communications/email/action_buttons.html', slots=('reply_url',))
+
+
+@lru_cache(maxsize=128)
+def sharepoint_section(links):
+    """Links are a tuple of (url, title) pairs - one fragment per distinct set of links"""
+    return PrecompiledFragment(
+        'communications/email/sharepoint_section.html',
+        slots=('token',),
+        context={
+            'base_url': _base_url(),
+            'links': [{'title': title, 'quoted_url': quote(url, safe='')} for url, title in links],
+        }
+    )
+
+
+def sharepoint_links_key(sharepoint_links):
+    """Hashable cache key for a list of {'url', 'title'} link dicts"""
+    return tuple((link['url'], link['title']) for link in sharepoint_links)
+
+
+def render_email(body, response_token=None, download_token=None, sharepoint_links=None, reply_url=None,
+                 include_buttons=True):
+    """
+    Assemble the full HTML for one recipient from the pre-rendered fragments.
+    Tokens are the invitation's tracking tokens for the yes/no buttons and the SharePoint downloads.
+    """
+    sharepoint_html = ''
+    if sharepoint_links and download_token:
+        sharepoint_html = sharepoint_section(sharepoint_links_key(sharepoint_links)).fill(token=download_token)
+
+    buttons_html = ''
+    if response_token and include_buttons:
+        buttons_html = tracking_buttons().fill(token=response_token)
+    elif reply_url:
+        # Fallback to old-style buttons if no invitation tracking
+        buttons_html = action_buttons().fill(reply_url=reply_url)
+
+    return email_layout().fill(
+        body=body,
+        sharepoint_section=sharepoint_html,
+        action_buttons=buttons_html
+    )
+
+
+def clear_cache():
+    """Drop pre-rendered fragments, e.g. after editing templates or BASE_URL"""
+    for cached in (signature, email_layout, tracking_buttons, action_buttons, sharepoint_section):
+        cached.cache_clear()
@@ -0,0 +1,94 @@
+# communications/management/commands/benchmark_email_render.py
+import time
+from urllib.parse import quote
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from communications import email_templates
+from tenders.tokens import make_token
+from tenders.tracking import EVENT_RESPONSE
+
+
+def render_full(body, response_token=None, download_token=None, sharepoint_links=None, reply_url=None):
+    """Baseline: every fragment rendered from its template for this recipient, as before pre-rendering"""
+    base_url = getattr(settings, 'BASE_URL', 'https://taknox.pythonanywhere.com')
+    sharepoint_section = ''
+    if sharepoint_links and download_token:
+        sharepoint_section = render_to_string('communications/email/sharepoint_section.html', {
+            'base_url': base_url,
+            'token': download_token,
+            'links': [{'title': link['title'], 'quoted_url': quote(link['url'], safe='')} for link in sharepoint_links],
+        })
+
+    action_buttons = ''
+    if response_token:
+        action_buttons = render_to_string('communications/email/tracking_buttons.html', {
+            'base_url': base_url,
+            'token': response_token,
+        })
+    elif reply_url:
+        action_buttons = render_to_string('communications/email/action_buttons.html', {'reply_url': reply_url})
+
+    return render_to_string('communications/email/layout.html', {
+        'body': mark_safe(body),
+        'sharepoint_section': mark_safe(sharepoint_section),
+        'action_buttons': mark_safe(action_buttons),
+    })
+
+
+class Command(BaseCommand):
+    help = 'Measure per-message render cost of tender invitation emails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=1000,
+            help='Number of messages to render per run (default 1000)'
+        )
+        parser.add_argument(
+            '--links',
+            type=int,
+            default=1,
+            help='SharePoint links per message (default 1)'
+        )
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        sharepoint_links = [
+            {'url': f'https://taknox.sharepoint.com/sites/Estimating/Tender {i}/ITT', 'title': f'ITT Documents {i}'}
+            for i in range(options['links'])
+        ]
+        tokens = [make_token(invitation_id, EVENT_RESPONSE) for invitation_id in range(count)]
+        bodies = [f"<p>Dear Contact {i},</p><p>We would like to invite you to tender.</p>" for i in range(count)]
+
+        self.stdout.write(f"📧 Rendering {count} messages with {len(sharepoint_links)} SharePoint link(s)")
+
+        # Baseline: full template render of every fragment for every recipient
+        start = time.perf_counter()
+        expected = [
+            render_full(body, response_token=token, download_token=token, sharepoint_links=sharepoint_links)
+            for body, token in zip(bodies, tokens)
+        ]
+        full_seconds = time.perf_counter() - start
+
+        # Pre-rendered fragments, including the one-off precompile cost
+        email_templates.clear_cache()
+        start = time.perf_counter()
+        rendered = [
+            email_templates.render_email(body, response_token=token, download_token=token, sharepoint_links=sharepoint_links)
+            for body, token in zip(bodies, tokens)
+        ]
+        precompiled_seconds = time.perf_counter() - start
+
+        mismatches = sum(html != baseline for html, baseline in zip(rendered, expected))
+        if mismatches:
+            raise CommandError(f"{mismatches} pre-rendered messages differ from the full render")
+
+        full_us = full_seconds / count * 1_000_000
+        precompiled_us = precompiled_seconds / count * 1_000_000
+
+        self.stdout.write(f"   Full render:   {full_us:10.1f} µs/message")
+        self.stdout.write(f"   Pre-rendered:  {precompiled_us:10.1f} µs/message")
+        self.stdout.write(self.style.SUCCESS(f"   Speed-up:      {full_seconds / precompiled_seconds:10.1f}x"))
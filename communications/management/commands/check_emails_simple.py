@@ -2,9 +2,10 @@
 from django.core.management.base import BaseCommand
 from communications.services import OutlookEmailService
 from communications.models import EmailMonitorConfig
+from communications.return_index import ReturnMatchIndex
 
 class Command(BaseCommand):
-    help = 'Simple email check for tender returns - domain matching only'
+    help = 'Simple email check for tender returns - sender address and domain matching'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -30,6 +31,11 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.WARNING("No active email monitoring configurations found"))
                 return
 
+            # One sender index shared by every project folder in this run
+            match_index = ReturnMatchIndex.load(
+                project_ids=list(configs.values_list('project_id', flat=True))
+            )
+
             total_emails = 0
             total_matched = 0
 
@@ -38,7 +44,7 @@ class Command(BaseCommand):
                 self.stdout.write(f"   Folder: {config.folder_name}")
                 
                 try:
-                    emails_processed, tenders_matched = service.check_project_folder_simple(config)
+                    emails_processed, tenders_matched = service.check_project_folder_simple(config, match_index=match_index)
                     
                     total_emails += emails_processed
                     total_matched += tenders_matched
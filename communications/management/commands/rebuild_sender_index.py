@@ -0,0 +1,21 @@
+# communications/management/commands/rebuild_sender_index.py
+from django.core.management.base import BaseCommand
+from communications.return_index import rebuild_sender_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the sender address/domain index used to match tender returns'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subcontractor-id',
+            type=int,
+            action='append',
+            help='Only reindex the given subcontractor (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Rebuilding sender index...")
+
+        entries = rebuild_sender_index(subcontractor_ids=options['subcontractor_id'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Sender index rebuilt with {entries} entries"))
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:08
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of communications.return_index as of this migration, so later
+# changes to the live index keys cannot change or break it.
+PUBLIC_MAIL_DOMAINS = frozenset(
+    [
+        "gmail.com", "googlemail.com", "hotmail.com", "hotmail.co.uk", "outlook.com",
+        "live.com", "live.co.uk", "yahoo.com", "yahoo.co.uk", "icloud.com", "me.com",
+        "aol.com", "btinternet.com", "sky.com", "talktalk.net", "virginmedia.com",
+    ]
+)
+
+ADDRESS_SPLIT_RE = re.compile(r"[;,\s]+")
+
+
+def normalize_address(address):
+    if not address:
+        return ""
+    address = address.strip().strip("<>").lower()
+    if address.startswith("mailto:"):
+        address = address[len("mailto:"):]
+    if address.count("@") != 1:
+        return ""
+    local, domain = address.split("@")
+    if not local or "." not in domain:
+        return ""
+    return address
+
+
+def index_keys(email_field):
+    keys = set()
+    for part in ADDRESS_SPLIT_RE.split(email_field or ""):
+        address = normalize_address(part)
+        if not address:
+            continue
+        keys.add((address, "ADDRESS"))
+        domain = address.split("@")[1]
+        if domain not in PUBLIC_MAIL_DOMAINS:
+            keys.add((domain, "DOMAIN"))
+    return keys
+
+
+def populate_sender_index(apps, schema_editor):
+    Subcontractor = apps.get_model("subcontractors", "Subcontractor")
+    SenderIndexEntry = apps.get_model("communications", "SenderIndexEntry")
+    SenderIndexEntry.objects.bulk_create(
+        [
+            SenderIndexEntry(
+                key=key, key_type=key_type, subcontractor_id=subcontractor_id
+            )
+            for subcontractor_id, email in Subcontractor.objects.values_list(
+                "id", "email"
+            )
+            for key, key_type in index_keys(email)
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0001_initial"),
+        ("subcontractors", "0002_alter_subcontractor_email"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SenderIndexEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(db_index=True, max_length=255)),
+                (
+                    "key_type",
+                    models.CharField(
+                        choices=[("ADDRESS", "Full Address"), ("DOMAIN", "Domain")],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "subcontractor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sender_index_entries",
+                        to="subcontractors.subcontractor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Sender index entries",
+                "unique_together": {("key", "key_type", "subcontractor")},
+            },
+        ),
+        migrations.RunPython(populate_sender_index, migrations.RunPython.noop),
+    ]
@@ -31,4 +31,22 @@ class EmailMonitorConfig(models.Model):
     is_active = models.BooleanField(default=True)
     
     def __str__(self):
-        return f"Email monitoring for {self.project.name}"
\ No newline at end of file
+        return f"Email monitoring for {self.project.name}"
+
+class SenderIndexEntry(models.Model):
+    """Normalized sender address or domain mapped to a subcontractor for tender return matching"""
+    KEY_TYPES = [
+        ('ADDRESS', 'Full Address'),
+        ('DOMAIN', 'Domain'),
+    ]
+
+    key = models.CharField(max_length=255, db_index=True)
+    key_type = models.CharField(max_length=10, choices=KEY_TYPES)
+    subcontractor = models.ForeignKey(Subcontractor, on_delete=models.CASCADE, related_name='sender_index_entries')
+
+    class Meta:
+        unique_together = ['key', 'key_type', 'subcontractor']
+        verbose_name_plural = "Sender index entries"
+
+    def __str__(self):
+        return f"{self.key} -> {self.subcontractor.company}"
@@ -0,0 +1,171 @@
+# communications/return_index.py
+import logging
+import re
+from collections import defaultdict
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Shared mailbox providers - a domain match on these says nothing about the company
+PUBLIC_MAIL_DOMAINS = frozenset([
+    'gmail.com', 'googlemail.com', 'hotmail.com', 'hotmail.co.uk', 'outlook.com',
+    'live.com', 'live.co.uk', 'yahoo.com', 'yahoo.co.uk', 'icloud.com', 'me.com',
+    'aol.com', 'btinternet.com', 'sky.com', 'talktalk.net', 'virginmedia.com',
+])
+
+ADDRESS_SPLIT_RE = re.compile(r'[;,\s]+')
+
+
+def normalize_address(address):
+    """Lower-case an email address and strip display wrappers, returns '' if invalid"""
+    if not address:
+        return ''
+    address = address.strip().strip('<>').lower()
+    if address.startswith('mailto:'):
+        address = address[len('mailto:'):]
+    if address.count('@') != 1:
+        return ''
+    local, domain = address.split('@')
+    if not local or '.' not in domain:
+        return ''
+    return address
+
+
+def split_addresses(email_field):
+    """Split a semicolon separated Subcontractor.email value into normalized addresses"""
+    addresses = []
+    for part in ADDRESS_SPLIT_RE.split(email_field or ''):
+        address = normalize_address(part)
+        if address and address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+def index_keys(email_field):
+    """Return the set of (key, key_type) pairs a subcontractor should be indexed under"""
+    keys = set()
+    for address in split_addresses(email_field):
+        keys.add((address, 'ADDRESS'))
+        domain = address.split('@')[1]
+        if domain not in PUBLIC_MAIL_DOMAINS:
+            keys.add((domain, 'DOMAIN'))
+    return keys
+
+
+def reindex_subcontractor(subcontractor):
+    """Replace the sender index entries for a single subcontractor"""
+    from .models import SenderIndexEntry
+
+    entries = [
+        SenderIndexEntry(key=key, key_type=key_type, subcontractor_id=subcontractor.pk)
+        for key, key_type in index_keys(subcontractor.email)
+    ]
+    with transaction.atomic():
+        SenderIndexEntry.objects.filter(subcontractor_id=subcontractor.pk).delete()
+        SenderIndexEntry.objects.bulk_create(entries)
+    return len(entries)
+
+
+def rebuild_sender_index(subcontractor_ids=None):
+    """Rebuild the sender index for all (or the given) subcontractors, returns entries written"""
+    from subcontractors.models import Subcontractor
+    from .models import SenderIndexEntry
+
+    subcontractors = Subcontractor.objects.all()
+    existing = SenderIndexEntry.objects.all()
+    if subcontractor_ids is not None:
+        subcontractors = subcontractors.filter(pk__in=subcontractor_ids)
+        existing = existing.filter(subcontractor_id__in=subcontractor_ids)
+
+    entries = [
+        SenderIndexEntry(key=key, key_type=key_type, subcontractor_id=subcontractor_id)
+        for subcontractor_id, email in subcontractors.values_list('id', 'email').iterator()
+        for key, key_type in index_keys(email)
+    ]
+    with transaction.atomic():
+        existing.delete()
+        SenderIndexEntry.objects.bulk_create(entries, batch_size=1000)
+
+    logger.info(f"Sender index rebuilt with {len(entries)} entries")
+    return len(entries)
+
+
+class ReturnMatchIndex:
+    """
+    In-memory snapshot of the sender index joined with open (not yet returned) invitations.
+    Loaded once per mail check so every message is matched with dict lookups only.
+    """
+
+    def __init__(self):
+        self.by_address = defaultdict(set)
+        self.by_domain = defaultdict(set)
+        self.open_invitations = defaultdict(list)
+
+    @staticmethod
+    def open_invitations_queryset(project_ids=None):
+        """Invitations still waiting for a tender return"""
+        from tenders.models import TenderInvitation
+
+        invitations = TenderInvitation.objects.filter(
+            tender_returned=False
+        ).select_related('subcontractor', 'project')
+        if project_ids is not None:
+            invitations = invitations.filter(project_id__in=project_ids)
+        return invitations
+
+    @classmethod
+    def load(cls, project_ids=None):
+        """Build the index with two queries, optionally restricted to some projects"""
+        from .models import SenderIndexEntry
+
+        index = cls()
+
+        for invitation in cls.open_invitations_queryset(project_ids):
+            index.open_invitations[invitation.subcontractor_id].append(invitation)
+
+        entries = SenderIndexEntry.objects.filter(
+            subcontractor_id__in=list(index.open_invitations.keys())
+        ).values_list('key', 'key_type', 'subcontractor_id')
+
+        for key, key_type, subcontractor_id in entries:
+            lookup = index.by_address if key_type == 'ADDRESS' else index.by_domain
+            lookup[key].add(subcontractor_id)
+
+        logger.info(
+            f"Return match index loaded: {len(index.by_address)} addresses, "
+            f"{len(index.by_domain)} domains, {len(index.open_invitations)} subcontractors"
+        )
+        return index
+
+    def match(self, sender_email, project_id=None):
+        """
+        Find open invitations for a sender, preferring an exact address over a domain match.
+        Returns: (invitations, matched_by)
+        """
+        address = normalize_address(sender_email)
+        if not address:
+            return [], None
+
+        subcontractor_ids = self.by_address.get(address)
+        matched_by = 'address_match'
+        if not subcontractor_ids:
+            subcontractor_ids = self.by_domain.get(address.split('@')[1])
+            matched_by = 'domain_match'
+        if not subcontractor_ids:
+            return [], None
+
+        invitations = [
+            invitation
+            for subcontractor_id in subcontractor_ids
+            for invitation in self.open_invitations.get(subcontractor_id, ())
+            if project_id is None or invitation.project_id == project_id
+        ]
+        return invitations, matched_by
+
+    def discard(self, invitation):
+        """Drop an invitation once it has been marked as returned"""
+        remaining = self.open_invitations.get(invitation.subcontractor_id, [])
+        self.open_invitations[invitation.subcontractor_id] = [
+            inv for inv in remaining if inv.pk != invitation.pk
+        ]
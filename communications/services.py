@@ -9,17 +9,31 @@ import logging
 import json
 import uuid
 import re
+import hashlib
+import tempfile
 from datetime import datetime, timedelta, timezone as dt_timezone
 from typing import List, Dict, Optional
 from django.conf import settings
 from django.utils import timezone
 from django.urls import reverse
 from django.core.mail import send_mail
-from django.core.signing import Signer
 from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.text import get_valid_filename
+from tenders.tokens import ACTION_REPLY, make_token
+from tenders.tracking import EVENT_DOWNLOAD, EVENT_OPEN, EVENT_RESPONSE
+from . import email_templates
 
 logger = logging.getLogger(__name__)
 
+# Graph attachment downloads are streamed in chunks of this size
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+# Attachments larger than this spill from memory to a temporary file while hashing
+ATTACHMENT_SPOOL_SIZE = 8 * 1024 * 1024
+# Seconds to wait on Graph for the attachment list of a message
+GRAPH_TIMEOUT = 30
+
 # communications/services.py - MERGED version with working signature + SharePoint links
 
 import os
@@ -30,17 +44,15 @@ import mimetypes
 import base64
 import logging
 from django.conf import settings
-from django.core.signing import Signer
 
 logger = logging.getLogger(__name__)
 
 class OutlookEmailService:
 
-    def _generate_tracking_token(self, invitation_id):
-        """Generate tracking token for email tracking"""
+    def _generate_tracking_token(self, invitation_id, action):
+        """Generate tracking token for one tracked action - see tenders/tokens"""
         try:
-            signer = Signer()
-            return signer.sign(str(invitation_id))
+            return make_token(invitation_id, action)
         except Exception as e:
             logger.error(f"Error generating tracking token: {str(e)}")
             return str(invitation_id)  # Fallback to plain ID
@@ -66,50 +78,7 @@ class OutlookEmailService:
 
     def _load_signature(self):
         """Load standardized company email signature"""
-        return """
-        <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #e0e0e0;">
-            <!-- Company Banner -->
-            <div style="text-align: center; margin-bottom: 20px;">
-                <img src="https://www.taknox.co.uk/wp-content/uploads/2020/09/taknox-logo.png"
-                     alt="TA Knox Logo"
-                     style="max-width: 400px; height: auto;" />
-            </div>
-
-            <!-- Company Details -->
-            <div style="font-family: 'Helvetica', Arial, sans-serif; font-size: 10.5pt; color: #000000;">
-                <p style="margin: 0; line-height: 1.4;">
-                    <strong>TA Knox</strong><br>
-                    TA Knox House<br>
-                    Hollingworth Road<br>
-                    Bredbury, Cheshire, SK6 2AR<br>
-                    Tel 0161 430 3308 :: Email
-                    <a href="mailto:enquiries@taknox.co.uk" style="color: #467886; text-decoration: underline;">enquiries@taknox.co.uk</a>
-                    :: Web
-                    <a href="http://www.taknox.co.uk" style="color: #467886; text-decoration: underline;">www.taknox.co.uk</a>
-                </p>
-            </div>
-
-            <!-- Company Registration -->
-            <div style="font-family: 'Calibri', Arial, sans-serif; font-size: 11pt; margin: 10px 0;">
-                <p style="margin: 0;">
-                    <strong>Company Reg No. <span style="color: #0078D4;">380 9060</span></strong>
-                </p>
-            </div>
-
-            <!-- Legal Disclaimer -->
-            <div style="font-family: 'Calibri', Arial, sans-serif; font-size: 11pt; color: #000000; margin-top: 15px;">
-                <p style="margin: 0; line-height: 1.3; font-size: 10pt;">
-                    <strong>This e-mail is confidential and intended solely for the use of the individual to whom it was addressed.
-                    Any views or opinions presented are solely those of the author and do not necessarily represent those of T.A. Knox.
-                    If you are not the intended recipient, be advised that you have received this e-mail in error and that any use,
-                    dissemination, forwarding, printing or copying of this e-mail is strictly prohibited. Viruses: Although we have
-                    taken steps to ensure that this e-mail and attachments are free from any virus, we advise that in keeping with
-                    good computing practice the recipient should ensure they are actually virus free. If you received this e-mail in
-                    error, please contact T.A. Knox on <span style="color: #0078D4;">0161 430 3308</span></strong>
-                </p>
-            </div>
-        </div>
-        """
+        return email_templates.signature()
 
     def _get_access_token(self):
         # Print out the values being used for authentication (for debugging)
@@ -151,56 +120,8 @@ class OutlookEmailService:
 
     def _generate_simple_tracking_buttons(self, invitation_id):
         """Generate simple tracking buttons that update database directly"""
-        signer = Signer()
-        token = signer.sign(str(invitation_id))
-
-        # Use simple tracking URLs that don't redirect to external pages
-        from django.conf import settings
-        base_url = getattr(settings, 'BASE_URL', 'https://taknox.pythonanywhere.com')
-
-        yes_url = f"{base_url}/tenders/track-response/{token}/?response=yes"
-        no_url = f"{base_url}/tenders/track-response/{token}/?response=no"
-
-        return f"""
-        <div style="text-align: center; margin: 30px 0; padding: 20px; background-color: #f8f9fa; border-radius: 8px;">
-            <div style="margin-bottom: 15px;">
-                <h3 style="font-size: 18px; font-weight: bold; color: #333; margin: 0;">
-                    Please let us know if you will be tendering:
-                </h3>
-            </div>
-            <table width="100%" border="0" cellspacing="0" cellpadding="0" style="margin: 0 auto; max-width: 400px;">
-                <tr>
-                    <td style="text-align: center; padding: 0 10px;">
-                        <table border="0" cellspacing="0" cellpadding="0">
-                            <tr>
-                                <td bgcolor="#00CC00" style="padding: 15px 30px; border-radius: 8px; box-shadow: 0 4px 8px rgba(0, 204, 0, 0.4); border: 2px solid #00AA00;">
-                                    <a href="{yes_url}" target="_blank" style="color: #ffffff; text-decoration: none; display: inline-block; font-weight: bold; font-size: 16px; text-shadow: 1px 1px 2px rgba(0,0,0,0.3);">
-                                        ✓ Yes, I will tender
-                                    </a>
-                                </td>
-                            </tr>
-                        </table>
-                    </td>
-                    <td style="text-align: center; padding: 0 10px;">
-                        <table border="0" cellspacing="0" cellpadding="0">
-                            <tr>
-                                <td bgcolor="#FF0000" style="padding: 15px 30px; border-radius: 8px; box-shadow: 0 4px 8px rgba(255, 0, 0, 0.4); border: 2px solid #CC0000;">
-                                    <a href="{no_url}" target="_blank" style="color: #ffffff; text-decoration: none; display: inline-block; font-weight: bold; font-size: 16px; text-shadow: 1px 1px 2px rgba(0,0,0,0.3);">
-                                        ✗ No, I won't tender
-                                    </a>
-                                </td>
-                            </tr>
-                        </table>
-                    </td>
-                </tr>
-            </table>
-            <div style="margin-top: 15px;">
-                <p style="font-size: 12px; color: #666; margin: 0;">
-                    Click a button above to record your response automatically.
-                </p>
-            </div>
-        </div>
-        """
+        token = self._generate_tracking_token(invitation_id, EVENT_RESPONSE)
+        return email_templates.tracking_buttons().fill(token=token)
 
     def _generate_sharepoint_section_with_tracking(self, sharepoint_links, invitation_id):
         """Generate SharePoint section with download tracking"""
@@ -208,65 +129,11 @@ class OutlookEmailService:
             logger.warning("No SharePoint links provided to _generate_sharepoint_section_with_tracking")
             return ""
 
-        signer = Signer()
-        token = signer.sign(str(invitation_id))
-
-        from django.conf import settings
-        base_url = getattr(settings, 'BASE_URL', 'https://taknox.pythonanywhere.com')
-
-        sharepoint_section = """
-        <div style="margin: 20px 0; padding: 20px; background: linear-gradient(135deg, #f8f9fa, #e9ecef); border: 1px solid #dee2e6; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-            <table width="100%" border="0" cellspacing="0" cellpadding="0">
-                <tr>
-                    <td>
-                        <table border="0" cellspacing="0" cellpadding="0">
-                            <tr>
-                                <td style="background: #007bff; color: white; width: 40px; height: 40px; border-radius: 50%; text-align: center; vertical-align: middle; font-size: 18px; margin-right: 15px;">
-                                    📁
-                                </td>
-                                <td style="padding-left: 15px;">
-                                    <h3 style="color: #007bff; margin: 0; font-size: 18px;">Tender Documents</h3>
-                                </td>
-                            </tr>
-                        </table>
-                    </td>
-                </tr>
-            </table>
-        """
-
-        for link in sharepoint_links:
-            # Add tracking to SharePoint links
-            tracking_url = f"{base_url}/tenders/track-download/{token}/?url={requests.utils.quote(link['url'], safe='')}"
-
-            sharepoint_section += f"""
-            <div style="margin: 15px 0; padding: 12px; background: white; border-radius: 6px; border-left: 4px solid #007bff;">
-                <table width="100%" border="0" cellspacing="0" cellpadding="0">
-                    <tr>
-                        <td>
-                            <a href="{tracking_url}" target="_blank" style="color: #007bff; text-decoration: none; font-weight: bold; font-size: 16px;">
-                                🔗 {link['title']}
-                            </a>
-                            <br>
-                            <span style="font-size: 12px; color: #666;">
-                                Click to access documents (SharePoint login may be required)
-                            </span>
-                        </td>
-                    </tr>
-                </table>
-            </div>
-            """
-
-        sharepoint_section += """
-            <div style="margin-top: 15px; padding: 10px; background: #fff3cd; border: 1px solid #ffeaa7; border-radius: 4px;">
-                <p style="margin: 0; font-size: 12px; color: #856404;">
-                    <strong>Note:</strong> Document access is tracked for tendering purposes.
-                </p>
-            </div>
-        </div>
-        """
+        token = self._generate_tracking_token(invitation_id, EVENT_DOWNLOAD)
+        fragment = email_templates.sharepoint_section(email_templates.sharepoint_links_key(sharepoint_links))
 
         logger.info(f"Generated SharePoint section with {len(sharepoint_links)} links")
-        return sharepoint_section
+        return fragment.fill(token=token)
 
     def send_email(self, to_email, subject, body, cc=None, attachments=None, reply_url=None, sharepoint_links=None, invitation_id=None, **kwargs):
         """
@@ -297,51 +164,18 @@ class OutlookEmailService:
                 logger.error(f"No valid recipients in: {to_email}")
                 return False
 
-            # ENHANCED: Build SharePoint section with tracking
-            sharepoint_section = ""
-            if sharepoint_links and invitation_id:
-                sharepoint_section = self._generate_sharepoint_section_with_tracking(sharepoint_links, invitation_id)
-                logger.info("✅ SharePoint section generated with tracking")
-            elif sharepoint_links:
+            # ENHANCED: Build complete email HTML from the pre-rendered layout
+            if sharepoint_links and not invitation_id:
                 logger.warning("⚠️ SharePoint links provided but no invitation_id for tracking")
-            else:
-                logger.info("ℹ️ No SharePoint links to include")
-
-            # ENHANCED: Build action buttons with simple tracking
-            action_buttons = ""
-            if invitation_id and kwargs.get('include buttons', True):
-                action_buttons = self._generate_simple_tracking_buttons(invitation_id)
-                logger.info("✅ Action buttons generated with simple tracking")
-            elif reply_url:
-                # Fallback to old-style buttons if no invitation_id
-                action_buttons = self._generate_action_buttons(reply_url)
-                logger.info("✅ Fallback action buttons generated")
-
-            # ENHANCED: Build complete email HTML
-            html_content = f"""
-            <html>
-            <head>
-                <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
-            </head>
-            <body style="font-family: Arial, sans-serif; line-height: 1.6;">
-                <!-- Email Body -->
-                <div style="margin-bottom: 20px;">
-                    {body}
-                </div>
-
-                <!-- SharePoint Documents Section -->
-                {sharepoint_section}
 
-                <!-- Action Buttons -->
-                <div style="margin: 20px 0;">
-                    {action_buttons}
-                </div>
-
-                <!-- Signature -->
-                {self.email_signature}
-            </body>
-            </html>
-            """
+            html_content = email_templates.render_email(
+                body,
+                response_token=self._generate_tracking_token(invitation_id, EVENT_RESPONSE) if invitation_id else None,
+                download_token=self._generate_tracking_token(invitation_id, EVENT_DOWNLOAD) if invitation_id else None,
+                sharepoint_links=sharepoint_links,
+                reply_url=reply_url,
+                include_buttons=kwargs.get('include_buttons', True)
+            )
 
             # Build email message
             email_message = {
@@ -396,7 +230,6 @@ class OutlookEmailService:
                 logger.info(f"✅ Email sent successfully to: {to_email}")
                 logger.info(f"✅ Signature included: {bool(self.email_signature)}")
                 logger.info(f"✅ SharePoint links included: {len(sharepoint_links) if sharepoint_links else 0}")
-                logger.info(f"✅ Action buttons included: {bool(action_buttons)}")
                 return True
             else:
                 error_message = f"❌ Failed to send email: {response.status_code} - {response.text}"
@@ -409,31 +242,7 @@ class OutlookEmailService:
 
     def _generate_action_buttons(self, reply_url):
         """Generate HTML for Yes/No action buttons (FALLBACK - old style)"""
-        return f"""
-        <table width="100%" border="0" cellspacing="0" cellpadding="0">
-            <tr>
-                <td style="text-align: center; padding: 0 10px;">
-                    <table border="0" cellspacing="0" cellpadding="0">
-                        <tr>
-                            <td bgcolor="#00CC00" style="padding: 12px 18px; border-radius: 3px; border: 2px solid #00AA00;">
-                                <a href="{reply_url}?response=yes" target="_blank" style="color: #ffffff; text-decoration: none; display: inline-block; font-weight: bold; text-shadow: 1px 1px 2px rgba(0,0,0,0.3);">Yes, I will tender</a>
-                            </td>
-                        </tr>
-                    </table>
-                </td>
-                <td width="20">&nbsp;</td>
-                <td style="text-align: center; padding: 0 10px;">
-                    <table border="0" cellspacing="0" cellpadding="0">
-                        <tr>
-                            <td bgcolor="#FF0000" style="padding: 12px 18px; border-radius: 3px; border: 2px solid #CC0000;">
-                                <a href="{reply_url}?response=no" target="_blank" style="color: #ffffff; text-decoration: none; display: inline-block; font-weight: bold; text-shadow: 1px 1px 2px rgba(0,0,0,0.3);">No, I will not tender</a>
-                            </td>
-                        </tr>
-                    </table>
-                </td>
-            </tr>
-        </table>
-        """
+        return email_templates.action_buttons().fill(reply_url=reply_url)
 
     def send_tender_invitation(self, invitation, tracking_url=None):
         """
@@ -579,9 +388,10 @@ class OutlookEmailService:
             """
 
             # Generate tracking token for response buttons
-            tracking_token = self._generate_tracking_token(invitation.id)
+            tracking_token = self._generate_tracking_token(invitation.id, EVENT_OPEN)
             tracking_url = f"{settings.BASE_URL}{reverse('tenders:track_email', kwargs={'token': tracking_token})}"
-            response_url = f"{settings.BASE_URL}{reverse('tenders:response', kwargs={'token': tracking_token})}"
+            reply_token = self._generate_tracking_token(invitation.id, ACTION_REPLY)
+            response_url = f"{settings.BASE_URL}{reverse('tenders:response', kwargs={'token': reply_token})}"
 
             # Add response buttons for pending reminders
             body += f"""
@@ -674,9 +484,10 @@ class OutlookEmailService:
             """
 
             # Generate tracking
-            tracking_token = self._generate_tracking_token(invitation.id)
+            tracking_token = self._generate_tracking_token(invitation.id, EVENT_OPEN)
             tracking_url = f"{settings.BASE_URL}{reverse('tenders:track_email', kwargs={'token': tracking_token})}"
-            response_url = f"{settings.BASE_URL}{reverse('tenders:response', kwargs={'token': tracking_token})}"
+            reply_token = self._generate_tracking_token(invitation.id, ACTION_REPLY)
+            response_url = f"{settings.BASE_URL}{reverse('tenders:response', kwargs={'token': reply_token})}"
 
             # Add response buttons
             body += f"""
@@ -752,7 +563,7 @@ class OutlookEmailService:
             """
 
             # Generate tracking token for email tracking
-            tracking_token = self._generate_tracking_token(invitation.id)
+            tracking_token = self._generate_tracking_token(invitation.id, EVENT_OPEN)
             tracking_url = f"{settings.BASE_URL}{reverse('tenders:track_email', kwargs={'token': tracking_token})}"
 
             # Add tracking pixel (hidden)
@@ -943,12 +754,99 @@ class OutlookEmailService:
             logger.exception(f"Error getting folders: {str(e)}")
             return []
 
-    def check_project_folder_simple(self, config):
+    def download_message_attachments(self, message_id, project_id):
+        """
+        Stream the file attachments of a returned tender into project media storage.
+        Files are keyed by SHA-256 so a re-sent submission is only stored once.
+        Returns: list of manifest entries
+        """
+        headers = {'Authorization': f'Bearer {self.token}'}
+        attachments_url = f'https://graph.microsoft.com/v1.0/users/{self.user_email}/messages/{message_id}/attachments'
+
+        # Metadata only - contentBytes would pull every file inline as base64
+        attachments = []
+        url, params = attachments_url, {'$select': 'id,name,contentType,size,isInline'}
+        while url:
+            response = requests.get(url, headers=headers, params=params, timeout=GRAPH_TIMEOUT)
+            if response.status_code != 200:
+                logger.error(f"Failed to list attachments: {response.status_code} - {response.text}")
+                return []
+            page = response.json()
+            attachments.extend(page.get('value', []))
+            # The next page link already carries the query
+            url, params = page.get('@odata.nextLink'), None
+
+        manifest = []
+        seen = set()
+
+        for attachment in attachments:
+            # Skip embedded emails, cloud links and inline signature images
+            if attachment.get('@odata.type') != '#microsoft.graph.fileAttachment' or attachment.get('isInline'):
+                continue
+
+            entry = self._store_attachment(
+                f"{attachments_url}/{attachment['id']}/$value", attachment, project_id, headers
+            )
+            if entry and entry['sha256'] not in seen:
+                seen.add(entry['sha256'])
+                manifest.append(entry)
+
+        logger.info(f"📎 Stored {len(manifest)} attachments for message {message_id}")
+        return manifest
+
+    def _store_attachment(self, content_url, attachment, project_id, headers):
+        """Download one attachment in chunks, hashing as it streams, and save it unless already stored"""
+        name = get_valid_filename(attachment.get('name') or 'attachment') or 'attachment'
+        digest = hashlib.sha256()
+        size = 0
+
+        with tempfile.SpooledTemporaryFile(max_size=ATTACHMENT_SPOOL_SIZE) as buffer:
+            with requests.get(content_url, headers=headers, stream=True, timeout=120) as response:
+                if response.status_code != 200:
+                    logger.error(f"Failed to download attachment {name}: {response.status_code}")
+                    return None
+
+                for chunk in response.iter_content(chunk_size=ATTACHMENT_CHUNK_SIZE):
+                    digest.update(chunk)
+                    buffer.write(chunk)
+                    size += len(chunk)
+
+            sha256 = digest.hexdigest()
+            directory = f"tender_returns/{project_id}/{sha256}"
+
+            # Same content already stored for the project, whatever it was called
+            stored = self._stored_files(directory)
+            deduplicated = bool(stored)
+            if deduplicated:
+                path = f"{directory}/{stored[0]}"
+            else:
+                buffer.seek(0)
+                path = default_storage.save(f"{directory}/{name}", File(buffer, name=name))
+
+        return {
+            'name': name,
+            'content_type': attachment.get('contentType', ''),
+            'size': size,
+            'sha256': sha256,
+            'path': path,
+            'deduplicated': deduplicated,
+        }
+
+    @staticmethod
+    def _stored_files(directory):
+        """Names of the files in a storage directory, empty if it does not exist"""
+        try:
+            return sorted(default_storage.listdir(directory)[1])
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+    def check_project_folder_simple(self, config, match_index=None):
         """
-        Simplified email checking - just match domains and mark as returned
+        Simplified email checking - match senders against the sender index and mark as returned
+        Pass a preloaded ReturnMatchIndex to share one index across several project folders.
         Returns: (emails_processed, tenders_matched)
         """
-        from tenders.models import TenderInvitation
+        from .return_index import ReturnMatchIndex
 
         logger.info(f"Checking emails for project: {config.project.name}")
 
@@ -985,19 +883,9 @@ class OutlookEmailService:
             emails = response.json().get('value', [])
             logger.info(f"Found {len(emails)} emails to check")
 
-            # Get all invitations for this project with their domains
-            invitations = TenderInvitation.objects.filter(
-                project=config.project
-            ).select_related('subcontractor')
-
-            # Create a simple domain lookup
-            domain_to_invitation = {}
-            for invitation in invitations:
-                if invitation.subcontractor.email and '@' in invitation.subcontractor.email:
-                    domain = invitation.subcontractor.email.split('@')[1].lower()
-                    domain_to_invitation[domain] = invitation
-
-            logger.info(f"Checking against {len(domain_to_invitation)} domains")
+            # Sender address/domain -> open invitations lookup
+            if match_index is None:
+                match_index = ReturnMatchIndex.load(project_ids=[config.project_id])
 
             emails_processed = 0
             tenders_matched = 0
@@ -1015,34 +903,38 @@ class OutlookEmailService:
                 if not sender_email or '@' not in sender_email:
                     continue
 
-                # Extract domain
-                sender_domain = sender_email.split('@')[1]
-
-                # Check if this domain matches any of our subcontractors
-                if sender_domain in domain_to_invitation:
-                    invitation = domain_to_invitation[sender_domain]
+                # Check if this sender matches any of our subcontractors on this project
+                invitations, matched_by = match_index.match(sender_email, project_id=config.project_id)
 
-                    # Skip if already marked as returned
-                    if invitation.tender_returned:
-                        logger.info(f"Tender already returned for {invitation.subcontractor.company}")
-                        continue
+                # Pull the priced submission into project storage once per message
+                files = []
+                if invitations and email.get('hasAttachments'):
+                    try:
+                        files = self.download_message_attachments(email['id'], config.project_id)
+                    except Exception as e:
+                        logger.exception(f"Error downloading attachments for message {email.get('id')}: {str(e)}")
 
+                for invitation in invitations:
                     # Mark as returned
                     invitation.tender_returned = True
-                    invitation.tender_returned_at = timezone.now()
+                    invitation.returned_at = timezone.now()
                     invitation.tender_attachments = {
                         'sender': sender_email,
                         'subject': email.get('subject', ''),
                         'received_date': email.get('receivedDateTime', ''),
                         'has_attachments': email.get('hasAttachments', False),
-                        'matched_by': 'domain_match',
-                        'domain': sender_domain,
-                        'processed_at': timezone.now().isoformat()
+                        'matched_by': matched_by,
+                        'domain': sender_email.split('@')[1],
+                        'processed_at': timezone.now().isoformat(),
+                        'message_id': email.get('id', ''),
+                        'count': len(files),
+                        'files': files
                     }
-                    invitation.save()
+                    invitation.save(update_fields=['tender_returned', 'returned_at', 'tender_attachments'])
+                    match_index.discard(invitation)
 
                     tenders_matched += 1
-                    logger.info(f"✅ Marked tender as returned for {invitation.subcontractor.company} (domain: {sender_domain})")
+                    logger.info(f"✅ Marked tender as returned for {invitation.subcontractor.company} ({matched_by}: {sender_email})")
 
             # Update last check time
             config.last_check_time = timezone.now()
@@ -1053,4 +945,4 @@ class OutlookEmailService:
 
         except Exception as e:
             logger.exception(f"Error checking emails: {str(e)}")
-            return 0, 0
\ No newline at end of file
+            return 0, 0
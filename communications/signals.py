@@ -1,7 +1,10 @@
 # You can either delete this file or simplify it like this:
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from .models import EmailMonitorConfig
+from subcontractors.models import Subcontractor
+from tenders.models import TenderInvitation
+from .models import EmailMonitorConfig, SenderIndexEntry
+from .return_index import reindex_subcontractor
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,4 +15,22 @@ def log_email_config_changes(sender, instance, created, **kwargs):
     if created:
         logger.info(f"Created email monitoring config for project {instance.project.name}")
     else:
-        logger.info(f"Updated email monitoring config for project {instance.project.name}")
\ No newline at end of file
+        logger.info(f"Updated email monitoring config for project {instance.project.name}")
+
+@receiver(post_save, sender=Subcontractor)
+def update_sender_index(sender, instance, created, raw=False, **kwargs):
+    """Keep the sender index in step with the subcontractor's email addresses"""
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'email' not in update_fields:
+        return
+    reindex_subcontractor(instance)
+
+@receiver(post_save, sender=TenderInvitation)
+def ensure_invited_subcontractor_indexed(sender, instance, created, raw=False, **kwargs):
+    """Index subcontractors that pre-date the sender index when they are first invited"""
+    if raw or not created:
+        return
+    if not SenderIndexEntry.objects.filter(subcontractor_id=instance.subcontractor_id).exists():
+        reindex_subcontractor(instance.subcontractor)
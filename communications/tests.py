@@ -1,3 +1,266 @@
-from django.test import TestCase
+import io
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from projects.models import Project
+from subcontractors.models import Subcontractor, Trade
+from tenders.models import TenderInvitation
+from tenders.tokens import make_token
+from tenders.tracking import EVENT_DOWNLOAD, EVENT_RESPONSE
+from . import email_templates
+from .management.commands.benchmark_email_render import render_full
+from .models import SenderIndexEntry
+from .return_index import ReturnMatchIndex, index_keys, rebuild_sender_index
+from .services import OutlookEmailService
+
+
+class FakeResponse:
+    """The parts of a requests response the attachment download reads"""
+
+    def __init__(self, payload=None, content=b''):
+        self.status_code = 200
+        self.payload = payload
+        self.content = content
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size):
+        yield self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class TenderReturnAttachmentTests(TestCase):
+    """Attachments of returned tenders stored once per content, across Graph result pages"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        # No Graph login - only the attributes the download uses
+        self.service = OutlookEmailService.__new__(OutlookEmailService)
+        self.service.token = 'token'
+        self.service.user_email = 'tenders@example.com'
+
+    def download(self, message_id, pages, contents):
+        def get(url, **kwargs):
+            self.assertIn('timeout', kwargs)
+            if url.endswith('/$value'):
+                return FakeResponse(content=contents[url.split('/')[-2]])
+            return FakeResponse(payload=pages[url])
+
+        with mock.patch('communications.services.requests.get', side_effect=get):
+            return self.service.download_message_attachments(message_id, project_id=7)
+
+    def attachment(self, attachment_id, name):
+        return {'@odata.type': '#microsoft.graph.fileAttachment', 'id': attachment_id, 'name': name, 'isInline': False}
+
+    def test_same_content_under_another_name_is_not_stored_again(self):
+        base = 'https://graph.microsoft.com/v1.0/users/tenders@example.com/messages'
+        first = self.download('m1', {
+            f'{base}/m1/attachments': {
+                'value': [self.attachment('a1', 'Tender.pdf')],
+                '@odata.nextLink': 'https://graph.microsoft.com/next-page',
+            },
+            'https://graph.microsoft.com/next-page': {'value': [self.attachment('a2', 'Rates.xlsx')]},
+        }, {'a1': b'tender submission', 'a2': b'rates'})
+        self.assertEqual([entry['name'] for entry in first], ['Tender.pdf', 'Rates.xlsx'])
+        self.assertFalse(any(entry['deduplicated'] for entry in first))
+
+        resent = self.download('m2', {
+            f'{base}/m2/attachments': {'value': [self.attachment('b1', 'Tender v2.pdf')]},
+        }, {'b1': b'tender submission'})
+        self.assertEqual(resent[0]['name'], 'Tender_v2.pdf')
+        self.assertTrue(resent[0]['deduplicated'])
+        self.assertEqual(resent[0]['path'], first[0]['path'])
+        self.assertEqual(default_storage.listdir(f"tender_returns/7/{first[0]['sha256']}")[1], ['Tender.pdf'])
+
+
+@override_settings(BASE_URL='https://tenders.example.com')
+class EmailRenderTests(SimpleTestCase):
+    """Pre-rendered email fragments produce the same HTML as rendering every template per message"""
+
+    def setUp(self):
+        email_templates.clear_cache()
+        self.addCleanup(email_templates.clear_cache)
+        self.body = '<p>Dear Contact,</p><p>Please price the <b>roofing</b> package.</p>'
+        self.links = [
+            {'url': 'https://taknox.sharepoint.com/sites/Estimating/Tender 12/ITT', 'title': 'ITT Documents'},
+            {'url': 'https://taknox.sharepoint.com/sites/Estimating/R&D?x=1', 'title': 'Drawings <rev B> & specs'},
+        ]
+
+    def test_fragments_match_the_full_render(self):
+        response_token = make_token(41, EVENT_RESPONSE)
+        download_token = make_token(41, EVENT_DOWNLOAD)
+        cases = {
+            'tracked with links': dict(response_token=response_token, download_token=download_token, sharepoint_links=self.links),
+            'tracked without links': dict(response_token=response_token),
+            'links without a download token': dict(response_token=response_token, sharepoint_links=self.links),
+            'reply url fallback': dict(reply_url='https://tenders.example.com/reply/41'),
+            'no buttons': dict(download_token=download_token, sharepoint_links=self.links),
+            'plain': dict(),
+        }
+        for name, options in cases.items():
+            with self.subTest(name):
+                html = email_templates.render_email(self.body, **options)
+                self.assertEqual(html, render_full(self.body, **options))
+
+        # Buttons can be left out even with a response token
+        html = email_templates.render_email(self.body, response_token=response_token, include_buttons=False)
+        self.assertEqual(html, render_full(self.body))
+
+    def test_clear_cache_picks_up_a_new_base_url(self):
+        token = make_token(7, EVENT_RESPONSE)
+        self.assertIn('https://tenders.example.com/tenders/track-response/', email_templates.render_email(self.body, token))
+
+        with override_settings(BASE_URL='https://staging.example.com'):
+            email_templates.clear_cache()
+            html = email_templates.render_email(self.body, token)
+            self.assertIn('https://staging.example.com/tenders/track-response/', html)
+            self.assertEqual(html, render_full(self.body, response_token=token))
+
+    def test_benchmark_checks_the_output(self):
+        out = io.StringIO()
+        call_command('benchmark_email_render', messages=5, links=2, stdout=out)
+        self.assertIn('Speed-up', out.getvalue())
+
+        with mock.patch.object(email_templates, 'render_email', return_value='<p>Broken</p>'):
+            with self.assertRaisesMessage(CommandError, '5 pre-rendered messages differ'):
+                call_command('benchmark_email_render', messages=5, stdout=io.StringIO())
+
+
+class IndexKeyTests(SimpleTestCase):
+    """Keys a Subcontractor.email value is indexed under"""
+
+    def test_addresses_and_company_domains(self):
+        self.assertEqual(
+            index_keys(' <Estimating@Acme-Roofing.co.uk>; mailto:jo@acme-roofing.co.uk, bob.acme@gmail.com '),
+            {
+                ('estimating@acme-roofing.co.uk', 'ADDRESS'),
+                ('jo@acme-roofing.co.uk', 'ADDRESS'),
+                ('acme-roofing.co.uk', 'DOMAIN'),
+                # Public mail domains are indexed by address only
+                ('bob.acme@gmail.com', 'ADDRESS'),
+            },
+        )
+
+    def test_invalid_values(self):
+        for value in (None, '', 'TBC', 'office@localhost', '@acme.co.uk', 'a@b@acme.co.uk', ' ; , '):
+            with self.subTest(value=value):
+                self.assertEqual(index_keys(value), set())
+
+
+class ReturnMatchIndexTests(TestCase):
+    """Sender index entries kept by the signals, and tender return matching against them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        trade = Trade.objects.create(name='Scaffolding')
+        cls.estimating = Subcontractor.objects.create(
+            trade=trade, company='Acme Scaffolding', head_office='Hull', email='estimating@acme-scaffolding.co.uk'
+        )
+        cls.director = Subcontractor.objects.create(
+            trade=trade, company='Acme Scaffolding North', head_office='York', email='director@acme-scaffolding.co.uk'
+        )
+        cls.sole_trader = Subcontractor.objects.create(
+            trade=trade, company='Bob Scaffolds', head_office='Leeds', email='bob.scaffolds@gmail.com'
+        )
+        cls.project, cls.other_project = [
+            Project.objects.create(
+                name=name,
+                start_date=date.today(),
+                tender_deadline=timezone.now() + timedelta(days=14),
+            )
+            for name in ('Return Project', 'Other Return Project')
+        ]
+        cls.invitations = {
+            subcontractor.pk: TenderInvitation.objects.create(project=cls.project, subcontractor=subcontractor)
+            for subcontractor in (cls.estimating, cls.director, cls.sole_trader)
+        }
+        cls.other_invitation = TenderInvitation.objects.create(project=cls.other_project, subcontractor=cls.estimating)
+
+    def entries(self, subcontractor):
+        return set(SenderIndexEntry.objects.filter(subcontractor=subcontractor).values_list('key', 'key_type'))
+
+    def test_address_match_before_domain_match(self):
+        index = ReturnMatchIndex.load()
+
+        invitations, matched_by = index.match(' <Director@Acme-Scaffolding.co.uk>')
+        self.assertEqual((invitations, matched_by), ([self.invitations[self.director.pk]], 'address_match'))
+
+        invitations, matched_by = index.match('accounts@acme-scaffolding.co.uk')
+        self.assertEqual(matched_by, 'domain_match')
+        self.assertCountEqual(
+            invitations,
+            [self.invitations[self.estimating.pk], self.invitations[self.director.pk], self.other_invitation],
+        )
+
+        invitations, _ = index.match('accounts@acme-scaffolding.co.uk', project_id=self.other_project.pk)
+        self.assertEqual(invitations, [self.other_invitation])
+
+    def test_public_domains_match_by_address_only(self):
+        index = ReturnMatchIndex.load()
+        self.assertEqual(
+            index.match('bob.scaffolds@gmail.com'), ([self.invitations[self.sole_trader.pk]], 'address_match')
+        )
+        self.assertEqual(index.match('someone.else@gmail.com'), ([], None))
+        self.assertEqual(index.match('not an address'), ([], None))
+
+    def test_only_open_invitations_are_matched(self):
+        returned = self.invitations[self.director.pk]
+        returned.tender_returned = True
+        returned.save()
+        index = ReturnMatchIndex.load(project_ids=[self.project.pk])
+        self.assertEqual(index.match('director@acme-scaffolding.co.uk'), ([self.invitations[self.estimating.pk]], 'domain_match'))
+
+        index.discard(self.invitations[self.estimating.pk])
+        self.assertEqual(index.match('director@acme-scaffolding.co.uk'), ([], 'domain_match'))
+
+    def test_signals_reindex_changed_addresses(self):
+        self.assertEqual(self.entries(self.estimating), {
+            ('estimating@acme-scaffolding.co.uk', 'ADDRESS'), ('acme-scaffolding.co.uk', 'DOMAIN'),
+        })
+
+        self.estimating.email = 'tenders@acme-group.com; bob.scaffolds@gmail.com'
+        self.estimating.save()
+        self.assertEqual(self.entries(self.estimating), {
+            ('tenders@acme-group.com', 'ADDRESS'), ('acme-group.com', 'DOMAIN'), ('bob.scaffolds@gmail.com', 'ADDRESS'),
+        })
+        index = ReturnMatchIndex.load()
+        self.assertCountEqual(
+            index.match('bob.scaffolds@gmail.com')[0],
+            [self.invitations[self.sole_trader.pk], self.invitations[self.estimating.pk], self.other_invitation],
+        )
+
+        # Saves that leave the email alone do not touch the index
+        Subcontractor.objects.filter(pk=self.estimating.pk).update(email='changed@elsewhere.co.uk')
+        self.estimating.company = 'Acme Group Scaffolding'
+        self.estimating.save(update_fields=['company'])
+        self.assertIn(('acme-group.com', 'DOMAIN'), self.entries(self.estimating))
+
+    def test_first_invitation_indexes_an_unindexed_subcontractor(self):
+        SenderIndexEntry.objects.filter(subcontractor=self.director).delete()
+        TenderInvitation.objects.create(project=self.other_project, subcontractor=self.director)
+        self.assertEqual(self.entries(self.director), {
+            ('director@acme-scaffolding.co.uk', 'ADDRESS'), ('acme-scaffolding.co.uk', 'DOMAIN'),
+        })
+
+    def test_rebuild_matches_the_signals(self):
+        expected = set(SenderIndexEntry.objects.values_list('key', 'key_type', 'subcontractor_id'))
+        SenderIndexEntry.objects.all().delete()
+        self.assertEqual(rebuild_sender_index(), len(expected))
+        self.assertEqual(set(SenderIndexEntry.objects.values_list('key', 'key_type', 'subcontractor_id')), expected)
@@ -0,0 +1,297 @@
+# core/backup.py
+import gzip
+import itertools
+import json
+import logging
+from collections import Counter
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.color import no_style
+from django.core.serializers.base import DEFER_FIELD
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.constants import OnConflict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+READ_SIZE = 1 << 16
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8-sig' if mode == 'r' else 'utf-8')
+
+
+def _iter_array(handle, buffer):
+    """Objects of a top-level JSON array, decoded one at a time as the file is read"""
+    decoder = json.JSONDecoder()
+    position = buffer.index('[') + 1
+    while True:
+        # Skip whitespace and separators, reading more as needed
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                break
+            buffer, position = handle.read(READ_SIZE), 0
+            if not buffer:
+                raise ValueError("Backup ended before the closing ']'")
+
+        if buffer[position] == ']':
+            return
+
+        while True:
+            try:
+                record, position = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                # Object runs past the end of the buffer
+                chunk = handle.read(READ_SIZE)
+                if not chunk:
+                    raise
+                buffer, position = buffer[position:] + chunk, 0
+        yield record
+
+
+def iter_records(path):
+    """
+    Serialized objects from a dumpdata-style JSON array or a JSONL backup
+    (either optionally gzipped), streamed without loading the file.
+    Text printed before the data - e.g. a settings banner captured with the dump - is skipped.
+    """
+    with _open(path, 'r') as handle:
+        buffer = handle.read(READ_SIZE)
+        starts = [index for index in (buffer.find('['), buffer.find('{')) if index >= 0]
+        if not starts:
+            return
+        start = min(starts)
+        if start > 0:
+            logger.warning(f"⚠️ Skipping {start} characters before the data in {path}")
+
+        if buffer[start] == '[':
+            yield from _iter_array(handle, buffer[start:])
+            return
+
+        # JSONL - complete the partial last line of the first read
+        buffer = buffer[start:] + handle.readline()
+        for line in itertools.chain(buffer.splitlines(), handle):
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def export_models(model_labels=None, exclude=()):
+    """Models to back up, sorted so that dependencies come first"""
+    app_list = {}
+    for model in apps.get_models():
+        label = model._meta.label_lower
+        if model._meta.proxy or not model._meta.managed:
+            continue
+        if label in exclude or model._meta.app_label in exclude:
+            continue
+        if model_labels and label not in model_labels and model._meta.app_label not in model_labels:
+            continue
+        app_list.setdefault(model._meta.app_config, []).append(model)
+    return serializers.sort_dependencies(app_list.items())
+
+
+def write_backup(path, models, chunk_size=DEFAULT_BATCH_SIZE, natural_keys=False, using=DEFAULT_DB_ALIAS):
+    """
+    Write one compact JSON object per line, model by model in dependency order.
+    Rows are read in primary key chunks so memory stays flat.
+    Returns: {model label: objects written}
+    """
+    counts = Counter()
+    with _open(path, 'w') as handle:
+        for model in models:
+            queryset = model._base_manager.using(using).order_by(model._meta.pk.name)
+            objects = queryset.iterator(chunk_size=chunk_size)
+            while True:
+                chunk = list(itertools.islice(objects, chunk_size))
+                if not chunk:
+                    break
+                for record in serializers.serialize(
+                    'python', chunk,
+                    use_natural_foreign_keys=natural_keys,
+                    use_natural_primary_keys=natural_keys,
+                ):
+                    handle.write(json.dumps(record, separators=(',', ':'), default=str))
+                    handle.write('\n')
+                counts[model._meta.label_lower] += len(chunk)
+    return counts
+
+
+class Restore:
+    """
+    Bulk-load serialized objects. Objects are buffered per model and inserted
+    in batches when the model changes (dumps are written in dependency order)
+    or the batch is full. The buffer is flushed before the next model's first
+    record is deserialized, so natural keys can refer to the rows just loaded.
+
+    Inserts are raw like loaddata's, so auto_now fields keep their backed-up
+    values and no model signals fire - derived data is rebuilt once afterwards
+    with rebuild_derived_data().
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, only=(), exclude=(), using=DEFAULT_DB_ALIAS):
+        self.batch_size = batch_size
+        self.only = set(only)
+        self.exclude = set(exclude)
+        self.using = using
+        self.connection = connections[using]
+        self.counts = Counter()
+        self.skipped = Counter()
+        self.models = set()
+        self.deferred = []
+        self.buffer = []
+        self.buffer_label = None
+
+    def _wanted(self, label):
+        app_label = label.split('.')[0]
+        if label in self.exclude or app_label in self.exclude:
+            return False
+        return not self.only or label in self.only or app_label in self.only
+
+    def _records(self, paths):
+        for path in paths:
+            for record in iter_records(path):
+                label = record.get('model', '').lower()
+                try:
+                    apps.get_model(label)
+                except (LookupError, ValueError):
+                    # Backups can outlive the models they were taken from
+                    self.skipped[label] += 1
+                    continue
+                if not self._wanted(label):
+                    continue
+                if label != self.buffer_label or len(self.buffer) >= self.batch_size:
+                    self.flush()
+                    self.buffer_label = label
+                yield record
+
+    def load(self, paths):
+        with transaction.atomic(using=self.using):
+            with self.connection.constraint_checks_disabled():
+                objects = PythonDeserializer(
+                    self._records(paths),
+                    using=self.using,
+                    ignorenonexistent=True,
+                    handle_forward_references=True,
+                )
+                for obj in objects:
+                    self.buffer.append(obj)
+                self.flush()
+
+            # Natural keys that pointed forward in the file
+            for obj in self.deferred:
+                obj.save_deferred_fields(using=self.using)
+
+            table_names = [model._meta.db_table for model in self.models]
+            self.connection.check_constraints(table_names=table_names)
+            self._reset_sequences()
+
+        return self.counts
+
+    def flush(self):
+        if not self.buffer:
+            return
+        model = type(self.buffer[0].object)
+        instances = [obj.object for obj in self.buffer]
+        self._insert(model, instances)
+
+        for obj in self.buffer:
+            if obj.deferred_fields:
+                self.deferred.append(obj)
+        self._set_m2m(model, self.buffer)
+
+        self.models.add(model)
+        self.counts[model._meta.label_lower] += len(instances)
+        self.buffer = []
+
+    def _insert(self, model, instances):
+        opts = model._meta
+        manager = model._base_manager.using(self.using)
+        fields = opts.concrete_fields
+        features = self.connection.features
+
+        with_pk = [instance for instance in instances if instance.pk is not None]
+        if with_pk:
+            # Rows already present are overwritten, as loaddata does
+            update_fields = [field for field in fields if not field.primary_key]
+            manager._insert(
+                with_pk, fields=fields, using=self.using, raw=True,
+                on_conflict=OnConflict.UPDATE if update_fields else OnConflict.IGNORE,
+                update_fields=update_fields,
+                unique_fields=[opts.pk] if features.supports_update_conflicts_with_target else [],
+            )
+
+        without_pk = [instance for instance in instances if instance.pk is None]
+        if without_pk:
+            # Natural-key objects not yet in the database - read their new keys back
+            returning_fields = opts.db_returning_fields if features.can_return_rows_from_bulk_insert else None
+            rows = manager._insert(
+                without_pk, fields=[field for field in fields if field not in opts.db_returning_fields],
+                using=self.using, raw=True, returning_fields=returning_fields,
+            )
+            if returning_fields:
+                for instance, row in zip(without_pk, rows):
+                    for field, value in zip(returning_fields, row):
+                        setattr(instance, field.attname, value)
+
+    def _set_m2m(self, model, objects):
+        """Replace each object's M2M rows with the backed-up ones, like .set()"""
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue  # Explicit through models are backed up as models of their own
+
+            source = field.m2m_field_name() + '_id'
+            target = field.m2m_reverse_field_name() + '_id'
+            rows = [
+                through(**{source: obj.object.pk, target: target_id})
+                for obj in objects
+                for target_id in obj.m2m_data.get(field.name, [])
+                if target_id != DEFER_FIELD
+            ]
+            through._base_manager.using(self.using).filter(
+                **{f'{source}__in': [obj.object.pk for obj in objects if field.name in obj.m2m_data]}
+            ).delete()
+            through._base_manager.using(self.using).bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def _reset_sequences(self):
+        statements = self.connection.ops.sequence_reset_sql(no_style(), list(self.models))
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+
+def rebuild_derived_data(model_labels):
+    """
+    Recompute what the model signals would have maintained during a restore.
+    Returns: names of the steps run
+    """
+    from communications.return_index import rebuild_sender_index
+    from project_tracker.analytics import refresh_summary
+    from subcontractors.geo import rebuild_locations
+    from subcontractors.search import rebuild_search_index
+    from tenders.counters import recount_project_counters, recount_subcontractor_stats
+
+    steps = [
+        ('invitation counters', {'projects.project', 'tenders.tenderinvitation'}, recount_project_counters),
+        ('subcontractor stats', {'tenders.tenderinvitation', 'tenders.subcontractorstats'}, recount_subcontractor_stats),
+        ('sender index', {'subcontractors.subcontractor'}, rebuild_sender_index),
+        ('search index', {'subcontractors.subcontractor', 'subcontractors.trade', 'subcontractors.region'}, rebuild_search_index),
+        ('head office locations', {'subcontractors.subcontractor'}, rebuild_locations),
+        ('project analytics summary', {'projects.project'}, refresh_summary),
+    ]
+
+    run = []
+    for name, triggers, rebuild in steps:
+        if triggers & set(model_labels):
+            rebuild()
+            run.append(name)
+    return run
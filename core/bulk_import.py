@@ -0,0 +1,198 @@
+# core/bulk_import.py
+import logging
+from collections import Counter
+
+import pandas as pd
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def read_table(file_path):
+    """Read a CSV or Excel file with every column as text, blanks as NaN"""
+    if file_path.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file_path, dtype=str)
+    return pd.read_csv(file_path, dtype=str)
+
+
+def text_column(df, name):
+    """Stripped text for a column, '' where blank or where the column is missing"""
+    if name not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[name].fillna('').astype(str).str.strip()
+
+
+def _parse_column(df, name, formats):
+    values = text_column(df, name)
+    parsed = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+    for date_format in formats:
+        parsed = parsed.fillna(pd.to_datetime(values, format=date_format, errors='coerce'))
+    return parsed
+
+
+def date_column(df, name, formats):
+    """Dates parsed with the first matching format per row, None where blank or unparseable"""
+    parsed = _parse_column(df, name, formats)
+    return parsed.dt.date.astype(object).where(parsed.notna(), None)
+
+
+def datetime_column(df, name, formats):
+    """Naive datetimes parsed like date_column()"""
+    parsed = _parse_column(df, name, formats)
+    return parsed.astype(object).map(lambda value: value.to_pydatetime() if pd.notna(value) else None)
+
+
+def resolve_names(model, names, dry_run=False, field='name'):
+    """
+    Map names to instances of a lookup model (Trade, Region, ...) with one query,
+    bulk-creating the missing ones - unsaved instances on a dry run.
+    Returns: ({name: instance}, number of names created)
+    """
+    names = {name for name in names if name}
+    found = {getattr(obj, field): obj for obj in model.objects.filter(**{f'{field}__in': names})}
+    missing = [model(**{field: name}) for name in sorted(names - found.keys())]
+
+    if missing and not dry_run:
+        model.objects.bulk_create(missing, ignore_conflicts=True)
+        # ignore_conflicts does not set primary keys - read them back
+        missing = list(model.objects.filter(**{f'{field}__in': [getattr(obj, field) for obj in missing]}))
+
+    found.update((getattr(obj, field), obj) for obj in missing)
+    return found, len(missing)
+
+
+class ImportReport:
+    """Outcome of an import, also what a dry run would do"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.counts = Counter()
+        self.errors = []
+        self.changed_fields = Counter()
+
+    def error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    def write(self, command, max_errors=20):
+        style = command.style
+        if self.dry_run:
+            command.stdout.write(style.WARNING("🧪 Dry run - nothing was written. The import would make these changes:"))
+        else:
+            command.stdout.write(style.SUCCESS("✅ Import complete:"))
+
+        for name in ('created', 'updated', 'unchanged', 'skipped', 'duplicates'):
+            command.stdout.write(f"  {name.capitalize()}: {self.counts[name]}")
+        command.stdout.write(f"  Errors: {len(self.errors)}")
+
+        for name, count in sorted(self.counts.items()):
+            if name not in ('created', 'updated', 'unchanged', 'skipped', 'duplicates') and count:
+                command.stdout.write(f"  {name}: {count}")
+
+        if self.changed_fields:
+            fields = ', '.join(f"{field} ({count})" for field, count in self.changed_fields.most_common())
+            command.stdout.write(f"  Changed fields: {fields}")
+
+        for row_number, message in self.errors[:max_errors]:
+            command.stderr.write(f"  ❌ Row {row_number}: {message}")
+        if len(self.errors) > max_errors:
+            command.stderr.write(f"  ... and {len(self.errors) - max_errors} more errors")
+
+
+class ImportPlan:
+    """
+    Rows diffed against the existing records, applied with bulk_create/bulk_update
+    and bulk through-table inserts in one transaction.
+    """
+
+    def __init__(self, model, report, batch_size=DEFAULT_BATCH_SIZE):
+        self.model = model
+        self.report = report
+        self.batch_size = batch_size
+        self.creates = []
+        self.updates = []
+        self.update_fields = set()
+        # M2M field name -> [(instance, target instances)], applied like .set()
+        self.m2m = {}
+
+    def add(self, instance, values, m2m=None):
+        """
+        Plan one row: instance is the matching existing record or None to create one.
+        Returns: the instance the row will be written to
+        """
+        if instance is None:
+            instance = self.model(**values)
+            self.creates.append(instance)
+            self.report.counts['created'] += 1
+        else:
+            changed = [field for field, value in values.items() if getattr(instance, field) != value]
+            for field in changed:
+                setattr(instance, field, values[field])
+                self.report.changed_fields[field] += 1
+            if changed:
+                self.updates.append(instance)
+                self.update_fields.update(changed)
+            else:
+                self.report.counts['unchanged'] += 1
+
+        for field, targets in (m2m or {}).items():
+            self.m2m.setdefault(field, []).append((instance, list(targets)))
+        return instance
+
+    def _sync_m2m(self, field, wanted, dry_run):
+        relation = getattr(self.model, field)
+        through = relation.through
+        source = relation.field.m2m_field_name() + '_id'
+        target = relation.field.m2m_reverse_field_name() + '_id'
+
+        existing_ids = [instance.pk for instance, _ in wanted if instance.pk is not None]
+        current = {}
+        for row_id, source_id, target_id in through.objects.filter(
+            **{f'{source}__in': existing_ids}
+        ).values_list('id', source, target):
+            current.setdefault(source_id, {})[target_id] = row_id
+
+        removed = []
+        added = []
+        for instance, targets in wanted:
+            # Targets still unsaved on a dry run are always new links
+            target_ids = {target.pk for target in targets if target.pk is not None}
+            added.extend((instance, None) for target in targets if target.pk is None)
+            rows = current.get(instance.pk, {})
+            removed.extend(row_id for target_id, row_id in rows.items() if target_id not in target_ids)
+            added.extend((instance, target_id) for target_id in target_ids - rows.keys())
+
+        self.report.counts[f'{field} links added'] += len(added)
+        self.report.counts[f'{field} links removed'] += len(removed)
+        if dry_run:
+            return
+
+        through.objects.filter(id__in=removed).delete()
+        through.objects.bulk_create(
+            [through(**{source: instance.pk, target: target_id}) for instance, target_id in added],
+            batch_size=self.batch_size,
+        )
+
+    def touched(self):
+        """Instances created or updated by this plan"""
+        return self.creates + self.updates
+
+    def execute(self, dry_run=False):
+        self.report.counts['updated'] += len(self.updates)
+
+        if dry_run:
+            for field, wanted in self.m2m.items():
+                self._sync_m2m(field, wanted, dry_run=True)
+            return
+
+        with transaction.atomic():
+            self.model.objects.bulk_create(self.creates, batch_size=self.batch_size)
+            if self.updates:
+                self.model.objects.bulk_update(self.updates, sorted(self.update_fields), batch_size=self.batch_size)
+            for field, wanted in self.m2m.items():
+                self._sync_m2m(field, wanted, dry_run=False)
+
+        logger.info(
+            f"📥 Imported {self.model.__name__}: {len(self.creates)} created, {len(self.updates)} updated"
+        )
@@ -0,0 +1,205 @@
+# core/cache.py
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Namespaces in use
+KNOWLEDGE_NAMESPACE = 'project_knowledge'
+DOCUMENTS_NAMESPACE = 'comprehensive_docs'
+NAMESPACES = (KNOWLEDGE_NAMESPACE, DOCUMENTS_NAMESPACE)
+
+METRIC_EVENTS = ('hit', 'miss', 'wait_hit', 'build', 'build_error')
+
+# Metrics recorded by this process, the shared counters live in the cache
+local_metrics = Counter()
+
+
+def _setting(name, default):
+    return getattr(settings, 'PROJECT_CACHE', {}).get(name, default)
+
+
+def _version_key(namespace, project_id):
+    return f"{namespace}:{project_id}:version"
+
+
+def _metric_key(namespace, event):
+    return f"metrics:{namespace}:{event}"
+
+
+def project_version(namespace, project_id):
+    """Current cache generation for a project - bumped by invalidate()"""
+    key = _version_key(namespace, project_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def project_key(namespace, project_id):
+    """Versioned key, so invalidating a project never needs to find its entries"""
+    return f"{namespace}:{project_id}:v{project_version(namespace, project_id)}"
+
+
+def invalidate(namespace, project_id):
+    """Drop every cached entry of this namespace for the project"""
+    key = _version_key(namespace, project_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, timeout=None)
+    logger.info(f"🗑️ Invalidated {namespace} cache for project {project_id}")
+
+
+def record(namespace, event):
+    local_metrics[(namespace, event)] += 1
+    key = _metric_key(namespace, event)
+    try:
+        # Approximate on the file backend, where incr is not atomic
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def metrics(namespaces):
+    """Shared hit/miss counters per namespace, with the hit ratio"""
+    results = {}
+    for namespace in namespaces:
+        counts = cache.get_many([_metric_key(namespace, event) for event in METRIC_EVENTS])
+        row = {event: counts.get(_metric_key(namespace, event), 0) for event in METRIC_EVENTS}
+        lookups = row['hit'] + row['wait_hit'] + row['miss']
+        row['hit_ratio'] = round((row['hit'] + row['wait_hit']) / lookups * 100, 1) if lookups else 0
+        results[namespace] = row
+    return results
+
+
+def reset_metrics(namespaces):
+    cache.delete_many([_metric_key(namespace, event) for namespace in namespaces for event in METRIC_EVENTS])
+
+
+def _lock_file(lock_key):
+    """Lock file beside the cache files when the default cache is file based, else None"""
+    config = settings.CACHES['default']
+    if not issubclass(import_string(config['BACKEND']), FileBasedCache):
+        return None
+    directory = os.path.abspath(config['LOCATION'])
+    return os.path.join(directory, hashlib.md5(lock_key.encode()).hexdigest() + '.lock')
+
+
+def _acquire_lock(lock_key, token, timeout):
+    """
+    cache.add() is atomic on the db, redis and locmem backends but not on the file
+    backend, which gets an exclusively created lock file instead
+    """
+    path = _lock_file(lock_key)
+    if path is None:
+        return cache.add(lock_key, token, timeout)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    try:
+        descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            expired = time.time() - os.path.getmtime(path) > timeout
+        except FileNotFoundError:
+            expired = True
+        if expired:
+            # Holder died or overran - clear the lock, the next poll can take it
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return False
+
+    with os.fdopen(descriptor, 'w') as lock:
+        lock.write(token)
+    return True
+
+
+def _lock_held(lock_key):
+    path = _lock_file(lock_key)
+    if path is None:
+        return cache.get(lock_key) is not None
+    return os.path.exists(path)
+
+
+def _release_lock(lock_key, token):
+    """Only release our own lock - a slow build may have outlived it"""
+    path = _lock_file(lock_key)
+    if path is None:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+        return
+
+    try:
+        with open(path) as lock:
+            if lock.read() != token:
+                return
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_or_build(namespace: str, project_id: int, builder: Callable[[], Any],
+                 timeout: int = DEFAULT_TIMEOUT, force_refresh: bool = False) -> Any:
+    """
+    Return the cached value for a project, building it at most once across workers.
+
+    The first worker to miss takes a lock and runs builder();
+    the others poll for its result instead of rebuilding. If the builder fails or
+    the lock expires, a waiting worker takes over.
+    """
+    key = project_key(namespace, project_id)
+
+    if not force_refresh:
+        value = cache.get(key)
+        if value is not None:
+            record(namespace, 'hit')
+            return value
+    record(namespace, 'miss')
+
+    lock_key = f"{key}:lock"
+    lock_timeout = _setting('LOCK_TIMEOUT', 300)
+    wait_timeout = _setting('WAIT_TIMEOUT', lock_timeout)
+    poll_interval = _setting('POLL_INTERVAL', 0.25)
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait_timeout
+
+    while not _acquire_lock(lock_key, token, lock_timeout):
+        if time.monotonic() >= deadline:
+            logger.warning(f"⏱️ Gave up waiting for {key} rebuild, building without the lock")
+            token = None
+            break
+
+        time.sleep(poll_interval)
+        value = cache.get(key)
+        # A forced refresh only accepts a value built after the other worker's lock is gone
+        if value is not None and (not force_refresh or not _lock_held(lock_key)):
+            record(namespace, 'wait_hit')
+            return value
+
+    try:
+        record(namespace, 'build')
+        value = builder()
+    except Exception:
+        record(namespace, 'build_error')
+        raise
+    else:
+        cache.set(key, value, timeout)
+        return value
+    finally:
+        if token is not None:
+            _release_lock(lock_key, token)
@@ -32,6 +32,9 @@ POWER_AUTOMATE_TEMPLATE_FLOW_ID = os.environ.get(
 )
 POWER_AUTOMATE_MAX_FLOWS = int(os.environ.get('POWER_AUTOMATE_MAX_FLOWS', 50))
 
+# Concurrent Graph sendMail calls used when sending reminder batches
+REMINDER_SEND_WORKERS = int(os.environ.get('REMINDER_SEND_WORKERS', 8))
+
 CLAUDE_API_KEY = os.environ.get('CLAUDE_API_KEY')
 
 # Application definition
@@ -88,14 +91,76 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
-# SQLite for local development
-DATABASES = {
+# Database - DATABASE_ENGINE=postgresql in production, SQLite in WAL mode otherwise
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite').lower()
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'taknox'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Persistent connections, checked before reuse
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            # Server-side cursors break behind a transaction-pooling PgBouncer
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER', 'False').lower() == 'true',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            # WAL journal, synchronous=NORMAL and busy_timeout on connect - see core/sqlite_wal
+            'ENGINE': 'core.sqlite_wal',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+            },
+            'PRAGMAS': {
+                'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)) * 1000,
+            },
+            # A file rather than shared-cache memory, so tests see the same locking as production
+            'TEST': {
+                'NAME': os.environ.get('SQLITE_TEST_PATH', BASE_DIR / 'test_db.sqlite3'),
+            },
+        }
+    }
+
+# Cache shared by all workers - CACHE_BACKEND=file (default), db, redis or locmem.
+# The db backend needs `python manage.py createcachetable`.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'file').lower()
+CACHE_BACKENDS = {
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'cache'))),
+    'db': ('django.core.cache.backends.db.DatabaseCache', os.environ.get('CACHE_LOCATION', 'django_cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379')),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'taknox'),
+}
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': CACHE_BACKENDS[CACHE_BACKEND][1],
+        'TIMEOUT': 3600,
+        'KEY_PREFIX': 'taknox',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 1000)),
+        },
     }
 }
 
+# Single-flight rebuilds in core.cache - seconds a rebuild may hold its lock,
+# and how long other workers wait for it before building themselves
+PROJECT_CACHE = {
+    'LOCK_TIMEOUT': int(os.environ.get('CACHE_LOCK_TIMEOUT', 300)),
+    'WAIT_TIMEOUT': int(os.environ.get('CACHE_WAIT_TIMEOUT', 300)),
+    'POLL_INTERVAL': 0.25,
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -127,6 +192,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # Use / operator for joining paths
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'  # Use / operator for joining paths
 
+# Generated Excel exports, kept until the data they were built from changes
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', str(BASE_DIR / 'exports'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -148,6 +216,10 @@ MS_GRAPH_USER_EMAIL = os.environ.get('MS_GRAPH_USER_EMAIL')
 # Base URL for email tracking - critical for proper email button functionality
 BASE_URL = os.environ.get('BASE_URL', 'https://taknox.pythonanywhere.com')
 
+# Append-only buffer for email open/download/response clicks, applied by the flush_tracking_events
+# management command - schedule it every minute or so (cron or a PythonAnywhere scheduled task)
+TRACKING_EVENT_BUFFER = os.environ.get('TRACKING_EVENT_BUFFER', os.path.join(BASE_DIR, 'tracking_events.jsonl'))
+
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -0,0 +1,29 @@
+# core/sqlite_wal/base.py
+from django.db.backends.sqlite3 import base
+
+# Applied on every new connection. WAL lets readers run alongside the single
+# writer, NORMAL sync is safe in WAL mode and waits replace "database is locked".
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend for concurrent writers.
+    Override pragmas with a PRAGMAS dict in the DATABASES entry.
+    """
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name}={value}').fetchall()
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        # Take the write lock up front - a deferred transaction that reads then
+        # writes fails immediately with "database is locked" instead of waiting
+        self.cursor().execute('BEGIN IMMEDIATE')
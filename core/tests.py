@@ -0,0 +1,228 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from projects.models import Project
+from subcontractors.models import Subcontractor, Trade
+from tenders.models import SubcontractorStats, TenderInvitation
+from . import backup
+from . import cache as project_cache
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'core-tests'}}
+FAST_POLLING = {'LOCK_TIMEOUT': 30, 'WAIT_TIMEOUT': 30, 'POLL_INTERVAL': 0.01}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PROJECT_CACHE=FAST_POLLING)
+class ProjectCacheTests(SimpleTestCase):
+    """Versioned project namespaces and single-flight rebuilds in core.cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_values_are_cached_until_invalidated(self):
+        builds = []
+
+        def builder():
+            builds.append(len(builds))
+            return f'build {len(builds)}'
+
+        self.assertEqual(project_cache.get_or_build('docs', 1, builder), 'build 1')
+        self.assertEqual(project_cache.get_or_build('docs', 1, builder), 'build 1')
+        # Other projects and namespaces are separate
+        self.assertEqual(project_cache.get_or_build('docs', 2, builder), 'build 2')
+        self.assertEqual(project_cache.get_or_build('other', 1, builder), 'build 3')
+
+        key = project_cache.project_key('docs', 1)
+        project_cache.invalidate('docs', 1)
+        self.assertNotEqual(project_cache.project_key('docs', 1), key)
+        self.assertEqual(project_cache.get_or_build('docs', 1, builder), 'build 4')
+        self.assertEqual(project_cache.get_or_build('docs', 2, builder), 'build 2')
+
+        self.assertEqual(project_cache.get_or_build('docs', 1, builder, force_refresh=True), 'build 5')
+        self.assertEqual(project_cache.metrics(['docs'])['docs']['build'], 4)
+
+    def test_errors_are_not_cached(self):
+        def failing():
+            raise RuntimeError('SharePoint is down')
+
+        with self.assertRaises(RuntimeError):
+            project_cache.get_or_build('docs', 1, failing)
+        self.assertEqual(project_cache.get_or_build('docs', 1, lambda: 'rebuilt'), 'rebuilt')
+
+        counts = project_cache.metrics(['docs'])['docs']
+        self.assertEqual((counts['build_error'], counts['build'], counts['miss']), (1, 2, 2))
+
+    def assertSingleFlight(self):
+        started = threading.Barrier(5)
+        builds = []
+
+        def builder():
+            builds.append(threading.get_ident())
+            time.sleep(0.2)
+            return 'knowledge'
+
+        results = []
+
+        def worker():
+            started.wait()
+            results.append(project_cache.get_or_build('knowledge', 7, builder))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['knowledge'] * 5)
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(project_cache.metrics(['knowledge'])['knowledge']['wait_hit'], 4)
+
+    def test_concurrent_misses_build_once(self):
+        self.assertSingleFlight()
+
+    def test_file_backend_locks_in_the_configured_location(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        location = os.path.join(directory.name, 'cache')
+        file_cache = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}}
+
+        with override_settings(CACHES=file_cache):
+            lock = project_cache._lock_file('knowledge:7:v1:lock')
+            self.assertEqual(os.path.dirname(lock), location)
+            self.assertTrue(project_cache._acquire_lock('knowledge:7:v1:lock', 'token', 30))
+            self.assertFalse(project_cache._acquire_lock('knowledge:7:v1:lock', 'other', 30))
+            project_cache._release_lock('knowledge:7:v1:lock', 'other')
+            self.assertTrue(os.path.exists(lock))
+            project_cache._release_lock('knowledge:7:v1:lock', 'token')
+            self.assertFalse(os.path.exists(lock))
+
+            self.assertSingleFlight()
+
+
+class BackupRestoreTests(TestCase):
+    """backup_data / restore_data and the loaders in core.backup"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('estimator', password='secret')
+        trade = Trade.objects.create(name='Roofing')
+        cls.subcontractors = [
+            Subcontractor.objects.create(
+                trade=trade, company=f'Backup Roofing {i}', head_office='Leeds',
+                email=f'tenders@backuproofing{i}.co.uk',
+            )
+            for i in range(3)
+        ]
+        cls.project = Project.objects.create(
+            name='Backup Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        for subcontractor, status in zip(cls.subcontractors, ['PENDING', 'ACCEPTED', 'DECLINED']):
+            TenderInvitation.objects.create(project=cls.project, subcontractor=subcontractor, status=status)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def rows(self, model, *exclude):
+        fields = [field.attname for field in model._meta.concrete_fields if field.attname not in exclude]
+        return list(model._base_manager.order_by('pk').values_list(*fields))
+
+    def snapshot(self):
+        return {
+            model: self.rows(model, *exclude)
+            for model, exclude in [
+                (get_user_model(), ()),
+                (Trade, ()),
+                (Subcontractor, ()),
+                (Project, ('invitation_count', 'accepted_count', 'declined_count', 'returned_count', 'pending_count')),
+                (TenderInvitation, ()),
+            ]
+        }
+
+    def counters(self):
+        project = Project.objects.get(pk=self.project.pk)
+        stats = SubcontractorStats.objects.get(subcontractor=self.subcontractors[1])
+        return (
+            (project.invitation_count, project.accepted_count, project.declined_count, project.pending_count),
+            (stats.invitation_count, stats.accepted_count),
+        )
+
+    def test_round_trip_restores_rows_and_rebuilds_counters(self):
+        expected_counters = self.counters()
+        self.assertEqual(expected_counters, ((3, 1, 1, 1), (1, 1)))
+        # Drift the stored counters - the restore must recount, not trust the backup
+        Project.objects.filter(pk=self.project.pk).update(invitation_count=9, accepted_count=0)
+        SubcontractorStats.objects.update(invitation_count=0, accepted_count=0)
+        expected_rows = self.snapshot()
+
+        for name in ('backup.jsonl', 'backup.jsonl.gz'):
+            with self.subTest(name=name):
+                path = self.path(name)
+                call_command('backup_data', path, stdout=io.StringIO())
+                call_command('flush', interactive=False, verbosity=0)
+                self.assertFalse(TenderInvitation.objects.exists())
+
+                call_command('restore_data', path, stdout=io.StringIO())
+                self.assertEqual(self.snapshot(), expected_rows)
+                self.assertEqual(self.counters(), expected_counters)
+
+                # Primary keys carry on from the restored rows
+                trade = Trade.objects.create(name='Glazing')
+                self.assertGreater(trade.pk, max(row[0] for row in expected_rows[Trade]))
+                trade.delete()
+
+    def test_jsonl_backup(self):
+        trade = Trade.objects.get()
+        lines = [
+            {'model': 'subcontractors.trade', 'pk': trade.pk, 'fields': {'name': 'Roofing & Cladding'}},
+            {'model': 'subcontractors.trade', 'pk': trade.pk + 100, 'fields': {'name': 'Groundworks'}},
+            {'model': 'legacy.removedmodel', 'pk': 1, 'fields': {}},
+        ]
+        path = self.path('trades.jsonl')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write('\n'.join(json.dumps(line) for line in lines) + '\n\n')
+
+        restore = backup.Restore(batch_size=1)
+        counts = restore.load([path])
+
+        self.assertEqual(counts, {'subcontractors.trade': 2})
+        self.assertEqual(restore.skipped, {'legacy.removedmodel': 1})
+        self.assertEqual(
+            list(Trade.objects.order_by('pk').values_list('name', flat=True)),
+            ['Roofing & Cladding', 'Groundworks'],
+        )
+
+    def test_dumpdata_file_with_a_banner(self):
+        dump = io.StringIO()
+        call_command('dumpdata', 'subcontractors.trade', 'subcontractors.subcontractor', indent=2, stdout=dump)
+        path = self.path('dump.json')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write('Using settings module core.settings\n' + dump.getvalue())
+        expected = {model: self.rows(model) for model in (Trade, Subcontractor)}
+        Subcontractor.objects.filter(pk=self.subcontractors[0].pk).update(email='', head_office='Overwritten')
+
+        # A small read size makes the array decoder refill its buffer mid-object
+        with mock.patch.object(backup, 'READ_SIZE', 64), self.assertLogs('core.backup', 'WARNING') as logs:
+            counts = backup.Restore().load([path])
+
+        self.assertIn('Skipping 36 characters', logs.output[0])
+        self.assertEqual(counts, {'subcontractors.trade': 1, 'subcontractors.subcontractor': 3})
+        self.assertEqual({model: self.rows(model) for model in (Trade, Subcontractor)}, expected)
@@ -1,7 +1,7 @@
 # feedback/admin.py
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import SubcontractorFeedback
+from .models import FeedbackAnalysisRun, SubcontractorFeedback
 
 @admin.register(SubcontractorFeedback)
 class SubcontractorFeedbackAdmin(admin.ModelAdmin):
@@ -48,4 +48,12 @@ class SubcontractorFeedbackAdmin(admin.ModelAdmin):
                 obj.email_body
             )
         return "No email content"
-    preview_email.short_description = 'Email Preview'
\ No newline at end of file
+    preview_email.short_description = 'Email Preview'
+
+@admin.register(FeedbackAnalysisRun)
+class FeedbackAnalysisRunAdmin(admin.ModelAdmin):
+    list_display = ('original_filename', 'uploaded_by', 'status', 'progress', 'total_responses', 'created_at', 'completed_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('original_filename', 'uploaded_by__username')
+    readonly_fields = ('created_at', 'started_at', 'completed_at')
+    list_select_related = ('uploaded_by',)
@@ -0,0 +1,264 @@
+# feedback/analytics.py
+# Column-at-a-time feedback analysis behind FeedbackAnalysisService
+
+import itertools
+import logging
+import re
+import string
+from collections import Counter
+from datetime import date, datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RATING_FIELDS = ['rating', 'score', 'satisfaction', 'stars', 'overall_rating']
+CATEGORY_FIELDS = ['category', 'type', 'department', 'topic', 'subject']
+COMMENT_FIELDS = ['comment', 'feedback', 'review', 'text', 'message', 'notes', 'description']
+DATE_FIELDS = ['date', 'created_at', 'timestamp', 'submitted_on', 'date_submitted']
+
+# Tried in this order - 01/02/2024 is read as January 2nd
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']
+
+POSITIVE_WORDS = [
+    'good', 'great', 'excellent', 'amazing', 'love', 'perfect', 'fantastic',
+    'wonderful', 'awesome', 'brilliant', 'outstanding', 'superb', 'satisfied',
+    'happy', 'pleased', 'impressed', 'recommend'
+]
+NEGATIVE_WORDS = [
+    'bad', 'terrible', 'awful', 'hate', 'horrible', 'disappointing', 'poor',
+    'worst', 'dissatisfied', 'angry', 'frustrated', 'annoyed', 'upset',
+    'complaint', 'problem', 'issue', 'wrong'
+]
+
+POSITIVE_SET = frozenset(POSITIVE_WORDS)
+NEGATIVE_SET = frozenset(NEGATIVE_WORDS)
+
+WORD_PATTERN = re.compile('[a-z]+')
+
+
+class _Missing:
+    """Placeholder for a field a row does not have - falsy, unlike a None value"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'MISSING'
+
+
+MISSING = _Missing()
+
+
+def _literals(fmt):
+    """Characters a string must contain to match a strptime format - whitespace matches any run of whitespace"""
+    return set(re.sub(r'%.', '', fmt)) - set(string.whitespace)
+
+
+_FORMAT_LITERALS = [(fmt, _literals(fmt)) for fmt in DATE_FORMATS]
+
+
+class FeedbackColumns:
+    """
+    Parsed feedback rows held as one object array per field.
+    Columns are built on first use and shared by every analysis of the same rows.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.size = len(rows)
+        self.fields = set().union(*rows) if rows else set()
+        self._columns = {}
+
+    @classmethod
+    def wrap(cls, data):
+        return data if isinstance(data, cls) else cls(data)
+
+    def column(self, field):
+        if field not in self._columns:
+            if field in self.fields:
+                values = (row.get(field, MISSING) for row in self.rows)
+            else:
+                values = itertools.repeat(MISSING, self.size)
+            self._columns[field] = np.fromiter(values, dtype=object, count=self.size)
+        return self._columns[field]
+
+    def first_truthy(self, fields):
+        """
+        Per row, the value of the first field that is present and truthy.
+        Returns: (values, found mask) - values are MISSING where nothing was found
+        """
+        values = np.full(self.size, MISSING, dtype=object)
+        pending = np.ones(self.size, dtype=bool)
+        for field in fields:
+            if field not in self.fields:
+                continue
+            column = self.column(field)
+            take = pending & np.fromiter(map(bool, column), dtype=bool, count=self.size)
+            values[take] = column[take]
+            pending &= ~take
+        return values, ~pending
+
+
+def _map_distinct(keys, parse):
+    """parse() applied once per distinct key, in key order"""
+    parsed = {key: parse(key) for key in set(keys)}
+    return [parsed[key] for key in keys]
+
+
+def _parse_rating(text):
+    try:
+        rating = float(text)
+    except (ValueError, TypeError):
+        return None
+    return rating if 0 <= rating <= 10 else None
+
+
+def rating_summary(columns):
+    """Ratings on a 0-10 scale from the first rating field that holds one"""
+    ratings = np.full(columns.size, np.nan)
+    pending = np.ones(columns.size, dtype=bool)
+    for field in RATING_FIELDS:
+        if field not in columns.fields:
+            continue
+        column = columns.column(field)
+        candidates = np.flatnonzero(pending & np.fromiter(
+            (value is not MISSING and value is not None for value in column), dtype=bool, count=columns.size
+        ))
+        parsed = _map_distinct([str(value).strip() for value in column[candidates]], _parse_rating)
+        valid = np.fromiter((rating is not None for rating in parsed), dtype=bool, count=len(parsed))
+        rows = candidates[valid]
+        ratings[rows] = [rating for rating in parsed if rating is not None]
+        pending[rows] = False
+
+    rated = ratings[~pending].tolist()
+    if not rated:
+        return {'count': 0, 'average': 0, 'distribution': {}}
+
+    # Group by whole numbers, keys in order of first appearance
+    distribution = Counter()
+    for rating, count in Counter(rated).items():
+        distribution[int(round(rating))] += count
+
+    return {
+        'count': len(rated),
+        'average': round(sum(rated) / len(rated), 2),
+        'min': min(rated),
+        'max': max(rated),
+        'distribution': dict(distribution)
+    }
+
+
+def category_summary(columns):
+    """Share of responses per category, 'uncategorized' when no category field is filled in"""
+    values, found = columns.first_truthy(CATEGORY_FIELDS)
+    names = [str(value) if has_value else None for value, has_value in zip(values.tolist(), found.tolist())]
+    labels = _map_distinct(names, lambda name: 'uncategorized' if name is None else name.lower().strip())
+
+    total = columns.size
+    return {
+        category: {
+            'count': count,
+            'percentage': round((count / total) * 100, 1) if total > 0 else 0
+        }
+        for category, count in Counter(labels).items()
+    }
+
+
+def keyword_sets(texts, keywords):
+    """
+    Per text, the set of keywords it contains anywhere, as `keyword in text` finds them.
+    Keywords are lowercase ASCII words, so a match always lies inside a run of a-z letters:
+    each distinct run is searched for the keywords once, and a text's keywords are the union
+    of its runs'. The cost grows with the number of words rather than words times keywords.
+    """
+    if not all(WORD_PATTERN.fullmatch(keyword) for keyword in keywords):
+        raise ValueError("Keywords must be lowercase ASCII words")
+
+    hits_by_word = {}
+    found = []
+    for text in texts:
+        present = set()
+        for word in set(WORD_PATTERN.findall(text)):
+            hits = hits_by_word.get(word)
+            if hits is None:
+                hits = hits_by_word[word] = frozenset(keyword for keyword in keywords if keyword in word)
+            present |= hits
+        found.append(present)
+    return found
+
+
+def sentiment_summary(columns):
+    """Percentage of positive, negative and neutral comments by keyword counts"""
+    values, found = columns.first_truthy(COMMENT_FIELDS)
+    texts = [str(value).lower() for value in values[found]]
+
+    # Keywords present per comment - each keyword counts once however often it appears
+    positive_count = negative_count = 0
+    for present in keyword_sets(texts, POSITIVE_WORDS + NEGATIVE_WORDS):
+        positive, negative = len(present & POSITIVE_SET), len(present & NEGATIVE_SET)
+        if positive > negative:
+            positive_count += 1
+        elif negative > positive:
+            negative_count += 1
+
+    sentiment_scores = {
+        'positive': positive_count,
+        'negative': negative_count,
+        'neutral': columns.size - positive_count - negative_count,
+    }
+
+    # Convert to percentages
+    total = sum(sentiment_scores.values())
+    if total > 0:
+        for key in sentiment_scores:
+            sentiment_scores[key] = round((sentiment_scores[key] / total) * 100, 1)
+    return sentiment_scores
+
+
+def parse_date(text):
+    """Date in the first of DATE_FORMATS that matches, None if none does"""
+    for fmt, literals in _FORMAT_LITERALS:
+        # Every literal in the format must appear - skips formats that cannot match without raising
+        if not literals.issubset(text):
+            continue
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def trend_summary(columns):
+    """Date range and monthly response counts from the first date field filled in"""
+    values, found = columns.first_truthy(DATE_FIELDS)
+    values = values[found].tolist()
+
+    # Date values are kept as they are, strings parsed once per distinct value
+    texts = {value.strip() for value in values if isinstance(value, str)}
+    parsed = {text: parse_date(text) for text in texts}
+    dates = [
+        value if isinstance(value, date) else parsed[value.strip()] if isinstance(value, str) else None
+        for value in values
+    ]
+    dates = [value for value in dates if value]
+
+    if not dates:
+        return {'has_date_data': False, 'message': 'No date information found'}
+
+    dates.sort()
+
+    # Group by month, months in date order
+    monthly_counts = Counter()
+    for item_date, count in Counter(dates).items():
+        monthly_counts[f"{item_date.year}-{item_date.month:02d}"] += count
+
+    return {
+        'has_date_data': True,
+        'date_range': {
+            'start': dates[0].isoformat(),
+            'end': dates[-1].isoformat()
+        },
+        'monthly_distribution': dict(monthly_counts),
+        'total_with_dates': len(dates)
+    }
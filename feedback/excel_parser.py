@@ -1,147 +1,289 @@
 # feedback/excel_parser.py
-# Using xlrd instead of openpyxl to avoid numpy conflicts
+# xls is read with xlrd, xlsx with openpyxl in read-only mode and csv with the csv module.
+# Rows are streamed from the file and stored column by column.
 
 import logging
 import xlrd
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime, time
 import csv
 import io
+import itertools
 
 logger = logging.getLogger(__name__)
 
+# Rows moved from the reader into the column lists at a time
+CHUNK_SIZE = 1000
+
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0'
+XLSX_SIGNATURE = b'PK\x03\x04'
+
+
+def sniff_format(head):
+    """'xls', 'xlsx' or 'csv' from the first bytes of a file"""
+    if isinstance(head, bytes):
+        if head.startswith(XLS_SIGNATURE):
+            return 'xls'
+        if head.startswith(XLSX_SIGNATURE):
+            return 'xlsx'
+    return 'csv'
+
+
 class ExcelParser:
-    """Excel parser using xlrd (no numpy dependency)"""
-    
+    """
+    Spreadsheet parser for xls, xlsx and csv files.
+    Values are held as one list per column; the indexes used by filter_data,
+    get_unique_values and count_by_column are built per column on first use.
+    """
+
+    file_kind = 'Excel'
+
     def __init__(self, file_path=None, file_content=None):
         self.file_path = file_path
         self.file_content = file_content
         self.workbook = None
         self.worksheet = None
         self.headers = []
-        self.data = []
-    
+        self._values = []
+        self._positions = {}
+        self._date_positions = set()
+        self._indexes = {}
+        self._counts = {}
+        self._lowered = {}
+
     def load_file(self):
-        """Load Excel file using xlrd"""
+        """Read the file into column storage"""
         try:
-            if self.file_content:
-                # Load from file content (uploaded file)
-                if hasattr(self.file_content, 'read'):
-                    content = self.file_content.read()
-                else:
-                    content = self.file_content
-                self.workbook = xlrd.open_workbook(file_contents=content)
-            elif self.file_path:
-                # Load from file path
-                self.workbook = xlrd.open_workbook(self.file_path)
-            else:
-                raise ValueError("Either file_path or file_content must be provided")
-            
-            # Get the first worksheet
-            self.worksheet = self.workbook.sheet_by_index(0)
-            self._parse_data()
+            rows = self._read_rows()
+            self.headers = self._clean_headers(next(rows, []))
+            self._store(self._data_rows(rows))
             return True
         except Exception as e:
-            logger.error(f"Error loading Excel file: {str(e)}")
+            logger.error(f"Error loading {self.file_kind} file: {str(e)}")
             return False
-    
-    def _parse_data(self):
-        """Parse worksheet data into headers and rows"""
-        if not self.worksheet:
-            return
-        
-        if self.worksheet.nrows == 0:
-            return
-        
-        # Get headers from first row
-        self.headers = []
-        for col in range(self.worksheet.ncols):
-            cell_value = self.worksheet.cell_value(0, col)
-            if cell_value:
-                self.headers.append(str(cell_value).strip())
-            else:
-                self.headers.append(f'Column_{col}')
-        
-        # Get data rows (skip header row)
-        self.data = []
-        for row in range(1, self.worksheet.nrows):
-            row_dict = {}
-            has_data = False
-            
-            for col in range(min(self.worksheet.ncols, len(self.headers))):
-                cell_value = self.worksheet.cell_value(row, col)
-                header = self.headers[col]
-                
-                # Convert Excel date numbers to readable dates
-                if self.worksheet.cell_type(row, col) == xlrd.XL_CELL_DATE:
+
+    def iter_rows(self):
+        """Stream cleaned rows straight from the file as dictionaries, without storing them"""
+        rows = self._read_rows()
+        headers = self._clean_headers(next(rows, []))
+        for values in self._data_rows(rows, len(headers)):
+            yield dict(zip(headers, values))
+
+    # Reading
+
+    def _content(self):
+        if hasattr(self.file_content, 'read'):
+            return self.file_content.read()
+        return self.file_content
+
+    def _read_rows(self):
+        """Raw rows of the first sheet, header row first"""
+        if self.file_content:
+            content = self._content()
+            file_format = sniff_format(content[:8])
+        elif self.file_path:
+            content = None
+            with open(self.file_path, 'rb') as handle:
+                file_format = sniff_format(handle.read(8))
+        else:
+            raise ValueError("Either file_path or file_content must be provided")
+
+        readers = {'xls': self._xls_rows, 'xlsx': self._xlsx_rows, 'csv': self._csv_rows}
+        return readers[file_format](content)
+
+    def _xls_rows(self, content):
+        if content is not None:
+            self.workbook = xlrd.open_workbook(file_contents=content, on_demand=True)
+        else:
+            self.workbook = xlrd.open_workbook(self.file_path, on_demand=True)
+        self.worksheet = self.workbook.sheet_by_index(0)
+
+        for row in range(self.worksheet.nrows):
+            values = self.worksheet.row_values(row)
+            types = self.worksheet.row_types(row)
+
+            # Convert Excel date numbers to readable dates
+            if row > 0 and xlrd.XL_CELL_DATE in types:
+                for col, cell_type in enumerate(types):
+                    if cell_type != xlrd.XL_CELL_DATE:
+                        continue
                     try:
-                        date_tuple = xlrd.xldate_as_tuple(cell_value, self.workbook.datemode)
-                        cell_value = datetime(*date_tuple).strftime('%Y-%m-%d')
-                    except:
+                        date_tuple = xlrd.xldate_as_tuple(values[col], self.workbook.datemode)
+                        values[col] = datetime(*date_tuple).strftime('%Y-%m-%d')
+                        self._date_positions.add(col)
+                    except Exception:
                         pass
-                
-                # Clean up string values
-                if isinstance(cell_value, str):
-                    cell_value = cell_value.strip()
-                
-                row_dict[header] = cell_value if cell_value != '' else None
-                
-                if cell_value:
-                    has_data = True
-            
-            if has_data:  # Only add rows with actual data
-                self.data.append(row_dict)
-    
+            yield values
+
+        self.workbook.release_resources()
+
+    def _xlsx_rows(self, content):
+        from openpyxl import load_workbook
+
+        source = io.BytesIO(content) if content is not None else self.file_path
+        self.workbook = load_workbook(source, read_only=True, data_only=True)
+        self.worksheet = self.workbook.worksheets[0]
+        try:
+            for row, values in enumerate(self.worksheet.iter_rows(values_only=True)):
+                values = ['' if value is None else value for value in values]
+                if row > 0:
+                    for col, value in enumerate(values):
+                        if isinstance(value, (datetime, date)):
+                            values[col] = value.strftime('%Y-%m-%d')
+                            self._date_positions.add(col)
+                        elif isinstance(value, time):
+                            values[col] = value.isoformat()
+                yield values
+        finally:
+            self.workbook.close()
+
+    def _csv_rows(self, content, encoding='utf-8-sig'):
+        if content is None:
+            with open(self.file_path, 'r', encoding=encoding, newline='') as csvfile:
+                yield from csv.reader(csvfile)
+        elif isinstance(content, bytes):
+            yield from csv.reader(io.TextIOWrapper(io.BytesIO(content), encoding=encoding, newline=''))
+        else:
+            yield from csv.reader(io.StringIO(str(content), newline=''))
+
+    # Cleaning
+
+    def _clean_headers(self, values):
+        return [str(value).strip() if value else f'Column_{col}' for col, value in enumerate(values)]
+
+    def _data_rows(self, rows, width=None):
+        """Data rows as lists as wide as the header, blank rows skipped"""
+        width = len(self.headers) if width is None else width
+        padding = [''] * width
+        for values in rows:
+            values = [
+                (value.strip() or None) if isinstance(value, str) else value
+                for value in itertools.islice(itertools.chain(values, padding), width)
+            ]
+            if any(values):  # Only add rows with actual data
+                yield values
+
+    def _store(self, rows):
+        """Transpose rows into the column lists a chunk at a time"""
+        self._values = [[] for _ in self.headers]
+        # A repeated header refers to its last column, as it would in a row dictionary
+        self._positions = {header: position for position, header in enumerate(self.headers)}
+        self._indexes = {}
+        self._counts = {}
+        self._lowered = {}
+
+        while True:
+            chunk = list(itertools.islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+            for column, values in zip(self._values, zip(*chunk)):
+                column.extend(values)
+
+    # Column access
+
+    @property
+    def row_count(self):
+        return len(self._values[0]) if self._values else 0
+
+    @property
+    def data(self):
+        return self.get_data_as_list()
+
+    def _column(self, column_name):
+        """Values of a column, None if the sheet has no such column"""
+        position = self._positions.get(column_name)
+        return None if position is None else self._values[position]
+
+    def _row(self, index):
+        return dict(zip(self.headers, (values[index] for values in self._values)))
+
+    def _index(self, column_name):
+        """{value: row positions} for a column, built on first use"""
+        if column_name not in self._indexes:
+            column = self._column(column_name)
+            if column is None:
+                return None
+            index = {}
+            for position, value in enumerate(column):
+                index.setdefault(value, []).append(position)
+            self._indexes[column_name] = index
+        return self._indexes[column_name]
+
+    def _value_counts(self, column_name):
+        """{str(value): occurrences} for a column in order of first appearance, built on first use"""
+        if column_name not in self._counts:
+            self._counts[column_name] = Counter(map(str, self.get_column_values(column_name)))
+        return self._counts[column_name]
+
     def get_data_as_list(self):
         """Get data as list of dictionaries"""
-        return self.data.copy()
-    
+        return [dict(zip(self.headers, values)) for values in zip(*self._values)]
+
     def get_headers(self):
         """Get column headers"""
-        return self.headers.copy()
-    
+        return list(self.headers)
+
+    def get_column_type(self, column_name):
+        """'number', 'date', 'text', 'boolean', 'empty' or 'mixed' from the values a column holds"""
+        column = self._column(column_name) or []
+        kinds = {type(value) for value in column if value is not None}
+        if not kinds:
+            return 'empty'
+        if kinds <= {int, float}:
+            return 'number'
+        if kinds == {bool}:
+            return 'boolean'
+        if kinds == {str}:
+            return 'date' if self._positions[column_name] in self._date_positions else 'text'
+        return 'mixed'
+
     def get_column_values(self, column_name):
         """Get all values from a specific column"""
-        return [row.get(column_name) for row in self.data if column_name in row and row[column_name] is not None]
-    
+        return [value for value in self._column(column_name) or [] if value is not None]
+
     def filter_data(self, column_name, value):
         """Filter data by column value"""
-        return [row for row in self.data if row.get(column_name) == value]
-    
+        index = self._index(column_name)
+        if index is None:
+            # Every row lacks the column
+            return self.get_data_as_list() if value is None else []
+        try:
+            positions = index.get(value, [])
+        except TypeError:
+            # Unhashable value - compare row by row
+            positions = [position for position, cell in enumerate(self._column(column_name)) if cell == value]
+        return [self._row(position) for position in positions]
+
     def get_unique_values(self, column_name):
         """Get unique values from a column"""
-        values = self.get_column_values(column_name)
-        return list(set(str(v) for v in values if v is not None))
-    
+        return list(self._value_counts(column_name))
+
     def count_by_column(self, column_name):
         """Count occurrences of each value in a column"""
-        values = self.get_column_values(column_name)
-        counts = {}
-        for value in values:
-            if value is not None:
-                str_value = str(value)
-                counts[str_value] = counts.get(str_value, 0) + 1
-        return counts
-    
+        return dict(self._value_counts(column_name))
+
     def get_numeric_column_stats(self, column_name):
         """Get basic statistics for a numeric column"""
-        values = []
-        for row in self.data:
-            if column_name in row and row[column_name] is not None:
+        if self.get_column_type(column_name) == 'number':
+            values = [float(value) for value in self.get_column_values(column_name)]
+        else:
+            values = []
+            for value in self.get_column_values(column_name):
                 try:
                     # Try to convert to float
-                    if isinstance(row[column_name], (int, float)):
-                        values.append(float(row[column_name]))
-                    elif isinstance(row[column_name], str):
+                    if isinstance(value, (int, float)):
+                        values.append(float(value))
+                    elif isinstance(value, str):
                         # Try to parse string numbers
-                        cleaned = str(row[column_name]).replace(',', '').strip()
+                        cleaned = value.replace(',', '').strip()
                         if cleaned:
                             values.append(float(cleaned))
                 except (ValueError, TypeError):
                     continue
-        
+
         if not values:
             return {'count': 0, 'sum': 0, 'mean': 0, 'min': 0, 'max': 0}
-        
+
         return {
             'count': len(values),
             'sum': sum(values),
@@ -149,84 +291,66 @@ class ExcelParser:
             'min': min(values),
             'max': max(values)
         }
-    
+
     def search_data(self, search_term, columns=None):
         """Search for a term across specified columns or all columns"""
         if columns is None:
             columns = self.headers
-        
-        results = []
+
         search_term = str(search_term).lower()
-        
-        for row in self.data:
-            for column in columns:
-                if column in row and row[column] is not None:
-                    if search_term in str(row[column]).lower():
-                        results.append(row)
-                        break  # Found in this row, move to next row
-        
-        return results
-    
+        matched = set()
+        for column_name in dict.fromkeys(columns):
+            if self._column(column_name) is None:
+                continue
+            if column_name not in self._lowered:
+                # Lower-cased text of each cell, kept for later searches
+                self._lowered[column_name] = [
+                    None if value is None else str(value).lower() for value in self._column(column_name)
+                ]
+            matched.update(
+                position for position, text in enumerate(self._lowered[column_name])
+                if text is not None and search_term in text
+            )
+
+        return [self._row(position) for position in sorted(matched)]
+
     def export_to_csv(self, output_path):
         """Export data to CSV file"""
         try:
             with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-                if not self.data:
+                if not self.row_count:
                     return False
-                
+
                 writer = csv.DictWriter(csvfile, fieldnames=self.headers)
                 writer.writeheader()
-                for row in self.data:
-                    writer.writerow(row)
+                writer.writerows(self.get_data_as_list())
             return True
         except Exception as e:
             logger.error(f"Error exporting to CSV: {str(e)}")
             return False
 
-class CSVParser:
-    """Simple CSV parser as fallback"""
-    
-    def __init__(self, file_path=None, file_content=None):
-        self.file_path = file_path
-        self.file_content = file_content
-        self.headers = []
-        self.data = []
-    
-    def load_file(self):
-        """Load CSV file"""
-        try:
-            if self.file_content:
-                if hasattr(self.file_content, 'read'):
-                    content = self.file_content.read()
-                    if isinstance(content, bytes):
-                        content = content.decode('utf-8')
-                else:
-                    content = str(self.file_content)
-                
-                # Use StringIO to read from string
-                csv_file = io.StringIO(content)
-                reader = csv.DictReader(csv_file)
-                self.headers = reader.fieldnames or []
-                self.data = [row for row in reader]
-                
-            elif self.file_path:
-                with open(self.file_path, 'r', encoding='utf-8') as csvfile:
-                    reader = csv.DictReader(csvfile)
-                    self.headers = reader.fieldnames or []
-                    self.data = [row for row in reader]
-            
-            return True
-        except Exception as e:
-            logger.error(f"Error loading CSV file: {str(e)}")
-            return False
-    
-    def get_data_as_list(self):
-        """Get data as list of dictionaries"""
-        return self.data.copy()
-    
-    def get_headers(self):
-        """Get column headers"""
-        return self.headers.copy()
+class CSVParser(ExcelParser):
+    """CSV parser keeping headers and values exactly as written"""
+
+    file_kind = 'CSV'
+
+    def _read_rows(self):
+        if self.file_content:
+            return self._csv_rows(self._content(), encoding='utf-8')
+        if self.file_path:
+            return self._csv_rows(None, encoding='utf-8')
+        return iter([])
+
+    def _clean_headers(self, values):
+        return list(values)
+
+    def _data_rows(self, rows, width=None):
+        """Rows as csv.DictReader reads them: blank lines skipped, short rows padded with None"""
+        width = len(self.headers) if width is None else width
+        padding = [None] * width
+        for values in rows:
+            if values:
+                yield list(itertools.islice(itertools.chain(values, padding), width))
 
 # Utility functions
 def parse_excel_file(file_path):
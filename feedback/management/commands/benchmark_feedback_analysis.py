@@ -0,0 +1,82 @@
+# feedback/management/commands/benchmark_feedback_analysis.py
+import random
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from feedback.analytics import NEGATIVE_WORDS, POSITIVE_WORDS
+from feedback.reference import RowByRowAnalysis
+from feedback.services import FeedbackAnalysisService
+
+FILLER = (
+    'the tender package was issued on time and the drawings were clear enough to price from '
+    'although site access and the programme need confirming before we can commit'
+).split()
+# Roughly one word in twelve of a comment carries sentiment
+KEYWORD_SHARE = 0.08
+CATEGORIES = ['Groundworks', 'Roofing', 'M&E', 'Drylining', 'Cladding', 'Windows', 'Flooring', '']
+
+
+class Command(BaseCommand):
+    help = 'Compare the columnar feedback analysis with the previous row-by-row one on synthetic responses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=50000,
+            help='Number of feedback responses to analyse (default 50000)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for the synthetic responses (default 1)'
+        )
+
+    def handle(self, *args, **options):
+        rows = self.synthetic_rows(options['rows'], random.Random(options['seed']))
+        self.stdout.write(f"📊 Analysing {len(rows)} synthetic feedback responses")
+
+        # Baseline: every row checked field by field, every date string parsed, every keyword scanned per comment
+        start = time.perf_counter()
+        baseline = RowByRowAnalysis.process_feedback_data(rows)
+        row_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        columnar = FeedbackAnalysisService.process_feedback_data(rows)
+        columnar_seconds = time.perf_counter() - start
+
+        for section in baseline:
+            # repr() also catches differences in key order and value types
+            if repr(baseline[section]) != repr(columnar[section]):
+                raise CommandError(f"❌ {section} differs:\n  row-by-row: {baseline[section]}\n  columnar:   {columnar[section]}")
+
+        self.stdout.write(f"   Row by row:  {row_seconds * 1000:10.0f} ms")
+        self.stdout.write(f"   Columnar:    {columnar_seconds * 1000:10.0f} ms")
+        self.stdout.write(self.style.SUCCESS(f"   Speed-up:    {row_seconds / columnar_seconds:10.1f}x (identical results)"))
+
+    def synthetic_rows(self, count, rng):
+        """Responses shaped like an uploaded spreadsheet: mixed date formats, blanks and free-text comments"""
+        keywords = POSITIVE_WORDS + NEGATIVE_WORDS
+        first_day = date(2023, 1, 1)
+        rows = []
+        for _ in range(count):
+            day = first_day + timedelta(days=rng.randrange(730))
+            submitted = rng.choice([
+                day.strftime('%d/%m/%Y'), day.isoformat(), f"{day.isoformat()} 09:30:00",
+                day, '', 'TBC',
+            ])
+            row = {
+                'rating': rng.choice([str(rng.randint(0, 10)), f" {rng.uniform(0, 10):.1f} ", '', 'n/a', '11']),
+                'score': rng.choice([rng.randint(1, 5), None]),
+                'category': rng.choice(CATEGORIES),
+                'comment': ' '.join(
+                    rng.choice(keywords if rng.random() < KEYWORD_SHARE else FILLER) for _ in range(rng.randint(0, 60))
+                ),
+                'date': submitted,
+            }
+            if rng.random() < 0.3:
+                row['notes'] = rng.choice(['Good value', 'Poor communication', 'Chased twice'])
+            rows.append(row)
+        return rows
+
@@ -0,0 +1,54 @@
+# feedback/management/commands/process_feedback_uploads.py
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from feedback.processing import STALE_AFTER, process_queue, remove_finished_uploads, requeue_stale_runs
+
+class Command(BaseCommand):
+    help = 'Analyse queued feedback uploads - run with --loop as an always-on task, or on a schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling the queue instead of exiting once it is empty'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between queue polls with --loop (default 5)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Process at most this many runs per poll'
+        )
+        parser.add_argument(
+            '--stale-minutes',
+            type=int,
+            default=int(STALE_AFTER.total_seconds() // 60),
+            help='Requeue runs still processing after this many minutes (default %(default)s)'
+        )
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes'])
+        removed = remove_finished_uploads()
+        if removed:
+            self.stdout.write(f"🧹 Removed the uploads of {removed} finished runs")
+
+        while True:
+            close_old_connections()
+            requeued = requeue_stale_runs(stale_after)
+            if requeued:
+                self.stdout.write(self.style.WARNING(f"⚠️ Requeued {requeued} stale runs"))
+
+            processed = process_queue(limit=options['limit'])
+            if processed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f"✅ Processed {processed} feedback uploads"))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
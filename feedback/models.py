@@ -1,4 +1,6 @@
 # feedback/models.py
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from projects.models import Project
@@ -45,4 +47,53 @@ class SubcontractorFeedback(models.Model):
         self.status = 'FAILED'
         if error_message:
             self.email_body += f"\n\nError: {error_message}"
-        self.save(update_fields=['status', 'email_body'])
\ No newline at end of file
+        self.save(update_fields=['status', 'email_body'])
+
+
+class FeedbackAnalysisRun(models.Model):
+    """An uploaded feedback file, queued for analysis by the process_feedback_uploads worker"""
+
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('PROCESSING', 'Processing'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='feedback_analysis_runs'
+    )
+    upload = models.FileField(upload_to='feedback_uploads/%Y/%m/')
+    original_filename = models.CharField(max_length=255)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    stage = models.CharField(max_length=100, blank=True, help_text="What the worker is doing now")
+    error = models.TextField(blank=True)
+
+    total_responses = models.PositiveIntegerField(default=0)
+    results = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, help_text="FeedbackAnalysisService output")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's queue scan
+            models.Index(fields=['status', 'created_at'], name='feedback_run_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.original_filename} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('COMPLETED', 'FAILED')
+
+    def set_progress(self, progress, stage):
+        """Record progress with a single UPDATE, so pages polling the run see it straight away"""
+        self.progress = progress
+        self.stage = stage
+        FeedbackAnalysisRun.objects.filter(pk=self.pk).update(progress=progress, stage=stage)
@@ -0,0 +1,127 @@
+# feedback/processing.py
+# Uploaded feedback files are analysed off the request by the process_feedback_uploads worker
+
+import logging
+import os
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import FeedbackAnalysisRun
+from .services import FeedbackAnalysisService
+
+logger = logging.getLogger(__name__)
+
+# A run still PROCESSING after this long lost its worker
+STALE_AFTER = timedelta(minutes=30)
+
+FINISHED_STATUSES = ('COMPLETED', 'FAILED')
+
+
+def enqueue_upload(uploaded_file, user=None):
+    """Write an uploaded feedback file to storage and queue it for analysis"""
+    filename = os.path.basename(uploaded_file.name)
+    run = FeedbackAnalysisRun(
+        uploaded_by=user if user is not None and user.is_authenticated else None,
+        original_filename=filename[:255],
+        stage='Waiting for the analysis worker',
+    )
+    run.upload.save(filename, uploaded_file, save=False)
+    run.save()
+    logger.info(f"📥 Queued feedback upload {filename} as run {run.pk}")
+    return run
+
+
+def claim_next_run():
+    """
+    Oldest queued run, switched to PROCESSING.
+    The switch is a conditional UPDATE, so two workers never claim the same run.
+    """
+    while True:
+        run_id = (
+            FeedbackAnalysisRun.objects.filter(status='QUEUED')
+            .order_by('created_at', 'pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if run_id is None:
+            return None
+
+        claimed = FeedbackAnalysisRun.objects.filter(pk=run_id, status='QUEUED').update(
+            status='PROCESSING', started_at=timezone.now(), progress=5, stage='Reading file'
+        )
+        if claimed:
+            return FeedbackAnalysisRun.objects.get(pk=run_id)
+        # Another worker got there first - try the next run
+
+
+def requeue_stale_runs(older_than=STALE_AFTER):
+    """Put runs whose worker stopped mid-analysis back in the queue"""
+    count = FeedbackAnalysisRun.objects.filter(
+        status='PROCESSING', started_at__lt=timezone.now() - older_than
+    ).update(status='QUEUED', progress=0, stage='Requeued after the worker stopped')
+    if count:
+        logger.warning(f"⚠️ Requeued {count} stale feedback analysis runs")
+    return count
+
+
+def process_run(run):
+    """Parse and analyse a claimed run's file, storing the results on the run"""
+    try:
+        with run.upload.open('rb') as handle:
+            analysis = FeedbackAnalysisService.process_file_feedback(
+                handle, run.original_filename, progress=run.set_progress
+            )
+    except Exception as e:
+        analysis = {'error': f'Error processing file: {str(e)}', 'total_responses': 0}
+
+    run.completed_at = timezone.now()
+    run.progress = 100
+    if analysis.get('error') or not analysis.get('total_responses'):
+        run.status = 'FAILED'
+        run.error = analysis.get('error') or 'No data found in file or file format not supported.'
+        run.stage = 'Failed'
+        run.save(update_fields=['status', 'error', 'stage', 'progress', 'completed_at'])
+        logger.error(f"❌ Feedback analysis run {run.pk} failed: {run.error}")
+        discard_upload(run)
+        return run
+
+    run.status = 'COMPLETED'
+    run.results = analysis
+    run.total_responses = analysis['total_responses']
+    run.stage = 'Completed'
+    run.save(update_fields=['status', 'results', 'total_responses', 'stage', 'progress', 'completed_at'])
+    logger.info(f"✅ Feedback analysis run {run.pk}: {run.total_responses} responses from {run.original_filename}")
+    discard_upload(run)
+    return run
+
+
+def discard_upload(run):
+    """Delete a finished run's uploaded file - the results (or error) are kept on the run"""
+    if run.upload:
+        run.upload.delete(save=False)
+        FeedbackAnalysisRun.objects.filter(pk=run.pk).update(upload='')
+
+
+def remove_finished_uploads():
+    """Delete files still stored for finished runs, e.g. a worker stopped before discarding them"""
+    runs = FeedbackAnalysisRun.objects.filter(status__in=FINISHED_STATUSES).exclude(upload='').only('pk', 'upload')
+    count = 0
+    for run in runs.iterator():
+        discard_upload(run)
+        count += 1
+    if count:
+        logger.info(f"🧹 Removed the uploads of {count} finished feedback analysis runs")
+    return count
+
+
+def process_queue(limit=None):
+    """Process queued runs oldest first until the queue is empty or limit runs are done"""
+    processed = 0
+    while limit is None or processed < limit:
+        run = claim_next_run()
+        if run is None:
+            break
+        process_run(run)
+        processed += 1
+    return processed
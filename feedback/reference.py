@@ -0,0 +1,166 @@
+# feedback/reference.py
+# Row-by-row feedback analysis, as FeedbackAnalysisService ran before feedback.analytics
+
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from .analytics import NEGATIVE_WORDS, POSITIVE_WORDS
+
+
+class RowByRowAnalysis:
+    """The analysis as it ran before the columnar engine, kept as the baseline for the benchmark and tests"""
+
+    @staticmethod
+    def process_feedback_data(data_list):
+        if not data_list:
+            return {
+                'total_responses': 0,
+                'summary': 'No data to analyze',
+                'analysis': {}
+            }
+
+        return {
+            'total_responses': len(data_list),
+            'rating_analysis': RowByRowAnalysis._analyze_ratings(data_list),
+            'category_analysis': RowByRowAnalysis._analyze_categories(data_list),
+            'sentiment_analysis': RowByRowAnalysis._analyze_sentiment(data_list),
+            'response_trends': RowByRowAnalysis._analyze_trends(data_list)
+        }
+
+    @staticmethod
+    def _analyze_ratings(data_list):
+        ratings = []
+        rating_fields = ['rating', 'score', 'satisfaction', 'stars', 'overall_rating']
+
+        for item in data_list:
+            for field in rating_fields:
+                if field in item and item[field] is not None:
+                    try:
+                        rating_str = str(item[field]).strip()
+                        rating = float(rating_str)
+                        if 0 <= rating <= 10:
+                            ratings.append(rating)
+                            break
+                    except (ValueError, TypeError):
+                        continue
+
+        if not ratings:
+            return {'count': 0, 'average': 0, 'distribution': {}}
+
+        distribution = Counter()
+        for rating in ratings:
+            rounded = int(round(rating))
+            distribution[rounded] += 1
+
+        return {
+            'count': len(ratings),
+            'average': round(sum(ratings) / len(ratings), 2),
+            'min': min(ratings),
+            'max': max(ratings),
+            'distribution': dict(distribution)
+        }
+
+    @staticmethod
+    def _analyze_categories(data_list):
+        categories = defaultdict(list)
+        category_fields = ['category', 'type', 'department', 'topic', 'subject']
+
+        for item in data_list:
+            category = 'uncategorized'
+            for field in category_fields:
+                if field in item and item[field]:
+                    category = str(item[field]).lower().strip()
+                    break
+
+            categories[category].append(item)
+
+        analysis = {}
+        total_items = len(data_list)
+        for category, items in categories.items():
+            analysis[category] = {
+                'count': len(items),
+                'percentage': round((len(items) / total_items) * 100, 1) if total_items > 0 else 0
+            }
+
+        return analysis
+
+    @staticmethod
+    def _analyze_sentiment(data_list):
+        sentiment_scores = {'positive': 0, 'negative': 0, 'neutral': 0}
+
+        comment_fields = ['comment', 'feedback', 'review', 'text', 'message', 'notes', 'description']
+
+        for item in data_list:
+            comment = ''
+            for field in comment_fields:
+                if field in item and item[field]:
+                    comment = str(item[field]).lower()
+                    break
+
+            if not comment:
+                sentiment_scores['neutral'] += 1
+                continue
+
+            positive_count = sum(1 for word in POSITIVE_WORDS if word in comment)
+            negative_count = sum(1 for word in NEGATIVE_WORDS if word in comment)
+
+            if positive_count > negative_count:
+                sentiment_scores['positive'] += 1
+            elif negative_count > positive_count:
+                sentiment_scores['negative'] += 1
+            else:
+                sentiment_scores['neutral'] += 1
+
+        total = sum(sentiment_scores.values())
+        if total > 0:
+            for key in sentiment_scores:
+                sentiment_scores[key] = round((sentiment_scores[key] / total) * 100, 1)
+
+        return sentiment_scores
+
+    @staticmethod
+    def _analyze_trends(data_list):
+        date_fields = ['date', 'created_at', 'timestamp', 'submitted_on', 'date_submitted']
+        dated_items = []
+
+        for item in data_list:
+            item_date = None
+            for field in date_fields:
+                if field in item and item[field]:
+                    try:
+                        if isinstance(item[field], (datetime, date)):
+                            item_date = item[field] if isinstance(item[field], date) else item[field].date()
+                        elif isinstance(item[field], str):
+                            date_str = str(item[field]).strip()
+                            for fmt in ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']:
+                                try:
+                                    item_date = datetime.strptime(date_str, fmt).date()
+                                    break
+                                except ValueError:
+                                    continue
+                        break
+                    except (ValueError, TypeError):
+                        continue
+
+            if item_date:
+                dated_items.append((item_date, item))
+
+        if not dated_items:
+            return {'has_date_data': False, 'message': 'No date information found'}
+
+        dated_items.sort(key=lambda x: x[0])
+
+        monthly_counts = defaultdict(int)
+        for item_date, item in dated_items:
+            month_key = f"{item_date.year}-{item_date.month:02d}"
+            monthly_counts[month_key] += 1
+
+        return {
+            'has_date_data': True,
+            'date_range': {
+                'start': dated_items[0][0].isoformat(),
+                'end': dated_items[-1][0].isoformat()
+            },
+            'monthly_distribution': dict(monthly_counts),
+            'total_with_dates': len(dated_items)
+        }
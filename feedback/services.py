@@ -1,16 +1,18 @@
 # feedback/services.py
-# Pure Python implementation - no external dependencies except xlrd
+# Analysis runs column-at-a-time on NumPy arrays, see analytics.py
 
 import csv
 import json
 import logging
-from collections import Counter, defaultdict
-from datetime import datetime, date
+from datetime import datetime
+
+from . import analytics
+from .analytics import FeedbackColumns
 
 logger = logging.getLogger(__name__)
 
 class FeedbackAnalysisService:
-    """Service for analyzing feedback data - pure Python implementation"""
+    """Service for analyzing feedback data"""
     
     @staticmethod
     def process_feedback_data(data_list):
@@ -22,12 +24,14 @@ class FeedbackAnalysisService:
                 'analysis': {}
             }
         
+        # Each field is pulled out of the rows once and shared by the analyses
+        columns = FeedbackColumns(data_list)
         analysis = {
             'total_responses': len(data_list),
-            'rating_analysis': FeedbackAnalysisService._analyze_ratings(data_list),
-            'category_analysis': FeedbackAnalysisService._analyze_categories(data_list),
-            'sentiment_analysis': FeedbackAnalysisService._analyze_sentiment(data_list),
-            'response_trends': FeedbackAnalysisService._analyze_trends(data_list)
+            'rating_analysis': FeedbackAnalysisService._analyze_ratings(columns),
+            'category_analysis': FeedbackAnalysisService._analyze_categories(columns),
+            'sentiment_analysis': FeedbackAnalysisService._analyze_sentiment(columns),
+            'response_trends': FeedbackAnalysisService._analyze_trends(columns)
         }
         
         return analysis
@@ -35,161 +39,22 @@ class FeedbackAnalysisService:
     @staticmethod
     def _analyze_ratings(data_list):
         """Analyze rating data"""
-        ratings = []
-        rating_fields = ['rating', 'score', 'satisfaction', 'stars', 'overall_rating']
-        
-        for item in data_list:
-            for field in rating_fields:
-                if field in item and item[field] is not None:
-                    try:
-                        rating_str = str(item[field]).strip()
-                        rating = float(rating_str)
-                        if 0 <= rating <= 10:  # Assume 0-10 scale
-                            ratings.append(rating)
-                            break
-                    except (ValueError, TypeError):
-                        continue
-        
-        if not ratings:
-            return {'count': 0, 'average': 0, 'distribution': {}}
-        
-        # Calculate distribution (group by whole numbers)
-        distribution = Counter()
-        for rating in ratings:
-            rounded = int(round(rating))
-            distribution[rounded] += 1
-        
-        return {
-            'count': len(ratings),
-            'average': round(sum(ratings) / len(ratings), 2),
-            'min': min(ratings),
-            'max': max(ratings),
-            'distribution': dict(distribution)
-        }
+        return analytics.rating_summary(FeedbackColumns.wrap(data_list))
     
     @staticmethod
     def _analyze_categories(data_list):
         """Analyze feedback by categories"""
-        categories = defaultdict(list)
-        category_fields = ['category', 'type', 'department', 'topic', 'subject']
-        
-        for item in data_list:
-            category = 'uncategorized'
-            for field in category_fields:
-                if field in item and item[field]:
-                    category = str(item[field]).lower().strip()
-                    break
-            
-            categories[category].append(item)
-        
-        # Calculate statistics for each category
-        analysis = {}
-        total_items = len(data_list)
-        for category, items in categories.items():
-            analysis[category] = {
-                'count': len(items),
-                'percentage': round((len(items) / total_items) * 100, 1) if total_items > 0 else 0
-            }
-        
-        return analysis
+        return analytics.category_summary(FeedbackColumns.wrap(data_list))
     
     @staticmethod
     def _analyze_sentiment(data_list):
         """Basic sentiment analysis based on keywords"""
-        positive_words = [
-            'good', 'great', 'excellent', 'amazing', 'love', 'perfect', 'fantastic', 
-            'wonderful', 'awesome', 'brilliant', 'outstanding', 'superb', 'satisfied',
-            'happy', 'pleased', 'impressed', 'recommend'
-        ]
-        negative_words = [
-            'bad', 'terrible', 'awful', 'hate', 'horrible', 'disappointing', 'poor', 
-            'worst', 'dissatisfied', 'angry', 'frustrated', 'annoyed', 'upset',
-            'complaint', 'problem', 'issue', 'wrong'
-        ]
-        
-        sentiment_scores = {'positive': 0, 'negative': 0, 'neutral': 0}
-        
-        comment_fields = ['comment', 'feedback', 'review', 'text', 'message', 'notes', 'description']
-        
-        for item in data_list:
-            comment = ''
-            for field in comment_fields:
-                if field in item and item[field]:
-                    comment = str(item[field]).lower()
-                    break
-            
-            if not comment:
-                sentiment_scores['neutral'] += 1
-                continue
-            
-            positive_count = sum(1 for word in positive_words if word in comment)
-            negative_count = sum(1 for word in negative_words if word in comment)
-            
-            if positive_count > negative_count:
-                sentiment_scores['positive'] += 1
-            elif negative_count > positive_count:
-                sentiment_scores['negative'] += 1
-            else:
-                sentiment_scores['neutral'] += 1
-        
-        # Convert to percentages
-        total = sum(sentiment_scores.values())
-        if total > 0:
-            for key in sentiment_scores:
-                sentiment_scores[key] = round((sentiment_scores[key] / total) * 100, 1)
-        
-        return sentiment_scores
+        return analytics.sentiment_summary(FeedbackColumns.wrap(data_list))
     
     @staticmethod
     def _analyze_trends(data_list):
         """Analyze trends over time if date fields are available"""
-        date_fields = ['date', 'created_at', 'timestamp', 'submitted_on', 'date_submitted']
-        dated_items = []
-        
-        for item in data_list:
-            item_date = None
-            for field in date_fields:
-                if field in item and item[field]:
-                    try:
-                        if isinstance(item[field], (datetime, date)):
-                            item_date = item[field] if isinstance(item[field], date) else item[field].date()
-                        elif isinstance(item[field], str):
-                            # Try to parse common date formats
-                            date_str = str(item[field]).strip()
-                            for fmt in ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d-%m-%Y']:
-                                try:
-                                    item_date = datetime.strptime(date_str, fmt).date()
-                                    break
-                                except ValueError:
-                                    continue
-                        break
-                    except (ValueError, TypeError):
-                        continue
-            
-            if item_date:
-                dated_items.append((item_date, item))
-        
-        if not dated_items:
-            return {'has_date_data': False, 'message': 'No date information found'}
-        
-        # Sort by date
-        dated_items.sort(key=lambda x: x[0])
-        
-        # Group by month
-        monthly_counts = defaultdict(int)
-        for item_date, item in dated_items:
-            month_key = f"{item_date.year}-{item_date.month:02d}"
-            monthly_counts[month_key] += 1
-        
-        return {
-            'has_date_data': True,
-            'date_range': {
-                'start': dated_items[0][0].isoformat(),
-                'end': dated_items[-1][0].isoformat()
-            },
-            'monthly_distribution': dict(monthly_counts),
-            'total_with_dates': len(dated_items)
-        }
+        return analytics.trend_summary(FeedbackColumns.wrap(data_list))
     
     @staticmethod
     def export_analysis_to_csv(analysis_data, output_path):
@@ -243,8 +108,11 @@ class FeedbackAnalysisService:
             return False
     
     @staticmethod
-    def process_file_feedback(file_path_or_content, filename=''):
-        """Process feedback from any supported file format"""
+    def process_file_feedback(file_path_or_content, filename='', progress=None):
+        """
+        Process feedback from any supported file format.
+        progress, if given, is called with (percent, stage) once the file has been parsed.
+        """
         try:
             # Import here to avoid circular imports
             from .excel_parser import parse_uploaded_file, parse_excel_file
@@ -260,6 +128,8 @@ class FeedbackAnalysisService:
                     'total_responses': 0
                 }
             
+            if progress:
+                progress(50, f"Analysing {len(data)} responses")
             analysis = FeedbackAnalysisService.process_feedback_data(data)
             
             # Add file-specific metadata
@@ -0,0 +1,367 @@
+import io
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+import xlrd
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .excel_parser import XLS_SIGNATURE, CSVParser, ExcelParser, sniff_format
+from .models import FeedbackAnalysisRun
+from .processing import claim_next_run, enqueue_upload, process_queue, process_run, requeue_stale_runs
+from .reference import RowByRowAnalysis
+from .services import FeedbackAnalysisService
+
+
+def xlsx_bytes(rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+class FakeSheet:
+    """The parts of an xlrd sheet the parser reads, cells given as (type, value)"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.nrows = len(rows)
+
+    def row_values(self, row):
+        return [value for _, value in self.rows[row]]
+
+    def row_types(self, row):
+        return [cell_type for cell_type, _ in self.rows[row]]
+
+
+class FakeBook:
+
+    datemode = 0
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self.released = False
+
+    def sheet_by_index(self, index):
+        return self.sheet
+
+    def release_resources(self):
+        self.released = True
+
+
+class ExcelParserTests(SimpleTestCase):
+    """Streaming xls, xlsx and csv parsing into column storage"""
+
+    def load(self, content, parser_class=ExcelParser):
+        parser = parser_class(file_content=content)
+        self.assertTrue(parser.load_file())
+        return parser
+
+    def test_format_is_sniffed_from_the_first_bytes(self):
+        self.assertEqual(sniff_format(XLS_SIGNATURE + b'\x00' * 4), 'xls')
+        self.assertEqual(sniff_format(xlsx_bytes([['Name']])[:8]), 'xlsx')
+        self.assertEqual(sniff_format(b'Name,Score'), 'csv')
+        self.assertEqual(sniff_format('Name,Score'), 'csv')
+
+    def test_csv_round_trip(self):
+        content = '\ufeff Name ,Score,\nAcme Ltd , 4 ,\n,,\nBeta Builders,5,extra,fields\nGamma\n'.encode('utf-8')
+        parser = self.load(content)
+
+        expected = [
+            {'Name': 'Acme Ltd', 'Score': '4', 'Column_2': None},
+            {'Name': 'Beta Builders', 'Score': '5', 'Column_2': 'extra'},
+            {'Name': 'Gamma', 'Score': None, 'Column_2': None},
+        ]
+        self.assertEqual(parser.get_headers(), ['Name', 'Score', 'Column_2'])
+        self.assertEqual(parser.get_data_as_list(), expected)
+        self.assertEqual(list(ExcelParser(file_content=content).iter_rows()), expected)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'export.csv')
+            self.assertTrue(parser.export_to_csv(path))
+            reloaded = ExcelParser(file_path=path)
+            self.assertTrue(reloaded.load_file())
+
+        self.assertEqual(reloaded.get_data_as_list(), expected)
+
+    def test_xlsx_round_trip(self):
+        content = xlsx_bytes([
+            ['Name', 'Returned', None, 'Score'],
+            ['Acme Ltd', datetime(2024, 3, 1, 9, 30), 'x', 4],
+            [None, None, None, None],
+            ['Beta Builders', date(2024, 4, 2), None, 5.5],
+        ])
+        parser = self.load(content)
+
+        self.assertEqual(parser.get_headers(), ['Name', 'Returned', 'Column_2', 'Score'])
+        self.assertEqual(parser.get_data_as_list(), [
+            {'Name': 'Acme Ltd', 'Returned': '2024-03-01', 'Column_2': 'x', 'Score': 4},
+            {'Name': 'Beta Builders', 'Returned': '2024-04-02', 'Column_2': None, 'Score': 5.5},
+        ])
+        self.assertEqual(parser.get_column_type('Returned'), 'date')
+        self.assertEqual(parser.get_column_type('Name'), 'text')
+        self.assertEqual(parser.get_column_type('Score'), 'number')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'feedback.xlsx')
+            with open(path, 'wb') as handle:
+                handle.write(content)
+            from_path = ExcelParser(file_path=path)
+            self.assertTrue(from_path.load_file())
+
+        self.assertEqual(from_path.get_data_as_list(), parser.get_data_as_list())
+
+    def test_xls_rows(self):
+        returned = xlrd.xldate.xldate_from_date_tuple((2024, 3, 1), 0)
+        book = FakeBook(FakeSheet([
+            [(xlrd.XL_CELL_TEXT, 'Name'), (xlrd.XL_CELL_TEXT, 'Returned'), (xlrd.XL_CELL_TEXT, 'Score')],
+            [(xlrd.XL_CELL_TEXT, ' Acme Ltd '), (xlrd.XL_CELL_DATE, returned), (xlrd.XL_CELL_NUMBER, 4.0)],
+            [(xlrd.XL_CELL_EMPTY, ''), (xlrd.XL_CELL_EMPTY, ''), (xlrd.XL_CELL_EMPTY, '')],
+            [(xlrd.XL_CELL_TEXT, 'Beta Builders'), (xlrd.XL_CELL_EMPTY, ''), (xlrd.XL_CELL_NUMBER, 5.0)],
+        ]))
+        content = XLS_SIGNATURE + b'\x00' * 12
+
+        with mock.patch('feedback.excel_parser.xlrd.open_workbook', return_value=book) as open_workbook:
+            parser = self.load(content)
+
+        open_workbook.assert_called_once_with(file_contents=content, on_demand=True)
+        self.assertTrue(book.released)
+        self.assertEqual(parser.get_data_as_list(), [
+            {'Name': 'Acme Ltd', 'Returned': '2024-03-01', 'Score': 4.0},
+            {'Name': 'Beta Builders', 'Returned': None, 'Score': 5.0},
+        ])
+        self.assertEqual(parser.get_column_type('Returned'), 'date')
+
+    def test_duplicate_headers_refer_to_the_last_column(self):
+        parser = self.load(b'Name,Score,Name\nAcme Ltd,4,Acme Holdings\nBeta Builders,5,Beta Group\n')
+
+        self.assertEqual(parser.get_data_as_list()[0], {'Name': 'Acme Holdings', 'Score': '4'})
+        self.assertEqual(parser.get_column_values('Name'), ['Acme Holdings', 'Beta Group'])
+        self.assertEqual(parser.filter_data('Name', 'Beta Group'), [{'Name': 'Beta Group', 'Score': '5'}])
+        self.assertEqual(parser.filter_data('Name', 'Beta Builders'), [])
+
+    def test_filter_data_builds_the_index_on_first_use(self):
+        parser = self.load(b'Name,Trade\nAcme Ltd,Roofing\nBeta Builders,Groundworks\nGamma,Roofing\nDelta,\n')
+        self.assertEqual(parser._indexes, {})
+
+        self.assertEqual(parser.filter_data('Trade', 'Roofing'), [
+            {'Name': 'Acme Ltd', 'Trade': 'Roofing'},
+            {'Name': 'Gamma', 'Trade': 'Roofing'},
+        ])
+        self.assertEqual(list(parser._indexes), ['Trade'])
+        self.assertEqual(parser.filter_data('Trade', None), [{'Name': 'Delta', 'Trade': None}])
+        self.assertEqual(parser.filter_data('Trade', 'Plumbing'), [])
+        self.assertEqual(parser.filter_data('Trade', ['Roofing']), [])
+        # A column the sheet lacks is None on every row
+        self.assertEqual(len(parser.filter_data('Region', None)), 4)
+        self.assertEqual(parser.filter_data('Region', 'Yorkshire'), [])
+
+    def test_unique_values_and_counts_in_order_of_first_appearance(self):
+        parser = self.load(b'Trade\nRoofing\nGroundworks\nRoofing\n\nScaffolding\nGroundworks\nRoofing\n')
+
+        self.assertEqual(parser.get_unique_values('Trade'), ['Roofing', 'Groundworks', 'Scaffolding'])
+        self.assertEqual(list(parser.count_by_column('Trade').items()), [
+            ('Roofing', 3), ('Groundworks', 2), ('Scaffolding', 1),
+        ])
+
+    def test_csv_parser_keeps_headers_and_values_as_written(self):
+        parser = self.load(b' Name ,Score\n Acme Ltd ,\n\nBeta Builders\nGamma,5,extra\n', CSVParser)
+
+        self.assertEqual(parser.get_headers(), [' Name ', 'Score'])
+        self.assertEqual(parser.get_data_as_list(), [
+            {' Name ': ' Acme Ltd ', 'Score': ''},
+            {' Name ': 'Beta Builders', 'Score': None},
+            {' Name ': 'Gamma', 'Score': '5'},
+        ])
+
+
+class FeedbackAnalysisEquivalenceTests(SimpleTestCase):
+    """Columnar feedback analysis matches the row-by-row reference it replaced"""
+
+    ROWS = [
+        # Out-of-range and unparseable ratings fall through to the next rating field
+        {'rating': '11', 'score': 4, 'category': ' Roofing ', 'comment': 'Très bon, excellent service', 'date': '01/02/2024'},
+        {'rating': '-1', 'score': None, 'stars': '3', 'category': 'roofing', 'comment': 'dissatisfied', 'date': date(2024, 3, 5)},
+        {'rating': 'n/a', 'score': 2, 'category': '', 'type': 'M&E', 'comment': 'Dissatisfied and frustrated', 'date': ' 2024-03-20 '},
+        {'rating': 'nan', 'score': '5', 'comment': 'satisfied', 'date': '2024-01-31 09:30:00'},
+        {'rating': ' 7.5 ', 'category': 'Groundworks', 'comment': 'good\x00bad', 'date': '31-12-2023'},
+        {'rating': '', 'overall_rating': 6.5, 'comment': 'sat\x00isfied, good price \x00 but the drawings were poor', 'date': 'TBC'},
+        {'rating': '10', 'comment': '👍 GREAT – İMPRESSED, gréat', 'notes': 'Poor communication', 'date': ''},
+        {'rating': 0, 'comment': '', 'notes': 'Good value', 'created_at': '13/01/2024'},
+        {'rating': 'inf', 'comment': None, 'feedback': 'problème with the programme', 'date': None},
+        {'comment': 42, 'submitted_on': date(2023, 11, 30)},
+        {},
+    ]
+
+    def assertSameAnalysis(self, rows):
+        reference = RowByRowAnalysis.process_feedback_data(rows)
+        columnar = FeedbackAnalysisService.process_feedback_data(rows)
+        self.assertEqual(list(columnar), list(reference))
+        for section in reference:
+            # repr() also catches differences in key order and value types
+            self.assertEqual(repr(columnar[section]), repr(reference[section]), section)
+        return columnar
+
+    def test_mixed_rows(self):
+        analysis = self.assertSameAnalysis(self.ROWS)
+
+        self.assertEqual(analysis['rating_analysis']['count'], 8)
+        self.assertEqual(analysis['sentiment_analysis'], {'positive': 36.4, 'negative': 9.1, 'neutral': 54.5})
+        self.assertTrue(analysis['response_trends']['has_date_data'])
+
+    def test_empty_input(self):
+        analysis = self.assertSameAnalysis([])
+
+        self.assertEqual(analysis, {'total_responses': 0, 'summary': 'No data to analyze', 'analysis': {}})
+
+    def test_datetime_values(self):
+        rows = [
+            {'date': datetime(2024, 3, 1, 9, 30)},
+            {'date': datetime(2024, 1, 15)},
+            {'date': 'TBC'},
+            {'date': ''},
+        ]
+        analysis = self.assertSameAnalysis(rows)
+
+        self.assertEqual(analysis['response_trends']['date_range'], {
+            'start': '2024-01-15T00:00:00', 'end': '2024-03-01T09:30:00',
+        })
+
+    def test_datetime_and_date_values_cannot_be_ordered(self):
+        rows = [{'date': datetime(2024, 3, 1, 9, 30)}, {'date': date(2024, 2, 1)}, {'date': '2024-01-05'}]
+
+        with self.assertRaises(TypeError):
+            RowByRowAnalysis.process_feedback_data(rows)
+        with self.assertRaises(TypeError):
+            FeedbackAnalysisService.process_feedback_data(rows)
+
+
+class FeedbackProcessingTests(TestCase):
+    """Uploads queued as FeedbackAnalysisRun rows and analysed by the process_feedback_uploads worker"""
+
+    CSV = b'Company,Rating,Comment\nAcme Ltd,8,Excellent service\nBeta Builders,4,Poor drawings\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('analyst', password='password')
+        cls.other_user = get_user_model().objects.create_user('other analyst', password='password')
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def enqueue(self, content=CSV, name='feedback.csv', user=None):
+        return enqueue_upload(SimpleUploadedFile(name, content), user or self.user)
+
+    def test_upload_is_queued_then_completed(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('feedback:upload'), {'feedback_file': SimpleUploadedFile('feedback.csv', self.CSV)}
+        )
+        self.assertRedirects(response, reverse('feedback:results'), fetch_redirect_response=False)
+
+        run = FeedbackAnalysisRun.objects.get()
+        self.assertEqual((run.status, run.uploaded_by, run.original_filename), ('QUEUED', self.user, 'feedback.csv'))
+        upload_name = run.upload.name
+        self.assertTrue(upload_name.startswith('feedback_uploads/'))
+        self.assertTrue(default_storage.exists(upload_name))
+        self.assertTemplateUsed(self.client.get(reverse('feedback:results')), 'feedback/run_status.html')
+
+        self.assertEqual(process_queue(), 1)
+
+        run.refresh_from_db()
+        self.assertEqual((run.status, run.progress, run.stage, run.total_responses), ('COMPLETED', 100, 'Completed', 2))
+        self.assertEqual(run.results['total_responses'], 2)
+        self.assertIsNotNone(run.completed_at)
+        # The results are on the run, so the file is no longer kept
+        self.assertEqual(run.upload.name, '')
+        self.assertFalse(default_storage.exists(upload_name))
+        self.assertTemplateUsed(self.client.get(reverse('feedback:results')), 'feedback/results.html')
+        self.assertIsNone(claim_next_run())
+
+    def test_runs_are_claimed_once_oldest_first(self):
+        first, second = self.enqueue(), self.enqueue()
+        FeedbackAnalysisRun.objects.filter(pk=second.pk).update(created_at=first.created_at - timedelta(minutes=1))
+
+        claimed = claim_next_run()
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual((claimed.status, claimed.stage), ('PROCESSING', 'Reading file'))
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(claim_next_run().pk, first.pk)
+        self.assertIsNone(claim_next_run())
+
+    def test_failed_files(self):
+        for content, error in [
+            (b'Company,Rating\n', 'Could not parse file or file is empty'),
+            (self.CSV, 'Error processing file: disk error'),
+        ]:
+            with self.subTest(error=error):
+                run = self.enqueue(content)
+                upload_name = run.upload.name
+                with mock.patch.object(
+                    FeedbackAnalysisService, 'process_feedback_data', side_effect=OSError('disk error')
+                ):
+                    process_run(claim_next_run())
+
+                run.refresh_from_db()
+                self.assertEqual((run.status, run.stage, run.progress), ('FAILED', 'Failed', 100))
+                self.assertEqual(run.error, error)
+                self.assertIsNone(run.results)
+                self.assertFalse(default_storage.exists(upload_name))
+
+    def test_stale_runs_are_requeued(self):
+        stale, busy = self.enqueue(), self.enqueue()
+        claim_next_run(), claim_next_run()
+        FeedbackAnalysisRun.objects.filter(pk=stale.pk).update(started_at=timezone.now() - timedelta(minutes=31))
+
+        self.assertEqual(requeue_stale_runs(), 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.progress), ('QUEUED', 0))
+        self.assertEqual(FeedbackAnalysisRun.objects.get(pk=busy.pk).status, 'PROCESSING')
+
+        # The file is still there for the next worker
+        self.assertEqual(process_queue(), 1)
+        self.assertEqual(FeedbackAnalysisRun.objects.get(pk=stale.pk).status, 'COMPLETED')
+
+    def test_worker_removes_uploads_left_by_finished_runs(self):
+        finished, queued = self.enqueue(), self.enqueue()
+        FeedbackAnalysisRun.objects.filter(pk=finished.pk).update(status='COMPLETED', completed_at=timezone.now())
+        self.enqueue(user=self.other_user)
+
+        out = io.StringIO()
+        # Closing the connection would end the test's transaction
+        with mock.patch('feedback.management.commands.process_feedback_uploads.close_old_connections'):
+            call_command('process_feedback_uploads', stdout=out)
+
+        self.assertIn('Removed the uploads of 1 finished runs', out.getvalue())
+        self.assertIn('Processed 2 feedback uploads', out.getvalue())
+        self.assertFalse(default_storage.exists(finished.upload.name))
+        self.assertFalse(default_storage.exists(queued.upload.name))
+        self.assertFalse(FeedbackAnalysisRun.objects.exclude(upload='').exists())
+
+    def test_run_status_is_only_shown_to_the_uploader(self):
+        run = self.enqueue()
+        url = reverse('feedback:run_status', args=[run.pk])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).json(), {
+            'status': 'QUEUED', 'progress': 0, 'stage': 'Waiting for the analysis worker', 'error': '',
+            'total_responses': 0, 'finished': False,
+        })
+
+        self.client.force_login(self.other_user)
+        self.assertEqual(self.client.get(url).status_code, 404)
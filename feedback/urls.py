@@ -9,6 +9,7 @@ urlpatterns = [
     path('', views.feedback_dashboard, name='dashboard'),
     path('upload/', views.upload_feedback_file, name='upload'),
     path('results/', views.feedback_results, name='results'),
+    path('runs/<int:run_id>/status/', views.run_status, name='run_status'),
     path('export/', views.export_analysis, name='export'),
     path('download/<str:format_type>/', views.download_report, name='download_report'),
     path('clear/', views.clear_analysis, name='clear'),
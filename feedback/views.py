@@ -1,7 +1,7 @@
 # feedback/views.py
 # Fixed imports to match the new service class names
 
-from django.shortcuts import render, redirect
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse, HttpResponse
@@ -16,9 +16,28 @@ import os
 # FIXED: Import the correct class names
 from .services import FeedbackAnalysisService, FeedbackReportGenerator
 from .excel_parser import parse_uploaded_file, analyze_feedback_file
+from .models import FeedbackAnalysisRun
+from .processing import enqueue_upload
 
 logger = logging.getLogger(__name__)
 
+def _current_run(request, with_results=False):
+    """The analysis run this session last uploaded, None if there is none"""
+    run_id = request.session.get('feedback_run_id')
+    if not run_id:
+        return None
+    runs = FeedbackAnalysisRun.objects.filter(pk=run_id, uploaded_by=request.user)
+    if not with_results:
+        runs = runs.defer('results')
+    return runs.first()
+
+def _completed_analysis(request):
+    """Results of the session's run once it has completed"""
+    run = _current_run(request, with_results=True)
+    if run is None or run.status != 'COMPLETED':
+        return None
+    return run.results
+
 @login_required
 def feedback_dashboard(request):
     """Main feedback dashboard"""
@@ -43,18 +62,12 @@ def upload_feedback_file(request):
             return redirect('feedback:dashboard')
         
         try:
-            # Process the file using our updated service
-            analysis = FeedbackAnalysisService.process_file_feedback(file, file.name)
-            
-            if analysis and analysis.get('total_responses', 0) > 0:
-                # Store analysis in session for display
-                request.session['feedback_analysis'] = analysis
-                messages.success(request, f'Successfully analyzed {analysis["total_responses"]} feedback responses.')
-                return redirect('feedback:results')
-            else:
-                error_msg = analysis.get('error', 'No data found in file or file format not supported.')
-                messages.error(request, f'Could not process file: {error_msg}')
-                return redirect('feedback:dashboard')
+            # Written to disk and analysed by the process_feedback_uploads worker - only the run id goes in the session
+            run = enqueue_upload(file, request.user)
+            request.session['feedback_run_id'] = run.pk
+            request.session.pop('feedback_analysis', None)
+            messages.info(request, f'{run.original_filename} has been queued for analysis.')
+            return redirect('feedback:results')
                 
         except Exception as e:
             logger.error(f"Error processing feedback file: {str(e)}")
@@ -65,13 +78,22 @@ def upload_feedback_file(request):
 
 @login_required
 def feedback_results(request):
-    """Display feedback analysis results"""
-    analysis = request.session.get('feedback_analysis')
+    """Display feedback analysis results, or progress while the upload is being analysed"""
+    run = _current_run(request, with_results=True)
     
-    if not analysis:
+    if not run:
         messages.warning(request, 'No analysis data found. Please upload a file first.')
         return redirect('feedback:dashboard')
     
+    if run.status == 'FAILED':
+        messages.error(request, f'Could not process file: {run.error}')
+        return redirect('feedback:dashboard')
+    
+    if run.status != 'COMPLETED':
+        return render(request, 'feedback/run_status.html', {'run': run})
+    
+    analysis = run.results
+    
     # Generate text report
     try:
         text_report = FeedbackReportGenerator.generate_summary_report(analysis)
@@ -89,10 +111,23 @@ def feedback_results(request):
     
     return render(request, 'feedback/results.html', context)
 
+@login_required
+def run_status(request, run_id):
+    """Progress of an analysis run, polled by the results page while the worker runs"""
+    run = get_object_or_404(FeedbackAnalysisRun.objects.defer('results'), pk=run_id, uploaded_by=request.user)
+    return JsonResponse({
+        'status': run.status,
+        'progress': run.progress,
+        'stage': run.stage,
+        'error': run.error,
+        'total_responses': run.total_responses,
+        'finished': run.is_finished,
+    })
+
 @login_required
 def export_analysis(request):
     """Export analysis results to CSV"""
-    analysis = request.session.get('feedback_analysis')
+    analysis = _completed_analysis(request)
     
     if not analysis:
         messages.error(request, 'No analysis data to export.')
@@ -124,7 +159,7 @@ def export_analysis(request):
 @login_required
 def download_report(request, format_type='text'):
     """Download analysis report in specified format"""
-    analysis = request.session.get('feedback_analysis')
+    analysis = _completed_analysis(request)
     
     if not analysis:
         messages.error(request, 'No analysis data to download.')
@@ -183,8 +218,9 @@ def ajax_analyze_sample(request):
 @login_required
 def clear_analysis(request):
     """Clear stored analysis data"""
-    if 'feedback_analysis' in request.session:
-        del request.session['feedback_analysis']
+    for key in ('feedback_run_id', 'feedback_analysis'):
+        if key in request.session:
+            del request.session[key]
     messages.info(request, 'Analysis data cleared.')
     return redirect('feedback:dashboard')
 
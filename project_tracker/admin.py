@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ProjectStatus, ProjectTracker
+from .models import ProjectAnalyticsSummary, ProjectStatus, ProjectTracker
 
 @admin.register(ProjectStatus)
 class ProjectStatusAdmin(admin.ModelAdmin):
@@ -26,4 +26,14 @@ class ProjectTrackerAdmin(admin.ModelAdmin):
         ('Tender Details', {
             'fields': ('tender_bid_amount', 'margin_percentage', 'key_risks', 'notes')
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(ProjectAnalyticsSummary)
+class ProjectAnalyticsSummaryAdmin(admin.ModelAdmin):
+    list_display = ('dimension', 'key', 'total', 'successful', 'unsuccessful', 'total_value', 'refreshed_at')
+    list_filter = ('dimension',)
+    search_fields = ('key',)
+    readonly_fields = [field.name for field in ProjectAnalyticsSummary._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,148 @@
+# project_tracker/analytics.py
+import logging
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from projects.models import Project
+from .models import ProjectAnalyticsSummary
+
+logger = logging.getLogger(__name__)
+
+# Summary dimension -> grouping expression ({} for the overall totals)
+DIMENSIONS = {
+    'OVERALL': {},
+    'STATUS': {'group': F('status')},
+    'LOCATION': {'group': F('location')},
+    'MONTH': {'group': TruncMonth('tender_deadline')},
+    'ESTIMATOR': {'group': F('estimator')},
+}
+
+SUCCESSFUL = Q(status='SUCCESSFUL')
+HAS_MARGIN = Q(margin_percentage__isnull=False)
+
+
+def _zero():
+    return Value(0, output_field=DecimalField(max_digits=18, decimal_places=2))
+
+
+AGGREGATES = {
+    'total': Count('pk'),
+    'successful': Count('pk', filter=SUCCESSFUL),
+    'unsuccessful': Count('pk', filter=Q(status='UNSUCCESSFUL')),
+    'total_value': Coalesce(Sum('tender_bid_amount'), _zero()),
+    'margin_sum': Coalesce(Sum('margin_percentage', filter=HAS_MARGIN), _zero()),
+    'margin_count': Count('pk', filter=HAS_MARGIN),
+    'successful_margin_sum': Coalesce(Sum('margin_percentage', filter=SUCCESSFUL & HAS_MARGIN), _zero()),
+    'successful_margin_count': Count('pk', filter=SUCCESSFUL & HAS_MARGIN),
+}
+
+
+def completed_projects(now=None):
+    """Completed tenders - those with a bid amount and an expired deadline"""
+    return Project.objects.filter(
+        tender_bid_amount__isnull=False,
+        tender_deadline__lt=now or timezone.now()
+    )
+
+
+def _group_key(dimension, value):
+    if dimension == 'MONTH':
+        return value.strftime('%Y-%m') if value else 'Unknown'
+    if dimension in ('LOCATION', 'ESTIMATOR'):
+        return value or 'Unknown'
+    return value or ''
+
+
+def refresh_summary(now=None):
+    """
+    Rebuild the summary table with one grouped aggregate query per dimension.
+    Returns: number of summary rows written
+    """
+    now = now or timezone.now()
+    projects = completed_projects(now).order_by()
+
+    rows = []
+    for dimension, grouping in DIMENSIONS.items():
+        if not grouping:
+            results = [projects.aggregate(**AGGREGATES)]
+        else:
+            results = projects.values(**grouping).annotate(**AGGREGATES)
+
+        # Different raw values can share a key (e.g. blank and NULL locations)
+        merged = defaultdict(lambda: defaultdict(int))
+        for result in results:
+            key = _group_key(dimension, result.pop('group', None))
+            for field, value in result.items():
+                merged[key][field] += value
+
+        rows += [
+            ProjectAnalyticsSummary(dimension=dimension, key=key, refreshed_at=now, **values)
+            for key, values in merged.items()
+        ]
+
+    with transaction.atomic():
+        ProjectAnalyticsSummary.objects.all().delete()
+        ProjectAnalyticsSummary.objects.bulk_create(rows)
+
+    logger.info(f"📊 Project analytics summary refreshed: {len(rows)} rows")
+    return len(rows)
+
+
+def summary_is_stale(now=None):
+    """
+    Saves refresh the summary, but projects also become 'completed' when their
+    deadline passes - catch those with a cheap existence check.
+    """
+    now = now or timezone.now()
+    overall = ProjectAnalyticsSummary.objects.filter(dimension='OVERALL').only('refreshed_at').first()
+    if overall is None:
+        return True
+
+    return Project.objects.filter(
+        tender_bid_amount__isnull=False,
+        tender_deadline__gte=overall.refreshed_at,
+        tender_deadline__lt=now
+    ).exists()
+
+
+def load_summary(now=None):
+    """
+    Precomputed analytics grouped by dimension, refreshing first if stale.
+    Returns: {dimension: {key: ProjectAnalyticsSummary}}
+    """
+    if summary_is_stale(now):
+        refresh_summary(now)
+
+    summary = defaultdict(dict)
+    for row in ProjectAnalyticsSummary.objects.all():
+        summary[row.dimension][row.key] = row
+    return summary
+
+
+# Per thread: a refresh is owed once the current transaction commits
+_pending = threading.local()
+
+
+def schedule_refresh():
+    """
+    Refresh once the current transaction commits, so bulk saves share one rebuild.
+    Every call registers a callback, and the first to run clears the flag and refreshes
+    - a rolled-back transaction drops its callbacks but leaves the flag for the next commit.
+    """
+    _pending.scheduled = True
+    transaction.on_commit(_refresh_after_commit)
+
+
+def _refresh_after_commit():
+    if not getattr(_pending, 'scheduled', False):
+        return
+    _pending.scheduled = False
+    try:
+        refresh_summary()
+    except Exception as e:
+        logger.exception(f"Error refreshing project analytics summary: {str(e)}")
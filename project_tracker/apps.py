@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'project_tracker'
-    label = 'project_tracker' 
+    label = 'project_tracker'
+
+    def ready(self):
+        # Import signals to ensure they are registered
+        import project_tracker.signals
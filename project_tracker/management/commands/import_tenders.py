@@ -1,66 +1,145 @@
 # In project_tracker/management/commands/import_tenders.py
+from decimal import Decimal
+
 import pandas as pd
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.bulk_import import (
+    DEFAULT_BATCH_SIZE, ImportPlan, ImportReport, date_column, datetime_column, read_table, text_column
+)
+from project_tracker.analytics import schedule_refresh
 from projects.models import Project
 
+# File column -> Project text field
+TEXT_COLUMNS = {
+    'reference': 'reference',
+    'location': 'location',
+    'estimator': 'estimator',
+}
+# File column -> Project decimal field
+DECIMAL_COLUMNS = {
+    'bid_amount': 'tender_bid_amount',
+    'margin': 'margin_percentage',
+}
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M']
+# Required by Project, so only ever written when the file has a value
+REQUIRED_DATES = ('start_date', 'tender_deadline')
+
 class Command(BaseCommand):
     help = 'Import tender data from CSV/Excel file'
 
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str, help='Path to CSV or Excel file')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be created and updated without writing anything'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk INSERT/UPDATE (default {DEFAULT_BATCH_SIZE})'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file_path']
+        dry_run = options['dry_run']
         self.stdout.write(f"Importing tender data from {file_path}")
 
-        # Detect file type and read accordingly
-        if file_path.endswith('.xlsx'):
-            df = pd.read_excel(file_path)
-        else:
-            df = pd.read_csv(file_path)
-
-        # Track statistics
-        stats = {
-            'created': 0,
-            'updated': 0,
-            'skipped': 0,
-            'errors': 0
-        }
-
-        # Process each row
-        for _, row in df.iterrows():
-            try:
-                # Required fields check
-                if pd.isna(row.get('project_name')) or pd.isna(row.get('status')):
-                    stats['skipped'] += 1
-                    continue
-
-                # Create or update the project
-                project, created = Project.objects.update_or_create(
-                    name=row.get('project_name'),
-                    defaults={
-                        'reference': row.get('reference', ''),
-                        'location': row.get('location', ''),
-                        'status': row.get('status'),
-                        'estimator': row.get('estimator', ''),
-                        'tender_bid_amount': row.get('bid_amount'),
-                        'margin_percentage': row.get('margin'),
-                        # Add other fields as needed
-                    }
-                )
-
-                if created:
-                    stats['created'] += 1
-                else:
-                    stats['updated'] += 1
-
-            except Exception as e:
-                self.stderr.write(f"Error processing {row.get('project_name')}: {str(e)}")
-                stats['errors'] += 1
-
-        # Report results
-        self.stdout.write(self.style.SUCCESS(f"Import complete:"))
-        self.stdout.write(f"  Created: {stats['created']}")
-        self.stdout.write(f"  Updated: {stats['updated']}")
-        self.stdout.write(f"  Skipped: {stats['skipped']}")
-        self.stdout.write(f"  Errors: {stats['errors']}")
\ No newline at end of file
+        df = read_table(file_path)
+        report = ImportReport(dry_run=dry_run)
+        rows, fields = self.normalize(df, report)
+        self.stdout.write(f"📄 {len(df)} rows read, {len(rows)} to import")
+
+        # Match on project name, later rows for the same project win
+        report.counts['duplicates'] += int(rows.duplicated('name', keep='last').sum())
+        rows = rows.drop_duplicates('name', keep='last')
+
+        existing = {}
+        ambiguous = set()
+        for project in Project.objects.filter(name__in=rows['name'].tolist()).only('id', 'name', *fields):
+            if project.name in existing:
+                ambiguous.add(project.name)
+            existing[project.name] = project
+
+        plan = ImportPlan(Project, report, batch_size=options['batch_size'])
+        for index, row in zip(rows.index, rows.to_dict('records')):
+            row_number = index + 2
+            if row['name'] in ambiguous:
+                report.error(row_number, f"More than one project is named {row['name']}")
+                continue
+
+            values = {
+                field: row[field] for field in fields
+                if row[field] is not None or field not in REQUIRED_DATES
+            }
+            project = existing.get(row['name'])
+            if project is None and any(values.get(field) is None for field in REQUIRED_DATES):
+                report.error(row_number, f"start_date and tender_deadline are required to create {row['name']}")
+                continue
+            plan.add(project, values)
+
+        with transaction.atomic():
+            plan.execute(dry_run=dry_run)
+            # bulk_create/bulk_update skip the post_save signal that refreshes the analytics summary
+            if plan.touched() and not dry_run:
+                schedule_refresh()
+
+        report.write(self)
+
+    def normalize(self, df, report):
+        """
+        Clean every column at once.
+        Returns: (importable rows, Project fields the file provides)
+        """
+        rows = pd.DataFrame({'name': text_column(df, 'project_name')})
+        status_text = text_column(df, 'status')
+
+        # Required fields check
+        missing = (rows['name'] == '') | (status_text == '')
+        report.counts['skipped'] += int(missing.sum())
+
+        # Accept status codes or labels, in any case
+        statuses = {}
+        for code, label in Project.STATUS_CHOICES:
+            statuses[code.lower()] = code
+            statuses[label.lower()] = code
+        rows['status'] = status_text.str.lower().map(statuses)
+        invalid = ~missing & rows['status'].isna()
+        for index in rows.index[invalid]:
+            report.error(index + 2, f"Unknown status '{status_text[index]}' for {rows.at[index, 'name']}")
+
+        # Only columns present in the file are written, so a partial file never blanks other fields
+        fields = ['name', 'status']
+        for column, field in TEXT_COLUMNS.items():
+            if column in df.columns:
+                rows[field] = text_column(df, column)
+                fields.append(field)
+
+        for column, field in DECIMAL_COLUMNS.items():
+            if column not in df.columns:
+                continue
+            text = text_column(df, column).str.replace(r'[£$,%\s]', '', regex=True)
+            numeric = pd.to_numeric(text, errors='coerce')
+            unparseable = ~missing & ~invalid & (text != '') & numeric.isna()
+            for index in rows.index[unparseable]:
+                report.error(index + 2, f"Invalid {column} '{df.at[index, column]}' for {rows.at[index, 'name']}")
+            invalid |= unparseable
+            rows[field] = text.where(numeric.notna(), None).map(
+                lambda value: Decimal(value).quantize(Decimal('0.01')) if pd.notna(value) else None
+            )
+            fields.append(field)
+
+        if 'start_date' in df.columns:
+            rows['start_date'] = date_column(df, 'start_date', DATE_FORMATS)
+            fields.append('start_date')
+        if 'tender_deadline' in df.columns:
+            deadlines = datetime_column(df, 'tender_deadline', DATE_FORMATS)
+            rows['tender_deadline'] = deadlines.map(
+                lambda value: timezone.make_aware(value) if pd.notna(value) else None
+            )
+            fields.append('tender_deadline')
+
+        return rows[~missing & ~invalid], fields
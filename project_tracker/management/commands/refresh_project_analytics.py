@@ -0,0 +1,13 @@
+# project_tracker/management/commands/refresh_project_analytics.py
+from django.core.management.base import BaseCommand
+from project_tracker.analytics import refresh_summary
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed project analytics summary table'
+
+    def handle(self, *args, **options):
+        self.stdout.write("📊 Refreshing project analytics summary...")
+
+        rows = refresh_summary()
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Project analytics summary rebuilt with {rows} rows"))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("project_tracker", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProjectAnalyticsSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[
+                            ("OVERALL", "Overall"),
+                            ("STATUS", "Status"),
+                            ("LOCATION", "Location"),
+                            ("MONTH", "Deadline Month"),
+                            ("ESTIMATOR", "Estimator"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("key", models.CharField(blank=True, max_length=255)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("successful", models.PositiveIntegerField(default=0)),
+                ("unsuccessful", models.PositiveIntegerField(default=0)),
+                (
+                    "total_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+                (
+                    "margin_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("margin_count", models.PositiveIntegerField(default=0)),
+                (
+                    "successful_margin_sum",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                ("successful_margin_count", models.PositiveIntegerField(default=0)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name_plural": "Project Analytics Summaries",
+                "ordering": ["dimension", "key"],
+                "unique_together": {("dimension", "key")},
+            },
+        ),
+    ]
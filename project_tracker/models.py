@@ -78,4 +78,55 @@ class ProjectTracker(models.Model):
         return "TBC"
     
     def __str__(self):
-        return f"{self.job_number} - {self.project_name}"
\ No newline at end of file
+        return f"{self.job_number} - {self.project_name}"
+
+class ProjectAnalyticsSummary(models.Model):
+    """Pre-aggregated bid analytics for completed tenders, one row per dimension value"""
+    DIMENSION_CHOICES = [
+        ('OVERALL', 'Overall'),
+        ('STATUS', 'Status'),
+        ('LOCATION', 'Location'),
+        ('MONTH', 'Deadline Month'),
+        ('ESTIMATOR', 'Estimator'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=255, blank=True)
+
+    # Counts
+    total = models.PositiveIntegerField(default=0)
+    successful = models.PositiveIntegerField(default=0)
+    unsuccessful = models.PositiveIntegerField(default=0)
+
+    # Financial Data
+    total_value = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    margin_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    margin_count = models.PositiveIntegerField(default=0)
+    successful_margin_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    successful_margin_count = models.PositiveIntegerField(default=0)
+
+    refreshed_at = models.DateTimeField()
+
+    @property
+    def success_rate(self):
+        decided = self.successful + self.unsuccessful
+        return round(self.successful / decided * 100, 1) if decided else 0
+
+    @property
+    def avg_margin(self):
+        return float(self.margin_sum) / self.margin_count if self.margin_count else 0
+
+    @property
+    def avg_margin_successful(self):
+        if not self.successful_margin_count:
+            return 0
+        return float(self.successful_margin_sum) / self.successful_margin_count
+
+    def __str__(self):
+        return f"{self.get_dimension_display()}: {self.key or 'All'}"
+
+    class Meta:
+        app_label = 'project_tracker'
+        ordering = ['dimension', 'key']
+        unique_together = ['dimension', 'key']
+        verbose_name_plural = "Project Analytics Summaries"
\ No newline at end of file
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from projects.models import Project
+from .analytics import schedule_refresh
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def refresh_project_analytics(sender, instance, raw=False, **kwargs):
+    """Keep the analytics summary table in step with project changes"""
+    if raw:
+        return
+    schedule_refresh()
@@ -1,3 +1,121 @@
+import io
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from projects.models import Project
+
+
+class ProjectAnalyticsViewTests(TestCase):
+    """The analytics page renders its breakdowns from the grouped summary rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='estimator', password='password')
+        for name, status, estimator, margin in [
+            ('Won Project', 'SUCCESSFUL', 'Alex', Decimal('8.5')),
+            ('Lost Project', 'UNSUCCESSFUL', 'Alex', Decimal('4.0')),
+            ('Other Lost Project', 'UNSUCCESSFUL', '', None),
+        ]:
+            Project.objects.create(
+                name=name,
+                location='Leeds',
+                start_date=date.today(),
+                tender_deadline=timezone.now() - timedelta(days=30),
+                status=status,
+                estimator=estimator,
+                tender_bid_amount=Decimal('100000'),
+                margin_percentage=margin,
+            )
+
+    def test_breakdowns(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('project_tracker:analytics'))
+        self.assertEqual(response.status_code, 200)
+
+        breakdowns = dict(response.context['breakdowns'])
+        self.assertEqual(
+            [(row.label, row.total) for row in breakdowns['By Status']],
+            [('Unsuccessful', 2), ('Successful', 1)],
+        )
+        self.assertEqual([(row.label, row.total) for row in breakdowns['By Estimator']], [('Alex', 2), ('Unknown', 1)])
+        self.assertEqual(breakdowns['By Location'][0].success_rate, 33.3)
+        self.assertContains(response, '<td>Unsuccessful</td>', html=True)
+
+
+class ImportTendersTests(TestCase):
+    """import_tenders: only the columns in the file are written, rows matched on project name"""
+
+    def run_import(self, text, *args):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(text)
+        self.addCleanup(os.remove, path)
+        out = io.StringIO()
+        call_command('import_tenders', path, *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_dry_run_import_and_reimport(self):
+        text = (
+            'project_name,status,bid_amount,start_date,tender_deadline\n'
+            'Imported Project,Successful,"£125,000",01/03/2025,2025-02-14 12:00:00\n'
+            'Undated Project,SUCCESSFUL,,,\n'
+        )
+        output = self.run_import(text, '--dry-run')
+        self.assertIn('Created: 1', output)
+        self.assertFalse(Project.objects.exists())
+
+        self.run_import(text)
+        project = Project.objects.get()
+        self.assertEqual((project.status, project.tender_bid_amount), ('SUCCESSFUL', Decimal('125000.00')))
+        self.assertEqual(project.start_date, date(2025, 3, 1))
+
+        output = self.run_import(text)
+        self.assertIn('Unchanged: 1', output)
+
+        # A partial file leaves the other fields alone
+        output = self.run_import('project_name,status\nImported Project,Unsuccessful\n')
+        self.assertIn('Updated: 1', output)
+        project.refresh_from_db()
+        self.assertEqual((project.status, project.tender_bid_amount), ('UNSUCCESSFUL', Decimal('125000.00')))
+
+
+class AnalyticsRefreshTests(TestCase):
+    """Project saves refresh the analytics summary once per committed transaction"""
+
+    def create_project(self, name):
+        return Project.objects.create(
+            name=name,
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+
+    def test_saves_in_one_transaction_share_one_refresh(self):
+        with mock.patch('project_tracker.analytics.refresh_summary') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    for i in range(3):
+                        self.create_project(f'Batch Project {i}')
+            self.assertEqual(refresh.call_count, 1)
+
+    def test_rolled_back_saves_leave_the_next_commit_to_refresh(self):
+        with mock.patch('project_tracker.analytics.refresh_summary') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        self.create_project('Rolled Back Project')
+                        raise RuntimeError('import failed')
+            self.assertEqual(refresh.call_count, 0)
 
-# Create your tests here.
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_project('Committed Project')
+            self.assertEqual(refresh.call_count, 1)
@@ -3,6 +3,7 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q
 from django.utils import timezone  # Add this line
 from projects.models import Project
+from .analytics import completed_projects, load_summary
 import json
 from decimal import Decimal
 from django.db.models import Avg, Count, Q, F, Sum, Case, When, Value, IntegerField
@@ -113,48 +114,27 @@ class ProjectAnalyticsView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         # Include completed tenders - those with bid amount and expired deadline
-        now = timezone.now()
-        queryset = Project.objects.filter(
-            tender_bid_amount__isnull=False,
-            tender_deadline__lt=now
-        )
-        return queryset
+        return completed_projects()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Prepare data for analytics
-        completed_projects = self.get_queryset()
+        # Grouped totals come from the precomputed summary table
+        summary = load_summary()
+        overall = summary['OVERALL'].get('')
 
-        # Success rate data
-        successful = completed_projects.filter(status='SUCCESSFUL').count()
-        unsuccessful = completed_projects.filter(status='UNSUCCESSFUL').count()
-        total = successful + unsuccessful
+        successful = overall.successful if overall else 0
+        unsuccessful = overall.unsuccessful if overall else 0
 
-        if total > 0:
-            success_rate = (successful / total) * 100
-        else:
-            success_rate = 0
-
-        context['success_rate'] = round(success_rate, 1)
-        context['total_bids'] = total
+        context['success_rate'] = overall.success_rate if overall else 0
+        context['total_bids'] = successful + unsuccessful
         context['successful_bids'] = successful
         context['unsuccessful_bids'] = unsuccessful
+        context['avg_margin_successful'] = overall.avg_margin_successful if overall else 0
 
-        # Average margin data
-        avg_margin_successful = completed_projects.filter(
-            status='SUCCESSFUL',
-            margin_percentage__isnull=False
-        ).values_list('margin_percentage', flat=True)
-
-        if avg_margin_successful:
-            context['avg_margin_successful'] = sum(avg_margin_successful) / len(avg_margin_successful)
-        else:
-            context['avg_margin_successful'] = 0
-
-        # Prepare chart data with location information
+        # Chart points reuse the project list the template renders - one query for both
         margin_data = []
-        for project in completed_projects:
+        for project in context['projects']:
             if project.margin_percentage and project.tender_bid_amount:
                 margin_data.append({
                     'name': project.name,
@@ -167,44 +147,22 @@ class ProjectAnalyticsView(LoginRequiredMixin, ListView):
 
         context['margin_chart_data'] = json.dumps(margin_data)
 
-        # Enhanced location analytics data
-        location_summary = {}
-        for project in completed_projects:
-            location = project.location or 'Unknown'
-
-            if location not in location_summary:
-                location_summary[location] = {
-                    'total': 0,
-                    'successful': 0,
-                    'unsuccessful': 0,
-                    'total_value': 0,
-                    'avg_margin': 0,
-                    'margins_sum': 0,
-                    'projects_with_margin': 0
-                }
-
-            location_summary[location]['total'] += 1
-
-            if project.status == 'SUCCESSFUL':
-                location_summary[location]['successful'] += 1
-            elif project.status == 'UNSUCCESSFUL':
-                location_summary[location]['unsuccessful'] += 1
-
-            if project.tender_bid_amount:
-                location_summary[location]['total_value'] += float(project.tender_bid_amount)
-
-            if project.margin_percentage:
-                location_summary[location]['margins_sum'] += float(project.margin_percentage)
-                location_summary[location]['projects_with_margin'] += 1
-
-        # Calculate averages for location data
-        for location in location_summary:
-            if location_summary[location]['projects_with_margin'] > 0:
-                location_summary[location]['avg_margin'] = (
-                    location_summary[location]['margins_sum'] /
-                    location_summary[location]['projects_with_margin']
-                )
-
-        context['location_summary'] = json.dumps(location_summary)
-
-        return context
\ No newline at end of file
+        # Breakdown tables render straight from the grouped summary rows
+        context['breakdowns'] = [
+            ('By Status', self._breakdown(summary['STATUS'], labels=dict(Project.STATUS_CHOICES))),
+            ('By Estimator', self._breakdown(summary['ESTIMATOR'])),
+            ('By Deadline Month', self._breakdown(summary['MONTH'], by_key=True)),
+            ('By Location', self._breakdown(summary['LOCATION'])),
+        ]
+
+        return context
+
+    @staticmethod
+    def _breakdown(rows, labels=None, by_key=False):
+        """Summary rows with a display label, largest group first (or in key order)"""
+        rows = list(rows.values())
+        for row in rows:
+            row.label = (labels or {}).get(row.key, row.key) or 'Unknown'
+        if by_key:
+            return sorted(rows, key=lambda row: row.key)
+        return sorted(rows, key=lambda row: (-row.total, row.label))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:22
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_invitation_counters(apps, schema_editor):
+    Project = apps.get_model("projects", "Project")
+    TenderInvitation = apps.get_model("tenders", "TenderInvitation")
+    totals = TenderInvitation.objects.values("project_id").annotate(
+        invitation_count=Count("pk"),
+        accepted_count=Count("pk", filter=Q(status="ACCEPTED")),
+        declined_count=Count("pk", filter=Q(status="DECLINED")),
+        returned_count=Count("pk", filter=Q(tender_returned=True)),
+        pending_count=Count("pk", filter=Q(status="PENDING", tender_returned=False)),
+    )
+    for row in totals:
+        Project.objects.filter(pk=row.pop("project_id")).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0001_initial"),
+        ("tenders", "0008_tenderinvitation_last_pending_reminder_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="accepted_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="declined_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="invitation_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="pending_count",
+            field=models.PositiveIntegerField(
+                default=0,
+                editable=False,
+                help_text="Invitations awaiting a response and not yet returned - the targets for pending reminders",
+            ),
+        ),
+        migrations.AddField(
+            model_name="project",
+            name="returned_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="project",
+            index=models.Index(
+                fields=["invitation_count", "-created_at"],
+                name="project_invitation_count_idx",
+            ),
+        ),
+        migrations.RunPython(populate_invitation_counters, migrations.RunPython.noop),
+    ]
@@ -52,8 +52,35 @@ class Project(models.Model):
         help_text="Description for the SharePoint link (e.g., 'ITT Documents', 'Tender Package')"
     )
 
+    # Tender dashboard counters - kept in step by TenderInvitation signals,
+    # repaired with the recount_project_counters command
+    invitation_count = models.PositiveIntegerField(default=0, editable=False)
+    accepted_count = models.PositiveIntegerField(default=0, editable=False)
+    declined_count = models.PositiveIntegerField(default=0, editable=False)
+    returned_count = models.PositiveIntegerField(default=0, editable=False)
+    pending_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Invitations awaiting a response and not yet returned - the targets for pending reminders"
+    )
+
+    COUNTER_FIELDS = ('invitation_count', 'accepted_count', 'declined_count', 'returned_count', 'pending_count')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['invitation_count', '-created_at'], name='project_invitation_count_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Counters are changed with F() updates - never write them back from a stale instance
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} ({self.reference})" if self.reference else self.name
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SubcontractorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'subcontractors'
+
+    def ready(self):
+        # Import signals to ensure they are registered
+        import subcontractors.signals
@@ -0,0 +1,248 @@
+# subcontractors/geo.py
+"""
+Offline geocoding and a proximity index for subcontractor head offices.
+
+Locations are matched against the gazetteer bundled in data/uk_places.csv
+(postcode areas, towns, counties and regions with their centroids) - there is
+no network lookup. Head-office coordinates are stored in SubcontractorLocation,
+backfilled after migrate while it is empty, kept in step by signals and rebuilt
+on demand by the geocode_subcontractors command.
+
+ProximityIndex buckets points into a grid of CELL_DEGREES squares sorted by
+cell, so "within N miles" reads the few runs of cells the circle overlaps and
+only measures the points in them.
+"""
+import csv
+import logging
+import math
+import re
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.db import transaction
+
+from .search import normalize
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'uk_places.csv'
+
+# Most to least precise. Postcodes are only resolved to their area ('LS'), so a named town beats them;
+# a bare outward code is the least certain postcode ('M62' may be the motorway)
+PRECISION = ['town', 'postcode', 'outward_code', 'county', 'region']
+
+# Full postcode ('LS11 5QN') and outward code on its own ('LS11')
+POSTCODE_RE = re.compile(r'\b([A-Z]{1,2})\d[A-Z\d]?\s*\d[A-Z]{2}\b')
+OUTWARD_CODE_RE = re.compile(r'\b([A-Z]{1,2})\d[A-Z\d]?\b')
+
+# A place name followed by one of these is a street ('York Road, Leeds'), not the town
+STREET_WORDS = {'road', 'rd', 'street', 'st', 'lane', 'ln', 'way', 'avenue', 'ave', 'drive', 'close', 'terrace', 'gate'}
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+
+CELL_DEGREES = 0.5
+GRID_COLUMNS = int(360 / CELL_DEGREES)
+
+Location = namedtuple('Location', ['latitude', 'longitude', 'place'])
+
+
+# Geocoding
+
+class Gazetteer:
+    """Postcode areas and place names of the bundled gazetteer, loaded once"""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.areas = {}
+        self.places = {}
+        with open(path, encoding='utf-8', newline='') as handle:
+            for row in csv.DictReader(handle):
+                latitude, longitude = float(row['latitude']), float(row['longitude'])
+                if row['kind'] == 'postcode_area':
+                    self.areas[row['name']] = Location(latitude, longitude, f"{row['name']} postcode area")
+                else:
+                    self.places[normalize(row['name'])] = (row['kind'], Location(latitude, longitude, row['name']))
+        self.longest_name = max((len(name.split()) for name in self.places), default=1)
+
+    def place_matches(self, words):
+        """(kind, location) of each place named in a list of words, longest name first at each position"""
+        position = 0
+        while position < len(words):
+            for length in range(min(self.longest_name, len(words) - position), 0, -1):
+                match = self.places.get(' '.join(words[position:position + length]))
+                if match is None:
+                    continue
+                following = words[position + length] if position + length < len(words) else None
+                if following not in STREET_WORDS:
+                    yield match
+                position += length - 1
+                break
+            position += 1
+
+
+@lru_cache(maxsize=None)
+def gazetteer():
+    return Gazetteer()
+
+
+@lru_cache(maxsize=4096)
+def _geocode(text):
+    places = gazetteer()
+    upper = text.upper()
+    found = {}
+
+    for area in POSTCODE_RE.findall(upper):
+        if area in places.areas:
+            found.setdefault('postcode', places.areas[area])
+
+    # Addresses run from the street to the town, so the last place of each kind wins
+    for kind, location in places.place_matches(normalize(text).split()):
+        found[kind] = location
+
+    if 'postcode' not in found:
+        for area in OUTWARD_CODE_RE.findall(upper):
+            if area in places.areas:
+                found.setdefault('outward_code', places.areas[area])
+
+    for kind in PRECISION:
+        if kind in found:
+            return found[kind]
+    return None
+
+
+def geocode(text):
+    """
+    Coordinates of a free-text UK location - postcode, address, town, county or region.
+    Returns: Location(latitude, longitude, place) or None when nothing in the text is recognised
+    """
+    text = str(text or '').strip()
+    return _geocode(text) if text else None
+
+
+def distances_miles(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in miles from one point to arrays of points (haversine)"""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+# Stored head-office locations
+
+def rebuild_locations(subcontractor_ids=None):
+    """Geocode the head offices of all (or the given) subcontractors, returns locations written"""
+    from .models import Subcontractor, SubcontractorLocation
+
+    subcontractors = Subcontractor.objects.order_by()
+    existing = SubcontractorLocation.objects.all()
+    if subcontractor_ids is not None:
+        subcontractors = subcontractors.filter(pk__in=subcontractor_ids)
+        existing = existing.filter(subcontractor_id__in=subcontractor_ids)
+
+    locations = []
+    for subcontractor_id, head_office in subcontractors.values_list('id', 'head_office').iterator():
+        location = geocode(head_office)
+        if location:
+            locations.append(SubcontractorLocation(
+                subcontractor_id=subcontractor_id,
+                latitude=location.latitude,
+                longitude=location.longitude,
+                place=location.place,
+            ))
+
+    with transaction.atomic():
+        existing.delete()
+        SubcontractorLocation.objects.bulk_create(locations, batch_size=1000)
+
+    if subcontractor_ids is None:
+        logger.info(f"📍 Geocoded {len(locations)} subcontractor head offices")
+    return len(locations)
+
+
+# Proximity index
+
+class ProximityIndex:
+    """
+    Grid index over points with ids (and optionally trades).
+    Points are sorted by grid cell, with each cell's key being row * GRID_COLUMNS + column,
+    so one band of latitude is a single contiguous run of the sorted keys.
+    """
+
+    def __init__(self, ids, latitudes, longitudes, trade_ids=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.trade_ids = None if trade_ids is None else np.asarray(trade_ids, dtype=np.int64)
+
+        # Points without coordinates are left out of the grid
+        known = np.flatnonzero(~np.isnan(self.latitudes) & ~np.isnan(self.longitudes))
+        keys = self._keys(self.latitudes[known], self.longitudes[known])
+        order = np.argsort(keys, kind='stable')
+        self._positions = known[order]
+        self._keys_sorted = keys[order]
+
+    @classmethod
+    def build(cls):
+        """Index of every geocoded subcontractor head office"""
+        from .models import SubcontractorLocation
+
+        rows = list(SubcontractorLocation.objects.order_by('subcontractor_id').values_list(
+            'subcontractor_id', 'subcontractor__trade_id', 'latitude', 'longitude'
+        ))
+        if not rows:
+            logger.warning("⚠️ No subcontractor head offices are geocoded - run manage.py geocode_subcontractors")
+        ids, trade_ids, latitudes, longitudes = zip(*rows) if rows else ((), (), (), ())
+        return cls(ids, latitudes, longitudes, trade_ids)
+
+    def __len__(self):
+        return len(self._positions)
+
+    @staticmethod
+    def _cells(latitudes, longitudes):
+        rows = np.floor(np.asarray(latitudes) / CELL_DEGREES).astype(np.int64)
+        columns = np.floor(np.asarray(longitudes) / CELL_DEGREES).astype(np.int64) + GRID_COLUMNS // 2
+        return rows, columns
+
+    def _keys(self, latitudes, longitudes):
+        rows, columns = self._cells(latitudes, longitudes)
+        return rows * GRID_COLUMNS + columns
+
+    def candidates(self, latitude, longitude, miles):
+        """Positions of the points in the grid cells a circle of the given radius overlaps"""
+        span = miles / MILES_PER_DEGREE
+        south, north = max(latitude - span, -90.0), min(latitude + span, 90.0)
+        # Degrees of longitude shrink towards the poles - take the width at the edge nearest one
+        widest = min(max(abs(south), abs(north)), 89.9)
+        east_west = span / math.cos(math.radians(widest))
+
+        first_row, last_row = self._cells([south, north], [longitude, longitude])[0]
+        first_column, last_column = self._cells([latitude, latitude], [longitude - east_west, longitude + east_west])[1]
+        first_column, last_column = max(first_column, 0), min(last_column, GRID_COLUMNS - 1)
+
+        rows = np.arange(first_row, last_row + 1) * GRID_COLUMNS
+        starts = np.searchsorted(self._keys_sorted, rows + first_column, side='left')
+        ends = np.searchsorted(self._keys_sorted, rows + last_column, side='right')
+        return np.concatenate([self._positions[start:end] for start, end in zip(starts, ends)])
+
+    def within(self, latitude, longitude, miles, trade_ids=None):
+        """
+        Points within a radius, nearest first.
+        trade_ids: only points with one of these trades
+        Returns: (positions in the arrays given to the index, distances in miles)
+        """
+        positions = self.candidates(latitude, longitude, miles)
+        if trade_ids is not None and self.trade_ids is not None:
+            positions = positions[np.isin(self.trade_ids[positions], list(trade_ids))]
+
+        distances = distances_miles(latitude, longitude, self.latitudes[positions], self.longitudes[positions])
+        inside = distances <= miles
+        positions, distances = positions[inside], distances[inside]
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+    def nearby(self, location, miles, trade_ids=None):
+        """{id: miles} of the points within a radius of a Location, nearest first"""
+        positions, distances = self.within(location.latitude, location.longitude, miles, trade_ids)
+        return dict(zip(self.ids[positions].tolist(), distances.tolist()))
@@ -0,0 +1,127 @@
+# subcontractors/management/commands/benchmark_subcontractor_search.py
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from subcontractors.models import Region, Subcontractor, Trade
+from subcontractors.search import rebuild_search_index, search_subcontractors
+
+TRADES = ['Groundworks', 'Roofing', 'Mechanical & Electrical', 'Drylining', 'Cladding', 'Windows', 'Flooring', 'Steelwork']
+REGIONS = ['Yorkshire', 'North East', 'North West', 'Midlands', 'London', 'South West', 'Scotland']
+TOWNS = ['Leeds', 'York', 'Hull', 'Sheffield', 'Bradford', 'Wakefield', 'Harrogate', 'Doncaster', 'Newcastle', 'Manchester']
+WORDS = ['North', 'Pennine', 'Castle', 'Allied', 'Premier', 'Acme', 'Riverside', 'Summit', 'Oak', 'Vale', 'Crown', 'Atlas']
+SUFFIXES = ['Ltd', 'Limited', 'Contracts Ltd', 'Group', '& Sons', 'Services Ltd']
+FIRST_NAMES = ['James', 'Sarah', 'Mohammed', 'Emma', 'David', 'Aisha', 'Tom', 'Claire', 'Raj', 'Megan']
+SURNAMES = ['Smith', 'Patel', 'Jones', 'Brown', 'Khan', 'Taylor', 'Wilson', 'Walker', 'Hughes', 'Wright']
+
+# Searches an estimator might type: company words, contact names, email domains, a town
+TERMS = ['acme', 'pennine roofing', 'patel', 'sarah walker', 'castle', 'oakvale', 'summit group', 'harrogate']
+PAGE_SIZE = 20
+
+
+class Command(BaseCommand):
+    help = 'Compare the indexed subcontractor search with the icontains filter on a synthetic directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=50000,
+            help='Number of synthetic subcontractors (default 50000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Times each search is run (default 5)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=1,
+            help='Random seed for the synthetic directory (default 1)'
+        )
+
+    def handle(self, *args, **options):
+        # Everything is written inside a transaction that is rolled back at the end
+        with transaction.atomic():
+            self.build_directory(options['rows'], random.Random(options['seed']))
+            self.compare(options['repeat'])
+            transaction.set_rollback(True)
+        self.stdout.write("🧹 Synthetic directory rolled back")
+
+    def build_directory(self, count, rng):
+        self.stdout.write(f"🏗️ Creating {count} synthetic subcontractors on {connection.vendor}...")
+        trades = [Trade.objects.get_or_create(name=f'Benchmark {name}')[0] for name in TRADES]
+        regions = [Region.objects.get_or_create(name=f'Benchmark {name}')[0] for name in REGIONS]
+
+        subcontractors = []
+        for i in range(count):
+            first_name, surname = rng.choice(FIRST_NAMES), rng.choice(SURNAMES)
+            name = f"{rng.choice(WORDS)}{rng.choice(['', ' ', ''])}{rng.choice(WORDS)} {rng.choice(SUFFIXES)} {i}"
+            domain = name.split()[0].lower()
+            subcontractors.append(Subcontractor(
+                trade=rng.choice(trades),
+                company=name,
+                head_office=rng.choice(TOWNS),
+                first_name=first_name,
+                surname=surname,
+                email=f"{first_name.lower()}.{surname.lower()}@{domain}{i}.co.uk; estimating@{domain}{i}.co.uk",
+            ))
+        created = Subcontractor.objects.bulk_create(subcontractors, batch_size=1000)
+
+        Membership = Subcontractor.regions.through
+        Membership.objects.bulk_create([
+            Membership(subcontractor_id=subcontractor.pk, region_id=region.pk)
+            for subcontractor in created
+            for region in rng.sample(regions, rng.randint(1, 2))
+        ], batch_size=1000)
+
+        # bulk_create skips the signals - index in one pass
+        start = time.perf_counter()
+        rebuild_search_index()
+        self.stdout.write(f"   Index built in {time.perf_counter() - start:.1f} s")
+
+    def compare(self, repeat):
+        self.stdout.write(f"🔎 First page of results, best of {repeat} runs per search")
+        self.stdout.write(f"   {'search':<18}{'icontains':>12}{'index':>12}{'matches':>16}")
+
+        scan_total = index_total = 0
+        for term in TERMS:
+            scan_seconds, scan_matches = self.best_of(repeat, lambda: self.icontains_page(term))
+            index_seconds, index_matches = self.best_of(repeat, lambda: self.index_page(term))
+            scan_total += scan_seconds
+            index_total += index_seconds
+            self.stdout.write(
+                f"   {term:<18}{scan_seconds * 1000:10.1f}ms{index_seconds * 1000:10.1f}ms"
+                f"{scan_matches:>8}{index_matches:>8}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"   Speed-up: {scan_total / index_total:.1f}x over all searches"))
+
+    def best_of(self, repeat, run):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def icontains_page(self, term):
+        """The previous list view search: four icontains filters OR-ed, count plus one page"""
+        queryset = Subcontractor.objects.filter(
+            models.Q(company__icontains=term) |
+            models.Q(first_name__icontains=term) |
+            models.Q(surname__icontains=term) |
+            models.Q(email__icontains=term)
+        )
+        total = queryset.count()
+        list(queryset[:PAGE_SIZE])
+        return total
+
+    def index_page(self, term):
+        results = search_subcontractors(term)
+        total = len(results)
+        results[:PAGE_SIZE]
+        return total
@@ -0,0 +1,38 @@
+# subcontractors/management/commands/geocode_subcontractors.py
+from django.core.management.base import BaseCommand
+from subcontractors.geo import rebuild_locations
+from subcontractors.models import Subcontractor
+
+class Command(BaseCommand):
+    help = 'Geocode subcontractor head offices against the bundled gazetteer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subcontractor-id',
+            type=int,
+            action='append',
+            help='Only geocode the given subcontractor (can be repeated)'
+        )
+        parser.add_argument(
+            '--show-unmatched',
+            action='store_true',
+            help='List the head offices the gazetteer does not recognise'
+        )
+
+    def handle(self, *args, **options):
+        subcontractor_ids = options['subcontractor_id']
+        self.stdout.write("📍 Geocoding subcontractor head offices...")
+
+        located = rebuild_locations(subcontractor_ids=subcontractor_ids)
+
+        subcontractors = Subcontractor.objects.all()
+        if subcontractor_ids is not None:
+            subcontractors = subcontractors.filter(pk__in=subcontractor_ids)
+        unmatched = subcontractors.filter(geolocation__isnull=True)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Located {located} subcontractors"))
+        if unmatched.exists():
+            self.stdout.write(self.style.WARNING(f"⚠️ {unmatched.count()} head offices not recognised"))
+            if options['show_unmatched']:
+                for company, head_office in unmatched.order_by('head_office').values_list('company', 'head_office'):
+                    self.stdout.write(f"   {company}: '{head_office}'")
@@ -1,162 +1,175 @@
 # In subcontractors/management/commands/import_subcontractors.py
 import pandas as pd
-from datetime import datetime
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from communications.return_index import rebuild_sender_index
+from subcontractors.geo import rebuild_locations
+from subcontractors.search import rebuild_search_index
+from core.bulk_import import (
+    DEFAULT_BATCH_SIZE, ImportPlan, ImportReport, date_column, read_table, resolve_names, text_column
+)
 from subcontractors.models import Subcontractor, Trade, Region
 
+# CSV column -> model field, for the plain text fields
+TEXT_COLUMNS = {
+    'Company': 'company',
+    'Email': 'email',
+    'Head Office ': 'head_office',
+    'First Name': 'first_name',
+    'Surname': 'surname',
+    'Mobile': 'mobile',
+    '__EMPTY': 'landline',
+    'Website': 'website',
+}
+REGIONS_COLUMN = 'Regions they opperate'
+DATE_FORMATS = ['%d/%m/%Y', '%Y-%m-%d']
+
 class Command(BaseCommand):
     help = 'Import subcontractors from CSV file'
 
     def add_arguments(self, parser):
         parser.add_argument('file_path', type=str, help='Path to CSV file')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be created and updated without writing anything'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk INSERT/UPDATE (default {DEFAULT_BATCH_SIZE})'
+        )
 
     def handle(self, *args, **options):
         file_path = options['file_path']
+        dry_run = options['dry_run']
         self.stdout.write(f"Importing subcontractors from {file_path}")
-        
+
         # Read the CSV file
         try:
-            df = pd.read_csv(file_path)
+            df = read_table(file_path)
         except Exception as e:
             self.stderr.write(f"Error reading file: {str(e)}")
             return
-        
-        # Get all existing trades to reduce DB queries
-        existing_trades = {t.name: t for t in Trade.objects.all()}
-        existing_regions = {r.name: r for r in Region.objects.all()}
-        
-        # Track statistics
-        stats = {
-            'created': 0,
-            'updated': 0,
-            'skipped': 0,
-            'errors': 0
+
+        report = ImportReport(dry_run=dry_run)
+        rows = self.normalize(df, report)
+        self.stdout.write(f"📄 {len(df)} rows read, {len(rows)} to import")
+
+        with transaction.atomic():
+            records = self.match(rows, report)
+
+            # Names from the rows that survive deduplication - a discarded duplicate creates nothing
+            trades, new_trades = resolve_names(Trade, [row['trade'] for row in records.values()], dry_run=dry_run)
+            regions, new_regions = resolve_names(
+                Region, [name for row in records.values() for name in row['regions']], dry_run=dry_run
+            )
+            report.counts['trades created'] = new_trades
+            report.counts['regions created'] = new_regions
+
+            plan = ImportPlan(Subcontractor, report, batch_size=options['batch_size'])
+            for row in records.values():
+                plan.add(row['instance'], {
+                    **row['values'],
+                    'trade_id': trades[row['trade']].pk,
+                }, m2m={'regions': [regions[name] for name in row['regions']]})
+            plan.execute(dry_run=dry_run)
+
+            # bulk_create/bulk_update skip the post_save signals that maintain the sender and search indexes and locations
+            touched = [subcontractor.pk for subcontractor in plan.touched()]
+            if touched and not dry_run:
+                rebuild_sender_index(subcontractor_ids=touched)
+                rebuild_search_index(subcontractor_ids=touched)
+                rebuild_locations(subcontractor_ids=touched)
+
+        report.write(self)
+
+    def normalize(self, df, report):
+        """Clean every column at once, returns the importable rows"""
+        rows = pd.DataFrame({field: text_column(df, column) for column, field in TEXT_COLUMNS.items()})
+        rows['trade'] = text_column(df, 'Trade')
+
+        # Skip rows without company or email
+        missing = (rows['company'] == '') | (rows['email'] == '')
+        report.counts['skipped'] += int(missing.sum())
+
+        no_trade = ~missing & (rows['trade'] == '')
+        for index in rows.index[no_trade]:
+            report.error(index + 2, f"No trade for {rows.at[index, 'company']}")
+        rows = rows[~missing & ~no_trade].copy()
+
+        # Regions: comma separated names
+        names = text_column(df.loc[rows.index], REGIONS_COLUMN).str.split(',').explode().str.strip()
+        names = names[names != '']
+        rows['regions'] = names.groupby(level=0).agg(lambda values: list(dict.fromkeys(values)))
+        rows['regions'] = rows['regions'].apply(lambda value: value if isinstance(value, list) else [])
+
+        # Map PQQ status
+        pqq = text_column(df.loc[rows.index], 'PQQ ').str.lower()
+        rows['pqq_status'] = 'NONE'
+        rows.loc[pqq.str.contains('sent'), 'pqq_status'] = 'SENT'
+        rows.loc[pqq.str.contains('complete'), 'pqq_status'] = 'COMPLETED'
+
+        # Parse dates (DD/MM/YYYY, falling back to YYYY-MM-DD)
+        raw_dates = text_column(df.loc[rows.index], 'Insurance Exp')
+        rows['insurance_expiry'] = date_column(df.loc[rows.index], 'Insurance Exp', DATE_FORMATS)
+        for index in rows.index[(raw_dates != '') & rows['insurance_expiry'].isna()]:
+            self.stdout.write(
+                f"  Warning: Could not parse date '{raw_dates[index]}' for {rows.at[index, 'company']}"
+            )
+
+        return rows
+
+    def match(self, rows, report):
+        """
+        Pair each row with the subcontractor it updates: by email first,
+        then by company + head office. Later rows for the same subcontractor win.
+        Returns: {row number: {'instance', 'values', 'trade', 'regions'}}
+        """
+        value_fields = list(TEXT_COLUMNS.values()) + ['pqq_status', 'insurance_expiry']
+        existing = {
+            subcontractor.pk: subcontractor
+            for subcontractor in Subcontractor.objects.only('id', 'trade_id', *value_fields)
         }
-        
-        # Process each row
-        for _, row in df.iterrows():
-            # Skip rows without company or email
-            if pd.isna(row.get('Company')) or pd.isna(row.get('Email')):
-                stats['skipped'] += 1
+        by_email = {}
+        by_key = {}
+        for subcontractor in existing.values():
+            by_email.setdefault(subcontractor.email, subcontractor)
+            by_key[(subcontractor.company, subcontractor.head_office)] = subcontractor
+
+        latest = {}
+        new_targets = {}
+        for index, row in zip(rows.index, rows.to_dict('records')):
+            key = (row['company'], row['head_office'])
+            instance = by_email.get(row['email']) or by_key.get(key)
+            if instance is not None:
+                target = ('existing', instance.pk)
+            else:
+                # Rows new to the database still merge with each other by email or company + head office
+                target = new_targets.get(('email', row['email'])) or new_targets.get(('key', key)) or ('new', index)
+                new_targets[('email', row['email'])] = new_targets[('key', key)] = target
+
+            if target in latest:
+                report.counts['duplicates'] += 1
+            latest[target] = (index + 2, row)
+
+        records = {}
+        owners = {key: ('existing', subcontractor.pk) for key, subcontractor in by_key.items()}
+        for target, (row_number, row) in sorted(latest.items(), key=lambda item: item[1][0]):
+            key = (row['company'], row['head_office'])
+
+            # Company + head office is unique - refuse a row that would collide with another subcontractor
+            owner = owners.get(key)
+            if owner is not None and owner != target:
+                report.error(row_number, f"{key[0]} ({key[1]}) already belongs to another subcontractor")
                 continue
-            
-            try:
-                # Get or create trade
-                trade_name = row.get('Trade')
-                if pd.isna(trade_name):
-                    trade = None
-                else:
-                    if trade_name not in existing_trades:
-                        trade = Trade.objects.create(name=trade_name)
-                        existing_trades[trade_name] = trade
-                    else:
-                        trade = existing_trades[trade_name]
-                
-                # Process regions
-                regions_text = row.get('Regions they opperate')
-                region_objs = []
-                if not pd.isna(regions_text):
-                    region_names = [r.strip() for r in str(regions_text).split(',')]
-                    for region_name in region_names:
-                        if region_name not in existing_regions:
-                            region = Region.objects.create(name=region_name)
-                            existing_regions[region_name] = region
-                        else:
-                            region = existing_regions[region_name]
-                        region_objs.append(region)
-                
-                # Map PQQ status
-                pqq_value = row.get('PQQ ')
-                if pd.isna(pqq_value):
-                    pqq_status = 'NONE'
-                elif 'complete' in str(pqq_value).lower():
-                    pqq_status = 'COMPLETED'
-                elif 'sent' in str(pqq_value).lower():
-                    pqq_status = 'SENT'
-                else:
-                    pqq_status = 'NONE'
-                
-                # Parse dates (handle DD/MM/YYYY format)
-                insurance_expiry = None
-                if not pd.isna(row.get('Insurance Exp')):
-                    try:
-                        # Try to parse the date in various formats
-                        date_str = str(row.get('Insurance Exp')).strip()
-                        try:
-                            # Try DD/MM/YYYY format
-                            insurance_expiry = datetime.strptime(date_str, '%d/%m/%Y').date()
-                        except ValueError:
-                            # Try other common formats
-                            try:
-                                insurance_expiry = datetime.strptime(date_str, '%Y-%m-%d').date()
-                            except ValueError:
-                                # If all parsing fails, leave as None
-                                self.stdout.write(f"  Warning: Could not parse date '{date_str}' for {row.get('Company')}")
-                    except Exception as e:
-                        self.stdout.write(f"  Warning: Date parsing error for {row.get('Company')}: {str(e)}")
-                
-                # Create or update subcontractor
-                try:
-                    # First try to find by email (most unique)
-                    existing = Subcontractor.objects.filter(email=row.get('Email')).first()
-                    
-                    if not existing:
-                        # If not found by email, try company+head_office
-                        existing = Subcontractor.objects.filter(
-                            company=row.get('Company'),
-                            head_office=row.get('Head Office ') if not pd.isna(row.get('Head Office ')) else ''
-                        ).first()
-                    
-                    if existing:
-                        # Update existing record
-                        existing.trade = trade
-                        existing.head_office = row.get('Head Office ') if not pd.isna(row.get('Head Office ')) else ''
-                        existing.pqq_status = pqq_status
-                        existing.first_name = row.get('First Name') if not pd.isna(row.get('First Name')) else ''
-                        existing.surname = row.get('Surname') if not pd.isna(row.get('Surname')) else ''
-                        existing.mobile = row.get('Mobile') if not pd.isna(row.get('Mobile')) else ''
-                        existing.landline = row.get('__EMPTY') if not pd.isna(row.get('__EMPTY')) else ''
-                        existing.website = row.get('Website') if not pd.isna(row.get('Website')) else ''
-                        existing.insurance_expiry = insurance_expiry
-                        existing.save()
-                        
-                        # Update regions (many-to-many)
-                        existing.regions.set(region_objs)
-                        
-                        stats['updated'] += 1
-                        
-                    else:
-                        # Create new record
-                        subcontractor = Subcontractor.objects.create(
-                            trade=trade,
-                            company=row.get('Company'),
-                            head_office=row.get('Head Office ') if not pd.isna(row.get('Head Office ')) else '',
-                            pqq_status=pqq_status,
-                            first_name=row.get('First Name') if not pd.isna(row.get('First Name')) else '',
-                            surname=row.get('Surname') if not pd.isna(row.get('Surname')) else '',
-                            email=row.get('Email'),
-                            mobile=row.get('Mobile') if not pd.isna(row.get('Mobile')) else '',
-                            landline=row.get('__EMPTY') if not pd.isna(row.get('__EMPTY')) else '',
-                            website=row.get('Website') if not pd.isna(row.get('Website')) else '',
-                            insurance_expiry=insurance_expiry,
-                        )
-                        
-                        # Add regions (many-to-many)
-                        subcontractor.regions.set(region_objs)
-                        
-                        stats['created'] += 1
-                
-                except Exception as e:
-                    self.stderr.write(f"Error processing {row.get('Company')}: {str(e)}")
-                    stats['errors'] += 1
-                    
-            except Exception as e:
-                self.stderr.write(f"Error processing {row.get('Company')}: {str(e)}")
-                stats['errors'] += 1
-        
-        # Report results
-        self.stdout.write(self.style.SUCCESS(f"Import complete:"))
-        self.stdout.write(f"  Created: {stats['created']}")
-        self.stdout.write(f"  Updated: {stats['updated']}")
-        self.stdout.write(f"  Skipped: {stats['skipped']}")
-        self.stdout.write(f"  Errors: {stats['errors']}")
\ No newline at end of file
+            owners[key] = target
+
+            records[row_number] = {
+                'instance': existing[target[1]] if target[0] == 'existing' else None,
+                'values': {field: row[field] for field in value_fields},
+                'trade': row['trade'],
+                'regions': row['regions'],
+            }
+        return records
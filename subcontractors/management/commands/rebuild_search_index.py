@@ -0,0 +1,21 @@
+# subcontractors/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+from subcontractors.search import rebuild_search_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the subcontractor directory search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subcontractor-id',
+            type=int,
+            action='append',
+            help='Only reindex the given subcontractor (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Rebuilding subcontractor search index...")
+
+        documents = rebuild_search_index(subcontractor_ids=options['subcontractor_id'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Search index rebuilt for {documents} subcontractors"))
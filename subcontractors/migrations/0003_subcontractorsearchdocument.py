@@ -0,0 +1,124 @@
+# Generated by Django 5.2.3 on 2026-10-18 22:20
+
+import re
+import sqlite3
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The trigram tokenizer arrived in SQLite 3.34 - older versions search without the FTS table
+MIN_TRIGRAM_SQLITE = (3, 34, 0)
+
+DOCUMENT_TABLE = "subcontractors_subcontractorsearchdocument"
+FTS_TABLE = "subcontractors_search_fts"
+
+SQLITE_INDEX = [
+    # External-content FTS5 table: the documents hold the text, the index only the trigrams
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        company, details,
+        content='{DOCUMENT_TABLE}', content_rowid='subcontractor_id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER subcontractors_search_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, company, details)
+        VALUES (new.subcontractor_id, new.company, new.details);
+    END""",
+    f"""CREATE TRIGGER subcontractors_search_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, company, details)
+        VALUES ('delete', old.subcontractor_id, old.company, old.details);
+    END""",
+    f"""CREATE TRIGGER subcontractors_search_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, company, details)
+        VALUES ('delete', old.subcontractor_id, old.company, old.details);
+        INSERT INTO {FTS_TABLE}(rowid, company, details)
+        VALUES (new.subcontractor_id, new.company, new.details);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS subcontractors_search_ai",
+    "DROP TRIGGER IF EXISTS subcontractors_search_ad",
+    "DROP TRIGGER IF EXISTS subcontractors_search_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_INDEX = [
+    f"""CREATE INDEX subcontractor_search_vector_idx ON {DOCUMENT_TABLE} USING GIN ((
+        setweight(to_tsvector('simple', company), 'A') || setweight(to_tsvector('simple', details), 'B')
+    ))""",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS subcontractor_search_vector_idx"]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX}
+    if sqlite3.sqlite_version_info < MIN_TRIGRAM_SQLITE:
+        statements["sqlite"] = []
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def populate_search_documents(apps, schema_editor):
+    Subcontractor = apps.get_model("subcontractors", "Subcontractor")
+    SubcontractorSearchDocument = apps.get_model("subcontractors", "SubcontractorSearchDocument")
+
+    def normalize(text):
+        return " ".join(re.findall(r"[^\W_]+", str(text or "").lower()))
+
+    documents = []
+    for subcontractor in Subcontractor.objects.select_related("trade").prefetch_related("regions"):
+        details = [
+            subcontractor.first_name,
+            subcontractor.surname,
+            subcontractor.email,
+            subcontractor.head_office,
+            subcontractor.trade.name,
+            *(region.name for region in subcontractor.regions.all()),
+        ]
+        documents.append(
+            SubcontractorSearchDocument(
+                subcontractor_id=subcontractor.pk,
+                company=normalize(subcontractor.company),
+                details=normalize(" ".join(filter(None, details))),
+            )
+        )
+    SubcontractorSearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subcontractors", "0002_alter_subcontractor_email"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubcontractorSearchDocument",
+            fields=[
+                (
+                    "subcontractor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="subcontractors.subcontractor",
+                    ),
+                ),
+                ("company", models.TextField(blank=True)),
+                (
+                    "details",
+                    models.TextField(
+                        blank=True,
+                        help_text="Contact, email, head office, trade and regions",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_search_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 22:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# The table starts empty: geocoding depends on the current gazetteer, so it is not
+# frozen into this migration. The post_migrate receiver in subcontractors.signals
+# geocodes the existing head offices while the table is empty; from then on the
+# save signals keep it in step.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subcontractors", "0003_subcontractorsearchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubcontractorLocation",
+            fields=[
+                (
+                    "subcontractor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="geolocation",
+                        serialize=False,
+                        to="subcontractors.subcontractor",
+                    ),
+                ),
+                ("latitude", models.FloatField()),
+                ("longitude", models.FloatField()),
+                (
+                    "place",
+                    models.CharField(
+                        help_text="Gazetteer entry the head office was matched to",
+                        max_length=100,
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -52,4 +52,33 @@ class Subcontractor(models.Model):
         return f"{self.company} ({self.trade})"
 
     def full_name(self):
-        return f"{self.first_name} {self.surname}".strip() or "No contact name"
\ No newline at end of file
+        return f"{self.first_name} {self.surname}".strip() or "No contact name"
+
+class SubcontractorSearchDocument(models.Model):
+    """
+    Normalised text of a subcontractor for the directory search - see subcontractors/search.
+    Kept in step by signals; the full-text index over it is maintained by the database.
+    """
+    subcontractor = models.OneToOneField(
+        Subcontractor, on_delete=models.CASCADE, primary_key=True, related_name='search_document'
+    )
+    company = models.TextField(blank=True)
+    details = models.TextField(blank=True, help_text="Contact, email, head office, trade and regions")
+
+    def __str__(self):
+        return self.company
+
+class SubcontractorLocation(models.Model):
+    """
+    Coordinates of a subcontractor's head office from the offline gazetteer - see subcontractors/geo.
+    Kept in step by signals; subcontractors whose head office is not recognised have no row.
+    """
+    subcontractor = models.OneToOneField(
+        Subcontractor, on_delete=models.CASCADE, primary_key=True, related_name='geolocation'
+    )
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    place = models.CharField(max_length=100, help_text="Gazetteer entry the head office was matched to")
+
+    def __str__(self):
+        return f"{self.subcontractor_id}: {self.place}"
@@ -0,0 +1,234 @@
+# subcontractors/search.py
+"""
+Ranked directory search over SubcontractorSearchDocument.
+
+SQLite: an FTS5 table with the trigram tokenizer - words match anywhere in a
+field, as icontains did, and results are ranked with bm25.
+PostgreSQL: a GIN index on the weighted tsvector of the document - words match
+as prefixes and results are ranked with ts_rank.
+Other databases, and SQLite older than 3.34 (no trigram tokenizer), fall back
+to icontains on the documents.
+The index itself is created in migration 0003 and, on SQLite, kept in step
+with the documents by triggers.
+"""
+import logging
+import re
+import sqlite3
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'subcontractors_search_fts'
+
+# Matches in the company name count for more than matches elsewhere
+COMPANY_WEIGHT = 10.0
+
+# Trigrams need three characters - shorter words are matched with LIKE
+MIN_TRIGRAM_LENGTH = 3
+
+# The trigram tokenizer arrived in SQLite 3.34 - migration 0003 creates no FTS table before that
+MIN_TRIGRAM_SQLITE = (3, 34, 0)
+
+# Searched as typed when a term has no letters or digits ('@')
+CONTACT_FIELDS = ['company', 'first_name', 'surname', 'email']
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Lower-case words of letters and digits, punctuation dropped - 'J.Smith@Acme.co.uk' -> 'j smith acme co uk'"""
+    return ' '.join(WORD_RE.findall(str(text or '').lower()))
+
+
+def search_words(term):
+    """Distinct words of a search term, in order"""
+    return list(dict.fromkeys(normalize(term).split()))
+
+
+# Index maintenance
+
+def _documents(subcontractor_ids=None):
+    from .models import Subcontractor, SubcontractorSearchDocument
+
+    subcontractors = Subcontractor.objects.order_by()
+    links = Subcontractor.regions.through.objects.order_by()
+    if subcontractor_ids is not None:
+        subcontractors = subcontractors.filter(pk__in=subcontractor_ids)
+        links = links.filter(subcontractor_id__in=subcontractor_ids)
+
+    regions = defaultdict(list)
+    for subcontractor_id, region in links.values_list('subcontractor_id', 'region__name').iterator():
+        regions[subcontractor_id].append(region)
+
+    rows = subcontractors.values_list(
+        'id', 'company', 'first_name', 'surname', 'email', 'head_office', 'trade__name'
+    ).iterator()
+    for subcontractor_id, company, first_name, surname, email, head_office, trade in rows:
+        details = [first_name, surname, email, head_office, trade, *regions[subcontractor_id]]
+        yield SubcontractorSearchDocument(
+            subcontractor_id=subcontractor_id,
+            company=normalize(company),
+            details=normalize(' '.join(filter(None, details))),
+        )
+
+
+def rebuild_search_index(subcontractor_ids=None):
+    """Rebuild the search documents for all (or the given) subcontractors, returns documents written"""
+    from .models import SubcontractorSearchDocument
+
+    existing = SubcontractorSearchDocument.objects.all()
+    if subcontractor_ids is not None:
+        existing = existing.filter(subcontractor_id__in=subcontractor_ids)
+
+    documents = list(_documents(subcontractor_ids))
+    with transaction.atomic():
+        existing.delete()
+        SubcontractorSearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+    if subcontractor_ids is None:
+        logger.info(f"🔎 Search index rebuilt with {len(documents)} subcontractors")
+    return len(documents)
+
+
+# Searching
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _sqlite_query(words, document_table):
+    trigram_words = [word for word in words if len(word) >= MIN_TRIGRAM_LENGTH]
+    short_words = [word for word in words if len(word) < MIN_TRIGRAM_LENGTH]
+
+    conditions = []
+    params = []
+    if trigram_words:
+        # Words are letters and digits only, so quoting each as a phrase is safe
+        sql = (
+            f'SELECT d.subcontractor_id FROM {FTS_TABLE} '
+            f'JOIN {document_table} d ON d.subcontractor_id = {FTS_TABLE}.rowid'
+        )
+        conditions.append(f'{FTS_TABLE} MATCH %s')
+        params.append(' '.join(f'"{word}"' for word in trigram_words))
+        order = f'bm25({FTS_TABLE}, {COMPANY_WEIGHT}, 1.0), d.company'
+    else:
+        sql = f'SELECT d.subcontractor_id FROM {document_table} d'
+        order = 'd.company'
+
+    for word in short_words:
+        conditions.append("(d.company LIKE %s OR d.details LIKE %s)")
+        params.extend([f'%{word}%'] * 2)
+    return sql, conditions, params, order, []
+
+
+def _postgres_query(words, document_table):
+    # Same expression as the GIN index in migration 0003, so the planner can use it
+    vector = (
+        "(setweight(to_tsvector('simple', d.company), 'A') || "
+        "setweight(to_tsvector('simple', d.details), 'B'))"
+    )
+    query = "to_tsquery('simple', %s)"
+    prefixes = ' & '.join(f'{word}:*' for word in words)
+    sql = f'SELECT d.subcontractor_id FROM {document_table} d'
+    return sql, [f'{vector} @@ {query}'], [prefixes], f'ts_rank({vector}, {query}) DESC, d.company', [prefixes]
+
+
+@lru_cache(maxsize=None)
+def _sqlite_fts_available(database_name):
+    """Whether this SQLite database has the FTS table - checked once per database"""
+    if sqlite3.sqlite_version_info < MIN_TRIGRAM_SQLITE:
+        return False
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def _fallback_query(words, document_table):
+    conditions = []
+    params = []
+    for word in words:
+        conditions.append("(UPPER(d.company) LIKE UPPER(%s) OR UPPER(d.details) LIKE UPPER(%s))")
+        params.extend([f'%{word}%'] * 2)
+    return f'SELECT d.subcontractor_id FROM {document_table} d', conditions, params, 'd.company', []
+
+
+def ranked_ids(term, within=None):
+    """
+    Ids of the subcontractors matching every word of a search term, best match first.
+    within: optional Subcontractor queryset (trade, region filters...) the results must belong to
+    Returns: list of ids, without duplicates - one document per subcontractor
+    """
+    from .models import SubcontractorSearchDocument
+
+    words = search_words(term)
+    if not words:
+        return _contains_ids(term, within)
+
+    document_table = _quote(SubcontractorSearchDocument._meta.db_table)
+    builders = {'sqlite': _sqlite_query, 'postgresql': _postgres_query}
+    build = builders.get(connection.vendor, _fallback_query)
+    if build is _sqlite_query and not _sqlite_fts_available(connection.settings_dict['NAME']):
+        build = _fallback_query
+    # (select, WHERE conditions, their params, ORDER BY, its params)
+    sql, conditions, params, order, order_params = build(words, document_table)
+
+    if within is not None:
+        within_sql, within_params = within.order_by().values('pk').query.sql_with_params()
+        conditions.append(f'd.subcontractor_id IN ({within_sql})')
+        params.extend(within_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"{sql} WHERE {' AND '.join(conditions)} ORDER BY {order}", [*params, *order_params])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _contains_ids(term, within=None):
+    """Ids of the subcontractors with a term as typed in a contact field, by company - the search before the index"""
+    from .models import Subcontractor
+
+    term = term.strip()
+    if not term:
+        return []
+
+    subcontractors = Subcontractor.objects.all()
+    if within is not None:
+        subcontractors = subcontractors.filter(pk__in=within.order_by().values('pk'))
+    matches = Q()
+    for field in CONTACT_FIELDS:
+        matches |= Q(**{f'{field}__icontains': term})
+    return list(subcontractors.filter(matches).order_by('company').values_list('pk', flat=True))
+
+
+class RankedResults:
+    """
+    Ranked search results for a Paginator: the matching ids are held in memory
+    and subcontractors are only loaded for the page being shown
+    """
+
+    def __init__(self, ids, queryset=None):
+        from .models import Subcontractor
+
+        self.ids = ids
+        self.queryset = queryset if queryset is not None else (
+            Subcontractor.objects.select_related('trade').prefetch_related('regions')
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0] if index >= 0 else self[len(self) + index]
+        ids = self.ids[index]
+        subcontractors = self.queryset.in_bulk(ids)
+        return [subcontractors[pk] for pk in ids if pk in subcontractors]
+
+
+def search_subcontractors(term, within=None):
+    """Subcontractors matching a search term as RankedResults"""
+    return RankedResults(ranked_ids(term, within=within))
@@ -0,0 +1,93 @@
+# subcontractors/signals.py
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from .geo import rebuild_locations
+from .models import Region, Subcontractor, SubcontractorLocation, Trade
+from .search import rebuild_search_index
+
+# Subcontractor fields that appear in the search document
+SEARCH_FIELDS = {'company', 'first_name', 'surname', 'email', 'head_office', 'trade'}
+
+
+@receiver(post_save, sender=Subcontractor)
+def update_search_document(sender, instance, created, raw=False, **kwargs):
+    """Keep the subcontractor's search document in step with its fields"""
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    rebuild_search_index([instance.pk])
+
+
+@receiver(post_save, sender=Subcontractor)
+def update_location(sender, instance, created, raw=False, **kwargs):
+    """Geocode the head office again when it changes"""
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'head_office' not in update_fields:
+        return
+    rebuild_locations([instance.pk])
+
+
+@receiver(post_migrate)
+def backfill_locations(sender, app_config=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Geocode the existing head offices once the location table exists and is still empty"""
+    # rebuild_locations writes to the default database
+    if app_config is None or app_config.label != 'subcontractors' or using != DEFAULT_DB_ALIAS:
+        return
+    # Migrating back past 0004 drops the table
+    if SubcontractorLocation._meta.db_table not in connection.introspection.table_names():
+        return
+    if SubcontractorLocation.objects.exists() or not Subcontractor.objects.exists():
+        return
+    rebuild_locations()
+
+
+@receiver(m2m_changed, sender=Subcontractor.regions.through)
+def update_search_regions(sender, instance, action, reverse, pk_set, **kwargs):
+    """Region names are part of the document - reindex when the regions change"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        rebuild_search_index([instance.pk])
+    elif pk_set:
+        rebuild_search_index(list(pk_set))
+    elif action == 'post_clear':
+        # region.subcontractor_set.clear() does not say which subcontractors were removed
+        rebuild_search_index()
+
+
+@receiver(post_save, sender=Trade)
+def update_search_trade(sender, instance, created, raw=False, **kwargs):
+    """Reindex a trade's subcontractors when it is renamed"""
+    update_fields = kwargs.get('update_fields')
+    if raw or created or (update_fields is not None and 'name' not in update_fields):
+        return
+    rebuild_search_index(list(instance.subcontractors.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Region)
+def update_search_region(sender, instance, created, raw=False, **kwargs):
+    """Reindex a region's subcontractors when it is renamed"""
+    update_fields = kwargs.get('update_fields')
+    if raw or created or (update_fields is not None and 'name' not in update_fields):
+        return
+    rebuild_search_index(list(instance.subcontractor_set.values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=Region)
+def remember_region_subcontractors(sender, instance, **kwargs):
+    # The memberships are gone by post_delete
+    instance._search_subcontractor_ids = list(instance.subcontractor_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Region)
+def update_search_region_deleted(sender, instance, **kwargs):
+    """Drop a deleted region's name from its subcontractors' documents"""
+    subcontractor_ids = getattr(instance, '_search_subcontractor_ids', None)
+    if subcontractor_ids:
+        rebuild_search_index(subcontractor_ids)
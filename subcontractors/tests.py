@@ -1,3 +1,225 @@
+import importlib
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models.signals import post_migrate
 from django.test import TestCase
+from django.urls import reverse
+
+import numpy as np
+
+from .geo import ProximityIndex, distances_miles, geocode
+from .models import Region, Subcontractor, SubcontractorLocation, SubcontractorSearchDocument, Trade
+from .search import ranked_ids, search_subcontractors
+
+
+class SubcontractorSearchTests(TestCase):
+    """Search documents kept in step by signals, and ranked directory search"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roofing = Trade.objects.create(name='Roofing')
+        cls.groundworks = Trade.objects.create(name='Groundworks')
+        cls.yorkshire = Region.objects.create(name='Yorkshire')
+
+        def subcontractor(company, trade, head_office, email, **fields):
+            return Subcontractor.objects.create(
+                company=company, trade=trade, head_office=head_office, email=email, **fields
+            )
+
+        cls.pennine = subcontractor(
+            'Pennine Roofing Ltd', cls.roofing, 'Halifax', 'estimating@pennineroofing.co.uk',
+            first_name='Sarah', surname='Walker',
+        )
+        cls.acme = subcontractor('Acme Groundworks', cls.groundworks, 'Pennine House, Leeds', 'info@acme-gw.co.uk')
+        cls.castle = subcontractor('Castle Roofing', cls.roofing, 'Newcastle', 'jo@castleroofs.com; bids@castleroofs.com')
+
+    def test_document_follows_subcontractor_changes(self):
+        document = SubcontractorSearchDocument.objects.get(subcontractor=self.acme)
+        self.assertEqual(document.company, 'acme groundworks')
+        self.assertIn('info acme gw co uk', document.details)
+
+        self.acme.regions.add(self.yorkshire)
+        self.assertEqual(ranked_ids('yorkshire'), [self.acme.id])
+
+        self.groundworks.name = 'Civils'
+        self.groundworks.save()
+        self.assertEqual(ranked_ids('civils'), [self.acme.id])
+
+        self.yorkshire.delete()
+        self.assertEqual(ranked_ids('yorkshire'), [])
+
+        self.acme.delete()
+        self.assertFalse(SubcontractorSearchDocument.objects.filter(subcontractor_id=self.acme.id).exists())
+
+    def test_company_matches_rank_first(self):
+        # Pennine is the company name of one and the head office of the other
+        self.assertEqual(ranked_ids('pennine'), [self.pennine.id, self.acme.id])
+
+    def test_every_word_must_match_anywhere_in_a_field(self):
+        self.assertEqual(ranked_ids('sarah walker'), [self.pennine.id])
+        self.assertEqual(ranked_ids('castleroofs'), [self.castle.id])
+        self.assertEqual(ranked_ids('ewcast'), [self.castle.id])
+        self.assertEqual(ranked_ids('gw'), [self.acme.id])
+        self.assertEqual(ranked_ids('roofing leeds'), [])
+        self.assertEqual(ranked_ids(' ;; '), [])
+
+    def test_punctuation_only_search_matches_as_typed(self):
+        self.assertEqual(ranked_ids('@'), [self.acme.id, self.castle.id, self.pennine.id])
+        self.assertEqual(ranked_ids(' @ ', within=Subcontractor.objects.filter(trade=self.roofing)), [
+            self.castle.id, self.pennine.id,
+        ])
+
+    def test_sqlite_without_trigrams_searches_the_documents(self):
+        migration = importlib.import_module('subcontractors.migrations.0003_subcontractorsearchdocument')
+        schema_editor = mock.Mock(connection=mock.Mock(vendor='sqlite'))
+        with mock.patch('sqlite3.sqlite_version_info', (3, 31, 1)):
+            migration.create_search_index(apps, schema_editor)
+        schema_editor.execute.assert_not_called()
+
+        with mock.patch('subcontractors.search._sqlite_fts_available', return_value=False):
+            self.assertEqual(ranked_ids('sarah walker'), [self.pennine.id])
+            self.assertEqual(ranked_ids('roofing'), [self.castle.id, self.pennine.id])
+
+    def test_search_within_filters(self):
+        roofers = Subcontractor.objects.filter(trade=self.roofing)
+        self.assertEqual(set(ranked_ids('roof', within=roofers)), {self.pennine.id, self.castle.id})
+        self.assertEqual(ranked_ids('acme', within=roofers), [])
+
+    def test_results_load_one_page(self):
+        results = search_subcontractors('roofing')
+        self.assertEqual(len(results), 2)
+        with self.assertNumQueries(2):
+            page = results[1:2]
+        self.assertEqual(len(page), 1)
+        self.assertEqual(page[0].regions.all().count(), 0)
+
+    def test_list_view_search(self):
+        user = get_user_model().objects.create_user('estimator', password='password')
+        self.client.force_login(user)
+        self.castle.regions.add(self.yorkshire)
+
+        response = self.client.get(reverse('subcontractors:list'), {'search': 'roofing', 'region': self.yorkshire.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['subcontractors']), [self.castle])
+
+
+class GeoTests(TestCase):
+    """Offline geocoding of head offices and radius searches over the proximity index"""
+
+    def test_geocode_prefers_the_most_precise_place(self):
+        self.assertEqual(geocode('Unit 4, York Road, Leeds LS9 8AA').place, 'Leeds')
+        self.assertEqual(geocode('Acme House, WF1 2AB').place, 'WF postcode area')
+        self.assertEqual(geocode('Newcastle upon Tyne').place, 'Newcastle upon Tyne')
+        self.assertEqual(geocode('Bradford-on-Avon, Wiltshire').place, 'Bradford on Avon')
+        self.assertEqual(geocode('West Yorkshire').place, 'West Yorkshire')
+        self.assertIsNone(geocode('Head office TBC'))
+        self.assertIsNone(geocode(''))
+
+    def test_location_follows_head_office(self):
+        subcontractor = Subcontractor.objects.create(
+            company='Moving Roofing', trade=Trade.objects.create(name='Roofing'),
+            head_office='Wakefield', email='info@movingroofing.co.uk',
+        )
+        self.assertEqual(subcontractor.geolocation.place, 'Wakefield')
+
+        subcontractor.head_office = 'Somewhere unknown'
+        subcontractor.save(update_fields=['head_office'])
+        self.assertFalse(SubcontractorLocation.objects.filter(subcontractor=subcontractor).exists())
+
+    def test_empty_locations_are_backfilled_after_migrate(self):
+        subcontractor = Subcontractor.objects.create(
+            company='Backfill Roofing', trade=Trade.objects.create(name='Roofing'),
+            head_office='Wakefield', email='info@backfillroofing.co.uk',
+        )
+        SubcontractorLocation.objects.all().delete()
+
+        post_migrate.send(sender=self.__class__, app_config=apps.get_app_config('subcontractors'), using='default')
+        self.assertEqual(SubcontractorLocation.objects.get(subcontractor=subcontractor).place, 'Wakefield')
+
+        with self.assertLogs('subcontractors.geo', 'WARNING'):
+            SubcontractorLocation.objects.all().delete()
+            self.assertEqual(len(ProximityIndex.build()), 0)
+
+    def test_within_matches_a_full_scan(self):
+        rng = np.random.default_rng(1)
+        latitudes, longitudes = rng.uniform(50, 58.5, 5000), rng.uniform(-5.5, 1.7, 5000)
+        trade_ids = rng.integers(0, 4, 5000)
+        latitudes[::50] = np.nan
+        index = ProximityIndex(np.arange(5000), latitudes, longitudes, trade_ids)
+
+        leeds = geocode('Leeds')
+        distances = distances_miles(leeds.latitude, leeds.longitude, latitudes, longitudes)
+        for miles in (10, 50, 150):
+            positions, found = index.within(leeds.latitude, leeds.longitude, miles, trade_ids=[1, 2])
+            expected = np.flatnonzero((distances <= miles) & np.isin(trade_ids, [1, 2]))
+            self.assertEqual(sorted(positions.tolist()), expected.tolist())
+            self.assertTrue(np.all(np.diff(found) >= 0))
+
+
+class SubcontractorImportTests(TestCase):
+    """import_subcontractors: bulk planned writes, dry runs and re-imports"""
+
+    HEADER = 'Company,Email,Head Office ,Trade,Regions they opperate,PQQ ,Insurance Exp\n'
+    ROWS = [
+        'Ridge Roofing,bids@ridgeroofing.co.uk,Leeds,Roofing,"Yorkshire, North East",Sent,31/12/2030\n',
+        'Dale Groundworks,info@dalegw.co.uk,York,Groundworks,Yorkshire,Complete,2030-06-30\n',
+        'No Email Ltd,,Hull,Roofing,,,\n',
+        # Same email as the first row - the later row wins, its regions only are used
+        'Ridge Roofing,bids@ridgeroofing.co.uk,Leeds,Roofing,Yorkshire,Sent,31/12/2030\n',
+        'Old Ridge Roofing,bids@ridgeroofing.co.uk,Leeds,Roofing,Discarded Region,,\n',
+    ]
+
+    def run_import(self, rows, *args):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(self.HEADER + ''.join(rows))
+        self.addCleanup(os.remove, path)
+        out = io.StringIO()
+        call_command('import_subcontractors', path, *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_dry_run_writes_nothing(self):
+        output = self.run_import(self.ROWS[:3], '--dry-run')
+
+        self.assertIn('Created: 2', output)
+        self.assertIn('Skipped: 1', output)
+        self.assertIn('regions created: 2', output)
+        self.assertFalse(Subcontractor.objects.exists())
+        self.assertFalse(Region.objects.exists())
+        self.assertFalse(Trade.objects.exists())
+
+    def test_import_and_reimport(self):
+        output = self.run_import(self.ROWS[:3])
+
+        self.assertIn('Created: 2', output)
+        ridge = Subcontractor.objects.get(email='bids@ridgeroofing.co.uk')
+        self.assertEqual(ridge.trade.name, 'Roofing')
+        self.assertEqual(ridge.pqq_status, 'SENT')
+        self.assertEqual(str(ridge.insurance_expiry), '2030-12-31')
+        self.assertEqual(sorted(ridge.regions.values_list('name', flat=True)), ['North East', 'Yorkshire'])
+        # The bulk writes rebuild the indexes the signals would have maintained
+        self.assertTrue(SubcontractorSearchDocument.objects.filter(subcontractor=ridge).exists())
+        self.assertEqual(ridge.geolocation.place, 'Leeds')
+
+        output = self.run_import(self.ROWS[:3])
+        self.assertIn('Created: 0', output)
+        self.assertIn('Unchanged: 2', output)
+
+        output = self.run_import(self.ROWS[1:4])
+        self.assertIn('Updated: 0', output)
+        self.assertIn('regions links removed: 1', output)
+        self.assertEqual(list(ridge.regions.values_list('name', flat=True)), ['Yorkshire'])
+        self.assertEqual(Subcontractor.objects.count(), 2)
+
+    def test_discarded_duplicates_create_no_regions(self):
+        output = self.run_import([self.ROWS[4], self.ROWS[0]])
 
-# Create your tests here.
+        self.assertIn('Duplicates: 1', output)
+        self.assertEqual(Subcontractor.objects.get().company, 'Ridge Roofing')
+        self.assertEqual(sorted(Region.objects.values_list('name', flat=True)), ['North East', 'Yorkshire'])
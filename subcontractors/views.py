@@ -9,10 +9,13 @@ from datetime import timedelta
 from django.db import models
 from .models import Subcontractor, Trade, Region
 from .forms import SubcontractorForm, TradeForm
+from .search import search_subcontractors
 
 class SubcontractorListView(LoginRequiredMixin, ListView):
     model = Subcontractor
     context_object_name = 'subcontractors'
+    # Searches return RankedResults rather than a QuerySet, so the template is named
+    template_name = 'subcontractors/subcontractor_list.html'
     paginate_by = 20
     
     def get_queryset(self):
@@ -28,17 +31,12 @@ class SubcontractorListView(LoginRequiredMixin, ListView):
         if region_id:
             queryset = queryset.filter(regions__id=region_id)
         
-        # Search by name or company
+        # Ranked search over the search index, within the trade and region filters
         search = self.request.GET.get('search')
         if search:
-            queryset = queryset.filter(
-                models.Q(company__icontains=search) | 
-                models.Q(first_name__icontains=search) | 
-                models.Q(surname__icontains=search) |
-                models.Q(email__icontains=search)
-            )
+            return search_subcontractors(search, within=queryset if trade_id or region_id else None)
         
-        return queryset
+        return queryset.select_related('trade').prefetch_related('regions')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -1,8 +1,9 @@
 # tenders/admin.py - Fixed version without SubcontractorRecommendation
 from django.contrib import admin
+from .instrumentation import stage_percentiles
 from .models import (
     TenderInvitation, TenderDocument, TenderAddendum, TenderAnalysis,
-    TenderQuestion, RFIItem, DocumentQuestion
+    TenderQuestion, RFIItem, DocumentQuestion, AnalysisRunMetrics, SubcontractorStats
 )
 
 @admin.register(TenderInvitation)
@@ -12,6 +13,18 @@ class TenderInvitationAdmin(admin.ModelAdmin):
     search_fields = ('project__name', 'subcontractor__company')
     date_hierarchy = 'email_sent'
 
+@admin.register(SubcontractorStats)
+class SubcontractorStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'subcontractor', 'invitation_count', 'accepted_count', 'declined_count', 'returned_count',
+        'acceptance_rate', 'return_rate', 'average_response_time'
+    )
+    search_fields = ('subcontractor__company',)
+    list_select_related = ('subcontractor', 'subcontractor__trade')
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(TenderDocument)
 class TenderDocumentAdmin(admin.ModelAdmin):
     list_display = ('title', 'project', 'document_type', 'created_at')
@@ -106,4 +119,29 @@ try:
         search_fields = ('question_text', 'answer_text', 'project__name')
         readonly_fields = ('created_at',)
 except:
-    pass
\ No newline at end of file
+    pass
+
+@admin.register(AnalysisRunMetrics)
+class AnalysisRunMetricsAdmin(admin.ModelAdmin):
+    list_display = (
+        'started_at', 'project', 'analysis_type', 'succeeded', 'total_seconds',
+        'crawl_seconds', 'download_seconds', 'parse_seconds', 'llm_seconds', 'save_seconds',
+        'documents_parsed', 'input_tokens', 'output_tokens'
+    )
+    list_filter = ('analysis_type', 'succeeded', 'started_at')
+    search_fields = ('project__name', 'error')
+    date_hierarchy = 'started_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        # Percentiles over the filtered runs, shown above the list
+        changelist = getattr(response, 'context_data', {}).get('cl')
+        if changelist is not None:
+            response.context_data['stage_percentiles'] = stage_percentiles(changelist.queryset)
+        return response
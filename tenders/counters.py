@@ -0,0 +1,297 @@
+# tenders/counters.py
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from projects.models import Project
+from .stats import count_expressions
+
+logger = logging.getLogger(__name__)
+
+# Project counter field -> invitations it counts
+COUNTER_BUCKETS = {
+    'invitation_count': None,
+    'accepted_count': Q(status='ACCEPTED'),
+    'declined_count': Q(status='DECLINED'),
+    'returned_count': Q(tender_returned=True),
+    'pending_count': Q(status='PENDING', tender_returned=False),
+}
+
+# Fields a save must write for the counters to change
+COUNTED_FIELDS = {'project', 'subcontractor', 'status', 'tender_returned', 'response_date', 'sent_at'}
+
+STATE_FIELDS = ('project_id', 'status', 'tender_returned')
+
+# SubcontractorStats field -> invitations it counts; response_seconds is a sum, not a count
+STATS_FIELDS = (
+    'invitation_count', 'accepted_count', 'declined_count', 'returned_count',
+    'response_count', 'response_seconds',
+)
+
+STATS_STATE_FIELDS = ('subcontractor_id', 'status', 'tender_returned', 'response_date', 'sent_at')
+
+
+def counter_increments(project_id, status, tender_returned):
+    """(project_id, per-counter increments) an invitation contributes to its project"""
+    returned = bool(tender_returned)
+    return project_id, (
+        1,
+        int(status == 'ACCEPTED'),
+        int(status == 'DECLINED'),
+        int(returned),
+        int(status == 'PENDING' and not returned),
+    )
+
+
+def counter_state(invitation):
+    """Per-counter increments of an invitation instance, or None if the fields needed are not loaded"""
+    if any(field not in invitation.__dict__ for field in STATE_FIELDS):
+        return None
+    return counter_increments(*(getattr(invitation, field) for field in STATE_FIELDS))
+
+
+def stats_increments(subcontractor_id, status, tender_returned, response_date, sent_at):
+    """(subcontractor_id, per-field increments) an invitation contributes to SubcontractorStats"""
+    responded = response_date is not None and sent_at is not None
+    seconds = max(0, int((response_date - sent_at).total_seconds())) if responded else 0
+    return subcontractor_id, (
+        1,
+        int(status == 'ACCEPTED'),
+        int(status == 'DECLINED'),
+        int(bool(tender_returned)),
+        int(responded),
+        seconds,
+    )
+
+
+def stats_state(invitation):
+    """Per-field SubcontractorStats increments, or None if the fields needed are not loaded"""
+    if any(field not in invitation.__dict__ for field in STATS_STATE_FIELDS):
+        return None
+    return stats_increments(*(getattr(invitation, field) for field in STATS_STATE_FIELDS))
+
+
+def stored_states(invitation_ids, lock=True):
+    """
+    {invitation id: (counter state, stats state)} of the invitations as stored in the database.
+    lock: select_for_update, so nothing else changes them before the counters are adjusted
+    """
+    from .models import TenderInvitation
+
+    rows = TenderInvitation.objects.filter(pk__in=list(invitation_ids)).order_by()
+    if lock:
+        rows = rows.select_for_update()
+    return {
+        values[0]: (
+            counter_increments(values[1], values[3], values[4]),
+            stats_increments(*values[2:]),
+        )
+        for values in rows.values_list('id', 'project_id', *STATS_STATE_FIELDS)
+    }
+
+
+class _Deltas:
+    """Counter deltas per key (project or subcontractor), and the keys to recount instead"""
+
+    def __init__(self, width):
+        self.deltas = defaultdict(lambda: [0] * width)
+        self.recount = set()
+
+    def _add(self, state, sign):
+        key, increments = state
+        delta = self.deltas[key]
+        for index, increment in enumerate(increments):
+            delta[index] += sign * increment
+
+    def changed(self, old_state, new_state):
+        if old_state is not None:
+            self._add(old_state, -1)
+        if new_state is not None:
+            self._add(new_state, 1)
+
+    def deleted(self, key, old_state):
+        if old_state is None:
+            # Deferred fields - the deleted values are unknown
+            self.recount.add(key)
+            return
+        self._add(old_state, -1)
+
+    def changes(self):
+        """(key, delta) for every key with a change that is not being recounted"""
+        return [
+            (key, delta) for key, delta in self.deltas.items()
+            if key not in self.recount and any(delta)
+        ]
+
+
+class CounterChanges:
+    """
+    Accumulates counter deltas for projects and subcontractor stats and applies
+    them with one UPDATE per project and per subcontractor
+    """
+
+    def __init__(self):
+        self.projects = _Deltas(len(COUNTER_BUCKETS))
+        self.subcontractors = _Deltas(len(STATS_FIELDS))
+        # Subcontractors with a saved invitation - their stats row is created if missing
+        self.saved_subcontractors = set()
+
+    def changed(self, old, new):
+        """
+        An invitation written to the database.
+        old, new: its stored (counter state, stats state) before and after, None where there was no row
+        """
+        old_counters, old_stats = old or (None, None)
+        new_counters, new_stats = new or (None, None)
+        self.projects.changed(old_counters, new_counters)
+        self.subcontractors.changed(old_stats, new_stats)
+        if new_stats is not None:
+            self.saved_subcontractors.add(new_stats[0])
+
+    def deleted(self, invitation):
+        self.projects.deleted(invitation.project_id, counter_state(invitation))
+        self.subcontractors.deleted(invitation.subcontractor_id, stats_state(invitation))
+
+    def apply(self):
+        from .models import SubcontractorStats
+
+        for project_id, delta in self.projects.changes():
+            Project.objects.filter(pk=project_id).update(**{
+                field: F(field) + change
+                for field, change in zip(COUNTER_BUCKETS, delta)
+                if change
+            })
+
+        if self.projects.recount:
+            recount_project_counters(self.projects.recount)
+
+        missing = set()
+        for subcontractor_id, delta in self.subcontractors.changes():
+            updated = SubcontractorStats.objects.filter(pk=subcontractor_id).update(**{
+                field: F(field) + change
+                for field, change in zip(STATS_FIELDS, delta)
+                if change
+            })
+            if not updated:
+                missing.add(subcontractor_id)
+
+        # A subcontractor's first invitation has no stats row yet - build it from their history.
+        # Rows are only created for saves: during a cascade delete the subcontractor is on its way out.
+        created = (missing | self.subcontractors.recount) & self.saved_subcontractors
+        if created:
+            recount_subcontractor_stats(created)
+        if self.subcontractors.recount - created:
+            recount_subcontractor_stats(self.subcontractors.recount - created, create=False)
+
+        self.projects = _Deltas(len(COUNTER_BUCKETS))
+        self.subcontractors = _Deltas(len(STATS_FIELDS))
+        self.saved_subcontractors = set()
+
+
+@contextmanager
+def counted_bulk_update(invitation_ids):
+    """
+    Update project counters and subcontractor stats for invitations written with
+    bulk_update, which bypasses the post_save signal:
+
+        with counted_bulk_update(ids):
+            TenderInvitation.objects.bulk_update(...)
+
+    The rows are locked and read before and after, so the counters move by what was actually written.
+    """
+    with transaction.atomic():
+        before = stored_states(invitation_ids)
+        yield
+        after = stored_states(invitation_ids, lock=False)
+
+        changes = CounterChanges()
+        for invitation_id, new in after.items():
+            changes.changed(before.get(invitation_id), new)
+        changes.apply()
+
+
+def recount_project_counters(project_ids=None):
+    """
+    Recompute project counters from the invitations table.
+    Returns: number of projects whose counters were corrected
+    """
+    from .models import TenderInvitation
+
+    projects = Project.objects.only('id', *COUNTER_BUCKETS)
+    if project_ids is not None:
+        projects = projects.filter(id__in=project_ids)
+
+    with transaction.atomic():
+        projects = list(projects.select_for_update())
+
+        rows = TenderInvitation.objects.filter(
+            project_id__in=[project.id for project in projects]
+        ).values('project_id')
+        totals = {
+            row.pop('project_id'): row
+            for row in rows.annotate(**count_expressions(COUNTER_BUCKETS))
+        }
+
+        corrected = []
+        for project in projects:
+            counts = totals.get(project.id, {})
+            values = {field: counts.get(field, 0) for field in COUNTER_BUCKETS}
+            if any(getattr(project, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(project, field, value)
+                corrected.append(project)
+
+        Project.objects.bulk_update(corrected, list(COUNTER_BUCKETS), batch_size=500)
+
+    if corrected:
+        logger.info(f"🔢 Recounted invitation counters for {len(corrected)} projects")
+    return len(corrected)
+
+
+def recount_subcontractor_stats(subcontractor_ids=None, create=True):
+    """
+    Recompute SubcontractorStats from the invitations table.
+    Rows are created for subcontractors with invitations unless create is False.
+    Returns: number of subcontractors whose stats were created or corrected
+    """
+    from .models import SubcontractorStats, TenderInvitation
+
+    stats = SubcontractorStats.objects.all()
+    invitations = TenderInvitation.objects.order_by()
+    if subcontractor_ids is not None:
+        stats = stats.filter(subcontractor_id__in=subcontractor_ids)
+        invitations = invitations.filter(subcontractor_id__in=subcontractor_ids)
+
+    with transaction.atomic():
+        existing = {row.subcontractor_id: row for row in stats.select_for_update()}
+
+        # Summed with the same increments the signals apply, so both always agree
+        totals = defaultdict(lambda: [0] * len(STATS_FIELDS))
+        for values in invitations.values_list(*STATS_STATE_FIELDS).iterator():
+            subcontractor_id, increments = stats_increments(*values)
+            total = totals[subcontractor_id]
+            for index, increment in enumerate(increments):
+                total[index] += increment
+
+        new = []
+        corrected = []
+        for subcontractor_id in set(existing) | (set(totals) if create else set()):
+            values = dict(zip(STATS_FIELDS, totals.get(subcontractor_id, [0] * len(STATS_FIELDS))))
+            row = existing.get(subcontractor_id)
+            if row is None:
+                new.append(SubcontractorStats(subcontractor_id=subcontractor_id, **values))
+            elif any(getattr(row, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(row, field, value)
+                corrected.append(row)
+
+        # A concurrent first invitation may have created the row already
+        SubcontractorStats.objects.bulk_create(new, batch_size=500, ignore_conflicts=True)
+        SubcontractorStats.objects.bulk_update(corrected, list(STATS_FIELDS), batch_size=500)
+
+    if corrected:
+        logger.info(f"🔢 Recounted tender stats for {len(corrected)} subcontractors")
+    return len(new) + len(corrected)
@@ -5,10 +5,14 @@ from django.core.exceptions import ValidationError
 from .models import TenderInvitation, TenderAddendum
 from projects.models import Project
 from subcontractors.models import Subcontractor, Trade
+from subcontractors.geo import ProximityIndex, geocode
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Radius options of the invitation form's distance filter, in miles
+DISTANCE_CHOICES = [10, 25, 50, 100]
+
 class TenderInvitationForm(forms.Form):
     subject = forms.CharField(
         max_length=255,
@@ -33,9 +37,13 @@ Please let us know if you will be tendering by clicking one of the buttons below
         help_text="Optional: Override the project's default SharePoint link"
     )
 
+    distance_choices = DISTANCE_CHOICES
+
     def __init__(self, *args, **kwargs):
         self.project_id = kwargs.pop('project_id')
         super().__init__(*args, **kwargs)
+        self.project_location = None
+        self.distances = {}
 
         # Get the project
         try:
@@ -44,6 +52,11 @@ Please let us know if you will be tendering by clicking one of the buttons below
             # Set up subcontractors queryset (all available)
             self.fields['subcontractors'].queryset = Subcontractor.objects.all().order_by('trade__name', 'company')
 
+            # Head offices within the widest filter radius of the project, from the proximity index
+            self.project_location = geocode(project.location)
+            if self.project_location:
+                self.distances = ProximityIndex.build().nearby(self.project_location, max(DISTANCE_CHOICES))
+
             # Update initial message with project name
             initial_message = self.fields['message'].initial
             initial_message = initial_message.replace("our project", f"the {project.name} project")
@@ -58,6 +71,11 @@ Please let us know if you will be tendering by clicking one of the buttons below
             # Handle the case where the project doesn't exist
             logger.error(f"Project with ID {self.project_id} not found when initializing TenderInvitationForm")
 
+    def subcontractor_options(self):
+        """(subcontractor, miles from the project or None) for the subcontractor list"""
+        for subcontractor in self.fields['subcontractors'].queryset.select_related('trade'):
+            yield subcontractor, self.distances.get(subcontractor.pk)
+
     def clean(self):
         cleaned_data = super().clean()
 
@@ -0,0 +1,104 @@
+# tenders/history.py
+import base64
+import json
+
+from django.db.models import Q
+from django.db.models.functions import Length, Substr
+from django.utils.dateparse import parse_datetime
+
+from .models import AIQuestion
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+PREVIEW_LENGTH = 300
+
+# Loaded by full_answer() only - never needed to list the history
+DEFERRED_FIELDS = ('answer_text', 'source_documents', 'document_references', 'analysis_metadata')
+
+
+def encode_cursor(question):
+    """Opaque cursor for the position after this question"""
+    position = json.dumps([question.created_date.isoformat(), question.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns: (created_date, id) the cursor points after
+    Raises: ValueError for a cursor this module did not produce
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created, question_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_date = parse_datetime(created)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+
+    if created_date is None or not isinstance(question_id, int):
+        raise ValueError(f"Invalid history cursor: {cursor!r}")
+    return created_date, question_id
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def history_page(conversation_id, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of a conversation, newest first, without the large answer fields.
+    Seeks past the cursor on (created_date, id) instead of using OFFSET, so
+    every page costs the same however far back it is.
+
+    Each question carries answer_preview and answer_truncated in place of answer_text.
+    Returns: (questions, next_cursor or None on the last page)
+    """
+    questions = AIQuestion.objects.filter(
+        conversation_id=conversation_id
+    ).defer(*DEFERRED_FIELDS).annotate(
+        answer_preview=Substr('answer_text', 1, PREVIEW_LENGTH),
+        answer_length=Length('answer_text'),
+    ).order_by('-created_date', '-id')
+
+    if cursor:
+        created_date, question_id = decode_cursor(cursor)
+        questions = questions.filter(
+            Q(created_date__lt=created_date) | Q(created_date=created_date, id__lt=question_id)
+        )
+
+    # One extra row tells us whether there is another page
+    page = list(questions[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    page = page[:limit]
+
+    for question in page:
+        question.answer_truncated = question.answer_length > PREVIEW_LENGTH
+
+    return page, next_cursor
+
+
+def serialize_preview(question):
+    return {
+        'id': question.id,
+        'question': question.question_text,
+        'answer_preview': question.answer_preview,
+        'answer_truncated': question.answer_truncated,
+        'confidence': question.confidence_score,
+        'timestamp': question.created_date.isoformat(),
+    }
+
+
+def full_answer(question):
+    return {
+        'id': question.id,
+        'question': question.question_text,
+        'answer': question.answer_text,
+        'confidence': question.confidence_score,
+        'timestamp': question.created_date.isoformat(),
+        'source_documents': question.source_documents,
+        'document_references': question.document_references,
+        'analysis_metadata': question.analysis_metadata,
+    }
@@ -0,0 +1,201 @@
+# tenders/instrumentation.py
+import contextvars
+import functools
+import logging
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Volumes a run can record, each an AnalysisRunMetrics field
+COUNTS = (
+    'documents_found', 'documents_parsed', 'bytes_downloaded', 'text_chars',
+    'llm_calls', 'input_tokens', 'output_tokens',
+)
+
+# The run recording spans in this thread/task, None outside an analysis
+_current_run = contextvars.ContextVar('analysis_run', default=None)
+
+
+class AnalysisRun:
+    """Stage durations and volumes collected while an analysis runs"""
+
+    def __init__(self, project=None, analysis_type=''):
+        self.project = project
+        self.analysis_type = analysis_type
+        self.started_at = timezone.now()
+        self.started = time.perf_counter()
+        self.stage_seconds = defaultdict(float)
+        self.stage_calls = Counter()
+        self.counts = Counter()
+        # Stages currently open - a stage nested in itself is only timed once
+        self.open_stages = Counter()
+
+    def add(self, **counts):
+        for name, value in counts.items():
+            if name not in COUNTS:
+                raise ValueError(f"Unknown analysis count: {name}")
+            self.counts[name] += value or 0
+
+    def save(self, error=''):
+        from .models import AnalysisRunMetrics
+
+        total = time.perf_counter() - self.started
+        fields = {f'{stage}_seconds': round(self.stage_seconds.get(stage, 0), 3) for stage in AnalysisRunMetrics.STAGES}
+        metrics = AnalysisRunMetrics.objects.create(
+            project=self.project,
+            analysis_type=self.analysis_type,
+            started_at=self.started_at,
+            succeeded=not error,
+            error=error,
+            total_seconds=round(total, 3),
+            stage_calls=dict(self.stage_calls),
+            **fields,
+            **{name: self.counts[name] for name in COUNTS},
+        )
+
+        breakdown = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+        logger.info(f"⏱️ {self.analysis_type} run took {total:.1f}s ({breakdown or 'no stages timed'})")
+        return metrics
+
+
+def add_to_run(**counts):
+    """Add counts to the current run, if there is one"""
+    run = _current_run.get()
+    if run is not None:
+        run.add(**counts)
+
+
+class Span:
+    """Handle yielded by span() to attach counts to the running analysis"""
+
+    def __init__(self, stage, run):
+        self.stage = stage
+        self.run = run
+        self.seconds = None
+
+    def add(self, **counts):
+        if self.run is not None:
+            self.run.add(**counts)
+
+
+@contextmanager
+def span(stage, **counts):
+    """
+    Time a block as one stage of the current analysis run.
+    Outside a run the block is still timed and logged at debug level.
+
+        with span('download') as timer:
+            content = fetch()
+            timer.add(bytes_downloaded=len(content))
+    """
+    run = _current_run.get()
+    timer = Span(stage, run)
+    timer.add(**counts)
+    if run is not None:
+        run.open_stages[stage] += 1
+
+    started = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.seconds = time.perf_counter() - started
+        if run is not None:
+            run.open_stages[stage] -= 1
+            if not run.open_stages[stage]:
+                run.stage_seconds[stage] += timer.seconds
+                run.stage_calls[stage] += 1
+        logger.debug(f"⏱️ {stage} took {timer.seconds * 1000:.0f} ms")
+
+
+def timed(stage):
+    """Decorator form of span()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def analysis_run(project, analysis_type):
+    """
+    Record the spans of an analysis and save them as AnalysisRunMetrics.
+    A run started inside another joins the outer one, so entry points that
+    delegate to each other produce a single row.
+    """
+    outer = _current_run.get()
+    if outer is not None:
+        yield outer
+        return
+
+    run = AnalysisRun(project, analysis_type)
+    token = _current_run.set(run)
+    error = ''
+    try:
+        yield run
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        _current_run.reset(token)
+        try:
+            run.save(error)
+        except Exception as e:
+            # Metrics must never turn a finished analysis into a failure
+            logger.error(f"❌ Could not save analysis run metrics: {str(e)}")
+
+
+def records_analysis_run(analysis_type):
+    """Decorator for analyzer methods taking the project as their first argument"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, project, *args, **kwargs):
+            with analysis_run(project, analysis_type):
+                return method(self, project, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_llm_usage(timer, response):
+    """Token counts from an Anthropic messages response"""
+    usage = getattr(response, 'usage', None)
+    timer.add(
+        llm_calls=1,
+        input_tokens=getattr(usage, 'input_tokens', 0),
+        output_tokens=getattr(usage, 'output_tokens', 0),
+    )
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(1, -(-percent * len(values) // 100))
+    return values[min(rank, len(values)) - 1]
+
+
+def stage_percentiles(queryset, percents=(50, 90, 95)):
+    """
+    Per-stage duration percentiles over AnalysisRunMetrics rows.
+    Returns: [{'stage', 'p50', 'p90', 'p95', 'max'}] with total first
+    """
+    from .models import AnalysisRunMetrics
+
+    columns = ['total_seconds'] + [f'{stage}_seconds' for stage in AnalysisRunMetrics.STAGES]
+    rows = list(queryset.order_by().values_list(*columns))
+
+    table = []
+    for index, column in enumerate(columns):
+        values = sorted(row[index] for row in rows)
+        entry = {'stage': column.replace('_seconds', '')}
+        for percent in percents:
+            entry[f'p{percent}'] = percentile(values, percent)
+        entry['max'] = values[-1] if values else None
+        table.append(entry)
+    return table
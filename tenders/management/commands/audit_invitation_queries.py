@@ -0,0 +1,85 @@
+# tenders/management/commands/audit_invitation_queries.py
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from communications.return_index import ReturnMatchIndex
+from projects.models import Project
+from tenders.models import TenderInvitation
+from tenders.services.reminder_engine import ReminderEngine
+
+# Plan lines that read a whole table, per database vendor
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?!.*\bUSING\b)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+    'mysql': re.compile(r'\btable=(\w+).*\btype=ALL\b'),
+}
+
+class Command(BaseCommand):
+    help = 'Run EXPLAIN on the hot TenderInvitation queries and report full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project-id',
+            type=int,
+            help='Project used for per-project queries (default: most recent project)'
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Exit with an error if any query scans the invitations table'
+        )
+
+    def handle(self, *args, **options):
+        project_id = options['project_id']
+        if project_id is None:
+            project_id = Project.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        invitations_table = TenderInvitation._meta.db_table
+        engine = ReminderEngine(email_service=None)
+
+        queries = {
+            'Deadline reminders (send_deadline_reminders)':
+                engine.due_queryset(deadline_windows=[0, 1, 2, 3]),
+            'Project reminders (SendAllRemindersView)':
+                engine.due_queryset(reminder_types=['pending'], project_ids=[project_id]),
+            'Daily limit count (SendAllRemindersView)':
+                engine.sent_today_queryset('will_tender', project_ids=[project_id]),
+            'Return matching (check_project_folder_simple)':
+                ReturnMatchIndex.open_invitations_queryset(project_ids=[project_id]),
+            'Return matching, all projects (check_emails_simple)':
+                ReturnMatchIndex.open_invitations_queryset(),
+            'Tracking page statistics (TenderTrackingView)':
+                TenderInvitation.objects.filter(project_id=project_id).order_by().values('status', 'tender_returned'),
+        }
+
+        self.stdout.write(f"🔍 Auditing {len(queries)} invitation queries on {connection.vendor}")
+        if pattern is None:
+            self.stdout.write(self.style.WARNING(f"⚠️ No scan detection for {connection.vendor}, showing plans only"))
+
+        full_scans = []
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            scanned = {table for table in (pattern.findall(plan) if pattern else [])}
+
+            self.stdout.write(f"\n{name}")
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+
+            if invitations_table in scanned:
+                full_scans.append(name)
+                self.stdout.write(self.style.ERROR(f"  ❌ Full scan of {invitations_table}"))
+            elif scanned:
+                self.stdout.write(self.style.WARNING(f"  ⚠️ Full scan of {', '.join(sorted(scanned))}"))
+            elif pattern:
+                self.stdout.write(self.style.SUCCESS("  ✅ Index access"))
+
+        self.stdout.write("")
+        if full_scans:
+            message = f"{len(full_scans)} queries scan {invitations_table}: {', '.join(full_scans)}"
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(f"⚠️ {message}"))
+            self.stdout.write("   Planners prefer scans on small tables - re-run after ANALYZE on production-sized data")
+        else:
+            self.stdout.write(self.style.SUCCESS("✅ No full scans of the invitations table"))
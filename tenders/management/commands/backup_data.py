@@ -0,0 +1,71 @@
+# tenders/management/commands/backup_data.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.backup import DEFAULT_BATCH_SIZE, export_models, write_backup
+
+# Rebuilt on restore, or tied to this database's content type ids
+DEFAULT_EXCLUDE = [
+    'contenttypes',
+    'auth.permission',
+    'admin.logentry',
+    'sessions',
+    'communications.senderindexentry',
+    'subcontractors.subcontractorsearchdocument',
+    'subcontractors.subcontractorlocation',
+    'project_tracker.projectanalyticssummary',
+]
+
+class Command(BaseCommand):
+    help = 'Back up the database as compact JSON lines (.jsonl or .jsonl.gz) for restore_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Backup file, .jsonl or .jsonl.gz')
+        parser.add_argument(
+            'labels',
+            nargs='*',
+            help='Only back up these apps or models (app_label or app_label.ModelName)'
+        )
+        parser.add_argument(
+            '--exclude',
+            action='append',
+            default=[],
+            help='App or model to leave out (can be repeated)'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Include content types, permissions, sessions and derived tables'
+        )
+        parser.add_argument(
+            '--natural',
+            action='store_true',
+            help='Use natural keys, so content types and permissions can move between databases'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows read per query (default {DEFAULT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output.endswith(('.jsonl', '.jsonl.gz')):
+            raise CommandError("Backup file must end in .jsonl or .jsonl.gz")
+
+        labels = {label.lower() for label in options['labels']}
+        exclude = {label.lower() for label in options['exclude']}
+        if not options['all']:
+            exclude.update(DEFAULT_EXCLUDE)
+
+        models = export_models(labels, exclude)
+        self.stdout.write(f"💾 Backing up {len(models)} models to {output}")
+
+        started = time.perf_counter()
+        counts = write_backup(output, models, chunk_size=options['chunk_size'], natural_keys=options['natural'])
+
+        for label, count in counts.items():
+            self.stdout.write(f"   {label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {sum(counts.values())} objects written in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,29 @@
+# tenders/management/commands/cache_stats.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core import cache as project_cache
+
+class Command(BaseCommand):
+    help = 'Show shared cache hit/miss metrics for the project document caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after showing them'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"📦 Cache backend: {settings.CACHES['default']['BACKEND']}")
+
+        for namespace, row in project_cache.metrics(project_cache.NAMESPACES).items():
+            self.stdout.write(f"\n{namespace}")
+            self.stdout.write(f"   Hits:          {row['hit']}")
+            self.stdout.write(f"   Waited hits:   {row['wait_hit']}  (served by another worker's rebuild)")
+            self.stdout.write(f"   Misses:        {row['miss']}")
+            self.stdout.write(f"   Rebuilds:      {row['build']}  ({row['build_error']} failed)")
+            self.stdout.write(f"   Hit ratio:     {row['hit_ratio']}%")
+
+        if options['reset']:
+            project_cache.reset_metrics(project_cache.NAMESPACES)
+            self.stdout.write(self.style.SUCCESS("\n✅ Counters reset"))
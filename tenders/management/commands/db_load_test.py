@@ -0,0 +1,132 @@
+# tenders/management/commands/db_load_test.py
+import os
+import statistics
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+SCRATCH_TABLE = 'db_load_test_scratch'
+
+class Command(BaseCommand):
+    help = 'Measure concurrent write throughput and lock errors for the configured database profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent writer threads (default 8)'
+        )
+        parser.add_argument(
+            '--writes',
+            type=int,
+            default=200,
+            help='Read-then-write transactions per worker (default 200)'
+        )
+        parser.add_argument(
+            '--baseline',
+            action='store_true',
+            help='SQLite only: also run the workload with the stock Django SQLite backend for comparison'
+        )
+
+    def handle(self, *args, **options):
+        profile = settings.DATABASES['default']
+        is_sqlite = 'sqlite' in profile['ENGINE']
+
+        runs = []
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            if is_sqlite:
+                # Never load-test the real SQLite file - use a scratch copy of the profile
+                if options['baseline']:
+                    runs.append(('Stock SQLite', {
+                        'ENGINE': 'django.db.backends.sqlite3',
+                        'NAME': os.path.join(scratch_dir, 'baseline.sqlite3'),
+                    }))
+                runs.append((f"Profile ({profile['ENGINE']})", {
+                    **profile,
+                    'NAME': os.path.join(scratch_dir, 'profile.sqlite3'),
+                }))
+            else:
+                runs.append((f"Profile ({profile['ENGINE']})", profile))
+
+            self.stdout.write(
+                f"🏋️ {options['workers']} workers x {options['writes']} read-then-write transactions"
+            )
+            for name, database in runs:
+                self._report(name, self._run(name, database, options['workers'], options['writes']))
+
+    def _run(self, name, database, workers, writes):
+        alias = f"load_test_{len(connections.settings)}"
+        connections.settings[alias] = connections.configure_settings({
+            'default': settings.DATABASES['default'],
+            alias: database,
+        })[alias]
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {SCRATCH_TABLE} (worker INTEGER, payload VARCHAR(100))")
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(workers)
+
+        def worker(worker_id):
+            connection = connections[alias]
+            local_latencies = []
+            local_errors = []
+            start_barrier.wait()
+            try:
+                for i in range(writes):
+                    started = time.perf_counter()
+                    try:
+                        # Read then write - the pattern of tracking flushes and analysis saves
+                        with transaction.atomic(using=alias):
+                            with connection.cursor() as cursor:
+                                cursor.execute(f"SELECT COUNT(*) FROM {SCRATCH_TABLE} WHERE worker = %s", [worker_id])
+                                cursor.fetchone()
+                                cursor.execute(
+                                    f"INSERT INTO {SCRATCH_TABLE} (worker, payload) VALUES (%s, %s)",
+                                    [worker_id, f'event {i}']
+                                )
+                        local_latencies.append(time.perf_counter() - started)
+                    except OperationalError as e:
+                        local_errors.append(str(e))
+            finally:
+                connection.close()
+                with lock:
+                    latencies.extend(local_latencies)
+                    errors.extend(local_errors)
+
+        threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"DROP TABLE {SCRATCH_TABLE}")
+        connections[alias].close()
+
+        return {'latencies': latencies, 'errors': errors, 'elapsed': elapsed}
+
+    def _report(self, name, result):
+        latencies = sorted(result['latencies'])
+        committed = len(latencies)
+
+        self.stdout.write(f"\n{name}")
+        self.stdout.write(f"   Committed:   {committed} in {result['elapsed']:.2f}s ({committed / result['elapsed']:.0f}/s)")
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+            self.stdout.write(f"   Latency:     median {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+
+        if result['errors']:
+            self.stdout.write(self.style.ERROR(
+                f"   ❌ {len(result['errors'])} failed: {result['errors'][0]}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("   ✅ No lock errors"))
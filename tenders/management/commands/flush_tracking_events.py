@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from tenders.tracking import flush_events
+
+class Command(BaseCommand):
+    help = 'Apply buffered email open, download and response tracking events (run on a schedule)'
+
+    def handle(self, *args, **options):
+        updated = flush_events()
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} invitations from tracking events"))
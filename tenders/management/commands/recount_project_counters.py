@@ -0,0 +1,23 @@
+# tenders/management/commands/recount_project_counters.py
+from django.core.management.base import BaseCommand
+from tenders.counters import recount_project_counters
+
+class Command(BaseCommand):
+    help = 'Recompute the per-project tender invitation counters from the invitations table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--project-id',
+            type=int,
+            action='append',
+            help='Only recount the given project (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔢 Recounting project invitation counters...")
+
+        corrected = recount_project_counters(project_ids=options['project_id'])
+
+        if corrected:
+            self.stdout.write(self.style.WARNING(f"⚠️ Corrected counters on {corrected} projects"))
+        self.stdout.write(self.style.SUCCESS("✅ Project counters are up to date"))
@@ -0,0 +1,23 @@
+# tenders/management/commands/recount_subcontractor_stats.py
+from django.core.management.base import BaseCommand
+from tenders.counters import recount_subcontractor_stats
+
+class Command(BaseCommand):
+    help = 'Recompute the per-subcontractor tender statistics from the invitations table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--subcontractor-id',
+            type=int,
+            action='append',
+            help='Only recount the given subcontractor (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔢 Recounting subcontractor tender stats...")
+
+        corrected = recount_subcontractor_stats(subcontractor_ids=options['subcontractor_id'])
+
+        if corrected:
+            self.stdout.write(self.style.WARNING(f"⚠️ Created or corrected stats for {corrected} subcontractors"))
+        self.stdout.write(self.style.SUCCESS("✅ Subcontractor stats are up to date"))
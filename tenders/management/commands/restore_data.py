@@ -0,0 +1,62 @@
+# tenders/management/commands/restore_data.py
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.backup import DEFAULT_BATCH_SIZE, Restore, rebuild_derived_data
+
+class Command(BaseCommand):
+    help = (
+        'Restore dumpdata JSON or backup_data JSONL files (optionally gzipped) with streamed '
+        'bulk inserts - model signals do not fire, derived data is rebuilt at the end'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', type=str, help='Backup files, restored in the order given')
+        parser.add_argument(
+            '--only',
+            action='append',
+            default=[],
+            help='Only restore this app or model (app_label or app_label.ModelName, can be repeated)'
+        )
+        parser.add_argument(
+            '--exclude',
+            action='append',
+            default=[],
+            help='App or model to skip (can be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Objects per bulk INSERT (default {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--skip-rebuild',
+            action='store_true',
+            help='Do not rebuild counters, the sender index and analytics after restoring'
+        )
+
+    def handle(self, *args, **options):
+        restore = Restore(
+            batch_size=options['batch_size'],
+            only=[label.lower() for label in options['only']],
+            exclude=[label.lower() for label in options['exclude']],
+        )
+
+        self.stdout.write(f"📥 Restoring {', '.join(options['paths'])}")
+        started = time.perf_counter()
+        try:
+            counts = restore.load(options['paths'])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Restore failed, nothing was written: {e}")
+
+        for label, count in counts.items():
+            self.stdout.write(f"   {label}: {count}")
+        for label, count in restore.skipped.items():
+            self.stdout.write(self.style.WARNING(f"   ⚠️ Skipped {count} {label or 'unlabelled'} objects - no such model"))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {sum(counts.values())} objects restored in {time.perf_counter() - started:.1f}s"
+        ))
+
+        if counts and not options['skip_rebuild']:
+            for step in rebuild_derived_data(counts):
+                self.stdout.write(f"🔄 Rebuilt {step}")
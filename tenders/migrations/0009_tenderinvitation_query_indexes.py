@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0002_project_invitation_counters"),
+        ("subcontractors", "0002_alter_subcontractor_email"),
+        ("tenders", "0008_tenderinvitation_last_pending_reminder_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tenderinvitation",
+            index=models.Index(
+                condition=models.Q(("tender_returned", False)),
+                fields=["project", "status"],
+                name="invitation_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tenderinvitation",
+            index=models.Index(
+                condition=models.Q(("status", "PENDING")),
+                fields=["project", "last_pending_reminder"],
+                name="invitation_pending_remind_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tenderinvitation",
+            index=models.Index(
+                condition=models.Q(("status", "ACCEPTED")),
+                fields=["project", "last_will_tender_reminder"],
+                name="invitation_tender_remind_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tenders", "0009_tenderinvitation_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="aiquestion",
+            index=models.Index(
+                fields=["conversation", "-created_date", "-id"],
+                name="ai_question_history_idx",
+            ),
+        ),
+    ]
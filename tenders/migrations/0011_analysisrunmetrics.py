@@ -0,0 +1,74 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0002_project_invitation_counters"),
+        ("tenders", "0010_aiquestion_history_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisRunMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("analysis_type", models.CharField(max_length=50)),
+                (
+                    "started_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+                ("succeeded", models.BooleanField(default=True)),
+                ("error", models.TextField(blank=True)),
+                ("total_seconds", models.FloatField(default=0)),
+                ("crawl_seconds", models.FloatField(default=0)),
+                ("download_seconds", models.FloatField(default=0)),
+                ("parse_seconds", models.FloatField(default=0)),
+                ("llm_seconds", models.FloatField(default=0)),
+                ("save_seconds", models.FloatField(default=0)),
+                ("documents_found", models.PositiveIntegerField(default=0)),
+                ("documents_parsed", models.PositiveIntegerField(default=0)),
+                ("bytes_downloaded", models.PositiveBigIntegerField(default=0)),
+                ("text_chars", models.PositiveBigIntegerField(default=0)),
+                ("llm_calls", models.PositiveIntegerField(default=0)),
+                ("input_tokens", models.PositiveIntegerField(default=0)),
+                ("output_tokens", models.PositiveIntegerField(default=0)),
+                (
+                    "stage_calls",
+                    models.JSONField(
+                        blank=True,
+                        default=dict,
+                        help_text="Number of timed calls per stage",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="analysis_runs",
+                        to="projects.project",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Analysis run metrics",
+                "ordering": ["-started_at"],
+            },
+        ),
+    ]
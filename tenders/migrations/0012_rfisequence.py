@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("projects", "0002_project_invitation_counters"),
+        ("tenders", "0011_analysisrunmetrics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RFISequence",
+            fields=[
+                (
+                    "project",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rfi_sequence",
+                        serialize=False,
+                        to="projects.project",
+                    ),
+                ),
+                ("last_number", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
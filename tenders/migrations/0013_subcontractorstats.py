@@ -0,0 +1,87 @@
+# Generated by Django 5.2.3 on 2026-10-18 22:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_subcontractor_stats(apps, schema_editor):
+    SubcontractorStats = apps.get_model("tenders", "SubcontractorStats")
+    TenderInvitation = apps.get_model("tenders", "TenderInvitation")
+    totals = {}
+    rows = TenderInvitation.objects.order_by().values_list(
+        "subcontractor_id", "status", "tender_returned", "response_date", "sent_at"
+    )
+    for subcontractor_id, status, returned, response_date, sent_at in rows.iterator():
+        stats = totals.setdefault(
+            subcontractor_id, SubcontractorStats(subcontractor_id=subcontractor_id)
+        )
+        stats.invitation_count += 1
+        stats.accepted_count += status == "ACCEPTED"
+        stats.declined_count += status == "DECLINED"
+        stats.returned_count += bool(returned)
+        if response_date is not None and sent_at is not None:
+            stats.response_count += 1
+            stats.response_seconds += max(0, int((response_date - sent_at).total_seconds()))
+    SubcontractorStats.objects.bulk_create(totals.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("subcontractors", "0002_alter_subcontractor_email"),
+        ("tenders", "0012_rfisequence"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubcontractorStats",
+            fields=[
+                (
+                    "subcontractor",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="tender_stats",
+                        serialize=False,
+                        to="subcontractors.subcontractor",
+                    ),
+                ),
+                (
+                    "invitation_count",
+                    models.PositiveIntegerField(default=0, editable=False),
+                ),
+                (
+                    "accepted_count",
+                    models.PositiveIntegerField(default=0, editable=False),
+                ),
+                (
+                    "declined_count",
+                    models.PositiveIntegerField(default=0, editable=False),
+                ),
+                (
+                    "returned_count",
+                    models.PositiveIntegerField(default=0, editable=False),
+                ),
+                (
+                    "response_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="Invitations with a response date",
+                    ),
+                ),
+                (
+                    "response_seconds",
+                    models.PositiveBigIntegerField(
+                        default=0,
+                        editable=False,
+                        help_text="Total time from sending to response over those invitations",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Subcontractor stats",
+            },
+        ),
+        migrations.RunPython(populate_subcontractor_stats, migrations.RunPython.noop),
+    ]
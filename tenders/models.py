@@ -3,9 +3,10 @@ import logging
 import os
 import traceback
 import json
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
 from django.utils import timezone
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.dispatch import receiver
 from projects.models import Project
@@ -637,10 +638,90 @@ class TenderInvitation(models.Model):
 
     class Meta:
         unique_together = ['project', 'subcontractor']
+        # Designed from the reminder, return matching and tracking queries -
+        # check them with the audit_invitation_queries command
+        indexes = [
+            # Open invitations: reminder planning and tender return matching
+            models.Index(
+                fields=['project', 'status'],
+                condition=models.Q(tender_returned=False),
+                name='invitation_open_idx'
+            ),
+            # Daily reminder limits
+            models.Index(
+                fields=['project', 'last_pending_reminder'],
+                condition=models.Q(status='PENDING'),
+                name='invitation_pending_remind_idx'
+            ),
+            models.Index(
+                fields=['project', 'last_will_tender_reminder'],
+                condition=models.Q(status='ACCEPTED'),
+                name='invitation_tender_remind_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.project.name} - {self.subcontractor.company}"
 
+    def save(self, *args, **kwargs):
+        from .counters import COUNTED_FIELDS, stored_states
+        update_fields = kwargs.get('update_fields')
+        # The post_save counter update shares the invitation's transaction
+        with transaction.atomic():
+            # The row as stored, locked - another copy of this invitation may have been saved since this one was loaded
+            if self.pk is not None and not self._state.adding and (update_fields is None or COUNTED_FIELDS & set(update_fields)):
+                self._stored_state = stored_states([self.pk]).get(self.pk)
+            super().save(*args, **kwargs)
+
+class SubcontractorStats(models.Model):
+    """
+    A subcontractor's tender history across every project - kept in step by the
+    TenderInvitation signals, repaired with the recount_subcontractor_stats command
+    """
+    subcontractor = models.OneToOneField(
+        Subcontractor, on_delete=models.CASCADE, primary_key=True, related_name='tender_stats'
+    )
+    invitation_count = models.PositiveIntegerField(default=0, editable=False)
+    accepted_count = models.PositiveIntegerField(default=0, editable=False)
+    declined_count = models.PositiveIntegerField(default=0, editable=False)
+    returned_count = models.PositiveIntegerField(default=0, editable=False)
+    response_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Invitations with a response date"
+    )
+    response_seconds = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        help_text="Total time from sending to response over those invitations"
+    )
+
+    class Meta:
+        verbose_name_plural = "Subcontractor stats"
+
+    def __str__(self):
+        return f"{self.subcontractor} - {self.invitation_count} invitations"
+
+    def _percentage(self, count, total):
+        return round(count / total * 100, 1) if total else None
+
+    @property
+    def acceptance_rate(self):
+        """Percentage of invitations accepted"""
+        return self._percentage(self.accepted_count, self.invitation_count)
+
+    @property
+    def return_rate(self):
+        """Percentage of invitations with a tender returned"""
+        return self._percentage(self.returned_count, self.invitation_count)
+
+    @property
+    def average_response_time(self):
+        """Mean time from sending an invitation to the response, None before any response"""
+        if not self.response_count:
+            return None
+        return timedelta(seconds=self.response_seconds / self.response_count)
+
 class TenderDocument(models.Model):
     DOCUMENT_TYPES = [
         ('TENDER', 'Tender Document'),
@@ -672,6 +753,14 @@ class TenderAddendum(models.Model):
     def __str__(self):
         return f"Addendum: {self.title} - {self.project.name}"
 
+class RFISequence(models.Model):
+    """Last RFI number issued for a project - see tenders/rfi_numbers"""
+    project = models.OneToOneField(Project, on_delete=models.CASCADE, primary_key=True, related_name='rfi_sequence')
+    last_number = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.project} - RFI {self.last_number}"
+
 class RFIItem(models.Model):
     """Enhanced Request for Information items"""
 
@@ -758,8 +847,8 @@ class RFIItem(models.Model):
     def save(self, *args, **kwargs):
         if not self.rfi_number and self.project:
             # Auto-generate RFI number
-            existing_count = RFIItem.objects.filter(project=self.project).count()
-            self.rfi_number = f"RFI-{self.project.reference or self.project.id}-{existing_count + 1:03d}"
+            from .rfi_numbers import allocate_rfi_numbers
+            self.rfi_number = allocate_rfi_numbers(self.project, 1)[0]
         super().save(*args, **kwargs)
 
     @property
@@ -799,6 +888,32 @@ def log_tender_invitation_status_change(sender, instance, created, **kwargs):
     if not created:
         logger.info(f"Tender invitation status changed to {instance.status} for {instance.subcontractor.company} on {instance.project.name}")
 
+@receiver(post_save, sender=TenderInvitation)
+def update_project_counters(sender, instance, created, raw=False, **kwargs):
+    """Keep the denormalized invitation counters on Project and SubcontractorStats in step"""
+    from .counters import COUNTED_FIELDS, CounterChanges, recount_project_counters, recount_subcontractor_stats, stored_states
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not COUNTED_FIELDS & set(update_fields):
+        return
+    if not created and '_stored_state' not in instance.__dict__:
+        # Not written through save() - the state before is unknown
+        recount_project_counters([instance.project_id])
+        recount_subcontractor_stats([instance.subcontractor_id])
+        return
+    # Counted by what the database now holds - an update_fields save keeps the other stored values
+    changes = CounterChanges()
+    changes.changed(instance.__dict__.pop('_stored_state', None), stored_states([instance.pk], lock=False).get(instance.pk))
+    changes.apply()
+
+@receiver(post_delete, sender=TenderInvitation)
+def remove_from_project_counters(sender, instance, **kwargs):
+    from .counters import CounterChanges
+    changes = CounterChanges()
+    changes.deleted(instance)
+    changes.apply()
+
 @receiver(pre_save, sender=TenderInvitation)
 def set_response_date(sender, instance, **kwargs):
     """Set response date when status changes from PENDING"""
@@ -838,6 +953,44 @@ class AIQuestion(models.Model):
     class Meta:
         ordering = ['-created_date']
         db_table = 'tenders_ai_question'
+        indexes = [
+            # Keyset pagination of a conversation's history (tenders.history)
+            models.Index(fields=['conversation', '-created_date', '-id'], name='ai_question_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"Q: {self.question_text[:50]}..."
+
+class AnalysisRunMetrics(models.Model):
+    """Per-stage timings and volumes of one document analysis run (tenders.instrumentation)"""
+    STAGES = ('crawl', 'download', 'parse', 'llm', 'save')
+
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, null=True, blank=True, related_name='analysis_runs')
+    analysis_type = models.CharField(max_length=50)
+    started_at = models.DateTimeField(default=timezone.now, db_index=True)
+    succeeded = models.BooleanField(default=True)
+    error = models.TextField(blank=True)
+
+    # Seconds spent in each stage, the remainder of total_seconds is unattributed
+    total_seconds = models.FloatField(default=0)
+    crawl_seconds = models.FloatField(default=0)
+    download_seconds = models.FloatField(default=0)
+    parse_seconds = models.FloatField(default=0)
+    llm_seconds = models.FloatField(default=0)
+    save_seconds = models.FloatField(default=0)
+
+    documents_found = models.PositiveIntegerField(default=0)
+    documents_parsed = models.PositiveIntegerField(default=0)
+    bytes_downloaded = models.PositiveBigIntegerField(default=0)
+    text_chars = models.PositiveBigIntegerField(default=0)
+    llm_calls = models.PositiveIntegerField(default=0)
+    input_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    stage_calls = models.JSONField(default=dict, blank=True, help_text="Number of timed calls per stage")
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name_plural = 'Analysis run metrics'
 
     def __str__(self):
-        return f"Q: {self.question_text[:50]}..."
\ No newline at end of file
+        return f"{self.analysis_type} run at {self.started_at:%Y-%m-%d %H:%M} ({self.total_seconds:.1f}s)"
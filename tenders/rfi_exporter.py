@@ -1,376 +1,378 @@
 # tenders/rfi_exporter.py - Export RFI schedule to Excel
+import hashlib
+import logging
+import os
+import tempfile
+
 import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
-from io import BytesIO
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import Count, Max
+from django.http import FileResponse
 from .models import TenderAnalysis, RFIItem
 
+logger = logging.getLogger(__name__)
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Bump when a layout changes, so files cached with the old layout are rebuilt
+EXPORT_FORMAT_VERSION = 2
+
+PRIORITIES = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
+PRIORITY_COLORS = {
+    'CRITICAL': 'FFCCCC',  # Light red
+    'HIGH': 'FFE6CC',      # Light orange
+    'MEDIUM': 'FFFFCC',    # Light yellow
+    'LOW': 'E6F3FF'        # Light blue
+}
+ANSWERED_STATUSES = ('RESPONDED', 'CLARIFIED')
+
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+
+def _fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def _named_styles():
+    """
+    Every cell style the exports use. A named style is stored once in the
+    file and referenced by each cell, instead of a Font/Fill copy per cell.
+    """
+    styles = [
+        NamedStyle('export_title', font=Font(size=16, bold=True)),
+        NamedStyle('export_section', font=Font(size=14, bold=True)),
+        NamedStyle('export_label', font=Font(bold=True)),
+        NamedStyle(
+            'export_column_header',
+            font=Font(bold=True, color="FFFFFF"),
+            fill=_fill("366092"),
+            alignment=Alignment(horizontal="center", vertical="center"),
+            border=THIN_BORDER,
+        ),
+        NamedStyle('export_cell', border=THIN_BORDER),
+        NamedStyle('export_wrapped', alignment=Alignment(wrap_text=True, vertical="top"), border=THIN_BORDER),
+        NamedStyle('export_answered', fill=_fill("C6EFCE"), border=THIN_BORDER),
+        NamedStyle('export_pending', fill=_fill("FFC7CE"), border=THIN_BORDER),
+    ]
+    for priority, color in PRIORITY_COLORS.items():
+        styles.append(NamedStyle(f'export_priority_{priority.lower()}', fill=_fill(color), border=THIN_BORDER))
+    return styles
+
+
+def _write_only_workbook(title):
+    """Workbook that streams rows to disk as they are appended"""
+    wb = openpyxl.Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    return wb, wb.create_sheet(title)
+
+
+class CachedExport:
+    """
+    An export file kept under EXPORT_CACHE_DIR. The file name carries a hash
+    of the data it was built from, so a repeat download is served from disk
+    and a change to that data builds a new file.
+    """
+
+    def __init__(self, kind, object_id, *fingerprint):
+        digest = hashlib.sha1(repr((EXPORT_FORMAT_VERSION,) + fingerprint).encode()).hexdigest()[:16]
+        self.directory = str(getattr(settings, 'EXPORT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'exports')))
+        self.prefix = f"{kind}_{object_id}_"
+        self.path = os.path.join(self.directory, f"{self.prefix}{digest}.xlsx")
+
+    def open(self, build):
+        """
+        The cached file opened for reading, built first with build(path) if missing.
+        The file is written under a temporary name and renamed into place, so
+        concurrent downloads never see a partial file.
+        """
+        try:
+            handle = open(self.path, 'rb')
+            logger.debug(f"📦 Serving cached export {self.path}")
+            return handle
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=self.prefix, suffix='.tmp')
+        os.close(fd)
+        try:
+            build(temp_path)
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        handle = open(self.path, 'rb')
+        self._remove_stale()
+        logger.info(f"📊 Built export {self.path}")
+        return handle
+
+    def _remove_stale(self):
+        """Files built from older data for the same object"""
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(self.prefix) and name.endswith('.xlsx') and path != self.path:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass  # Removed by a concurrent download
+
+
+def _file_response(handle, filename):
+    """Stream the file in chunks rather than copying it into the response"""
+    return FileResponse(handle, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
 class RFIExcelExporter:
     """Export RFI schedule to formatted Excel file"""
-    
+
+    HEADER_ROW = 10  # Column headers sit on row 10, data starts on row 11
+    COLUMNS = [
+        ("RFI No.", 14),
+        ("Category", 15),
+        ("Priority", 12),
+        ("Question/Description", 60),
+        ("Document Reference", 20),
+        ("Location", 20),
+        ("Response", 40),
+        ("Answered By", 15),
+        ("Date Answered", 15),
+        ("Status", 12)
+    ]
+
     def __init__(self):
         self.wb = None
         self.ws = None
-    
-    def export_rfi_schedule(self, tender_analysis: TenderAnalysis) -> HttpResponse:
-        """Export RFI schedule as Excel file"""
-        
-        # Create workbook
-        self.wb = openpyxl.Workbook()
-        self.ws = self.wb.active
-        self.ws.title = "RFI Schedule"
-        
-        # Set up the worksheet
+
+    def export_rfi_schedule(self, tender_analysis: TenderAnalysis) -> FileResponse:
+        """Export RFI schedule as Excel file, rebuilt only when the analysis or its RFIs change"""
+
+        project = tender_analysis.project
+        rfis = tender_analysis.rfi_items.aggregate(last_updated=Max('updated_at'), count=Count('id'))
+        export = CachedExport(
+            'rfi_schedule', tender_analysis.pk,
+            tender_analysis.updated_date, project.updated_at, rfis['last_updated'], rfis['count'],
+        )
+        handle = export.open(lambda path: self.write_rfi_schedule(tender_analysis, path))
+
+        filename = f"RFI_Schedule_{project.name.replace(' ', '_')}_{tender_analysis.analysis_date.strftime('%Y%m%d')}.xlsx"
+        return _file_response(handle, filename)
+
+    def write_rfi_schedule(self, tender_analysis: TenderAnalysis, path):
+        """Write the schedule to path row by row"""
+
+        self.wb, self.ws = _write_only_workbook("RFI Schedule")
+
+        # Set up the worksheet - widths and panes must be set before rows are written
+        for index, (_, width) in enumerate(self.COLUMNS, 1):
+            self.ws.column_dimensions[get_column_letter(index)].width = width
+        self.ws.freeze_panes = f'A{self.HEADER_ROW + 1}'
+
         self._setup_header(tender_analysis)
         self._setup_column_headers()
-        self._populate_rfi_items(tender_analysis)
-        self._format_worksheet()
-        
-        # Save to BytesIO
-        buffer = BytesIO()
-        self.wb.save(buffer)
-        buffer.seek(0)
-        
-        # Create HTTP response
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        
-        filename = f"RFI_Schedule_{tender_analysis.project.name.replace(' ', '_')}_{tender_analysis.analysis_date.strftime('%Y%m%d')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
-    
+        last_row = self._populate_rfi_items(tender_analysis)
+        self._add_summary_section(last_row)
+
+        self.wb.save(path)
+
+    def _cell(self, value, style=None):
+        cell = WriteOnlyCell(self.ws, value=value)
+        if style:
+            cell.style = style
+        return cell
+
     def _setup_header(self, tender_analysis: TenderAnalysis):
-        """Set up the header section with project information"""
-        
-        # Title
-        self.ws['A1'] = "REQUEST FOR INFORMATION (RFI) SCHEDULE"
-        self.ws['A1'].font = Font(size=16, bold=True)
-        
-        # Project information
-        self.ws['A3'] = "Project:"
-        self.ws['B3'] = tender_analysis.project.name
-        self.ws['A4'] = "Reference:"
-        self.ws['B4'] = tender_analysis.project.reference
-        self.ws['A5'] = "Location:"
-        self.ws['B5'] = tender_analysis.project.location
-        self.ws['A6'] = "Analysis Date:"
-        self.ws['B6'] = tender_analysis.analysis_date.strftime('%d/%m/%Y')
-        
+        """Set up the header section with project information, rows 1-9"""
+
+        project = tender_analysis.project
+        info = [
+            ("Project:", project.name),
+            ("Reference:", project.reference),
+            ("Location:", project.location),
+            ("Analysis Date:", tender_analysis.analysis_date.strftime('%d/%m/%Y')),
+        ]
+
         # Tender deadline if available
-        if tender_analysis.tender_deadline:
-            self.ws['A7'] = "Tender Deadline:"
-            self.ws['B7'] = tender_analysis.tender_deadline.strftime('%d/%m/%Y %H:%M')
-        
-        # Bold the labels
-        for row in range(3, 8):
-            self.ws[f'A{row}'].font = Font(bold=True)
-    
+        if project.tender_deadline:
+            info.append(("Tender Deadline:", project.tender_deadline.strftime('%d/%m/%Y %H:%M')))
+
+        self.ws.append([self._cell("REQUEST FOR INFORMATION (RFI) SCHEDULE", 'export_title')])
+        self.ws.append([])
+        for label, value in info:
+            self.ws.append([self._cell(label, 'export_label'), value])
+        for _ in range(len(info) + 2, self.HEADER_ROW - 1):
+            self.ws.append([])
+
     def _setup_column_headers(self):
         """Set up column headers for RFI items"""
-        
-        headers = [
-            ("A", "RFI No.", 10),
-            ("B", "Category", 15),
-            ("C", "Priority", 12),
-            ("D", "Question/Description", 60),
-            ("E", "Document Reference", 20),
-            ("F", "Location", 20),
-            ("G", "Response", 40),
-            ("H", "Answered By", 15),
-            ("I", "Date Answered", 15),
-            ("J", "Status", 12)
-        ]
-        
-        header_row = 10  # Start headers at row 10
-        
-        for col_letter, header_text, width in headers:
-            cell = self.ws[f'{col_letter}{header_row}']
-            cell.value = header_text
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Set column width
-            self.ws.column_dimensions[col_letter].width = width
-    
-    def _populate_rfi_items(self, tender_analysis: TenderAnalysis):
-        """Populate the RFI items in the worksheet"""
-        
-        rfi_items = tender_analysis.rfi_items.all().order_by('priority', 'category')
-        start_row = 11  # Data starts at row 11
-        
-        # Priority colors
-        priority_colors = {
-            'CRITICAL': 'FFCCCC',  # Light red
-            'HIGH': 'FFE6CC',      # Light orange
-            'MEDIUM': 'FFFFCC',    # Light yellow
-            'LOW': 'E6F3FF'        # Light blue
-        }
-        
-        for idx, rfi_item in enumerate(rfi_items, 1):
-            row = start_row + idx - 1
-            
-            # RFI Number
-            self.ws[f'A{row}'] = f"RFI-{idx:03d}"
-            
-            # Category
-            self.ws[f'B{row}'] = rfi_item.category
-            
-            # Priority
-            priority_cell = self.ws[f'C{row}']
-            priority_cell.value = rfi_item.priority
-            priority_cell.fill = PatternFill(
-                start_color=priority_colors.get(rfi_item.priority, 'FFFFFF'),
-                end_color=priority_colors.get(rfi_item.priority, 'FFFFFF'),
-                fill_type="solid"
-            )
-            
-            # Question
-            question_cell = self.ws[f'D{row}']
-            question_cell.value = rfi_item.question
-            question_cell.alignment = Alignment(wrap_text=True, vertical="top")
-            
-            # Document Reference
-            self.ws[f'E{row}'] = rfi_item.reference
-            
-            # Location
-            self.ws[f'F{row}'] = rfi_item.location_in_document
-            
-            # Response
-            response_cell = self.ws[f'G{row}']
-            response_cell.value = rfi_item.answer if rfi_item.is_answered else ""
-            response_cell.alignment = Alignment(wrap_text=True, vertical="top")
-            
-            # Answered By
-            self.ws[f'H{row}'] = rfi_item.answered_by if rfi_item.is_answered else ""
-            
-            # Date Answered
-            if rfi_item.answered_date:
-                self.ws[f'I{row}'] = rfi_item.answered_date.strftime('%d/%m/%Y')
-            
-            # Status
-            status_cell = self.ws[f'J{row}']
-            status_cell.value = "ANSWERED" if rfi_item.is_answered else "PENDING"
-            if rfi_item.is_answered:
-                status_cell.fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-            else:
-                status_cell.fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-            
+        self.ws.append([self._cell(header, 'export_column_header') for header, _ in self.COLUMNS])
+
+    def _populate_rfi_items(self, tender_analysis: TenderAnalysis) -> int:
+        """
+        Stream the RFI items into the worksheet.
+        Returns: the last row written
+        """
+
+        rfi_items = tender_analysis.rfi_items.order_by('priority', 'category').only(
+            'tender_analysis', 'rfi_number', 'category', 'priority', 'question', 'document_reference',
+            'location_in_document', 'status', 'client_response', 'responded_at',
+        )
+        row = self.HEADER_ROW
+
+        for idx, rfi_item in enumerate(rfi_items.iterator(chunk_size=500), 1):
+            row = self.HEADER_ROW + idx
+            is_answered = rfi_item.status in ANSWERED_STATUSES
+
             # Set row height for better readability
             self.ws.row_dimensions[row].height = 30
-    
-    def _format_worksheet(self):
-        """Apply final formatting to the worksheet"""
-        
-        # Add borders to all data cells
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Find the last row with data
-        last_row = self.ws.max_row
-        
-        # Apply borders to data range
-        for row in range(10, last_row + 1):  # From header row to last data row
-            for col in range(1, 11):  # Columns A to J
-                cell = self.ws.cell(row=row, column=col)
-                cell.border = thin_border
-        
-        # Freeze panes at header row
-        self.ws.freeze_panes = 'A11'
-        
-        # Add summary section
-        self._add_summary_section(last_row + 2)
-    
-    def _add_summary_section(self, start_row: int):
-        """Add summary statistics section"""
-        
-        self.ws[f'A{start_row}'] = "SUMMARY"
-        self.ws[f'A{start_row}'].font = Font(size=14, bold=True)
-        
-        # Count RFI items by priority
-        summary_row = start_row + 2
-        
-        priorities = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
-        priority_colors = {
-            'CRITICAL': 'FFCCCC',
-            'HIGH': 'FFE6CC', 
-            'MEDIUM': 'FFFFCC',
-            'LOW': 'E6F3FF'
-        }
-        
-        self.ws[f'A{summary_row}'] = "Priority"
-        self.ws[f'B{summary_row}'] = "Count"
-        self.ws[f'C{summary_row}'] = "Answered"
-        self.ws[f'D{summary_row}'] = "Pending"
-        
-        # Bold headers
-        for col in ['A', 'B', 'C', 'D']:
-            self.ws[f'{col}{summary_row}'].font = Font(bold=True)
-        
-        for idx, priority in enumerate(priorities):
-            row = summary_row + 1 + idx
-            
-            # Priority name with color
-            priority_cell = self.ws[f'A{row}']
-            priority_cell.value = priority
-            priority_cell.fill = PatternFill(
-                start_color=priority_colors[priority],
-                end_color=priority_colors[priority],
-                fill_type="solid"
-            )
-            
-            # Use COUNTIF formulas to count items
-            total_range = f'$C$11:$C${self.ws.max_row}'
-            status_range = f'$J$11:$J${self.ws.max_row}'
-            
-            # Total count
-            self.ws[f'B{row}'] = f'=COUNTIF({total_range},"{priority}")'
-            
-            # Answered count
-            self.ws[f'C{row}'] = f'=COUNTIFS({total_range},"{priority}",{status_range},"ANSWERED")'
-            
-            # Pending count  
-            self.ws[f'D{row}'] = f'=COUNTIFS({total_range},"{priority}",{status_range},"PENDING")'
+            self.ws.append([
+                self._cell(rfi_item.rfi_number or f"RFI-{idx:03d}", 'export_cell'),
+                self._cell(rfi_item.category, 'export_cell'),
+                self._cell(rfi_item.priority, f'export_priority_{rfi_item.priority.lower()}'
+                           if rfi_item.priority in PRIORITY_COLORS else 'export_cell'),
+                self._cell(rfi_item.question, 'export_wrapped'),
+                self._cell(rfi_item.document_reference, 'export_cell'),
+                self._cell(rfi_item.location_in_document, 'export_cell'),
+                self._cell(rfi_item.client_response if is_answered else "", 'export_wrapped'),
+                self._cell("", 'export_cell'),
+                self._cell(rfi_item.responded_at.strftime('%d/%m/%Y') if rfi_item.responded_at else None, 'export_cell'),
+                self._cell("ANSWERED" if is_answered else "PENDING", 'export_answered' if is_answered else 'export_pending'),
+            ])
+
+        return row
+
+    def _add_summary_section(self, last_row: int):
+        """Add summary statistics section below the RFI items"""
+
+        self.ws.append([])
+        self.ws.append([self._cell("SUMMARY", 'export_section')])
+        self.ws.append([])
+        self.ws.append([self._cell(header, 'export_label') for header in ("Priority", "Count", "Answered", "Pending")])
+
+        # Use COUNTIF formulas over the data rows to count items
+        total_range = f'$C${self.HEADER_ROW + 1}:$C${max(last_row, self.HEADER_ROW + 1)}'
+        status_range = f'$J${self.HEADER_ROW + 1}:$J${max(last_row, self.HEADER_ROW + 1)}'
+
+        for priority in PRIORITIES:
+            self.ws.append([
+                self._cell(priority, f'export_priority_{priority.lower()}'),
+                f'=COUNTIF({total_range},"{priority}")',
+                f'=COUNTIFS({total_range},"{priority}",{status_range},"ANSWERED")',
+                f'=COUNTIFS({total_range},"{priority}",{status_range},"PENDING")',
+            ])
+
+
+def _format_date(value, date_format='%d/%m/%Y'):
+    return value.strftime(date_format) if value else "Not specified"
+
+
+def _format_money(value):
+    return f"£{value:,.2f}" if value else "Not specified"
 
 
 class ContractSummaryExporter:
     """Export contract information summary to Excel"""
-    
-    def export_contract_summary(self, tender_analysis: TenderAnalysis) -> HttpResponse:
-        """Export contract summary as Excel file"""
-        
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Contract Summary"
-        
-        # Title
-        ws['A1'] = "CONTRACT INFORMATION SUMMARY"
-        ws['A1'].font = Font(size=16, bold=True)
-        
-        # Project info
-        ws['A3'] = "Project:"
-        ws['B3'] = tender_analysis.project.name
-        ws['A4'] = "Reference:"
-        ws['B4'] = tender_analysis.project.reference
-        
-        row = 6
-        
-        # Contract Information
-        ws[f'A{row}'] = "CONTRACT INFORMATION"
-        ws[f'A{row}'].font = Font(size=14, bold=True)
-        row += 1
-        
+
+    def export_contract_summary(self, tender_analysis: TenderAnalysis) -> FileResponse:
+        """Export contract summary as Excel file, rebuilt only when the analysis changes"""
+
+        project = tender_analysis.project
+        export = CachedExport('contract_summary', tender_analysis.pk, tender_analysis.updated_date, project.updated_at)
+        handle = export.open(lambda path: self.write_contract_summary(tender_analysis, path))
+
+        filename = f"Contract_Summary_{project.name.replace(' ', '_')}_{tender_analysis.analysis_date.strftime('%Y%m%d')}.xlsx"
+        return _file_response(handle, filename)
+
+    def _sections(self, tender_analysis: TenderAnalysis):
+        """[(section title, [(label, value)])] - fields the analysis does not record show as not specified"""
+
+        def field(name):
+            return getattr(tender_analysis, name, None)
+
+        amendments = field('contract_amendments')
         contract_info = [
-            ("Contract Type:", tender_analysis.contract_type or "Not specified"),
-            ("Amendments:", ", ".join(tender_analysis.contract_amendments) if tender_analysis.contract_amendments else "None noted"),
+            ("Contract Type:", field('contract_type') or "Not specified"),
+            ("Amendments:", ", ".join(amendments) if amendments else "None noted"),
         ]
-        
-        for label, value in contract_info:
-            ws[f'A{row}'] = label
-            ws[f'B{row}'] = value
-            ws[f'A{row}'].font = Font(bold=True)
-            row += 1
-        
-        row += 1
-        
-        # Key Dates
-        ws[f'A{row}'] = "KEY DATES"
-        ws[f'A{row}'].font = Font(size=14, bold=True)
-        row += 1
-        
+
         date_info = [
-            ("Possession Date:", tender_analysis.possession_date.strftime('%d/%m/%Y') if tender_analysis.possession_date else "Not specified"),
-            ("Start on Site:", tender_analysis.start_on_site_date.strftime('%d/%m/%Y') if tender_analysis.start_on_site_date else "Not specified"),
-            ("Practical Completion:", tender_analysis.practical_completion_date.strftime('%d/%m/%Y') if tender_analysis.practical_completion_date else "Not specified"),
-            ("Handover Date:", tender_analysis.handover_date.strftime('%d/%m/%Y') if tender_analysis.handover_date else "Not specified"),
-            ("Tender Deadline:", tender_analysis.tender_deadline.strftime('%d/%m/%Y %H:%M') if tender_analysis.tender_deadline else "Not specified"),
+            ("Possession Date:", _format_date(field('possession_date'))),
+            ("Start on Site:", _format_date(field('start_on_site_date'))),
+            ("Practical Completion:", _format_date(field('practical_completion_date'))),
+            ("Handover Date:", _format_date(field('handover_date'))),
+            ("Tender Deadline:", _format_date(tender_analysis.project.tender_deadline, '%d/%m/%Y %H:%M')),
         ]
-        
-        for label, value in date_info:
-            ws[f'A{row}'] = label
-            ws[f'B{row}'] = value
-            ws[f'A{row}'].font = Font(bold=True)
-            row += 1
-        
-        row += 1
-        
-        # Insurance Requirements
-        ws[f'A{row}'] = "INSURANCE REQUIREMENTS"
-        ws[f'A{row}'].font = Font(size=14, bold=True)
-        row += 1
-        
+
         insurance_info = [
-            ("Public Liability:", f"£{tender_analysis.public_liability_amount:,.2f}" if tender_analysis.public_liability_amount else "Not specified"),
-            ("Employers Liability:", f"£{tender_analysis.employers_liability_amount:,.2f}" if tender_analysis.employers_liability_amount else "Not specified"),
-            ("Professional Indemnity:", f"£{tender_analysis.professional_indemnity_amount:,.2f}" if tender_analysis.professional_indemnity_amount else "Not specified"),
-            ("Works Insurance:", f"£{tender_analysis.works_insurance_amount:,.2f}" if tender_analysis.works_insurance_amount else "Not specified"),
+            ("Public Liability:", _format_money(field('public_liability_amount'))),
+            ("Employers Liability:", _format_money(field('employers_liability_amount'))),
+            ("Professional Indemnity:", _format_money(field('professional_indemnity_amount'))),
+            ("Works Insurance:", _format_money(field('works_insurance_amount'))),
         ]
-        
-        for label, value in insurance_info:
-            ws[f'A{row}'] = label
-            ws[f'B{row}'] = value
-            ws[f'A{row}'].font = Font(bold=True)
-            row += 1
-        
-        row += 1
-        
-        # LADs
-        ws[f'A{row}'] = "LIQUIDATED DAMAGES"
-        ws[f'A{row}'].font = Font(size=14, bold=True)
-        row += 1
-        
+
         lads_info = []
-        if tender_analysis.lads_amount_per_week:
-            lads_info.append(("Per Week:", f"£{tender_analysis.lads_amount_per_week:,.2f}"))
-        if tender_analysis.lads_amount_per_day:
-            lads_info.append(("Per Day:", f"£{tender_analysis.lads_amount_per_day:,.2f}"))
-        if tender_analysis.lads_cap_percentage:
-            lads_info.append(("Cap (%):", f"{tender_analysis.lads_cap_percentage}%"))
-        if tender_analysis.lads_cap_amount:
-            lads_info.append(("Cap (Amount):", f"£{tender_analysis.lads_cap_amount:,.2f}"))
-        
+        if field('lads_amount_per_week'):
+            lads_info.append(("Per Week:", _format_money(field('lads_amount_per_week'))))
+        if field('lads_amount_per_day'):
+            lads_info.append(("Per Day:", _format_money(field('lads_amount_per_day'))))
+        if field('lads_cap_percentage'):
+            lads_info.append(("Cap (%):", f"{field('lads_cap_percentage')}%"))
+        if field('lads_cap_amount'):
+            lads_info.append(("Cap (Amount):", _format_money(field('lads_cap_amount'))))
+
         if not lads_info:
             lads_info = [("LADs:", "Not specified")]
-        
-        for label, value in lads_info:
-            ws[f'A{row}'] = label
-            ws[f'B{row}'] = value
-            ws[f'A{row}'].font = Font(bold=True)
-            row += 1
-        
-        # Auto-size columns
-        for column in ws.columns:
-            max_length = 0
-            column_letter = get_column_letter(column[0].column)
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Save to BytesIO
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        # Create HTTP response
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        
-        filename = f"Contract_Summary_{tender_analysis.project.name.replace(' ', '_')}_{tender_analysis.analysis_date.strftime('%Y%m%d')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
\ No newline at end of file
+
+        return [
+            ("CONTRACT INFORMATION", contract_info),
+            ("KEY DATES", date_info),
+            ("INSURANCE REQUIREMENTS", insurance_info),
+            ("LIQUIDATED DAMAGES", lads_info),
+        ]
+
+    def write_contract_summary(self, tender_analysis: TenderAnalysis, path):
+        """Write the summary to path"""
+
+        wb, ws = _write_only_workbook("Contract Summary")
+
+        def cell(value, style):
+            written = WriteOnlyCell(ws, value=value)
+            written.style = style
+            return written
+
+        project = tender_analysis.project
+        rows = [
+            [cell("CONTRACT INFORMATION SUMMARY", 'export_title')],
+            [],
+            [cell("Project:", 'export_label'), project.name],
+            [cell("Reference:", 'export_label'), project.reference],
+        ]
+
+        for title, entries in self._sections(tender_analysis):
+            rows.append([])
+            rows.append([cell(title, 'export_section')])
+            for label, value in entries:
+                rows.append([cell(label, 'export_label'), value])
+
+        # Size columns to their content - widths must be set before the first row is written
+        widths = {}
+        for row in rows:
+            for index, value in enumerate(row, 1):
+                text = getattr(value, 'value', value)
+                widths[index] = max(widths.get(index, 0), len(str(text or '')))
+        for index, width in widths.items():
+            ws.column_dimensions[get_column_letter(index)].width = min(width + 2, 50)
+
+        for row in rows:
+            ws.append(row)
+        wb.save(path)
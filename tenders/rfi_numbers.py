@@ -0,0 +1,53 @@
+# tenders/rfi_numbers.py
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import RFIItem, RFISequence
+
+logger = logging.getLogger(__name__)
+
+
+def format_rfi_number(project, number):
+    return f"RFI-{project.reference or project.id}-{number:03d}"
+
+
+def _highest_issued(project):
+    """Highest number among a project's RFIs, for projects numbered before sequences existed"""
+    highest = 0
+    numbers = RFIItem.objects.filter(project=project).exclude(rfi_number='').values_list('rfi_number', flat=True)
+    for rfi_number in numbers:
+        suffix = rfi_number.rsplit('-', 1)[-1]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def _advance(project, count):
+    return RFISequence.objects.filter(project_id=project.pk).update(last_number=F('last_number') + count)
+
+
+def allocate_rfi_numbers(project, count):
+    """
+    Reserve the next `count` RFI numbers of a project.
+    The UPDATE holds the sequence row lock until the surrounding transaction
+    ends, so concurrent callers always get disjoint blocks. Call it inside the
+    transaction that inserts the RFIs and a rollback hands the block back.
+    Returns: the formatted RFI numbers, in order
+    """
+    if count <= 0:
+        return []
+
+    with transaction.atomic():
+        if not _advance(project, count):
+            try:
+                with transaction.atomic():
+                    RFISequence.objects.create(project_id=project.pk, last_number=_highest_issued(project) + count)
+                logger.info(f"🔢 Started RFI numbering for project {project.pk}")
+            except IntegrityError:
+                # Another request created the sequence first
+                _advance(project, count)
+        last = RFISequence.objects.filter(project_id=project.pk).values_list('last_number', flat=True).get()
+
+    return [format_rfi_number(project, number) for number in range(last - count + 1, last + 1)]
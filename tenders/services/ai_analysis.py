@@ -15,6 +15,7 @@ from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
 from ..models import TenderAnalysis, RFIItem, DocumentQuestion
+from ..instrumentation import add_to_run, record_llm_usage, records_analysis_run, span, timed
 from projects.models import Project
 from subcontractors.models import Subcontractor
 from .enhanced_mapper import EnhancedAIAnalysisMapper
@@ -527,6 +528,7 @@ class SharePointService:
         except Exception as e:
             logger.error(f"❌ Error getting SharePoint access token: {str(e)}")
 
+    @timed('crawl')
     def get_folder_documents(self, sharepoint_url: str) -> List[Dict]:
         """Get all documents from a SharePoint folder (non-recursive)"""
         try:
@@ -558,6 +560,7 @@ class SharePointService:
             logger.error(f"Error getting SharePoint documents: {str(e)}")
             return []
 
+    @timed('crawl')
     def get_folder_documents_recursive(self, sharepoint_url: str, max_depth: int = 10) -> List[Dict]:
         """Get all documents from a SharePoint folder recursively"""
         try:
@@ -912,7 +915,9 @@ class SharePointService:
                 'Authorization': f'Bearer {self.access_token}',
             }
 
-            response = requests.get(download_url, headers=headers)
+            with span('download') as timer:
+                response = requests.get(download_url, headers=headers)
+                timer.add(bytes_downloaded=len(response.content) if response.status_code == 200 else 0)
             if response.status_code == 200:
                 return response.content
             else:
@@ -963,6 +968,13 @@ class DocumentParser:
     @staticmethod
     def extract_text(content: bytes, mime_type: str, filename: str) -> str:
         """Extract text from document content based on type"""
+        with span('parse') as timer:
+            text = DocumentParser._extract_text_by_type(content, mime_type, filename)
+            timer.add(documents_parsed=1, text_chars=len(text or ''))
+            return text
+
+    @staticmethod
+    def _extract_text_by_type(content: bytes, mime_type: str, filename: str) -> str:
         try:
             filename_lower = filename.lower()
 
@@ -1180,6 +1192,13 @@ class ClaudeAIService:
         if not self.claude_available:
             logger.info("ℹ️ Using fallback analysis mode")
 
+    def create_message(self, **kwargs):
+        """messages.create, timed as the llm stage with its token usage recorded"""
+        with span('llm') as timer:
+            response = self.client.messages.create(**kwargs)
+            record_llm_usage(timer, response)
+            return response
+
     def _rate_limit_api_calls(self):
         """Ensure minimum time between API calls"""
         with self._api_call_lock:
@@ -1202,7 +1221,7 @@ class ClaudeAIService:
             try:
                 logger.info(f"🔄 Claude API attempt {attempt + 1}/{max_retries}")
 
-                response = self.client.messages.create(
+                response = self.create_message(
                     model="claude-3-5-sonnet-20241022",
                     max_tokens=6000,
                     temperature=0.1,
@@ -2333,7 +2352,7 @@ DOCUMENTS TO ANALYZE:
 
             # Call Claude API
             logger.info("Calling Claude AI API...")
-            response = self.client.messages.create(
+            response = self.create_message(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=4000,
                 temperature=0.1,
@@ -2366,7 +2385,7 @@ DOCUMENTS TO ANALYZE:
         try:
             # Call Claude API with the prompt
             logger.info("Calling Claude API...")
-            response = self.client.messages.create(
+            response = self.create_message(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=4000,
                 temperature=0.1,
@@ -2978,6 +2997,7 @@ DOCUMENTS TO ANALYZE:
 
         return prompt
 
+    @records_analysis_run('comprehensive')
     def analyze_project_comprehensive(self, project: 'Project', max_depth: int = 4) -> 'TenderAnalysis':
         """Natural Claude.ai style analysis - COMPLETELY REWRITTEN"""
 
@@ -2989,6 +3009,7 @@ DOCUMENTS TO ANALYZE:
             documents = self.sharepoint_service.get_folder_documents_recursive(
                 project.sharepoint_folder_url, max_depth=max_depth
             )
+            add_to_run(documents_found=len(documents or []))
 
             if not documents:
                 raise ValueError("No documents found in SharePoint folder")
@@ -3044,7 +3065,7 @@ DOCUMENTS TO ANALYZE:
             if not self.claude_service.claude_available:
                 raise ValueError("Claude AI service not available")
 
-            response = self.claude_service.client.messages.create(
+            response = self.claude_service.create_message(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=8000,  # Allow for detailed response
                 temperature=0.1,
@@ -3060,14 +3081,15 @@ DOCUMENTS TO ANALYZE:
             analysis_data = self._parse_natural_claude_response(claude_response, project, document_names)
 
             # Save to database
-            analysis, created = TenderAnalysis.objects.update_or_create(
-                project=project,
-                defaults=analysis_data
-            )
+            with span('save'):
+                analysis, created = TenderAnalysis.objects.update_or_create(
+                    project=project,
+                    defaults=analysis_data
+                )
 
-            # Set documents analyzed
-            analysis.documents_analyzed = document_names
-            analysis.save()
+                # Set documents analyzed
+                analysis.documents_analyzed = document_names
+                analysis.save()
 
             duration = time.time() - start_time
             logger.info(f"✅ NATURAL analysis completed in {duration:.2f} seconds")
@@ -3281,7 +3303,7 @@ DOCUMENTS TO ANALYZE:
             )
 
             # Call Claude with enhanced parameters
-            response = self.claude_service.client.messages.create(
+            response = self.claude_service.create_message(
                 model="claude-3-5-sonnet-20241022",
                 max_tokens=8000,  # Increased for comprehensive response
                 temperature=0.1,
@@ -3605,6 +3627,7 @@ DOCUMENTS TO ANALYZE:
 
         return questions[:15]  # Limit to 15 questions
 
+    @records_analysis_run('file_detection')
     def analyze_project_with_file_detection(self, project: Project, max_depth: int = 4) -> 'TenderAnalysis':
         """Enhanced analysis with file format detection - ADD this method"""
 
@@ -3617,6 +3640,7 @@ DOCUMENTS TO ANALYZE:
                 project.sharepoint_folder_url,
                 max_depth=max_depth
             )
+            add_to_run(documents_found=len(documents or []))
 
             if not documents:
                 logger.warning("⚠️ No documents found")
@@ -3677,7 +3701,7 @@ DOCUMENTS TO ANALYZE:
 
             # Call Claude with enhanced prompt
             if self.claude_service.claude_available:
-                response = self.claude_service.client.messages.create(
+                response = self.claude_service.create_message(
                     model="claude-3-5-sonnet-20241022",
                     max_tokens=4000,
                     temperature=0.1,
@@ -3692,19 +3716,20 @@ DOCUMENTS TO ANALYZE:
             # Save to database using your existing mapping
             mapped_results = self._map_analysis_to_model_fields(analysis_results, project)
 
-            tender_analysis, created = TenderAnalysis.objects.get_or_create(
-                project=project,
-                defaults=mapped_results
-            )
+            with span('save'):
+                tender_analysis, created = TenderAnalysis.objects.get_or_create(
+                    project=project,
+                    defaults=mapped_results
+                )
 
-            if not created:
-                for key, value in mapped_results.items():
-                    if hasattr(tender_analysis, key):
-                        setattr(tender_analysis, key, value)
-                tender_analysis.save()
+                if not created:
+                    for key, value in mapped_results.items():
+                        if hasattr(tender_analysis, key):
+                            setattr(tender_analysis, key, value)
+                    tender_analysis.save()
 
-            tender_analysis.documents_analyzed = document_names
-            tender_analysis.save()
+                tender_analysis.documents_analyzed = document_names
+                tender_analysis.save()
 
             # Generate recommendations using your existing method
             try:
@@ -4078,6 +4103,7 @@ DOCUMENTS TO ANALYZE:
             logger.error(traceback.format_exc())
             raise
 
+    @records_analysis_run('sharepoint_folder')
     def analyze_project_sharepoint_folder(self, project):
         """Analyze all documents in the project's SharePoint folder (non-recursive)"""
         try:
@@ -4092,6 +4118,7 @@ DOCUMENTS TO ANALYZE:
             # Get all documents from SharePoint folder
             logger.info(f"Fetching documents from SharePoint folder: {sharepoint_url}")
             documents = self.sharepoint_service.get_folder_documents(sharepoint_url)
+            add_to_run(documents_found=len(documents or []))
 
             if not documents:
                 raise ValueError("No documents found in SharePoint folder")
@@ -4137,23 +4164,24 @@ DOCUMENTS TO ANALYZE:
             from tenders.models import TenderAnalysis
             mapped_results = self._map_analysis_to_model_fields(analysis_results, project)
 
-            tender_analysis, created = TenderAnalysis.objects.get_or_create(
-                project=project,
-                defaults=mapped_results
-            )
+            with span('save'):
+                tender_analysis, created = TenderAnalysis.objects.get_or_create(
+                    project=project,
+                    defaults=mapped_results
+                )
 
-            if not created:
-                # Update existing analysis
-                logger.info("Updating existing analysis")
-                for key, value in mapped_results.items():
-                    if hasattr(tender_analysis, key):
-                        setattr(tender_analysis, key, value)
-                    else:
-                        logger.warning(f"TenderAnalysis model doesn't have field '{key}'")
-                tender_analysis.save()
+                if not created:
+                    # Update existing analysis
+                    logger.info("Updating existing analysis")
+                    for key, value in mapped_results.items():
+                        if hasattr(tender_analysis, key):
+                            setattr(tender_analysis, key, value)
+                        else:
+                            logger.warning(f"TenderAnalysis model doesn't have field '{key}'")
+                    tender_analysis.save()
 
-            tender_analysis.documents_analyzed = document_names
-            tender_analysis.save()
+                tender_analysis.documents_analyzed = document_names
+                tender_analysis.save()
 
             # Generate subcontractor recommendations
             try:
@@ -4209,24 +4237,27 @@ DOCUMENTS TO ANALYZE:
         return analysis_results
 
     def _generate_subcontractor_recommendations(self, tender_analysis):
-        """Enhanced subcontractor recommendation generation"""
+        """Rank subcontractors on the database for each required trade and store the recommendations"""
         try:
             logger.info("Enhanced subcontractor recommendations generation starting")
 
             # Import the enhanced mapper
             from .enhanced_mapper import EnhancedAIAnalysisMapper
+            from .recommendation_engine import RecommendationEngine, required_trades
             mapper = EnhancedAIAnalysisMapper()
 
-            analysis_data = {
-                'required_trades': tender_analysis.key_requirements or []
-            }
+            trades = required_trades(tender_analysis)
+            if not trades:
+                logger.info("No required trades in the analysis - no subcontractor recommendations generated")
+                return
 
-            recommendations = mapper.generate_enhanced_subcontractor_recommendations(analysis_data)
+            trade_requirements = mapper.generate_enhanced_subcontractor_recommendations({'required_trades': trades})
+            recommendations = RecommendationEngine().recommend(tender_analysis, trade_requirements)
             logger.info(f"Generated {len(recommendations)} subcontractor recommendations")
 
             # Log the recommendations
             for rec in recommendations:
-                logger.info(f"Recommendation: {rec['trade_category']} - {rec['priority']}")
+                logger.info(f"Recommendation: {rec.trade_category} - {rec.priority} - {rec.suitability_score}")
 
         except Exception as e:
             logger.error(f"Error in enhanced subcontractor generation: {str(e)}")
@@ -12,7 +12,6 @@ from decimal import Decimal
 import anthropic
 from django.conf import settings
 from django.db import transaction
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 
 # Import existing services - using the correct paths from your project
@@ -26,6 +25,7 @@ except ImportError:
 # Import models
 from ..models import TenderAnalysis, AIConversation, AIQuestion
 from projects.models import Project
+from core import cache as project_cache
 
 logger = logging.getLogger(__name__)
 
@@ -82,14 +82,16 @@ class EnhancedDocumentQuestionAnswerer:
         """
         Get comprehensive document suite from SharePoint with caching
         """
-        cache_key = f"comprehensive_docs_{project.id}"
-        
-        if use_cache:
-            cached_data = cache.get(cache_key)
-            if cached_data:
-                logger.info(f"Using cached document data for project {project.id}")
-                return cached_data
-        
+        # Shared across workers - concurrent questions wait for a single fetch
+        return project_cache.get_or_build(
+            project_cache.DOCUMENTS_NAMESPACE,
+            project.id,
+            lambda: self._fetch_comprehensive_documents(project),
+            timeout=3600,
+            force_refresh=not use_cache
+        )
+
+    def _fetch_comprehensive_documents(self, project: Project) -> Dict[str, Any]:
         logger.info(f"Fetching comprehensive document suite for project {project.id}")
         
         try:
@@ -179,9 +181,6 @@ class EnhancedDocumentQuestionAnswerer:
                     document_data['processing_summary']['failed'] += 1
                     continue
             
-            # Cache the processed data (for 1 hour)
-            cache.set(cache_key, document_data, 3600)
-            
             logger.info(f"Processed {document_data['processing_summary']['successful']} documents successfully")
             return document_data
             
@@ -438,8 +437,7 @@ Document content: {relevant_content[:15000]}
         """
         Clear cached document data for a project
         """
-        cache_key = f"comprehensive_docs_{project.id}"
-        cache.delete(cache_key)
+        project_cache.invalidate(project_cache.DOCUMENTS_NAMESPACE, project.id)
         logger.info(f"Cleared document cache for project {project.id}")
 
 
@@ -0,0 +1,444 @@
+# tenders/services/recommendation_engine.py
+"""
+Subcontractor ranking for the trades a tender analysis requires.
+
+Everything the score needs is loaded into NumPy arrays in five queries -
+subcontractors with their SubcontractorStats and head-office location, regions,
+region memberships, live tenders and trades - and every subcontractor is scored
+in one vectorised pass per project. Head offices within travelling distance of
+the project are found with the proximity index of subcontractors.geo. Candidates
+for each trade are then picked from those arrays and the recommendations are
+written with a single bulk insert.
+"""
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from subcontractors.geo import ProximityIndex, geocode
+from subcontractors.models import Region, Subcontractor, Trade
+from tenders.models import SubcontractorRecommendation, TenderInvitation
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_TRADE_PREFIX = 'Required trade:'
+
+# Fragments of a trade name -> SubcontractorRecommendation trade category, checked in order
+TRADE_KEYWORDS = [
+    ('M&E', ('m&e', 'mechanical', 'hvac', 'ventilation', 'building services')),
+    ('ELECTRICAL', ('electric',)),
+    ('PLUMBING', ('plumb', 'sanitary', 'heating')),
+    ('DEMOLITION', ('demoli', 'strip out', 'soft strip')),
+    ('GROUNDWORKS', ('groundwork', 'civil', 'excavat', 'drainage', 'earthwork', 'piling', 'external works')),
+    ('CONCRETE', ('concrete', 'rc frame', 'formwork')),
+    ('BRICKWORK', ('brick', 'blockwork', 'masonry')),
+    ('ROOFING', ('roof',)),
+    ('STEELWORK', ('steel', 'structural', 'metalwork')),
+    ('CARPENTRY', ('carpent', 'joiner', 'timber')),
+    ('PLASTERING', ('plaster', 'drylin', 'partition', 'ceiling')),
+    ('FLOORING', ('floor', 'screed', 'carpet')),
+    ('PAINTING', ('paint', 'decorat')),
+    ('GLAZING', ('glaz', 'window', 'curtain wall')),
+    ('INSULATION', ('insulat',)),
+    ('SCAFFOLDING', ('scaffold',)),
+    ('PLANT_HIRE', ('plant',)),
+    ('WASTE_MANAGEMENT', ('waste', 'skip hire')),
+    ('SECURITY', ('security',)),
+    ('CLEANING', ('clean',)),
+]
+
+# Share of the suitability score taken by each component
+WEIGHTS = {
+    'past_performance': 0.35,
+    'location_proximity': 0.20,
+    'acceptance': 0.15,
+    'capacity_score': 0.15,
+    'experience_match': 0.15,
+}
+
+# Given when there is nothing to judge a component on
+NEUTRAL_SCORE = 50.0
+
+# Past performance: the subcontractor's rating outweighs their tender return rate
+RATING_WEIGHT = 0.6
+RETURN_RATE_WEIGHT = 0.4
+
+# Each live tender a subcontractor has accepted and not yet returned
+CAPACITY_PER_ACTIVE_TENDER = 25.0
+
+# Experience: a base for every subcontractor in the trade plus each tender returned
+BASE_EXPERIENCE = 40.0
+EXPERIENCE_PER_RETURN = 15.0
+
+# Head office in the project location without covering its region, when either cannot be geocoded
+HEAD_OFFICE_PROXIMITY = 70.0
+
+# Head offices this close to the project score full proximity, falling to none at MAX_TRAVEL_MILES
+LOCAL_MILES = 20.0
+MAX_TRAVEL_MILES = 100.0
+
+INSURANCE_WARNING_DAYS = 30
+EXPIRED_INSURANCE_PENALTY = 25.0
+MISSING_INSURANCE_PENALTY = 10.0
+EXPIRING_INSURANCE_PENALTY = 5.0
+
+# Average days from invitation to response flagged as a concern
+SLOW_RESPONSE_DAYS = 7
+
+RECOMMEND_THRESHOLD = 60.0
+CANDIDATES_PER_TRADE = 5
+
+# Most urgent first - merged requirements keep the most urgent priority
+PRIORITY_ORDER = ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW']
+
+
+def trade_category(name):
+    """SubcontractorRecommendation trade category for a trade name, OTHER if none fits"""
+    name = str(name).lower()
+    for category, keywords in TRADE_KEYWORDS:
+        if any(keyword in name for keyword in keywords):
+            return category
+    return 'OTHER'
+
+
+def _urgency(priority):
+    """Position in PRIORITY_ORDER, unknown priorities last"""
+    return PRIORITY_ORDER.index(priority) if priority in PRIORITY_ORDER else len(PRIORITY_ORDER)
+
+
+def merge_requirements(trade_requirements):
+    """
+    Requirements combined per SubcontractorRecommendation trade category, in order of first appearance -
+    'Groundworks' and 'Drainage' draw on the same subcontractors, so they are ranked once.
+    Trades without a category (OTHER) are only combined with the same trade name.
+    Returns: list of dicts with trades, trade_category, priority, experience_needed and certifications
+    """
+    merged = {}
+    for requirement in trade_requirements:
+        trade = str(requirement['trade_category'])
+        category = trade_category(trade)
+        key = category if category != 'OTHER' else trade.lower().strip()
+        group = merged.setdefault(key, {
+            'trades': [],
+            'trade_category': category,
+            'priority': None,
+            'experience_needed': [],
+            'certifications': [],
+        })
+        if trade not in group['trades']:
+            group['trades'].append(trade)
+
+        priority = requirement.get('priority', 'MEDIUM')
+        if group['priority'] is None or _urgency(priority) < _urgency(group['priority']):
+            group['priority'] = priority
+
+        experience = requirement.get('experience_needed', '')
+        if experience and experience not in group['experience_needed']:
+            group['experience_needed'].append(experience)
+        for certification in requirement.get('certifications', []):
+            if certification not in group['certifications']:
+                group['certifications'].append(certification)
+
+    for group in merged.values():
+        group['experience_needed'] = '; '.join(group['experience_needed'])
+    return list(merged.values())
+
+
+def required_trades(tender_analysis):
+    """Trade names from the 'Required trade: X' entries of key_requirements, in order and without repeats"""
+    trades = []
+    for requirement in tender_analysis.key_requirements or []:
+        requirement = str(requirement)
+        if requirement.startswith(REQUIRED_TRADE_PREFIX):
+            trade = requirement[len(REQUIRED_TRADE_PREFIX):].strip()
+            if trade and trade not in trades:
+                trades.append(trade)
+    return trades
+
+
+class SubcontractorFeatures:
+    """
+    One row per subcontractor, ordered by id:
+    trade, region membership, head-office coordinates, rating, days of insurance left and tender history.
+    """
+
+    def __init__(self, today=None):
+        self.today = today or timezone.localdate()
+        now = timezone.now()
+
+        # Invitation history comes from SubcontractorStats, joined onto the subcontractor rows
+        rows = list(
+            Subcontractor.objects.order_by('id').values_list(
+                'id', 'trade_id', 'company', 'head_office', 'subcontractor_score', 'insurance_expiry',
+                'tender_stats__invitation_count', 'tender_stats__accepted_count',
+                'tender_stats__returned_count', 'tender_stats__response_count', 'tender_stats__response_seconds',
+                'geolocation__latitude', 'geolocation__longitude',
+            )
+        )
+        size = len(rows)
+        columns = list(zip(*rows)) if rows else [()] * 13
+        ids, trade_ids, companies, head_offices, scores, expiries = columns[:6]
+
+        self.ids = np.array(ids, dtype=np.int64)
+        self.trade_ids = np.array(trade_ids, dtype=np.int64)
+        self.companies = list(companies)
+        self.head_offices = [str(office).lower().strip() for office in head_offices]
+        self.rating = np.array([np.nan if score is None else float(score) for score in scores], dtype=float)
+        self.insurance_expiry = list(expiries)
+        self.insurance_days = np.array(
+            [np.nan if expiry is None else (expiry - self.today).days for expiry in expiries], dtype=float
+        )
+
+        # No stats row - no invitations yet
+        history = np.array(
+            [[value or 0 for value in column] for column in columns[6:11]], dtype=np.int64
+        ).reshape(5, size)
+        self.invited, self.accepted, self.returned, responses, response_seconds = history
+        self.response_days = _ratio(response_seconds, responses) / 86400
+
+        # Head offices the gazetteer did not recognise have no location - NaN coordinates, left out of the index
+        latitudes, longitudes = (
+            np.array([np.nan if value is None else value for value in column], dtype=float) for column in columns[11:13]
+        )
+        self.proximity = ProximityIndex(self.ids, latitudes, longitudes, self.trade_ids)
+        if size and not len(self.proximity):
+            logger.warning(
+                "⚠️ No subcontractor head offices are geocoded - location scoring falls back to text matching. "
+                "Run manage.py geocode_subcontractors"
+            )
+
+        # Region membership matrix - subcontractors by regions
+        regions = list(Region.objects.order_by('id').values_list('id', 'name'))
+        self.region_names = [name.lower().strip() for _, name in regions]
+        self.regions = np.zeros((size, len(regions)), dtype=bool)
+        links = np.array(
+            Subcontractor.regions.through.objects.values_list('subcontractor_id', 'region_id'), dtype=np.int64
+        ).reshape(-1, 2)
+        region_ids = np.array([region_id for region_id, _ in regions], dtype=np.int64)
+        self.regions[self._rows(links[:, 0]), np.searchsorted(region_ids, links[:, 1])] = True
+
+        # Live tenders in hand - accepted, not returned and before the deadline - depend on the time, so are counted here
+        active = np.array(
+            TenderInvitation.objects.filter(
+                status='ACCEPTED', tender_returned=False, project__tender_deadline__gte=now
+            ).values('subcontractor_id').annotate(active=Count('id')).order_by()
+            .values_list('subcontractor_id', 'active'),
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        self.active = np.zeros(size, dtype=np.int64)
+        self.active[self._rows(active[:, 0])] = active[:, 1]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _rows(self, subcontractor_ids):
+        """Row positions of subcontractor ids - ids are sorted, so a binary search finds them"""
+        return np.searchsorted(self.ids, subcontractor_ids)
+
+    def location_matches(self, location):
+        """
+        Per subcontractor, whether they cover the project location:
+        (region named in the location, head office named in the location).
+        """
+        location = str(location or '').lower()
+        covered = np.array([bool(name) and name in location for name in self.region_names], dtype=bool)
+        in_region = self.regions[:, covered].any(axis=1)
+        in_office = np.fromiter(
+            (bool(office) and (office in location or location in office) for office in self.head_offices),
+            dtype=bool,
+            count=len(self),
+        )
+        return in_region, in_office
+
+    def distances_from(self, location, miles=MAX_TRAVEL_MILES):
+        """
+        Miles from a geocoded Location to each head office:
+        NaN where the head office has no coordinates, inf where it is further than miles away.
+        """
+        distances = np.where(np.isnan(self.proximity.latitudes), np.nan, np.inf)
+        positions, nearby = self.proximity.within(location.latitude, location.longitude, miles)
+        distances[positions] = nearby
+        return distances
+
+
+def _ratio(part, whole):
+    """part / whole as a float array, NaN where whole is 0"""
+    return np.where(whole > 0, part / np.maximum(whole, 1), np.nan)
+
+
+def score_subcontractors(features, location):
+    """
+    Component scores (0-100) and the weighted suitability score for every subcontractor.
+    Returns: dict of arrays aligned with features.ids
+    """
+    rating = features.rating * 10
+    return_rate = _ratio(features.returned, features.accepted) * 100
+
+    # Weighted mean of rating and return rate, skipping whichever is unknown
+    parts = np.vstack([rating, return_rate])
+    weights = np.array([[RATING_WEIGHT], [RETURN_RATE_WEIGHT]])
+    known = ~np.isnan(parts)
+    weight = np.where(known, weights, 0).sum(axis=0)
+    past_performance = np.where(
+        weight > 0, np.where(known, parts * weights, 0).sum(axis=0) / np.maximum(weight, 1e-9), NEUTRAL_SCORE
+    )
+
+    point = geocode(location)
+    distance = features.distances_from(point) if point else np.full(len(features), np.nan)
+    if location:
+        in_region, in_office = features.location_matches(location)
+        # Distance where both ends are geocoded, otherwise the head office named in the location
+        travel = np.clip((MAX_TRAVEL_MILES - distance) / (MAX_TRAVEL_MILES - LOCAL_MILES) * 100, 0, 100)
+        nearby = np.where(np.isnan(distance), np.where(in_office, HEAD_OFFICE_PROXIMITY, 0.0), travel)
+        location_proximity = np.where(in_region, 100.0, nearby)
+    else:
+        in_region = np.zeros(len(features), dtype=bool)
+        location_proximity = np.full(len(features), NEUTRAL_SCORE)
+
+    acceptance = np.nan_to_num(_ratio(features.accepted, features.invited) * 100, nan=NEUTRAL_SCORE)
+    capacity_score = np.clip(100 - CAPACITY_PER_ACTIVE_TENDER * features.active, 0, 100).astype(float)
+    experience_match = np.minimum(100.0, BASE_EXPERIENCE + EXPERIENCE_PER_RETURN * features.returned)
+
+    scores = {
+        'past_performance': past_performance,
+        'location_proximity': location_proximity,
+        'acceptance': acceptance,
+        'capacity_score': capacity_score,
+        'experience_match': experience_match,
+    }
+
+    days = features.insurance_days
+    penalty = np.select(
+        [np.isnan(days), days < 0, days <= INSURANCE_WARNING_DAYS],
+        [MISSING_INSURANCE_PENALTY, EXPIRED_INSURANCE_PENALTY, EXPIRING_INSURANCE_PENALTY],
+        0.0,
+    )
+    weighted = np.column_stack([scores[name] for name in WEIGHTS]) @ np.array(list(WEIGHTS.values()))
+    scores['suitability_score'] = np.clip(weighted - penalty, 0, 100)
+    scores['insurance_expired'] = days < 0
+    scores['covers_region'] = in_region
+    scores['distance_miles'] = distance
+    return scores
+
+
+class RecommendationEngine:
+    """Ranks subcontractors for each required trade and stores SubcontractorRecommendation rows"""
+
+    def __init__(self, features=None):
+        self.features = features if features is not None else SubcontractorFeatures()
+        self.trades = list(Trade.objects.values_list('id', 'name'))
+
+    def trade_ids(self, trade):
+        """Ids of the database trades that can supply a required trade"""
+        category = trade_category(trade)
+        wanted = trade.lower().strip()
+        return [
+            trade_id for trade_id, name in self.trades
+            if name.lower().strip() == wanted
+            or (category != 'OTHER' and trade_category(name) == category)
+        ]
+
+    def rank(self, trades, scores, limit=CANDIDATES_PER_TRADE):
+        """Row positions of the best candidates for a trade (or list of trades), best first"""
+        if isinstance(trades, str):
+            trades = [trades]
+        trade_ids = {trade_id for trade in trades for trade_id in self.trade_ids(trade)}
+        candidates = np.flatnonzero(np.isin(self.features.trade_ids, list(trade_ids)))
+        order = np.argsort(-scores['suitability_score'][candidates], kind='stable')
+        return candidates[order[:limit]]
+
+    def recommend(self, tender_analysis, trade_requirements, limit=CANDIDATES_PER_TRADE, created_by=None):
+        """
+        Replace the recommendations of a tender analysis.
+        trade_requirements: the dicts EnhancedAIAnalysisMapper.generate_enhanced_subcontractor_recommendations returns
+        Returns: the SubcontractorRecommendation rows created
+        """
+        features = self.features
+        scores = score_subcontractors(features, tender_analysis.project.location)
+
+        recommendations = []
+        # Trades of one category share candidates - rank them together, each subcontractor once
+        for requirement in merge_requirements(trade_requirements):
+            trade = ' / '.join(requirement['trades'])
+            common = {
+                'tender_analysis': tender_analysis,
+                'trade_category': requirement['trade_category'],
+                'priority': requirement['priority'],
+                'required_experience': requirement['experience_needed'],
+                'required_certifications': requirement['certifications'],
+                'created_by': created_by,
+            }
+
+            rows = self.rank(requirement['trades'], scores, limit).tolist()
+            if not rows:
+                recommendations.append(SubcontractorRecommendation(
+                    recommendation_notes=f"No subcontractors on the database for {trade}",
+                    **common,
+                ))
+                continue
+
+            for rank, row in enumerate(rows, start=1):
+                suitability = float(scores['suitability_score'][row])
+                recommendations.append(SubcontractorRecommendation(
+                    subcontractor_id=int(features.ids[row]),
+                    suitability_score=round(suitability, 1),
+                    experience_match=round(float(scores['experience_match'][row]), 1),
+                    location_proximity=round(float(scores['location_proximity'][row]), 1),
+                    past_performance=round(float(scores['past_performance'][row]), 1),
+                    capacity_score=round(float(scores['capacity_score'][row]), 1),
+                    strengths=self._strengths(row, scores),
+                    concerns=self._concerns(row, scores),
+                    recommendation_notes=f"Ranked {rank} of {len(rows)} for {trade}",
+                    is_recommended=suitability >= RECOMMEND_THRESHOLD and not scores['insurance_expired'][row],
+                    **common,
+                ))
+
+        with transaction.atomic():
+            tender_analysis.subcontractor_recommendations.all().delete()
+            created = SubcontractorRecommendation.objects.bulk_create(recommendations, batch_size=500)
+
+        logger.info(f"🏗️ Stored {len(created)} subcontractor recommendations for analysis {tender_analysis.pk}")
+        return created
+
+    def _strengths(self, row, scores):
+        features = self.features
+        strengths = []
+        distance = scores['distance_miles'][row]
+        if scores['covers_region'][row]:
+            strengths.append('Covers the project region')
+        if distance <= LOCAL_MILES:
+            strengths.append(f"Head office {distance:.0f} miles from the project")
+        elif np.isnan(distance) and not scores['covers_region'][row] and scores['location_proximity'][row] >= HEAD_OFFICE_PROXIMITY:
+            strengths.append('Head office near the project')
+        if not np.isnan(features.rating[row]):
+            strengths.append(f"Rated {features.rating[row]:g}/10")
+        if features.returned[row]:
+            strengths.append(f"Returned {features.returned[row]} of {features.accepted[row]} accepted tenders")
+        # Only a strength for someone who takes work on, not one who turns every invitation down
+        if features.accepted[row] > 0 and not features.active[row]:
+            strengths.append('No live tenders in hand')
+        return strengths
+
+    def _concerns(self, row, scores):
+        features = self.features
+        concerns = []
+        if np.isinf(scores['distance_miles'][row]):
+            concerns.append(f"Head office more than {MAX_TRAVEL_MILES:.0f} miles from the project")
+        expiry = features.insurance_expiry[row]
+        if expiry is None:
+            concerns.append('No insurance expiry date on record')
+        elif expiry < features.today:
+            concerns.append(f"Insurance expired on {expiry:%d/%m/%Y}")
+        elif (expiry - features.today).days <= INSURANCE_WARNING_DAYS:
+            concerns.append(f"Insurance expires on {expiry:%d/%m/%Y}")
+        if not features.invited[row]:
+            concerns.append('No tender history')
+        elif features.invited[row] >= 3 and features.accepted[row] * 3 < features.invited[row]:
+            concerns.append(f"Accepted {features.accepted[row]} of {features.invited[row]} invitations")
+        if features.response_days[row] > SLOW_RESPONSE_DAYS:
+            concerns.append(f"Takes {features.response_days[row]:.0f} days on average to respond")
+        if features.active[row] >= 3:
+            concerns.append(f"{features.active[row]} live tenders in hand")
+        return concerns
@@ -0,0 +1,200 @@
+# tenders/services/reminder_engine.py
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import TenderInvitation
+
+logger = logging.getLogger(__name__)
+
+# Invitation status and tracking fields for each reminder type
+REMINDER_TYPES = {
+    'pending': {
+        'status': 'PENDING',
+        'last_field': 'last_pending_reminder',
+        'count_field': 'pending_reminder_count',
+    },
+    'will_tender': {
+        'status': 'ACCEPTED',
+        'last_field': 'last_will_tender_reminder',
+        'count_field': 'will_tender_reminder_count',
+    },
+}
+
+# (subject, body, extra send_email kwargs) for one recipient, or None to skip
+RenderedReminder = Optional[Tuple[str, str, Dict]]
+ReminderRenderer = Callable[[str, Optional[int], TenderInvitation], RenderedReminder]
+
+
+class ReminderEngine:
+    """
+    Plans every due reminder across the book in one query, sends them through a
+    shared worker pool and records the tracking counters with a single bulk_update.
+    """
+
+    def __init__(self, email_service, now=None, max_workers: int = None):
+        self.email_service = email_service
+        self.now = now or timezone.now()
+        self.today = timezone.localdate(self.now)
+        self.max_workers = max_workers or getattr(settings, 'REMINDER_SEND_WORKERS', 8)
+
+    def reminded_today(self, reminder_type: str) -> Q:
+        """
+        Invitations already sent this reminder type today.
+        A range on the timestamp rather than __date, so the reminder indexes can be used.
+        """
+        start = timezone.make_aware(datetime.combine(self.today, time.min))
+        last_field = REMINDER_TYPES[reminder_type]['last_field']
+        return Q(**{
+            f"{last_field}__gte": start,
+            f"{last_field}__lt": start + timedelta(days=1),
+        })
+
+    def due_queryset(self, reminder_types: Iterable[str] = ('pending', 'will_tender'),
+                     project_ids: List[int] = None,
+                     deadline_windows: Iterable[int] = None):
+        """Open invitations of the given reminder types not yet reminded today"""
+        due = Q()
+        for reminder_type in reminder_types:
+            config = REMINDER_TYPES[reminder_type]
+            due |= Q(status=config['status']) & ~self.reminded_today(reminder_type)
+
+        invitations = TenderInvitation.objects.filter(
+            due,
+            tender_returned=False
+        ).select_related('project', 'subcontractor')
+
+        if project_ids is not None:
+            invitations = invitations.filter(project_id__in=project_ids)
+
+        if deadline_windows is not None:
+            invitations = invitations.filter(
+                project__sc_deadline__in=[self.today + timedelta(days=days) for days in deadline_windows]
+            )
+
+        return invitations
+
+    def sent_today_queryset(self, reminder_type: str, project_ids: List[int] = None):
+        """Invitations that have already had this reminder type today (daily limit)"""
+        invitations = TenderInvitation.objects.filter(
+            self.reminded_today(reminder_type),
+            status=REMINDER_TYPES[reminder_type]['status']
+        )
+        if project_ids is not None:
+            invitations = invitations.filter(project_id__in=project_ids)
+        return invitations
+
+    def plan(self, reminder_types: Iterable[str] = ('pending', 'will_tender'),
+             project_ids: List[int] = None,
+             deadline_windows: Iterable[int] = None) -> Dict[Tuple[str, Optional[int]], List[TenderInvitation]]:
+        """
+        Find invitations due a reminder today, grouped by (reminder_type, days_to_sc_deadline).
+        Invitations already reminded today for that type are excluded (daily limit).
+        """
+        invitations = self.due_queryset(reminder_types, project_ids, deadline_windows)
+
+        groups = defaultdict(list)
+        for invitation in invitations:
+            reminder_type = 'pending' if invitation.status == 'PENDING' else 'will_tender'
+            sc_deadline = invitation.project.sc_deadline
+            window = (sc_deadline - self.today).days if sc_deadline else None
+            groups[(reminder_type, window)].append(invitation)
+
+        logger.info(f"📋 Reminder plan: {sum(len(v) for v in groups.values())} reminders in {len(groups)} groups")
+        return dict(groups)
+
+    def send(self, groups: Dict[Tuple[str, Optional[int]], List[TenderInvitation]],
+             render: ReminderRenderer = None) -> Dict:
+        """
+        Send planned reminders concurrently.
+        Without a renderer each invitation goes through the service's dedicated reminder method.
+        Returns: summary dict with sent/failed totals and per-group counts
+        """
+        from communications.models import EmailLog
+
+        jobs = [
+            (reminder_type, window, invitation)
+            for (reminder_type, window), invitations in groups.items()
+            for invitation in invitations
+        ]
+        if not jobs:
+            return {'sent': 0, 'failed': 0, 'by_group': {}}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+            results = list(pool.map(lambda job: self._send_one(job, render), jobs))
+
+        sent = []
+        logs = []
+        by_group = defaultdict(int)
+        failed = 0
+
+        for (reminder_type, window, invitation), (success, rendered) in zip(jobs, results):
+            if not success:
+                failed += 1
+                continue
+
+            config = REMINDER_TYPES[reminder_type]
+            setattr(invitation, config['last_field'], self.now)
+            setattr(invitation, config['count_field'], getattr(invitation, config['count_field']) + 1)
+            invitation.reminder_sent_at = self.now
+            sent.append(invitation)
+            by_group[(reminder_type, window)] += 1
+
+            if rendered:
+                subject, body, _ = rendered
+                logs.append(EmailLog(
+                    project=invitation.project,
+                    subcontractor=invitation.subcontractor,
+                    email_type='REMINDER',
+                    subject=subject,
+                    body=body
+                ))
+
+        with transaction.atomic():
+            TenderInvitation.objects.bulk_update(sent, self._tracking_fields(groups), batch_size=500)
+            if logs:
+                EmailLog.objects.bulk_create(logs, batch_size=500)
+
+        logger.info(f"✅ Reminders sent: {len(sent)}, failed: {failed}")
+        return {'sent': len(sent), 'failed': failed, 'by_group': dict(by_group)}
+
+    def _send_one(self, job, render: ReminderRenderer):
+        """Send a single reminder, returns (success, rendered)"""
+        reminder_type, window, invitation = job
+        try:
+            if render is None:
+                if reminder_type == 'pending':
+                    return self.email_service.send_pending_response_reminder(invitation), None
+                return self.email_service.send_will_tender_deadline_reminder(invitation), None
+
+            rendered = render(reminder_type, window, invitation)
+            if rendered is None:
+                return False, None
+
+            subject, body, send_kwargs = rendered
+            success = self.email_service.send_email(
+                to_email=invitation.subcontractor.email,
+                subject=subject,
+                body=body,
+                **send_kwargs
+            )
+            return success, rendered
+
+        except Exception as e:
+            logger.exception(f"Error sending {reminder_type} reminder to {invitation.subcontractor.company}: {str(e)}")
+            return False, None
+
+    @staticmethod
+    def _tracking_fields(groups) -> List[str]:
+        fields = ['reminder_sent_at']
+        for reminder_type in sorted({reminder_type for reminder_type, _ in groups}):
+            config = REMINDER_TYPES[reminder_type]
+            fields += [config['last_field'], config['count_field']]
+        return fields
@@ -2,8 +2,10 @@
 import logging
 import json
 from typing import Dict, List, Any, Optional
+from django.db import transaction
 from django.utils import timezone
 from ..models import TenderAnalysis, RFIItem
+from ..rfi_numbers import allocate_rfi_numbers
 from .ai_analysis import ClaudeAIService
 
 logger = logging.getLogger(__name__)
@@ -298,14 +300,15 @@ Return as JSON array of RFI objects.
         return rfi
     
     def _create_rfi_items(self, tender_analysis: TenderAnalysis, rfis: List[Dict[str, Any]], created_by: str = None) -> List[RFIItem]:
-        """Create RFI items in the database"""
+        """Create RFI items in the database with one bulk INSERT"""
         
-        created_items = []
+        project = tender_analysis.project
+        new_items = []
         
         for rfi_data in rfis:
             try:
-                rfi_item = RFIItem.objects.create(
-                    project=tender_analysis.project,
+                new_items.append(RFIItem(
+                    project=project,
                     tender_analysis=tender_analysis,
                     category=rfi_data['category'],
                     priority=rfi_data['priority'],
@@ -317,13 +320,19 @@ Return as JSON array of RFI objects.
                     risk_if_unresolved=rfi_data.get('risk_if_unresolved', ''),
                     created_by=created_by or 'System Generated',
                     status='PENDING'
-                )
-                created_items.append(rfi_item)
+                ))
                 
             except Exception as e:
                 logger.error(f"Failed to create RFI item: {str(e)}")
                 continue
         
+        # bulk_create skips save(), so the numbers are reserved as one block up front
+        with transaction.atomic():
+            numbers = allocate_rfi_numbers(project, len(new_items))
+            for rfi_item, rfi_number in zip(new_items, numbers):
+                rfi_item.rfi_number = rfi_number
+            created_items = RFIItem.objects.bulk_create(new_items)
+        
         logger.info(f"✅ Created {len(created_items)} RFI items")
         return created_items
     
@@ -1,7 +1,7 @@
 import logging
 import time
 from typing import Dict, List, Any, Optional
-from django.core.cache import cache
+from core import cache as project_cache
 from django.conf import settings
 from .ai_analysis import OptimizedSharePointService, DocumentParser, ClaudeAIService
 
@@ -18,14 +18,16 @@ class SharePointKnowledgeService:
     
     def build_project_knowledge_base(self, project, force_refresh=False):
         """Build comprehensive knowledge base from all SharePoint documents"""
-        cache_key = f"project_knowledge_{project.id}"
-        
-        if not force_refresh:
-            cached_knowledge = cache.get(cache_key)
-            if cached_knowledge:
-                logger.info(f"Using cached knowledge base for project {project.name}")
-                return cached_knowledge
-        
+        # Shared across workers - concurrent requests wait for a single rebuild
+        return project_cache.get_or_build(
+            project_cache.KNOWLEDGE_NAMESPACE,
+            project.id,
+            lambda: self._build_knowledge_base(project),
+            timeout=self.cache_timeout,
+            force_refresh=force_refresh
+        )
+
+    def _build_knowledge_base(self, project):
         logger.info(f"Building fresh knowledge base for project {project.name}")
         
         try:
@@ -105,9 +107,6 @@ class SharePointKnowledgeService:
                     logger.warning(f"Error processing document {doc.get('name', 'unknown')}: {str(e)}")
                     knowledge_base['processing_summary']['processing_errors'] += 1
             
-            # Cache the knowledge base
-            cache.set(cache_key, knowledge_base, self.cache_timeout)
-            
             logger.info(f"Knowledge base built: {knowledge_base['processing_summary']['processed_successfully']} documents processed")
             return knowledge_base
             
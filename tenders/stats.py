@@ -0,0 +1,56 @@
+# tenders/stats.py
+from django.db.models import Count, Q
+
+from .models import RFIItem, TenderInvitation
+
+
+def count_expressions(buckets):
+    """
+    Conditional Count() per bucket.
+    buckets maps a result key to a Q filter, or None for the unfiltered total.
+    """
+    return {
+        key: Count('pk', filter=condition) if condition is not None else Count('pk')
+        for key, condition in buckets.items()
+    }
+
+
+def aggregate_counts(queryset, buckets):
+    """Count every bucket in a single conditional-aggregate query"""
+    return queryset.aggregate(**count_expressions(buckets))
+
+
+def invitation_stats(invitations):
+    """Status and return breakdown for a TenderInvitation queryset"""
+    buckets = {'total': None}
+    for status, _ in TenderInvitation.STATUS_CHOICES:
+        buckets[status.lower()] = Q(status=status)
+    buckets['returned'] = Q(tender_returned=True)
+
+    return aggregate_counts(invitations.order_by(), buckets)
+
+
+def rfi_stats(rfis):
+    """
+    Status and category breakdown for an RFIItem queryset.
+    Returns: (stats dict, {category display name: count}) from one query
+    """
+    buckets = {
+        'total': None,
+        'pending': Q(status='PENDING'),
+        'submitted': Q(status='SUBMITTED'),
+        'responded': Q(status='RESPONDED'),
+        'resolved': Q(status='CLARIFIED'),
+    }
+    for category, _ in RFIItem.CATEGORY_CHOICES:
+        buckets[f'category_{category}'] = Q(category=category)
+
+    counts = aggregate_counts(rfis.order_by(), buckets)
+
+    categories = {}
+    for category, label in RFIItem.CATEGORY_CHOICES:
+        count = counts.pop(f'category_{category}')
+        if count:
+            categories[label] = count
+
+    return counts, categories
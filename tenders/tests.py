@@ -1,3 +1,1000 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.signing import BadSignature, Signer
+from django.db import close_old_connections, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from communications.models import EmailLog
+from projects.models import Project
+from subcontractors.models import Region, Subcontractor, Trade
+from .counters import counted_bulk_update, recount_project_counters, recount_subcontractor_stats
+from .forms import TenderInvitationForm
+from .history import MAX_PAGE_SIZE, PREVIEW_LENGTH, decode_cursor, encode_cursor, history_page, parse_limit
+from .models import (
+    AIConversation, AIQuestion, RFIItem, RFISequence, SubcontractorRecommendation, SubcontractorStats,
+    TenderAnalysis, TenderInvitation
+)
+from .rfi_exporter import CachedExport, RFIExcelExporter
+from .rfi_numbers import allocate_rfi_numbers
+from .services.recommendation_engine import RecommendationEngine, required_trades, trade_category
+from .services.reminder_engine import ReminderEngine
+from .tokens import ACTION_REPLY, make_token, read_token
+from .tracking import EVENT_DOWNLOAD, EVENT_OPEN, EVENT_RESPONSE, _take_buffered_events, flush_events, record_event
+
+
+# Session + user + page queries - statistics must stay a single aggregate
+TRACKING_PAGE_QUERIES = 6
+RFI_PAGE_QUERIES = 6
+
+
+class PageQueryCountTests(TestCase):
+    """Pin the number of SQL statements the tracking and RFI pages emit"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('estimator', password='password')
+        cls.project = Project.objects.create(
+            name='Query Count Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        TenderAnalysis.objects.create(project=cls.project)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_invitations(self, count):
+        start = TenderInvitation.objects.count()
+        for i in range(start, start + count):
+            trade, _ = Trade.objects.get_or_create(name=f'Trade {i % 3}')
+            subcontractor = Subcontractor.objects.create(
+                trade=trade,
+                company=f'Subcontractor {i}',
+                head_office='Leeds',
+                email=f'estimating{i}@sub{i}.co.uk',
+            )
+            TenderInvitation.objects.create(
+                project=self.project,
+                subcontractor=subcontractor,
+                status=['PENDING', 'ACCEPTED', 'DECLINED'][i % 3],
+                tender_returned=i % 4 == 0,
+            )
+
+    def create_rfis(self, count):
+        categories = [category for category, _ in RFIItem.CATEGORY_CHOICES]
+        statuses = ['PENDING', 'SUBMITTED', 'RESPONDED', 'CLARIFIED']
+        start = RFIItem.objects.count()
+        for i in range(start, start + count):
+            RFIItem.objects.create(
+                project=self.project,
+                category=categories[i % len(categories)],
+                status=statuses[i % len(statuses)],
+                question=f'Question {i}',
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_tracking_page_query_count_is_constant(self):
+        url = reverse('tenders:tracking', args=[self.project.id])
+
+        self.create_invitations(3)
+        _, small = self.count_queries(url)
+
+        self.create_invitations(12)
+        response, large = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        with self.assertNumQueries(TRACKING_PAGE_QUERIES):
+            self.client.get(url)
+
+        stats = response.context['stats']
+        invitations = TenderInvitation.objects.filter(project=self.project)
+        self.assertEqual(stats['total'], invitations.count())
+        self.assertEqual(stats['pending'], invitations.filter(status='PENDING').count())
+        self.assertEqual(stats['accepted'], invitations.filter(status='ACCEPTED').count())
+        self.assertEqual(stats['declined'], invitations.filter(status='DECLINED').count())
+        self.assertEqual(stats['returned'], invitations.filter(tender_returned=True).count())
+
+    def test_rfi_list_query_count_is_constant(self):
+        url = reverse('tenders:rfi_list', args=[self.project.id])
+
+        self.create_rfis(4)
+        _, small = self.count_queries(url)
+
+        self.create_rfis(20)
+        response, large = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        with self.assertNumQueries(RFI_PAGE_QUERIES):
+            self.client.get(url)
+
+        stats = response.context['stats']
+        self.assertEqual(stats['total'], 24)
+        self.assertEqual(stats['pending'], 6)
+        self.assertEqual(stats['resolved'], 6)
+        self.assertEqual(sum(response.context['categories'].values()), 24)
+        self.assertEqual(response.context['categories']['Technical Specifications'], 2)
+
+
+class RFINumberTests(TestCase):
+    """RFI numbers come from the per-project sequence"""
+
+    def setUp(self):
+        self.project = Project.objects.create(
+            name='RFI Numbering Project',
+            reference='TK100',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+
+    def test_blocks_follow_on(self):
+        self.assertEqual(allocate_rfi_numbers(self.project, 2), ['RFI-TK100-001', 'RFI-TK100-002'])
+        rfi = RFIItem.objects.create(project=self.project, category='TECHNICAL', question='Question')
+        self.assertEqual(rfi.rfi_number, 'RFI-TK100-003')
+        self.assertEqual(allocate_rfi_numbers(self.project, 0), [])
+        self.assertEqual(RFISequence.objects.get(project=self.project).last_number, 3)
+
+    def test_sequence_starts_after_existing_numbers(self):
+        RFIItem.objects.create(project=self.project, category='TECHNICAL', question='Old', rfi_number='RFI-TK100-007')
+        RFIItem.objects.create(project=self.project, category='TECHNICAL', question='Custom', rfi_number='SITE-VISIT')
+        self.assertEqual(allocate_rfi_numbers(self.project, 1), ['RFI-TK100-008'])
+
+    def test_rolled_back_block_is_reissued(self):
+        allocate_rfi_numbers(self.project, 1)
+        try:
+            with transaction.atomic():
+                allocate_rfi_numbers(self.project, 5)
+                raise RuntimeError('insert failed')
+        except RuntimeError:
+            pass
+        self.assertEqual(allocate_rfi_numbers(self.project, 1), ['RFI-TK100-002'])
+
+
+class RFINumberConcurrencyTests(TransactionTestCase):
+    """Concurrent regenerations must never hand out the same RFI number twice"""
+
+    THREADS = 8
+    BLOCKS_PER_THREAD = 5
+    BLOCK_SIZE = 3
+
+    def test_concurrent_allocations_are_disjoint(self):
+        project = Project.objects.create(
+            name='Concurrent RFI Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        start = threading.Barrier(self.THREADS)
+        allocated = []
+        errors = []
+
+        def allocate():
+            try:
+                start.wait()
+                for _ in range(self.BLOCKS_PER_THREAD):
+                    with transaction.atomic():
+                        allocated.extend(allocate_rfi_numbers(project, self.BLOCK_SIZE))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=allocate) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        total = self.THREADS * self.BLOCKS_PER_THREAD * self.BLOCK_SIZE
+        expected = [f'RFI-{project.id}-{number:03d}' for number in range(1, total + 1)]
+        self.assertEqual(sorted(allocated), expected)
+
+
+class TrackingTokenTests(TestCase):
+    """Versioned tracking tokens and the response page lookup"""
+
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(
+            name='Token Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        subcontractor = Subcontractor.objects.create(
+            trade=Trade.objects.create(name='Groundworks'),
+            company='Token Groundworks',
+            head_office='York',
+            email='estimating@tokengroundworks.co.uk',
+        )
+        cls.invitation = TenderInvitation.objects.create(project=project, subcontractor=subcontractor)
+
+    def test_token_round_trip(self):
+        token = make_token(self.invitation.id, EVENT_OPEN)
+        self.assertTrue(token.startswith('1o'))
+        self.assertEqual(read_token(token, EVENT_OPEN), self.invitation.id)
+
+    def test_token_is_only_valid_for_its_action(self):
+        token = make_token(self.invitation.id, EVENT_OPEN)
+        with self.assertRaises(BadSignature):
+            read_token(token, EVENT_DOWNLOAD)
+
+    def test_tampered_token_is_rejected(self):
+        token = make_token(self.invitation.id, EVENT_OPEN)
+        with self.assertRaises(BadSignature):
+            read_token('1o2' + token[3:], EVENT_OPEN)
+
+    def test_legacy_token_is_accepted_for_every_action(self):
+        token = Signer().sign(str(self.invitation.id))
+        self.assertEqual(read_token(token, EVENT_OPEN), self.invitation.id)
+        self.assertEqual(read_token(token, ACTION_REPLY), self.invitation.id)
+
+    def test_repeat_response_page_visit_is_one_query(self):
+        url = reverse('tenders:response', args=[make_token(self.invitation.id, ACTION_REPLY)])
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['subcontractor'], self.invitation.subcontractor)
+
+        wrong_action = reverse('tenders:response', args=[make_token(self.invitation.id, EVENT_OPEN)])
+        self.assertEqual(self.client.get(wrong_action).status_code, 403)
+
+
+class TrackingBufferTests(TestCase):
+    """The write-behind buffer of tracking events and its flush"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(
+            name='Buffer Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        subcontractor = Subcontractor.objects.create(
+            trade=Trade.objects.create(name='Groundworks'),
+            company='Buffer Groundworks',
+            head_office='York',
+            email='estimating@buffergroundworks.co.uk',
+        )
+        cls.invitation = TenderInvitation.objects.create(project=cls.project, subcontractor=subcontractor)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tracking_events.jsonl')
+        settings = override_settings(TRACKING_EVENT_BUFFER=self.path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_rotated_buffer_is_unlinked_for_late_writers(self):
+        record_event(self.invitation.id, EVENT_OPEN)
+        # A writer that opened the buffer before the flusher rotated it
+        with open(self.path, 'a', encoding='utf-8') as late_writer:
+            self.assertEqual(len(_take_buffered_events()), 1)
+            self.assertEqual(os.fstat(late_writer.fileno()).st_nlink, 0)
+
+    def test_failed_flush_keeps_the_events(self):
+        record_event(self.invitation.id, EVENT_OPEN)
+        record_event(self.invitation.id, EVENT_RESPONSE, response='yes')
+
+        with mock.patch.object(TenderInvitation.objects, 'bulk_update', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                flush_events()
+
+        self.assertEqual(flush_events(), 1)
+        self.invitation.refresh_from_db()
+        self.assertTrue(self.invitation.email_opened)
+        self.assertEqual(self.invitation.status, 'ACCEPTED')
+        self.assertEqual(flush_events(), 0)
+
+    def test_tracking_page_does_not_write(self):
+        record_event(self.invitation.id, EVENT_RESPONSE, response='no')
+        self.client.force_login(get_user_model().objects.create_user('tracker', password='password'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('tenders:tracking', args=[self.project.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([
+            query for query in queries
+            if query['sql'].startswith(('UPDATE "tenders_', 'INSERT INTO "communications_'))
+        ])
+        self.invitation.refresh_from_db()
+        self.assertEqual(self.invitation.status, 'PENDING')
+
+        out = io.StringIO()
+        call_command('flush_tracking_events', stdout=out)
+        self.assertIn('Updated 1 invitations', out.getvalue())
+        self.invitation.refresh_from_db()
+        self.assertEqual(self.invitation.status, 'DECLINED')
+
+
+class RecommendationEngineTests(TestCase):
+    """Subcontractor ranking and the bulk insert of recommendations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.project = Project.objects.create(
+            name='Recommendation Project',
+            location='Leeds, West Yorkshire',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        cls.analysis = TenderAnalysis.objects.create(
+            project=cls.project,
+            key_requirements=['Required trade: Groundworks', 'Required trade: Roofing', 'Required trade: Lifts', 'BREEAM Very Good'],
+        )
+        yorkshire = Region.objects.create(name='West Yorkshire')
+        groundworks = Trade.objects.create(name='Groundworks')
+
+        def subcontractor(company, head_office, score, insurance_days):
+            return Subcontractor.objects.create(
+                trade=groundworks,
+                company=company,
+                head_office=head_office,
+                email=f'estimating@{company.lower().replace(" ", "")}.co.uk',
+                subcontractor_score=score,
+                insurance_expiry=date.today() + timedelta(days=insurance_days),
+            )
+
+        cls.local = subcontractor('Local Groundworks', 'Wakefield', 8, 365)
+        cls.local.regions.add(yorkshire)
+        cls.distant = subcontractor('Distant Groundworks', 'Bristol', 8, 365)
+        cls.uninsured = subcontractor('Lapsed Groundworks', 'Leeds', 9, -10)
+
+        for i, (status, returned) in enumerate([('ACCEPTED', True), ('ACCEPTED', True), ('DECLINED', False)]):
+            past_project = Project.objects.create(
+                name=f'Past Project {i}',
+                start_date=date.today() - timedelta(days=200),
+                tender_deadline=timezone.now() - timedelta(days=180),
+            )
+            TenderInvitation.objects.create(
+                project=past_project, subcontractor=cls.local, status=status, tender_returned=returned
+            )
+
+    def recommend(self):
+        engine = RecommendationEngine()
+        trades = [{'trade_category': trade, 'priority': 'HIGH'} for trade in required_trades(self.analysis)]
+        return engine.recommend(self.analysis, trades)
+
+    def test_required_trades_and_categories(self):
+        self.assertEqual(required_trades(self.analysis), ['Groundworks', 'Roofing', 'Lifts'])
+        self.assertEqual(trade_category('Mechanical & Electrical'), 'M&E')
+        self.assertEqual(trade_category('Drylining and Ceilings'), 'PLASTERING')
+        self.assertEqual(trade_category('Lifts'), 'OTHER')
+
+    def test_candidates_ranked_by_suitability(self):
+        self.recommend()
+        ranked = list(
+            SubcontractorRecommendation.objects.filter(tender_analysis=self.analysis, trade_category='GROUNDWORKS')
+            .order_by('-suitability_score')
+        )
+        self.assertEqual([rec.subcontractor for rec in ranked], [self.local, self.distant, self.uninsured])
+
+        local = ranked[0]
+        self.assertEqual(local.location_proximity, 100)
+        self.assertTrue(local.is_recommended)
+        self.assertIn('Covers the project region', local.strengths)
+        self.assertFalse(ranked[2].is_recommended)
+        self.assertTrue(any('Insurance expired' in concern for concern in ranked[2].concerns))
+
+    def test_head_office_distance_from_the_project(self):
+        self.recommend()
+        recommendations = {
+            rec.subcontractor: rec
+            for rec in SubcontractorRecommendation.objects.filter(tender_analysis=self.analysis, trade_category='GROUNDWORKS')
+        }
+        self.assertIn('Head office 8 miles from the project', recommendations[self.local].strengths)
+        self.assertEqual(recommendations[self.uninsured].location_proximity, 100)
+        self.assertEqual(recommendations[self.distant].location_proximity, 0)
+        self.assertIn('Head office more than 100 miles from the project', recommendations[self.distant].concerns)
+
+    def test_no_live_tenders_needs_an_accepted_invitation(self):
+        for i in range(3):
+            past_project = Project.objects.create(
+                name=f'Declined Project {i}',
+                start_date=date.today() - timedelta(days=200),
+                tender_deadline=timezone.now() - timedelta(days=180),
+            )
+            TenderInvitation.objects.create(project=past_project, subcontractor=self.distant, status='DECLINED')
+
+        self.recommend()
+        recommendations = {
+            rec.subcontractor: rec
+            for rec in SubcontractorRecommendation.objects.filter(tender_analysis=self.analysis, trade_category='GROUNDWORKS')
+        }
+        self.assertIn('No live tenders in hand', recommendations[self.local].strengths)
+        self.assertNotIn('No live tenders in hand', recommendations[self.distant].strengths)
+        self.assertIn('Accepted 0 of 3 invitations', recommendations[self.distant].concerns)
+
+    def test_invitation_form_distances(self):
+        form = TenderInvitationForm(project_id=self.project.pk)
+        self.assertEqual(form.project_location.place, 'Leeds')
+        # Bristol is beyond the widest radius
+        self.assertEqual(list(form.distances), [self.uninsured.pk, self.local.pk])
+        self.assertAlmostEqual(form.distances[self.local.pk], 8.3, places=1)
+
+    def test_trades_of_one_category_are_ranked_together(self):
+        engine = RecommendationEngine()
+        engine.recommend(self.analysis, [
+            {'trade_category': 'Groundworks', 'priority': 'MEDIUM'},
+            {'trade_category': 'Drainage', 'priority': 'HIGH', 'certifications': ['NHSS 19']},
+        ])
+        groundworks = SubcontractorRecommendation.objects.filter(tender_analysis=self.analysis, trade_category='GROUNDWORKS')
+        self.assertFalse(groundworks.filter(subcontractor=None).exists())
+        self.assertEqual(
+            sorted(groundworks.values_list('subcontractor__company', flat=True)),
+            ['Distant Groundworks', 'Lapsed Groundworks', 'Local Groundworks'],
+        )
+        first = groundworks.order_by('-suitability_score').first()
+        self.assertEqual(first.priority, 'HIGH')
+        self.assertEqual(first.required_certifications, ['NHSS 19'])
+        self.assertEqual(first.recommendation_notes, 'Ranked 1 of 3 for Groundworks / Drainage')
+
+    def test_trades_without_subcontractors_get_a_general_recommendation(self):
+        self.recommend()
+        general = SubcontractorRecommendation.objects.filter(tender_analysis=self.analysis, subcontractor=None)
+        self.assertEqual(sorted(general.values_list('trade_category', flat=True)), ['OTHER', 'ROOFING'])
+
+    def test_rerun_replaces_recommendations_in_constant_queries(self):
+        self.recommend()
+        # Five feature queries, the delete, the bulk insert and the savepoint pair
+        with self.assertNumQueries(9):
+            created = self.recommend()
+        self.assertEqual(len(created), 5)
+        self.assertEqual(self.analysis.subcontractor_recommendations.count(), 5)
+
+
+class ProjectCounterTests(TestCase):
+    """Invitation counters on Project, kept in step by the TenderInvitation signals"""
+
+    @classmethod
+    def setUpTestData(cls):
+        trade = Trade.objects.create(name='Drylining')
+        cls.subcontractors = [
+            Subcontractor.objects.create(
+                trade=trade, company=f'Counter Drylining {i}', head_office='York',
+                email=f'estimating@counterdrylining{i}.co.uk',
+            )
+            for i in range(4)
+        ]
+        cls.project = Project.objects.create(
+            name='Counter Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        cls.other_project = Project.objects.create(
+            name='Other Counter Project',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+
+    def counters(self, project=None):
+        project = Project.objects.get(pk=(project or self.project).pk)
+        return (
+            project.invitation_count, project.accepted_count, project.declined_count,
+            project.returned_count, project.pending_count,
+        )
+
+    def invite(self, subcontractor, **fields):
+        return TenderInvitation.objects.create(project=self.project, subcontractor=subcontractor, **fields)
+
+    def test_counters_follow_saves_and_deletes(self):
+        invitations = [self.invite(subcontractor) for subcontractor in self.subcontractors]
+        self.assertEqual(self.counters(), (4, 0, 0, 0, 4))
+
+        invitations[0].status = 'ACCEPTED'
+        invitations[0].save()
+        invitations[1].status = 'DECLINED'
+        invitations[1].save(update_fields=['status'])
+        invitations[2].tender_returned = True
+        invitations[2].save(update_fields=['tender_returned'])
+        self.assertEqual(self.counters(), (4, 1, 1, 1, 1))
+
+        invitations[3].project = self.other_project
+        invitations[3].save()
+        self.assertEqual(self.counters(), (3, 1, 1, 1, 0))
+        self.assertEqual(self.counters(self.other_project), (1, 0, 0, 0, 1))
+
+        invitations[0].delete()
+        self.assertEqual(self.counters(), (2, 0, 1, 1, 0))
+        self.assertEqual(recount_project_counters(), 0)
+
+    def test_saving_unrelated_fields_leaves_the_counters(self):
+        invitation = self.invite(self.subcontractors[0])
+        with CaptureQueriesContext(connection) as queries:
+            invitation.email_opened = True
+            invitation.save(update_fields=['email_opened'])
+        self.assertFalse([query for query in queries if 'projects_project' in query['sql']])
+
+    def test_stale_copy_saves_what_it_changed(self):
+        for subcontractor in self.subcontractors[1:]:
+            self.invite(subcontractor, status='DECLINED')
+        invitation = self.invite(self.subcontractors[0])
+        accepted = TenderInvitation.objects.get(pk=invitation.pk)
+        stale = TenderInvitation.objects.get(pk=invitation.pk)
+
+        accepted.status = 'ACCEPTED'
+        accepted.save()
+        # Loaded before the acceptance, as check_project_folder_simple's preloaded invitations are
+        stale.tender_returned = True
+        stale.save(update_fields=['tender_returned'])
+
+        self.assertEqual(self.counters(), (4, 1, 3, 1, 0))
+        self.assertEqual(recount_project_counters(), 0)
+
+    def test_recount_corrects_drifted_counters(self):
+        self.invite(self.subcontractors[0], status='ACCEPTED')
+        self.invite(self.subcontractors[1])
+        Project.objects.filter(pk=self.project.pk).update(invitation_count=9, pending_count=0)
+
+        self.assertEqual(recount_project_counters([self.project.pk]), 1)
+        self.assertEqual(self.counters(), (2, 1, 0, 0, 1))
+        self.assertEqual(recount_project_counters(), 0)
+
+
+class SubcontractorStatsTests(TestCase):
+    """SubcontractorStats kept in step with invitation saves, bulk updates and deletes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subcontractor = Subcontractor.objects.create(
+            trade=Trade.objects.create(name='Roofing'),
+            company='Stats Roofing',
+            head_office='Hull',
+            email='estimating@statsroofing.co.uk',
+        )
+        cls.projects = [
+            Project.objects.create(
+                name=f'Stats Project {i}',
+                start_date=date.today(),
+                tender_deadline=timezone.now() + timedelta(days=14),
+            )
+            for i in range(3)
+        ]
+
+    def stats(self):
+        return SubcontractorStats.objects.get(subcontractor=self.subcontractor)
+
+    def assertMatchesRecount(self):
+        # Nothing for the recount to correct
+        self.assertEqual(recount_subcontractor_stats([self.subcontractor.id]), 0)
+
+    def test_stats_follow_saves_and_deletes(self):
+        invitations = [
+            TenderInvitation.objects.create(project=project, subcontractor=self.subcontractor)
+            for project in self.projects
+        ]
+        self.assertEqual(self.stats().invitation_count, 3)
+
+        accepted = TenderInvitation.objects.get(pk=invitations[0].pk)
+        accepted.status = 'ACCEPTED'
+        accepted.save()  # response_date set by the pre_save signal
+        accepted.tender_returned = True
+        accepted.save(update_fields=['tender_returned'])
+
+        stats = self.stats()
+        self.assertEqual((stats.accepted_count, stats.returned_count, stats.response_count), (1, 1, 1))
+        self.assertLess(stats.average_response_time, timedelta(minutes=1))
+        self.assertEqual(stats.acceptance_rate, 33.3)
+        self.assertMatchesRecount()
+
+        invitations[2].delete()
+        self.assertEqual(self.stats().invitation_count, 2)
+        self.assertMatchesRecount()
+
+    def test_bulk_updated_responses_are_counted(self):
+        invitation = TenderInvitation.objects.create(project=self.projects[0], subcontractor=self.subcontractor)
+        invitation = TenderInvitation.objects.get(pk=invitation.pk)
+        invitation.status = 'DECLINED'
+        invitation.response_date = invitation.sent_at + timedelta(days=2)
+        with counted_bulk_update([invitation.pk]):
+            TenderInvitation.objects.bulk_update([invitation], ['status', 'response_date'])
+
+        stats = self.stats()
+        self.assertEqual((stats.declined_count, stats.response_count), (1, 1))
+        self.assertEqual(stats.average_response_time, timedelta(days=2))
+        self.assertMatchesRecount()
+
+    def test_stale_copy_saves_count_once(self):
+        invitation = TenderInvitation.objects.create(project=self.projects[0], subcontractor=self.subcontractor)
+        TenderInvitation.objects.create(project=self.projects[1], subcontractor=self.subcontractor)
+        first = TenderInvitation.objects.get(pk=invitation.pk)
+        second = TenderInvitation.objects.get(pk=invitation.pk)
+
+        first.status = 'ACCEPTED'
+        first.save()
+        second.tender_returned = True
+        second.save(update_fields=['tender_returned'])
+
+        project = Project.objects.get(pk=self.projects[0].pk)
+        self.assertEqual(
+            (project.invitation_count, project.accepted_count, project.returned_count, project.pending_count),
+            (1, 1, 1, 0),
+        )
+        stats = self.stats()
+        self.assertEqual(
+            (stats.invitation_count, stats.accepted_count, stats.returned_count, stats.response_count),
+            (2, 1, 1, 1),
+        )
+        self.assertEqual(recount_project_counters(), 0)
+        self.assertMatchesRecount()
+
+    def test_recount_rebuilds_lost_stats(self):
+        TenderInvitation.objects.create(project=self.projects[0], subcontractor=self.subcontractor, status='ACCEPTED')
+        SubcontractorStats.objects.all().delete()
+
+        self.assertEqual(recount_subcontractor_stats(), 1)
+        self.assertEqual((self.stats().invitation_count, self.stats().accepted_count), (1, 1))
+
+    def test_deleting_a_subcontractor_removes_their_stats(self):
+        TenderInvitation.objects.create(project=self.projects[0], subcontractor=self.subcontractor)
+        self.subcontractor.delete()
+        self.assertFalse(SubcontractorStats.objects.exists())
+
+
+class StubEmailService:
+    """Records sends instead of calling Outlook; addresses in fail_for are refused"""
+
+    def __init__(self, fail_for=()):
+        self.fail_for = set(fail_for)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send_email(self, to_email, subject, body, **kwargs):
+        with self.lock:
+            self.sent.append((to_email, subject))
+        return to_email not in self.fail_for
+
+
+class ReminderEngineTests(TestCase):
+    """Reminder planning across projects, the daily limit and the batched tracking writes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        trade = Trade.objects.create(name='Cladding')
+        today = timezone.localdate()
+
+        def project(name, days):
+            return Project.objects.create(
+                name=name,
+                start_date=today,
+                tender_deadline=timezone.now() + timedelta(days=days),
+                sc_deadline=today + timedelta(days=days),
+            )
+
+        cls.due_project = project('Reminder Project', 2)
+        cls.later_project = project('Later Project', 10)
+
+        def invitation(company, project, **fields):
+            subcontractor = Subcontractor.objects.create(
+                trade=trade, company=company, head_office='Leeds',
+                email=f'bids@{company.lower().replace(" ", "")}.co.uk',
+            )
+            return TenderInvitation.objects.create(project=project, subcontractor=subcontractor, **fields)
+
+        cls.pending = invitation('Pending Cladding', cls.due_project)
+        cls.accepted = invitation('Accepted Cladding', cls.due_project, status='ACCEPTED')
+        cls.reminded = invitation('Reminded Cladding', cls.due_project, last_pending_reminder=timezone.now())
+        cls.yesterday = invitation(
+            'Yesterday Cladding', cls.due_project, last_pending_reminder=timezone.now() - timedelta(days=1)
+        )
+        invitation('Declined Cladding', cls.due_project, status='DECLINED')
+        invitation('Returned Cladding', cls.due_project, tender_returned=True)
+        invitation('Later Cladding', cls.later_project)
+
+    def planned(self, engine, **kwargs):
+        return {
+            key: sorted(invitation.pk for invitation in invitations)
+            for key, invitations in engine.plan(**kwargs).items()
+        }
+
+    def render(self, reminder_type, window, invitation):
+        return f'{reminder_type} reminder {window}', 'body', {}
+
+    def test_plan_selects_open_invitations_not_reminded_today(self):
+        engine = ReminderEngine(email_service=None)
+
+        self.assertEqual(self.planned(engine, deadline_windows=[0, 1, 2, 3]), {
+            ('pending', 2): sorted([self.pending.pk, self.yesterday.pk]),
+            ('will_tender', 2): [self.accepted.pk],
+        })
+        self.assertEqual(list(self.planned(engine, reminder_types=['will_tender'])), [('will_tender', 2)])
+        self.assertIn(('pending', 10), self.planned(engine))
+        self.assertEqual(self.planned(engine, project_ids=[self.later_project.pk]), {('pending', 10): [
+            TenderInvitation.objects.get(project=self.later_project).pk
+        ]})
+
+    def test_send_writes_the_tracking_fields_once(self):
+        service = StubEmailService(fail_for=[self.accepted.subcontractor.email])
+        engine = ReminderEngine(service, max_workers=4)
+        groups = engine.plan(deadline_windows=[2])
+
+        with CaptureQueriesContext(connection) as queries:
+            summary = engine.send(groups, render=self.render)
+
+        self.assertEqual((summary['sent'], summary['failed']), (2, 1))
+        self.assertEqual(summary['by_group'], {('pending', 2): 2})
+        self.assertEqual(len(service.sent), 3)
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "tenders_tenderinvitation"')]
+        self.assertEqual(len(updates), 1)
+
+        for invitation in (self.pending, self.yesterday):
+            invitation.refresh_from_db()
+            self.assertEqual(invitation.pending_reminder_count, 1)
+            self.assertEqual(invitation.last_pending_reminder, engine.now)
+            self.assertEqual(invitation.reminder_sent_at, engine.now)
+        self.accepted.refresh_from_db()
+        self.assertEqual((self.accepted.will_tender_reminder_count, self.accepted.last_will_tender_reminder), (0, None))
+        self.assertEqual(EmailLog.objects.filter(email_type='REMINDER').count(), 2)
+
+    def test_daily_limit(self):
+        engine = ReminderEngine(StubEmailService())
+        engine.send(engine.plan(deadline_windows=[2]), render=self.render)
+
+        self.assertEqual(engine.plan(deadline_windows=[2]), {})
+        # The next day everything is due again
+        tomorrow = ReminderEngine(StubEmailService(), now=engine.now + timedelta(days=1))
+        self.assertEqual(sum(len(group) for group in tomorrow.plan(deadline_windows=[1]).values()), 4)
+
+    def test_command_dry_run_sends_nothing(self):
+        out = io.StringIO()
+        with mock.patch('tenders.management.commands.send_deadline_reminders.OutlookEmailService') as service:
+            call_command('send_deadline_reminders', '--dry-run', stdout=out)
+
+        service.assert_not_called()
+        self.assertIn('2 pending reminders due in 2 days', out.getvalue())
+        self.assertFalse(EmailLog.objects.exists())
+        self.pending.refresh_from_db()
+        self.assertEqual((self.pending.pending_reminder_count, self.pending.last_pending_reminder), (0, None))
+
+    def test_command_sends_through_the_engine(self):
+        service = StubEmailService()
+        out = io.StringIO()
+        with mock.patch(
+            'tenders.management.commands.send_deadline_reminders.OutlookEmailService', return_value=service
+        ):
+            call_command('send_deadline_reminders', stdout=out)
+
+        self.assertIn('Sent 3 reminders', out.getvalue())
+        self.assertIn(
+            (self.pending.subcontractor.email, 'REMINDER: Tender for Reminder Project is due in 2 days'), service.sent
+        )
+        self.assertEqual(EmailLog.objects.filter(email_type='REMINDER').count(), 3)
+
+
+class ConversationHistoryTests(TestCase):
+    """Keyset paging of the Ask AI history and the full answer endpoint"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('historian', password='password')
+        cls.project, cls.other_project = [
+            Project.objects.create(
+                name=name,
+                start_date=date.today(),
+                tender_deadline=timezone.now() + timedelta(days=14),
+            )
+            for name in ('History Project', 'Other History Project')
+        ]
+        cls.conversation = AIConversation.objects.create(project=cls.project)
+        cls.other_conversation = AIConversation.objects.create(project=cls.other_project)
+
+        # Three questions share a timestamp so the id has to break the tie
+        base = timezone.now() - timedelta(days=1)
+        offsets = [0, 5, 5, 5, 10, 20]
+        cls.questions = []
+        for number, offset in enumerate(offsets):
+            question = AIQuestion.objects.create(
+                conversation=cls.conversation,
+                question_text=f'Question {number}',
+                answer_text=f'Answer {number} ' + 'x' * (PREVIEW_LENGTH if number == 0 else 10),
+                source_documents=[f'drawing-{number}.pdf'],
+            )
+            AIQuestion.objects.filter(pk=question.pk).update(created_date=base + timedelta(minutes=offset))
+            question.refresh_from_db()
+            cls.questions.append(question)
+        cls.other_question = AIQuestion.objects.create(
+            conversation=cls.other_conversation, question_text='Elsewhere', answer_text='Not yours'
+        )
+
+    def newest_first(self):
+        return [q.id for q in sorted(self.questions, key=lambda q: (q.created_date, q.id), reverse=True)]
+
+    def test_pages_are_stable_across_equal_timestamps(self):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = history_page(self.conversation.id, cursor, limit=2)
+            seen.extend(question.id for question in page)
+            pages += 1
+            if pages == 1:
+                # New questions arrive at the top and do not shift the older pages
+                AIQuestion.objects.create(conversation=self.conversation, question_text='Late', answer_text='Late')
+            if cursor is None:
+                break
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, self.newest_first())
+
+    def test_cursor_returns_questions_before_it(self):
+        tied = [question for question in self.questions if question.created_date == self.questions[1].created_date]
+        middle = sorted(tied, key=lambda q: q.id)[1]
+        self.assertEqual(decode_cursor(encode_cursor(middle)), (middle.created_date, middle.id))
+
+        page, next_cursor = history_page(self.conversation.id, encode_cursor(middle), limit=10)
+        expected = self.newest_first()
+        self.assertEqual([question.id for question in page], expected[expected.index(middle.id) + 1:])
+        self.assertIsNone(next_cursor)
+
+        with self.assertRaises(ValueError):
+            history_page(self.conversation.id, 'not-a-cursor')
+
+    def test_previews_defer_the_answer(self):
+        page, _ = history_page(self.conversation.id, limit=MAX_PAGE_SIZE)
+        oldest = page[-1]
+        self.assertIn('answer_text', oldest.get_deferred_fields())
+        self.assertEqual(len(oldest.answer_preview), PREVIEW_LENGTH)
+        self.assertTrue(oldest.answer_truncated)
+        self.assertFalse(page[0].answer_truncated)
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(parse_limit('0'), 1)
+        self.assertEqual(parse_limit('-5'), 1)
+        self.assertEqual(parse_limit(str(MAX_PAGE_SIZE + 1)), MAX_PAGE_SIZE)
+        self.assertEqual(parse_limit('ten', default=7), 7)
+        self.assertEqual(parse_limit(None, default=7), 7)
+
+        self.client.force_login(self.user)
+        url = reverse('tenders:conversation_history', args=[self.project.id])
+        response = self.client.get(url, {'limit': '0'}).json()
+        self.assertEqual(len(response['history']), 1)
+        self.assertIsNotNone(response['next_cursor'])
+
+        response = self.client.get(url, {'limit': '1000'}).json()
+        self.assertEqual([item['id'] for item in response['history']], self.newest_first())
+        self.assertIsNone(response['next_cursor'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_full_answer_only_from_its_project(self):
+        question = self.questions[0]
+        url = reverse('tenders:conversation_answer', args=[self.project.id, question.id])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.user)
+        answer = self.client.get(url).json()['question']
+        self.assertEqual(answer['answer'], question.answer_text)
+        self.assertEqual(answer['source_documents'], ['drawing-0.pdf'])
+
+        for project_id, question_id in [
+            (self.project.id, self.other_question.id),
+            (self.other_project.id, question.id),
+        ]:
+            url = reverse('tenders:conversation_answer', args=[project_id, question_id])
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class RFIExportCacheTests(TestCase):
+    """RFI schedule downloads served from CachedExport files until the RFIs change"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('exporter', password='password')
+        cls.project = Project.objects.create(
+            name='Export Project',
+            reference='TK200',
+            start_date=date.today(),
+            tender_deadline=timezone.now() + timedelta(days=14),
+        )
+        cls.analysis = TenderAnalysis.objects.create(project=cls.project)
+        cls.rfi = RFIItem.objects.create(
+            project=cls.project, tender_analysis=cls.analysis, category='TECHNICAL', question='Roof falls?'
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(EXPORT_CACHE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.builds = []
+        build = RFIExcelExporter.write_rfi_schedule
+
+        def counted_build(exporter, tender_analysis, path):
+            self.builds.append(path)
+            return build(exporter, tender_analysis, path)
+
+        patcher = mock.patch.object(RFIExcelExporter, 'write_rfi_schedule', counted_build)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def download(self):
+        response = self.client.get(reverse('tenders:export_rfi_schedule', args=[self.project.id]))
+        self.assertEqual(response.status_code, 200)
+        # The test client closes the file once the content has been read
+        return b''.join(response.streaming_content)
+
+    def questions(self, content):
+        sheet = load_workbook(io.BytesIO(content)).active
+        rows = sheet.iter_rows(min_row=RFIExcelExporter.HEADER_ROW + 1, values_only=True)
+        return [row[3] for row in rows if str(row[0]).startswith('RFI-')]
+
+    def cached_files(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_repeat_download_is_served_from_the_cached_file(self):
+        first = self.download()
+        self.assertEqual(len(self.builds), 1)
+        files = self.cached_files()
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith(f'rfi_schedule_{self.analysis.pk}_'))
+
+        self.assertEqual(self.download(), first)
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(self.cached_files(), files)
+        self.assertIn('Roof falls?', self.questions(first))
+
+    def test_rfi_change_rebuilds_the_file(self):
+        self.download()
+        old_files = self.cached_files()
+
+        self.rfi.question = 'Roof falls to the north?'
+        self.rfi.save()
+        content = self.download()
+        self.assertEqual(len(self.builds), 2)
+        self.assertEqual(self.questions(content), ['Roof falls to the north?'])
+        # The file built from the old data is gone
+        self.assertEqual(len(self.cached_files()), 1)
+        self.assertNotEqual(self.cached_files(), old_files)
+
+        RFIItem.objects.create(
+            project=self.project, tender_analysis=self.analysis, category='TECHNICAL', question='Gutter sizes?'
+        )
+        self.assertEqual(len(self.questions(self.download())), 2)
+        self.assertEqual(len(self.builds), 3)
+
+    def test_remove_stale_keeps_the_current_file(self):
+        export = CachedExport('rfi_schedule', 7, 'current')
+        stale = CachedExport('rfi_schedule', 7, 'old')
+        other_object = CachedExport('rfi_schedule', 70, 'current')
+        in_progress = os.path.join(self.directory, 'rfi_schedule_7_abc.tmp')
+        for path in (export.path, stale.path, other_object.path, in_progress):
+            with open(path, 'wb') as handle:
+                handle.write(b'xlsx')
+
+        export._remove_stale()
+        self.assertEqual(
+            self.cached_files(),
+            sorted(os.path.basename(path) for path in (export.path, other_object.path, in_progress)),
+        )
+
+    def test_failed_build_leaves_nothing_behind(self):
+        export = CachedExport('rfi_schedule', 7, 'current')
+
+        def failing_build(path):
+            with open(path, 'wb') as handle:
+                handle.write(b'partial')
+            raise ValueError('bad cell')
+
+        with self.assertRaises(ValueError):
+            export.open(failing_build)
+        self.assertEqual(self.cached_files(), [])
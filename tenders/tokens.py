@@ -0,0 +1,86 @@
+# tenders/tokens.py
+import logging
+from functools import lru_cache
+
+from django.core.signing import BadSignature, Signer
+from django.shortcuts import get_object_or_404
+from django.utils.http import base36_to_int, int_to_base36
+
+from .models import TenderInvitation
+from .tracking import EVENT_DOWNLOAD, EVENT_OPEN, EVENT_RESPONSE
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION = '1'
+SALT = 'tenders.tracking'
+
+# Opening the tender response page
+ACTION_REPLY = 'reply'
+
+# Action -> one-letter code carried in the token
+ACTION_CODES = {
+    EVENT_OPEN: 'o',
+    EVENT_RESPONSE: 'r',
+    EVENT_DOWNLOAD: 'd',
+    ACTION_REPLY: 'p',
+}
+CODE_ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+
+@lru_cache(maxsize=None)
+def _signer():
+    return Signer(sep='.', salt=SALT)
+
+
+@lru_cache(maxsize=None)
+def _legacy_signer():
+    # Signer().sign(str(invitation_id)) - still in emails sent before versioned tokens
+    return Signer()
+
+
+def make_token(invitation_id, action):
+    """
+    Signed token for one action on one invitation:
+    version, action code and base36 id, then the signature - e.g. 1r2n9.<signature>
+    """
+    return _signer().sign(f"{TOKEN_VERSION}{ACTION_CODES[action]}{int_to_base36(int(invitation_id))}")
+
+
+@lru_cache(maxsize=4096)
+def _decode(token):
+    """
+    (invitation id, action) for a valid token, None otherwise.
+    Legacy tokens carry no action and decode with action None.
+    Memoized - a tracking pixel or button is hit many times with the same token.
+    """
+    try:
+        if ':' in token:
+            return int(_legacy_signer().unsign(token)), None
+
+        value = _signer().unsign(token)
+        if value[:1] != TOKEN_VERSION or value[1:2] not in CODE_ACTIONS:
+            return None
+        return base36_to_int(value[2:]), CODE_ACTIONS[value[1:2]]
+    except (BadSignature, ValueError):
+        return None
+
+
+def read_token(token, action):
+    """
+    Invitation id a token was issued for.
+    Raises BadSignature if the token is invalid or was issued for another action.
+    """
+    decoded = _decode(token)
+    if decoded is None:
+        raise BadSignature(f"Invalid tracking token: {token}")
+
+    invitation_id, token_action = decoded
+    if token_action is not None and token_action != action:
+        raise BadSignature(f"Tracking token for {token_action} used for {action}")
+    return invitation_id
+
+
+def invitation_for_token(token, action):
+    """The invitation a token points at, fetched with its subcontractor and project in one query"""
+    invitation_id = read_token(token, action)
+    return get_object_or_404(TenderInvitation.objects.select_related('subcontractor', 'project'), pk=invitation_id)
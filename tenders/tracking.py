@@ -0,0 +1,195 @@
+# tenders/tracking.py
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines - appends are not shared between processes there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EVENT_OPEN = 'open'
+EVENT_DOWNLOAD = 'download'
+EVENT_RESPONSE = 'response'
+
+
+def _buffer_path():
+    return str(getattr(settings, 'TRACKING_EVENT_BUFFER', os.path.join(settings.BASE_DIR, 'tracking_events.jsonl')))
+
+
+def _append(text):
+    """Append lines to the buffer, returns False if it kept being rotated away"""
+    path = _buffer_path()
+
+    # Retry if the flusher rotated the file between our open and our lock
+    for _ in range(3):
+        with open(path, 'a', encoding='utf-8') as buffer:
+            if fcntl is None:
+                buffer.write(text)
+                return True
+            fcntl.flock(buffer, fcntl.LOCK_SH)
+            if os.fstat(buffer.fileno()).st_nlink == 0:
+                continue
+            buffer.write(text)
+            return True
+    return False
+
+
+def record_event(invitation_id, event, **data):
+    """
+    Append a tracking event to the write-behind buffer.
+    No database access - events are applied in batches by flush_events().
+    """
+    line = json.dumps({
+        'invitation_id': int(invitation_id),
+        'event': event,
+        'at': timezone.now().isoformat(),
+        **data,
+    }) + '\n'
+    if not _append(line):
+        logger.error(f"Could not buffer tracking event {event} for invitation {invitation_id}")
+
+
+def _take_buffered_events():
+    """Atomically rotate the buffer and return its events"""
+    path = _buffer_path()
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+
+    flushing_path = f"{path}.{uuid.uuid4().hex}.flushing"
+    try:
+        os.replace(path, flushing_path)
+    except FileNotFoundError:
+        return []  # Another flusher got there first
+
+    events = []
+    with open(flushing_path, 'r', encoding='utf-8') as buffer:
+        if fcntl is not None:
+            # Wait for writers that still hold the rotated file
+            fcntl.flock(buffer, fcntl.LOCK_EX)
+        for line in buffer:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping malformed tracking event: {line[:100]}")
+        if fcntl is not None:
+            # Unlink while still locked: a writer that opened the rotated file before the
+            # replace then sees no links once it gets its lock, and retries on the new buffer
+            os.remove(flushing_path)
+
+    if fcntl is None:
+        os.remove(flushing_path)  # Open files cannot be removed on Windows
+    return events
+
+
+def _restore_events(events):
+    """Put events taken from the buffer back, for the next flush to apply"""
+    if not _append(''.join(json.dumps(event) + '\n' for event in events)):
+        logger.error(f"Could not restore {len(events)} tracking events to the buffer")
+
+
+def flush_events():
+    """
+    Apply buffered tracking events in one batch.
+    Repeat opens/downloads collapse to the first one, the latest response wins.
+    Returns: number of invitations updated
+    """
+    events = _take_buffered_events()
+    if not events:
+        return 0
+
+    try:
+        updated = _apply_events(events)
+    except Exception:
+        # Nothing was committed - keep the events for the next flush
+        _restore_events(events)
+        raise
+
+    logger.info(f"Flushed {len(events)} tracking events into {updated} invitations")
+    return updated
+
+
+def _apply_events(events):
+    """Write a batch of events to their invitations in one transaction, returns invitations updated"""
+    from communications.models import EmailLog
+    from .counters import counted_bulk_update
+    from .models import TenderInvitation
+
+    first_open = {}
+    first_download = {}
+    latest_response = {}
+
+    for event in events:
+        invitation_id = event['invitation_id']
+        # A copy, so the buffered form of the event is kept if the batch has to be restored
+        event = {**event, 'at': datetime.fromisoformat(event['at'])}
+
+        if event['event'] == EVENT_OPEN:
+            if invitation_id not in first_open or event['at'] < first_open[invitation_id]['at']:
+                first_open[invitation_id] = event
+        elif event['event'] == EVENT_DOWNLOAD:
+            if invitation_id not in first_download or event['at'] < first_download[invitation_id]['at']:
+                first_download[invitation_id] = event
+        elif event['event'] == EVENT_RESPONSE:
+            if invitation_id not in latest_response or event['at'] >= latest_response[invitation_id]['at']:
+                latest_response[invitation_id] = event
+
+    invitation_ids = set(first_open) | set(first_download) | set(latest_response)
+    invitations = TenderInvitation.objects.filter(
+        id__in=invitation_ids
+    ).select_related('project', 'subcontractor')
+
+    updated = []
+    logs = []
+
+    for invitation in invitations:
+        opened = first_open.get(invitation.id)
+        if opened and not invitation.email_opened:
+            invitation.email_opened = True
+            invitation.email_opened_at = opened['at']
+
+        downloaded = first_download.get(invitation.id)
+        if downloaded:
+            if not invitation.documents_downloaded:
+                invitation.documents_downloaded = True
+                invitation.documents_downloaded_at = downloaded['at']
+            logs.append(EmailLog(
+                project=invitation.project,
+                subcontractor=invitation.subcontractor,
+                email_type='DOWNLOAD',
+                subject=f"Documents Downloaded - {invitation.project.name}",
+                body=f"SharePoint documents accessed by {invitation.subcontractor.company}"
+            ))
+
+        responded = latest_response.get(invitation.id)
+        if responded:
+            invitation.status = 'ACCEPTED' if responded['response'] == 'yes' else 'DECLINED'
+            invitation.response_date = responded['at']
+            logs.append(EmailLog(
+                project=invitation.project,
+                subcontractor=invitation.subcontractor,
+                email_type='RESPONSE',
+                subject=f"Response: {responded['response'].upper()} - {invitation.project.name}",
+                body=f"Subcontractor responded: {responded['response'].upper()}"
+            ))
+            logger.info(f"Response {responded['response'].upper()}: {invitation.subcontractor.company} - {invitation.project.name}")
+
+        updated.append(invitation)
+
+    # bulk_update skips post_save - adjust the project counters for status changes
+    with counted_bulk_update([invitation.pk for invitation in updated]):
+        TenderInvitation.objects.bulk_update(updated, [
+            'email_opened', 'email_opened_at',
+            'documents_downloaded', 'documents_downloaded_at',
+            'status', 'response_date',
+        ])
+        EmailLog.objects.bulk_create(logs)
+
+    return len(updated)
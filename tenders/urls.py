@@ -41,6 +41,7 @@ urlpatterns = [
     path('invitation/<int:invitation_id>/update-notes/', views.update_invitation_notes, name='update_invitation_notes'),
     path('invitation/<int:invitation_id>/update-status/', views.UpdateInvitationStatusView.as_view(), name='update_invitation_status'),
     path('invitation/<int:invitation_id>/toggle-returned/', views.toggle_tender_returned, name='toggle_tender_returned'),
+    path('invitation/<int:invitation_id>/returned-files/<str:sha256>/', views.returned_tender_file, name='returned_tender_file'),
 
     # SIMPLIFIED: Document access (no tracking)
     path('project/<int:project_id>/download-documents/', views.download_documents, name='download_documents'),
@@ -74,6 +75,7 @@ urlpatterns = [
     path('project/<int:project_id>/enhanced-ask-ai/question/', views.enhanced_ask_ai_question, name='enhanced_ask_ai_question'),
 
     path('project/<int:project_id>/conversation-history/', views.get_conversation_history, name='conversation_history'),
+    path('project/<int:project_id>/conversation-history/<int:question_id>/', views.get_conversation_answer, name='conversation_answer'),
 
     path('project/<int:project_id>/enhanced-ask-ai-with-analysis/', views.enhanced_ask_ai_question_with_analysis, name='enhanced_ask_ai_with_analysis'),
 
@@ -11,7 +11,6 @@ import tempfile
 import urllib.parse
 import traceback
 import time
-from django.core.cache import cache
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_http_methods, require_GET
 from django.views.generic import ListView, DetailView, FormView, TemplateView
@@ -20,17 +19,25 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.contrib import messages
-from django.core.signing import Signer, BadSignature, SignatureExpired
+from django.core.signing import BadSignature, SignatureExpired
 from django.utils import timezone
 from django.http import HttpResponse, HttpResponseNotFound, FileResponse, JsonResponse
 from django.db import models
 from django.utils.decorators import method_decorator
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count, Q, Case, When, IntegerField, F, FloatField
+from django.db.models import Avg, Count, Q, F, FloatField
 from urllib.parse import unquote
+from core import cache as project_cache
 from django.views import View
 from .services.ai_analysis import TenderAIAnalyzer
 from .services.rfi_generator import IntelligentRFIGenerator
+from .services.reminder_engine import ReminderEngine
+from .history import DEFAULT_PAGE_SIZE, full_answer, history_page, parse_limit, serialize_preview
+from .stats import invitation_stats, rfi_stats
+from .tracking import EVENT_DOWNLOAD, EVENT_OPEN, EVENT_RESPONSE
+from .tracking import record_event as record_tracking_event
+from .tokens import ACTION_REPLY, invitation_for_token, make_token, read_token
 
 # Import models (but NOT any view classes from models)
 from .models import (
@@ -115,8 +122,7 @@ def clear_project_knowledge_cache(request, project_id):
     """Clear cached project knowledge to force refresh"""
     try:
         project = get_object_or_404(Project, id=project_id)
-        cache_key = f"project_knowledge_{project.id}"
-        cache.delete(cache_key)
+        project_cache.invalidate(project_cache.KNOWLEDGE_NAMESPACE, project.id)
 
         return JsonResponse({
             'success': True,
@@ -202,20 +208,8 @@ def rfi_list(request, project_id):
     # Get RFI items
     rfis = RFIItem.objects.filter(project=project).order_by('priority', 'category', 'created_at')
 
-    # Statistics
-    stats = {
-        'total': rfis.count(),
-        'pending': rfis.filter(status='PENDING').count(),
-        'submitted': rfis.filter(status='SUBMITTED').count(),
-        'responded': rfis.filter(status='RESPONDED').count(),
-        'resolved': rfis.filter(status='CLARIFIED').count(),
-    }
-
-    # Category breakdown
-    categories = {}
-    for rfi in rfis:
-        cat = rfi.get_category_display()
-        categories[cat] = categories.get(cat, 0) + 1
+    # Status and category breakdown in one query
+    stats, categories = rfi_stats(rfis)
 
     context = {
         'project': project,
@@ -223,7 +217,7 @@ def rfi_list(request, project_id):
         'rfis': rfis,
         'stats': stats,
         'categories': categories,
-        'can_generate': analysis is not None and rfis.count() == 0
+        'can_generate': analysis is not None and stats['total'] == 0
     }
 
     return render(request, 'tenders/rfi_list.html', context)
@@ -403,144 +397,55 @@ def get_fallback_answer(question: str, project_name: str) -> dict:
         'quotes': []
     }
 
+# Tracking responses are static so they can be served without touching the database
+TRACKING_PIXEL = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+RESPONSE_RECORDED_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Response Recorded</title>
+</head>
+<body style="font-family: Arial, sans-serif; text-align: center; padding: 40px; color: #333;">
+<div style="font-size: 60px; color: {color};">{icon}</div>
+<h1>Response Recorded</h1>
+<p style="font-size: 18px; color: #666;">{message}</p>
+<p style="font-size: 12px; color: #999;"><strong>TA Knox Ltd</strong> - Estimating Department</p>
+</body>
+</html>"""
+
+RESPONSE_PAGES = {
+    'yes': RESPONSE_RECORDED_PAGE.format(
+        color='#28a745', icon='✓', message='Thank you! We have recorded that you will tender.'
+    ),
+    'no': RESPONSE_RECORDED_PAGE.format(
+        color='#6c757d', icon='ℹ', message='Thank you for letting us know that you will not tender.'
+    ),
+}
+
+
 class TrackResponseView(View):
     """
-    SIMPLE: Track yes/no responses without showing web pages
+    FAST PATH: Buffer yes/no responses and return a tiny cached confirmation page.
+    The invitation is updated by the tracking event flusher.
     """
     def get(self, request, token):
         try:
             # Decode token to get invitation ID
-            signer = Signer()
-            invitation_id = signer.unsign(token)
+            invitation_id = read_token(token, EVENT_RESPONSE)
 
-            invitation = get_object_or_404(TenderInvitation, id=invitation_id)
             response = request.GET.get('response', '').lower()
 
             if response not in ['yes', 'no']:
                 logger.error(f"Invalid response: {response}")
                 return HttpResponse("Invalid response", status=400)
 
-            # Update invitation status
-            if response == 'yes':
-                invitation.status = 'ACCEPTED'
-                message = f"✓ Thank you! {invitation.subcontractor.company} will tender for {invitation.project.name}"
-                logger.info(f"Response YES: {invitation.subcontractor.company} - {invitation.project.name}")
-            else:  # response == 'no'
-                invitation.status = 'DECLINED'
-                message = f"Thank you for letting us know. {invitation.subcontractor.company} will not tender for {invitation.project.name}"
-                logger.info(f"Response NO: {invitation.subcontractor.company} - {invitation.project.name}")
-
-            # Set response date and save
-            invitation.response_date = timezone.now()
-            invitation.save(update_fields=['status', 'response_date'])
-
-            # Log the response
-            if EmailLog:
-                EmailLog.objects.create(
-                    project=invitation.project,
-                    subcontractor=invitation.subcontractor,
-                    email_type='RESPONSE',
-                    subject=f"Response: {response.upper()} - {invitation.project.name}",
-                    body=f"Subcontractor responded: {response.upper()}"
-                )
+            record_tracking_event(invitation_id, EVENT_RESPONSE, response=response)
 
-            # Return simple success page
-            success_color = "#28a745" if response == 'yes' else "#6c757d"
-            icon = "✓" if response == 'yes' else "ℹ"
-
-            html_response = f"""
-            <!DOCTYPE html>
-            <html lang="en">
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <title>Response Recorded - {invitation.project.name}</title>
-                <style>
-                    body {{
-                        font-family: Arial, sans-serif;
-                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                        margin: 0;
-                        padding: 20px;
-                        min-height: 100vh;
-                        display: flex;
-                        align-items: center;
-                        justify-content: center;
-                    }}
-                    .container {{
-                        background: white;
-                        padding: 40px;
-                        border-radius: 15px;
-                        box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-                        text-align: center;
-                        max-width: 500px;
-                        width: 100%;
-                    }}
-                    .icon {{
-                        font-size: 60px;
-                        color: {success_color};
-                        margin-bottom: 20px;
-                    }}
-                    h1 {{
-                        color: #333;
-                        margin-bottom: 20px;
-                    }}
-                    .message {{
-                        font-size: 18px;
-                        color: #666;
-                        line-height: 1.5;
-                        margin-bottom: 30px;
-                    }}
-                    .project-info {{
-                        background: #f8f9fa;
-                        padding: 20px;
-                        border-radius: 8px;
-                        margin-bottom: 20px;
-                    }}
-                    .footer {{
-                        font-size: 12px;
-                        color: #999;
-                        margin-top: 30px;
-                    }}
-                    .logo {{
-                        max-width: 200px;
-                        height: auto;
-                        margin-bottom: 20px;
-                    }}
-                </style>
-                <script>
-                    // Auto-close after 10 seconds
-                    setTimeout(function() {{
-                        window.close();
-                    }}, 10000);
-                </script>
-            </head>
-            <body>
-                <div class="container">
-                    <img src="https://www.taknox.co.uk/wp-content/uploads/2020/09/taknox-logo.png" alt="TA Knox Logo" class="logo">
-
-                    <div class="icon">{icon}</div>
-
-                    <h1>Response Recorded</h1>
-
-                    <div class="project-info">
-                        <strong>Project:</strong> {invitation.project.name}<br>
-                        <strong>Company:</strong> {invitation.subcontractor.company}
-                    </div>
-
-                    <div class="message">
-                        {message}
-                    </div>
-
-                    <div class="footer">
-                        This window will close automatically in 10 seconds.<br>
-                        <strong>TA Knox Ltd</strong> - Estimating Department
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-
-            return HttpResponse(html_response)
+            http_response = HttpResponse(RESPONSE_PAGES[response])
+            patch_cache_control(http_response, private=True, max_age=3600)
+            return http_response
 
         except (BadSignature, SignatureExpired) as e:
             logger.error(f"Invalid token: {token} - {str(e)}")
@@ -552,55 +457,33 @@ class TrackResponseView(View):
 
 class TrackDownloadView(View):
     """
-    SIMPLE: Track SharePoint document downloads and mark documents as downloaded
+    FAST PATH: Buffer SharePoint document downloads and redirect straight to SharePoint
     """
     def get(self, request, token):
-        try:
-            # Decode token to get invitation ID
-            signer = Signer()
-            invitation_id = signer.unsign(token)
+        sharepoint_url = request.GET.get('url', '')
 
-            invitation = get_object_or_404(TenderInvitation, id=invitation_id)
-            sharepoint_url = request.GET.get('url', '')
+        if not sharepoint_url:
+            logger.error("No SharePoint URL provided")
+            return HttpResponse("Invalid download link", status=400)
 
-            if not sharepoint_url:
-                logger.error("No SharePoint URL provided")
-                return HttpResponse("Invalid download link", status=400)
-
-            # Decode the SharePoint URL
-            sharepoint_url = unquote(sharepoint_url)
-
-            # FIXED: Mark documents as downloaded in tender tracking
-            invitation.documents_downloaded = True
-            invitation.documents_downloaded_at = timezone.now()
-            invitation.save(update_fields=['documents_downloaded', 'documents_downloaded_at'])
-
-            logger.info(f"Document download tracked: {invitation.subcontractor.company} - {invitation.project.name}")
-            logger.info(f"SharePoint URL: {sharepoint_url}")
-
-            # Log the download
-            if EmailLog:
-                EmailLog.objects.create(
-                    project=invitation.project,
-                    subcontractor=invitation.subcontractor,
-                    email_type='DOWNLOAD',
-                    subject=f"Documents Downloaded - {invitation.project.name}",
-                    body=f"SharePoint documents accessed by {invitation.subcontractor.company}"
-                )
+        # Decode the SharePoint URL
+        sharepoint_url = unquote(sharepoint_url)
+
+        try:
+            # Decode token to get invitation ID
+            invitation_id = read_token(token, EVENT_DOWNLOAD)
 
-            # Redirect to the actual SharePoint URL
-            return redirect(sharepoint_url)
+            record_tracking_event(invitation_id, EVENT_DOWNLOAD)
 
         except (BadSignature, SignatureExpired) as e:
             logger.error(f"Invalid token: {token} - {str(e)}")
             return HttpResponse("Invalid or expired download link", status=403)
         except Exception as e:
-            logger.exception(f"Error tracking download: {str(e)}")
             # Still redirect to SharePoint even if tracking fails
-            sharepoint_url = request.GET.get('url', '')
-            if sharepoint_url:
-                return redirect(unquote(sharepoint_url))
-            return HttpResponse("Error processing download", status=500)
+            logger.exception(f"Error tracking download: {str(e)}")
+
+        # Redirect to the actual SharePoint URL
+        return redirect(sharepoint_url)
 
 class TenderListView(LoginRequiredMixin, ListView):
     """List view for tender projects"""
@@ -620,12 +503,7 @@ class TenderListView(LoginRequiredMixin, ListView):
                 tender_deadline__lt=now
             )
 
-            queryset = queryset.annotate(
-                invitation_count=models.Count('invitations'),
-                accepted_count=models.Count('invitations', filter=models.Q(invitations__status='ACCEPTED')),
-                declined_count=models.Count('invitations', filter=models.Q(invitations__status='DECLINED')),
-            )
-
+            # Denormalized counters on Project - no join over invitations
             queryset = queryset.filter(invitation_count__gt=0)
 
         queryset = queryset.order_by('-created_at')
@@ -649,38 +527,28 @@ class TenderTrackingView(LoginRequiredMixin, DetailView):
     pk_url_kwarg = 'project_id'
 
     def get_context_data(self, **kwargs):
+        # Read-only: buffered opens/downloads/responses are applied by the scheduled
+        # flush_tracking_events command, not by page views
         context = super().get_context_data(**kwargs)
-        project = self.get_object()
-
-        invitations = project.invitations.all().select_related('subcontractor', 'subcontractor__trade')
-
-        # Basic statistics
-        stats = {
-            'total': invitations.count(),
-            'pending': invitations.filter(status='PENDING').count(),
-            'accepted': invitations.filter(status='ACCEPTED').count(),
-            'declined': invitations.filter(status='DECLINED').count(),
-            'returned': invitations.filter(tender_returned=True).count(),
-        }
+        project = self.object
 
-        trades_stats = Trade.objects.filter(
-            subcontractors__tender_invitations__project=project
-        ).annotate(
-            total=Count('subcontractors__tender_invitations'),
-            returned=Count(
-                Case(
-                    When(subcontractors__tender_invitations__tender_returned=True, then=1),
-                    output_field=IntegerField(),
-                )
-            )
-        ).filter(total__gt=0).order_by('name')
+        invitations = project.invitations.all().select_related(
+            'subcontractor', 'subcontractor__trade', 'subcontractor__tender_stats'
+        )
 
-        # Calculate return rate for each trade
+        # Basic statistics in one query
+        stats = invitation_stats(invitations)
+
+        # Per-trade return rates from the invitations the page lists anyway
+        trades = {}
+        for invitation in invitations:
+            trade = invitation.subcontractor.trade
+            row = trades.setdefault(trade.name, {'name': trade.name, 'total': 0, 'returned': 0})
+            row['total'] += 1
+            row['returned'] += invitation.tender_returned
+        trades_stats = [trades[name] for name in sorted(trades)]
         for trade in trades_stats:
-            if trade.total > 0:
-                trade.return_rate = round((trade.returned / trade.total) * 100, 1)
-            else:
-                trade.return_rate = 0
+            trade['return_rate'] = round((trade['returned'] / trade['total']) * 100, 1)
 
         context['invitations'] = invitations
         context['stats'] = stats
@@ -1270,7 +1138,7 @@ class SendTenderInvitationView(LoginRequiredMixin, FormView):
 
                     if created:
                         # Generate tracking token for new invitation
-                        tracking_token = self._generate_tracking_token(invitation.id)
+                        tracking_token = make_token(invitation.id, EVENT_OPEN)
                         tracking_url = self.request.build_absolute_uri(
                             reverse('tenders:track_email', kwargs={'token': tracking_token})
                         )
@@ -1345,10 +1213,6 @@ class SendTenderInvitationView(LoginRequiredMixin, FormView):
 
         return super().form_valid(form)
 
-    def _generate_tracking_token(self, invitation_id):
-        signer = Signer()
-        return signer.sign(str(invitation_id))
-
 class SendAddendumView(LoginRequiredMixin, FormView):
     """Send addendum to existing tender invitations"""
     template_name = 'tenders/send_addendum.html'
@@ -1448,10 +1312,6 @@ class SendAddendumView(LoginRequiredMixin, FormView):
 
         return super().form_valid(form)
 
-    def _generate_tracking_token(self, invitation_id):
-        signer = Signer()
-        return signer.sign(str(invitation_id))
-
 @login_required
 def generate_analysis(self, prompt: str) -> str:
     """Generate analysis from a prompt using Claude AI"""
@@ -1495,13 +1355,13 @@ def export_rfi_schedule(request, project_id):
     try:
         from .rfi_exporter import RFIExcelExporter
         exporter = RFIExcelExporter()
-        try:
-            rfi_items = RFIItem.objects.filter(project=project)
-        except:
-            rfi_items = []
-        response = exporter.export_rfi_items(project, rfi_items)
+        analysis = TenderAnalysis.objects.select_related('project').get(project=project)
+        response = exporter.export_rfi_schedule(analysis)
         return response
 
+    except TenderAnalysis.DoesNotExist:
+        messages.error(request, "No analysis found for this project.")
+        return redirect('projects:detail', pk=project.id)
     except ImportError:
         messages.error(request, "RFI export functionality not available.")
         return redirect('tenders:analysis', project_id=project_id)
@@ -1519,7 +1379,7 @@ def export_contract_summary(request, project_id):
     try:
         from .rfi_exporter import ContractSummaryExporter
         exporter = ContractSummaryExporter()
-        analysis = TenderAnalysis.objects.get(project=project)
+        analysis = TenderAnalysis.objects.select_related('project').get(project=project)
         response = exporter.export_contract_summary(analysis)
         return response
 
@@ -2014,6 +1874,26 @@ def toggle_tender_returned(request, invitation_id):
     return redirect('tenders:tracking', project_id=invitation.project.id)
 
 
+@login_required
+def returned_tender_file(request, invitation_id, sha256):
+    """Serve a returned tender attachment stored by the email monitor"""
+    from django.core.files.storage import default_storage
+
+    invitation = get_object_or_404(TenderInvitation, id=invitation_id)
+    files = (invitation.tender_attachments or {}).get('files', [])
+    entry = next((f for f in files if f.get('sha256') == sha256), None)
+
+    if not entry or not default_storage.exists(entry['path']):
+        return HttpResponseNotFound("Returned tender file not found")
+
+    return FileResponse(
+        default_storage.open(entry['path'], 'rb'),
+        as_attachment=True,
+        filename=entry['name'],
+        content_type=entry.get('content_type') or None
+    )
+
+
 # API endpoints
 @csrf_exempt
 @require_POST
@@ -2117,32 +1997,14 @@ class SendAllRemindersView(LoginRequiredMixin, View):
         project = get_object_or_404(Project, id=project_id)
         reminder_type = request.GET.get('type', 'pending')
 
-        # Get today's date for daily limit checking
-        today = timezone.now().date()
+        # Daily limit checks share the reminder engine's queries (and indexes)
+        engine = ReminderEngine(email_service=None)
 
         if reminder_type == 'pending':
-            # Get pending invitations that haven't had a reminder today
-            invitations = TenderInvitation.objects.filter(
-                project=project,
-                status='PENDING',
-                tender_returned=False
-            ).exclude(
-                last_pending_reminder__date=today  # Exclude if already sent today
-            )
-
             reminder_title = "Remind Non-Responders"
             reminder_description = "Send daily reminder to subcontractors who haven't responded (max once per day)"
 
         elif reminder_type == 'will_tender':
-            # Get accepted invitations that haven't had a tender reminder today
-            invitations = TenderInvitation.objects.filter(
-                project=project,
-                status='ACCEPTED',
-                tender_returned=False
-            ).exclude(
-                last_will_tender_reminder__date=today  # Exclude if already sent today
-            )
-
             reminder_title = "Remind Will Tender"
             reminder_description = "Send tender deadline reminder to subcontractors who confirmed they will tender"
 
@@ -2150,19 +2012,11 @@ class SendAllRemindersView(LoginRequiredMixin, View):
             messages.error(request, "Invalid reminder type")
             return redirect('tenders:tracking', project_id=project_id)
 
+        # Invitations that haven't had this reminder today
+        invitations = engine.due_queryset(reminder_types=[reminder_type], project_ids=[project.id])
+
         # Count how many already received reminders today
-        if reminder_type == 'pending':
-            already_sent_today = TenderInvitation.objects.filter(
-                project=project,
-                status='PENDING',
-                last_pending_reminder__date=today
-            ).count()
-        else:
-            already_sent_today = TenderInvitation.objects.filter(
-                project=project,
-                status='ACCEPTED',
-                last_will_tender_reminder__date=today
-            ).count()
+        already_sent_today = engine.sent_today_queryset(reminder_type, project_ids=[project.id]).count()
 
         context = {
             'project': project,
@@ -2182,76 +2036,26 @@ class SendAllRemindersView(LoginRequiredMixin, View):
         reminder_type = request.POST.get('type', 'pending')
 
         try:
-            today = timezone.now().date()
-
-            # Get appropriate invitations based on type and daily limits
             if reminder_type == 'pending':
-                invitations = TenderInvitation.objects.filter(
-                    project=project,
-                    status='PENDING',
-                    tender_returned=False
-                ).exclude(
-                    last_pending_reminder__date=today
-                )
                 message_suffix = "to non-responding subcontractors"
-
             elif reminder_type == 'will_tender':
-                invitations = TenderInvitation.objects.filter(
-                    project=project,
-                    status='ACCEPTED',
-                    tender_returned=False
-                ).exclude(
-                    last_will_tender_reminder__date=today
-                )
                 message_suffix = "to subcontractors who will tender"
-
             else:
                 messages.error(request, "Invalid reminder type")
                 return redirect('tenders:tracking', project_id=project_id)
 
-            if not invitations.exists():
-                messages.info(request, f"No {reminder_type} reminders to send today (daily limit applied)")
-                return redirect('tenders:tracking', project_id=project_id)
-
             if OutlookEmailService:
-                email_service = OutlookEmailService()
-                reminders_sent = 0
-                errors = 0
+                # Invitations not yet reminded today (daily limit), sent concurrently
+                engine = ReminderEngine(OutlookEmailService())
+                groups = engine.plan(reminder_types=[reminder_type], project_ids=[project.id])
 
-                for invitation in invitations:
-                    try:
-                        # Send reminder using appropriate method based on type
-                        if reminder_type == 'pending':
-                            success = email_service.send_pending_response_reminder(invitation)
-                        elif reminder_type == 'will_tender':
-                            success = email_service.send_will_tender_deadline_reminder(invitation)
-                        else:
-                            success = False
-                            logger.error(f"Unknown reminder type: {reminder_type}")
+                if not groups:
+                    messages.info(request, f"No {reminder_type} reminders to send today (daily limit applied)")
+                    return redirect('tenders:tracking', project_id=project_id)
 
-                        if success:
-                            now = timezone.now()
-
-                            # Update tracking fields based on reminder type
-                            if reminder_type == 'pending':
-                                invitation.last_pending_reminder = now
-                                invitation.pending_reminder_count += 1
-                            else:  # will_tender
-                                invitation.last_will_tender_reminder = now
-                                invitation.will_tender_reminder_count += 1
-
-                            invitation.reminder_sent_at = now  # Generic reminder timestamp
-                            invitation.save()
-
-                            reminders_sent += 1
-                            logger.info(f"✅ {reminder_type} reminder sent to {invitation.subcontractor.company}")
-                        else:
-                            errors += 1
-                            logger.error(f"❌ Failed to send {reminder_type} reminder to {invitation.subcontractor.company}")
-
-                    except Exception as e:
-                        errors += 1
-                        logger.exception(f"Error sending {reminder_type} reminder to {invitation.subcontractor.company}: {str(e)}")
+                summary = engine.send(groups)
+                reminders_sent = summary['sent']
+                errors = summary['failed']
 
                 # Success message
                 if reminders_sent > 0:
@@ -2279,7 +2083,7 @@ class ResendInvitationView(LoginRequiredMixin, View):
         try:
             if OutlookEmailService:
                 email_service = OutlookEmailService()
-                tracking_token = self._generate_tracking_token(invitation.id)
+                tracking_token = make_token(invitation.id, EVENT_OPEN)
                 tracking_url = request.build_absolute_uri(
                     reverse('tenders:track_email', kwargs={'token': tracking_token})
                 )
@@ -2301,10 +2105,6 @@ class ResendInvitationView(LoginRequiredMixin, View):
 
         return redirect('tenders:tracking', project_id=invitation.project.id)
 
-    def _generate_tracking_token(self, invitation_id):
-        signer = Signer()
-        return signer.sign(str(invitation_id))
-
 
 class UpdateInvitationStatusView(LoginRequiredMixin, View):
     """Update the status of a tender invitation"""
@@ -2329,23 +2129,18 @@ class UpdateInvitationStatusView(LoginRequiredMixin, View):
 
 
 class TrackEmailView(View):
-    """Track email opens via pixel tracking"""
+    """Track email opens via pixel tracking (buffered, repeat opens are deduplicated on flush)"""
 
     def get(self, request, token):
         try:
-            signer = Signer()
-            invitation_id = signer.unsign(token)
+            invitation_id = read_token(token, EVENT_OPEN)
 
-            invitation = get_object_or_404(TenderInvitation, id=invitation_id)
-            invitation.email_opened = True
-            invitation.email_opened_at = timezone.now()
-            invitation.save()
+            record_tracking_event(invitation_id, EVENT_OPEN)
 
             # Return a 1x1 transparent pixel
-            pixel_data = base64.b64decode(
-                'R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7'
-            )
-            return HttpResponse(pixel_data, content_type='image/gif')
+            response = HttpResponse(TRACKING_PIXEL, content_type='image/gif')
+            patch_cache_control(response, private=True, max_age=86400)
+            return response
 
         except (BadSignature, SignatureExpired):
             return HttpResponseNotFound()
@@ -2423,16 +2218,13 @@ class TenderResponseView(View):
 
     def get(self, request, token):
         try:
-            signer = Signer()
-            invitation_id = signer.unsign(token)
+            invitation = invitation_for_token(token, ACTION_REPLY)
 
-            invitation = get_object_or_404(TenderInvitation, id=invitation_id)
-
-            # Track that the response page was accessed
-            invitation.email_opened = True
-            if not invitation.email_opened_at:
-                invitation.email_opened_at = timezone.now()
-            invitation.save()
+            # Track that the response page was accessed - repeat visits are a single read
+            if not invitation.email_opened or not invitation.email_opened_at:
+                invitation.email_opened = True
+                invitation.email_opened_at = invitation.email_opened_at or timezone.now()
+                invitation.save(update_fields=['email_opened', 'email_opened_at'])
 
             context = {
                 'invitation': invitation,
@@ -2444,14 +2236,11 @@ class TenderResponseView(View):
             return render(request, 'tenders/tender_response.html', context)
 
         except (BadSignature, SignatureExpired):
-            return render(request, 'tenders/invalid_token.html', status=404)
+            return HttpResponse("Invalid or expired link", status=403)
 
     def post(self, request, token):
         try:
-            signer = Signer()
-            invitation_id = signer.unsign(token)
-
-            invitation = get_object_or_404(TenderInvitation, id=invitation_id)
+            invitation = invitation_for_token(token, ACTION_REPLY)
 
             # Update invitation status based on response
             response = request.POST.get('response')
@@ -2481,7 +2270,7 @@ class TenderResponseView(View):
             return render(request, 'tenders/response_confirmation.html', context)
 
         except (BadSignature, SignatureExpired):
-            return render(request, 'tenders/invalid_token.html', status=404)
+            return HttpResponse("Invalid or expired link", status=403)
 
 
 @login_required
@@ -2652,14 +2441,15 @@ class EnhancedAskAIView(LoginRequiredMixin, TemplateView):
         else:
             context['document_analysis'] = None
 
-        # Get conversation history
+        # Get the latest page of conversation history - older pages and full answers load on demand
         try:
             conversation = AIConversation.objects.get(project=project)
-            context['conversation_history'] = AIQuestion.objects.filter(
-                conversation=conversation
-            ).order_by('-created_date')[:20]
+            context['conversation_history'], context['history_next_cursor'] = history_page(
+                conversation.id, limit=DEFAULT_PAGE_SIZE
+            )
         except AIConversation.DoesNotExist:
             context['conversation_history'] = []
+            context['history_next_cursor'] = None
 
         context['project'] = project
         context['enhanced_ai_available'] = ENHANCED_AI_AVAILABLE
@@ -2734,41 +2524,39 @@ def enhanced_ask_ai_question(request, project_id):
 @login_required
 def get_conversation_history(request, project_id):
     """
-    Get conversation history for a project
+    Get one page of conversation history for a project, newest first.
+    Query params: cursor (next_cursor of the previous page), limit.
+    Answers are truncated to a preview - see get_conversation_answer.
     """
     try:
         project = get_object_or_404(Project, id=project_id)
+        limit = parse_limit(request.GET.get('limit'))
 
         try:
             conversation = AIConversation.objects.get(project=project)
-            questions = AIQuestion.objects.filter(conversation=conversation).order_by('-created_date')
-
-            history = []
-            for question in questions:
-                history.append({
-                    'id': question.id,
-                    'question': question.question_text,
-                    'answer': question.answer_text,
-                    'confidence': question.confidence_score,
-                    'timestamp': question.created_date.isoformat(),
-                    'source_documents': question.source_documents,
-                    'document_references': question.document_references,
-                    'analysis_metadata': question.analysis_metadata
-                })
+            questions, next_cursor = history_page(conversation.id, request.GET.get('cursor'), limit)
 
             return JsonResponse({
                 'success': True,
                 'conversation_id': conversation.id,
-                'history': history
+                'history': [serialize_preview(question) for question in questions],
+                'next_cursor': next_cursor
             })
 
         except AIConversation.DoesNotExist:
             return JsonResponse({
                 'success': True,
                 'conversation_id': None,
-                'history': []
+                'history': [],
+                'next_cursor': None
             })
 
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+
     except Exception as e:
         logger.error(f"Error getting conversation history: {str(e)}")
         return JsonResponse({
@@ -2777,6 +2565,18 @@ def get_conversation_history(request, project_id):
         }, status=500)
 
 
+@login_required
+def get_conversation_answer(request, project_id, question_id):
+    """
+    Full answer and sources for one question of the conversation history
+    """
+    question = get_object_or_404(AIQuestion, id=question_id, conversation__project_id=project_id)
+    return JsonResponse({
+        'success': True,
+        'question': full_answer(question)
+    })
+
+
 @login_required
 def clear_document_cache(request, project_id):
     """